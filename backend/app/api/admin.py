@@ -1,53 +1,52 @@
 """
 Admin API endpoints for managing lessons
 """
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import AsyncIterator, Literal, Optional, Sequence
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from app.core.security import verify_token, get_supabase_client
+from app.core.config import settings
+from app.core.roles import record_role_change, resolve_role
+from app.core.security import verify_token, verify_token_strict
+from app.models.schemas import LessonCreate, LessonUpdate
+from app.repositories.lessons import LessonRepository, get_lesson_repository
+from app.repositories.users import UserAdminRepository, get_user_admin_repository
+from app.services.admin_listing import (
+    LESSON_COLUMNS,
+    USER_COLUMNS,
+    InvalidCursor,
+    UserFilter,
+    csv_lines,
+    iter_lessons,
+    iter_users,
+    ndjson_lines,
+    page_lessons,
+    page_users,
+)
+from app.services.lesson_catalog import lesson_catalog
+from app.services.lesson_import import BundleError, TooManyLessons, import_lessons, iter_bundle
+from app.services.judge_registry import judge_registry
+from app.services.validators import ConfigError
 
 router = APIRouter()
 
 
-# --- Models ---
-class LessonCreate(BaseModel):
-    title: str
-    description: Optional[str] = None
-    goal: str
-    game_type: str = "exact_match"
-    difficulty: str = "beginner"
-    order_index: int = 0
-    config: dict = {}
-    time_limit: Optional[int] = None
-    is_published: bool = False
-
-
-class LessonUpdate(BaseModel):
-    title: Optional[str] = None
-    description: Optional[str] = None
-    goal: Optional[str] = None
-    game_type: Optional[str] = None
-    difficulty: Optional[str] = None
-    order_index: Optional[int] = None
-    config: Optional[dict] = None
-    time_limit: Optional[int] = None
-    is_published: Optional[bool] = None
-
-
 # --- Helpers ---
-async def verify_admin(user: dict = Depends(verify_token)) -> dict:
-    """Verify the user has admin role"""
-    supabase = get_supabase_client()
-    user_response = supabase.auth.admin.get_user_by_id(user["user_id"])
-
-    if not user_response or not user_response.user:
+async def verify_admin(
+    user: dict = Depends(verify_token),
+    user_admin: UserAdminRepository = Depends(get_user_admin_repository),
+) -> dict:
+    """Verify the user has admin role (from the token's claim or the role cache)"""
+    role = await resolve_role(user, user_admin)
+
+    if role is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied"
         )
 
-    role = (user_response.user.user_metadata or {}).get("role", "")
     if role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -57,119 +56,204 @@ async def verify_admin(user: dict = Depends(verify_token)) -> dict:
     return user
 
 
+def lesson_filters(
+    game_type: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    is_published: Optional[bool] = None,
+) -> dict:
+    """Column filters for lesson listings and exports"""
+    filters = {"game_type": game_type, "difficulty": difficulty, "is_published": is_published}
+    return {column: value for column, value in filters.items() if value is not None}
+
+
+def user_filter(
+    role: Optional[Literal["admin", "user"]] = None,
+    email_prefix: Optional[str] = None,
+    confirmed: Optional[bool] = None,
+    last_sign_in_after: Optional[datetime] = None,
+    last_sign_in_before: Optional[datetime] = None,
+) -> UserFilter:
+    """Filters for user listings and exports"""
+    return UserFilter(role, email_prefix, confirmed, last_sign_in_after, last_sign_in_before)
+
+
+def page_limit(limit: int = Query(settings.ADMIN_PAGE_SIZE, ge=1, le=settings.ADMIN_MAX_PAGE_SIZE)) -> int:
+    return limit
+
+
+def export_response(rows: AsyncIterator[dict], format: str, columns: Sequence[str], name: str) -> StreamingResponse:
+    """Stream ``rows`` as NDJSON or CSV, one page of source rows in memory at a time"""
+    if format == "csv":
+        body, media_type = csv_lines(rows, columns), "text/csv; charset=utf-8"
+    else:
+        body, media_type = ndjson_lines(rows), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
+
+
+def validate_lesson_config(game_type: str, config: dict) -> None:
+    """Reject configs that would fail at judge time (bad regex, mismatched lengths...)"""
+    try:
+        judge_registry.compile(game_type, config)
+    except ConfigError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Invalid lesson config: {e}"
+        )
+
+
 # --- Routes ---
 @router.get("/admin/lessons")
-async def list_all_lessons(user: dict = Depends(verify_admin)):
-    """List ALL lessons (including unpublished) for admin"""
-    supabase = get_supabase_client()
-    result = supabase.table("lessons").select("*").order("order_index").execute()
-    return {"lessons": result.data, "total": len(result.data)}
+async def list_all_lessons(
+    limit: int = Depends(page_limit),
+    cursor: Optional[str] = None,
+    filters: dict = Depends(lesson_filters),
+    user: dict = Depends(verify_admin),
+    lessons: LessonRepository = Depends(get_lesson_repository),
+):
+    """
+    List lessons (including unpublished) for admin, one page at a time; pass ``next_cursor`` back for the next.
+    ``total`` counts every lesson matching the filters.
+    """
+    try:
+        rows, next_cursor, total = await page_lessons(lessons, filters, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"lessons": rows, "total": total, "count": len(rows), "next_cursor": next_cursor}
+
+
+@router.get("/admin/lessons/export")
+async def export_lessons(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: dict = Depends(lesson_filters),
+    user: dict = Depends(verify_admin),
+):
+    """Export every matching lesson as NDJSON or CSV"""
+    # Not bound to the request: the body streams after this handler returns,
+    # and Starlette stops the generator if the client goes away
+    rows = iter_lessons(LessonRepository(), filters, settings.ADMIN_EXPORT_PAGE_SIZE)
+    return export_response(rows, format, LESSON_COLUMNS, "lessons")
+
+
+@router.post("/admin/lessons/import")
+async def import_lesson_bundle(
+    request: Request,
+    dry_run: bool = False,
+    user: dict = Depends(verify_admin),
+    lessons: LessonRepository = Depends(get_lesson_repository),
+):
+    """
+    Import lessons from an NDJSON (as exported) or JSON array body. Every
+    lesson is validated first; then only new or changed ones are written,
+    all in one transaction. ``dry_run`` reports the diff without writing.
+    """
+    try:
+        result = await import_lessons(
+            iter_bundle(request.stream()),
+            lessons,
+            max_lessons=settings.LESSON_IMPORT_MAX_LESSONS,
+            page_size=settings.ADMIN_EXPORT_PAGE_SIZE,
+            dry_run=dry_run,
+        )
+    except BundleError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bundle: {e}")
+    except TooManyLessons as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+    if result.error_count:
+        raise HTTPException(status_code=422, detail=result.summary())
+
+    lesson_catalog.upsert_many(result.written)
+    return result.summary()
 
 
 @router.post("/admin/lessons", status_code=status.HTTP_201_CREATED)
-async def create_lesson(lesson: LessonCreate, user: dict = Depends(verify_admin)):
+async def create_lesson(
+    lesson: LessonCreate,
+    user: dict = Depends(verify_admin),
+    lessons: LessonRepository = Depends(get_lesson_repository),
+):
     """Create a new lesson"""
-    supabase = get_supabase_client()
-    result = supabase.table("lessons").insert(lesson.model_dump()).execute()
+    validate_lesson_config(lesson.game_type, lesson.config)
+    created = await lessons.create(lesson.model_dump())
 
-    if not result.data:
+    if not created:
         raise HTTPException(status_code=500, detail="Failed to create lesson")
 
-    return {"lesson": result.data[0], "message": "Lesson created successfully"}
+    lesson_catalog.upsert(created)
+
+    return {"lesson": created, "message": "Lesson created successfully"}
 
 
 @router.get("/admin/lessons/{lesson_id}")
-async def get_lesson(lesson_id: int, user: dict = Depends(verify_admin)):
+async def get_lesson(
+    lesson_id: int,
+    user: dict = Depends(verify_admin),
+    lessons: LessonRepository = Depends(get_lesson_repository),
+):
     """Get a single lesson by ID (admin view)"""
-    supabase = get_supabase_client()
-    result = supabase.table("lessons").select("*").eq("id", lesson_id).execute()
+    row = await lessons.get(lesson_id)
 
-    if not result.data:
+    if not row:
         raise HTTPException(status_code=404, detail="Lesson not found")
 
-    return result.data[0]
+    return row
 
 
 @router.put("/admin/lessons/{lesson_id}")
 async def update_lesson(
     lesson_id: int,
     lesson: LessonUpdate,
-    user: dict = Depends(verify_admin)
+    user: dict = Depends(verify_admin),
+    lessons: LessonRepository = Depends(get_lesson_repository),
 ):
     """Update an existing lesson"""
-    supabase = get_supabase_client()
     update_data = {k: v for k, v in lesson.model_dump().items() if v is not None}
 
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    result = supabase.table("lessons").update(update_data).eq("id", lesson_id).execute()
+    if "game_type" in update_data or "config" in update_data:
+        current = await lesson_catalog.get(lesson_id, lessons)
+        if not current:
+            raise HTTPException(status_code=404, detail="Lesson not found")
+        validate_lesson_config(
+            update_data.get("game_type", current["game_type"]),
+            update_data.get("config", current.get("config") or {}),
+        )
+
+    updated = await lessons.update(lesson_id, update_data)
 
-    if not result.data:
+    if not updated:
         raise HTTPException(status_code=404, detail="Lesson not found")
 
-    return {"lesson": result.data[0], "message": "Lesson updated successfully"}
+    lesson_catalog.upsert(updated)
+    return {"lesson": updated, "message": "Lesson updated successfully"}
 
 
 @router.delete("/admin/lessons/{lesson_id}")
-async def delete_lesson(lesson_id: int, user: dict = Depends(verify_admin)):
+async def delete_lesson(
+    lesson_id: int,
+    user: dict = Depends(verify_admin),
+    lessons: LessonRepository = Depends(get_lesson_repository),
+):
     """Delete a lesson"""
-    supabase = get_supabase_client()
-    result = supabase.table("lessons").delete().eq("id", lesson_id).execute()
+    deleted = await lessons.delete(lesson_id)
 
-    if not result.data:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Lesson not found")
 
+    lesson_catalog.remove(lesson_id)
     return {"message": "Lesson deleted successfully"}
 
 
 @router.get("/admin/game-types")
 async def list_game_types(user: dict = Depends(verify_admin)):
     """Return available game types and their config schemas"""
-    return {
-        "game_types": [
-            {
-                "id": "exact_match",
-                "name": "Exact Match",
-                "description": "User types the exact expected output",
-                "config_schema": {
-                    "expected": {"type": "string", "required": True, "label": "Expected Answer"},
-                    "case_sensitive": {"type": "boolean", "default": True, "label": "Case Sensitive"},
-                    "match_type": {"type": "select", "options": ["exact", "contains", "regex"], "default": "exact", "label": "Match Type"},
-                }
-            },
-            {
-                "id": "fill_blank",
-                "name": "Fill in the Blank",
-                "description": "User fills in missing words in a template",
-                "config_schema": {
-                    "template": {"type": "string", "required": True, "label": "Template (use {{blank}} for blanks)"},
-                    "answers": {"type": "string_array", "required": True, "label": "Answers (in order)"},
-                    "case_sensitive": {"type": "boolean", "default": False, "label": "Case Sensitive"},
-                }
-            },
-            {
-                "id": "multiple_choice",
-                "name": "Multiple Choice",
-                "description": "User selects the correct option(s)",
-                "config_schema": {
-                    "question": {"type": "string", "required": True, "label": "Question"},
-                    "options": {"type": "string_array", "required": True, "label": "Options"},
-                    "correct": {"type": "number_array", "required": True, "label": "Correct Option Indices (0-based)"},
-                    "multi": {"type": "boolean", "default": False, "label": "Allow Multiple Selections"},
-                }
-            },
-            {
-                "id": "reorder",
-                "name": "Reorder / Drag & Drop",
-                "description": "User arranges items in the correct order by dragging",
-                "config_schema": {
-                    "items": {"type": "string_array", "required": True, "label": "Items (in correct order)"},
-                    "correct_order": {"type": "number_array", "required": True, "label": "Correct Order Indices"},
-                }
-            },
-        ]
-    }
+    return {"game_types": judge_registry.describe()}
 
 
 # ============================================
@@ -181,56 +265,77 @@ class UserRoleUpdate(BaseModel):
 
 
 @router.get("/admin/users")
-async def list_users(user: dict = Depends(verify_admin)):
-    """List all users"""
-    supabase = get_supabase_client()
-    result = supabase.auth.admin.list_users()
-
-    users = []
-    for u in result:
-        users.append({
-            "id": str(u.id),
-            "email": u.email,
-            "role": (u.user_metadata or {}).get("role", "user"),
-            "created_at": u.created_at.isoformat() if u.created_at else None,
-            "last_sign_in_at": u.last_sign_in_at.isoformat() if u.last_sign_in_at else None,
-            "email_confirmed": u.email_confirmed_at is not None,
-        })
-
-    return {"users": users, "total": len(users)}
-
-
-@router.put("/admin/users/{user_id}/role")
+async def list_users(
+    limit: int = Depends(page_limit),
+    cursor: Optional[str] = None,
+    filters: UserFilter = Depends(user_filter),
+    user: dict = Depends(verify_admin),
+    user_admin: UserAdminRepository = Depends(get_user_admin_repository),
+):
+    """
+    List users one page at a time; pass ``next_cursor`` back for the next (null at the end).
+    ``total`` counts every user, and is null when filtered: counting matches would mean
+    reading every user.
+    """
+    try:
+        users, next_cursor = await page_users(
+            user_admin,
+            filters,
+            limit,
+            cursor,
+            upstream_page_size=settings.ADMIN_USERS_UPSTREAM_PAGE_SIZE,
+            max_scan_pages=settings.ADMIN_USERS_MAX_SCAN_PAGES,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total = await user_admin.count() if filters.empty else None
+    return {"users": users, "total": total, "count": len(users), "next_cursor": next_cursor}
+
+
+@router.get("/admin/users/export")
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: UserFilter = Depends(user_filter),
+    user: dict = Depends(verify_admin),
+):
+    """Export every matching user as NDJSON or CSV"""
+    rows = iter_users(UserAdminRepository(), filters, settings.ADMIN_USERS_UPSTREAM_PAGE_SIZE)
+    return export_response(rows, format, USER_COLUMNS, "users")
+
+
+@router.put("/admin/users/{user_id}/role", dependencies=[Depends(verify_token_strict)])
 async def update_user_role(
     user_id: str,
     role_update: UserRoleUpdate,
-    user: dict = Depends(verify_admin)
+    user: dict = Depends(verify_admin),
+    user_admin: UserAdminRepository = Depends(get_user_admin_repository),
 ):
     """Update a user's role"""
-    supabase = get_supabase_client()
-    result = supabase.auth.admin.update_user_by_id(
-        user_id,
-        {"user_metadata": {"role": role_update.role}}
-    )
+    updated = await user_admin.update_role(user_id, role_update.role)
 
-    if not result or not result.user:
+    if not updated:
         raise HTTPException(status_code=404, detail="User not found")
 
+    record_role_change(user_id, role_update.role)
     return {
         "message": f"User role updated to '{role_update.role or 'user'}'",
         "user_id": user_id,
     }
 
 
-@router.delete("/admin/users/{user_id}")
-async def delete_user(user_id: str, user: dict = Depends(verify_admin)):
+@router.delete("/admin/users/{user_id}", dependencies=[Depends(verify_token_strict)])
+async def delete_user(
+    user_id: str,
+    user: dict = Depends(verify_admin),
+    user_admin: UserAdminRepository = Depends(get_user_admin_repository),
+):
     """Delete a user"""
     # Prevent self-deletion
     if user_id == user["user_id"]:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
 
-    supabase = get_supabase_client()
-    supabase.auth.admin.delete_user(user_id)
+    await user_admin.delete(user_id)
+    record_role_change(user_id, None)
 
     return {"message": "User deleted successfully"}
 
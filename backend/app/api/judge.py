@@ -1,12 +1,28 @@
 """
 Judge API endpoint — validates user answers for all game types
 """
-import re
+import asyncio
+import json
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 from pydantic import BaseModel
 
-from app.core.security import verify_token, get_supabase_client
+from app.core.config import settings
+from app.core.rate_limit import limit_user
+from app.repositories.lessons import LessonRepository, get_lesson_repository
+from app.services.judge_registry import judge_registry
+from app.services.leaderboard import leaderboard
+from app.services.lesson_catalog import lesson_catalog
+from app.services.progress_recorder import progress_recorder
+from app.services.validators import (
+    ConfigError,
+    InvalidPlan,
+    compile_exact_match,
+    compile_fill_blank,
+    compile_multiple_choice,
+    compile_reorder,
+)
 
 router = APIRouter()
 
@@ -17,6 +33,7 @@ class JudgeRequest(BaseModel):
     selected: Optional[List[int]] = None  # For multiple_choice
     user_order: Optional[List[int]] = None  # For reorder
     answers: Optional[List[str]] = None  # For fill_blank
+    ai_provider: Optional[Literal["openai", "gemini", "claude", "grok"]] = None  # For llm; lesson default if unset
 
 
 class JudgeResponse(BaseModel):
@@ -26,121 +43,191 @@ class JudgeResponse(BaseModel):
     ai_output: Optional[str] = None
 
 
-def judge_exact_match(user_input: str, config: dict) -> tuple:
-    """Judge exact match, contains, or regex"""
-    expected = config.get("expected", "")
-    case_sensitive = config.get("case_sensitive", True)
-    match_type = config.get("match_type", "exact")
+class JudgeBatchRequest(BaseModel):
+    items: List[JudgeRequest]
+    stream: bool = False  # NDJSON, one line per item as it completes
 
-    compare_input = user_input if case_sensitive else user_input.lower()
-    compare_expected = expected if case_sensitive else expected.lower()
 
-    if match_type == "exact":
-        if compare_input.strip() == compare_expected.strip():
-            return True, "Perfect! Exact match achieved! 🎉", 100
-        return False, f"Not quite. Expected exactly: '{expected}'", 0
+class JudgeBatchItem(BaseModel):
+    index: int
+    level_id: int
+    success: bool = False
+    feedback: str = ""
+    score: int = 0
+    ai_output: Optional[str] = None
+    error: Optional[str] = None
 
-    elif match_type == "contains":
-        if compare_expected in compare_input:
-            return True, "Great job! Your output contains the required content! ✨", 100
-        return False, f"Your output should contain: '{expected}'", 0
 
-    elif match_type == "regex":
-        flags = 0 if case_sensitive else re.IGNORECASE
-        try:
-            if re.search(expected, user_input, flags):
-                return True, "Excellent! Pattern matched successfully! 🚀", 100
-            return False, "The pattern doesn't match. Try a different approach.", 0
-        except re.error:
-            return False, "Internal error: Invalid validation pattern.", 0
+class JudgeBatchResponse(BaseModel):
+    results: List[JudgeBatchItem]
+    total: int
 
-    return False, "Unknown match type.", 0
 
+def _judge_with(compiler, value, config: dict) -> tuple:
+    # Compiles on every call; the judge routes go through judge_registry.plan_for instead,
+    # which caches the plan by lesson id + updated_at
+    try:
+        plan = compiler(config)
+    except ConfigError as e:
+        plan = InvalidPlan(str(e))
+    return getattr(plan, "judge_blocking", plan.judge)(value)
 
-def judge_fill_blank(answers: list, config: dict) -> tuple:
-    """Judge fill-in-the-blank answers"""
-    expected = config.get("answers", [])
-    case_sensitive = config.get("case_sensitive", False)
 
-    if not answers or len(answers) != len(expected):
-        return False, f"Expected {len(expected)} answers, got {len(answers or [])}", 0
+def judge_exact_match(user_input: str, config: dict) -> tuple:
+    """Judge exact match, contains, or regex"""
+    return _judge_with(compile_exact_match, user_input, config)
 
-    correct = 0
-    for i, (user_ans, exp_ans) in enumerate(zip(answers, expected)):
-        u = user_ans.strip() if case_sensitive else user_ans.strip().lower()
-        e = exp_ans.strip() if case_sensitive else exp_ans.strip().lower()
-        if u == e:
-            correct += 1
 
-    if correct == len(expected):
-        return True, "All blanks filled correctly! 🎉", 100
+def judge_exact_match_many(user_inputs: List[str], config: dict) -> List[tuple]:
+    """Judge many answers against one exact_match config (offline grading); the config is compiled once"""
+    try:
+        plan = compile_exact_match(config)
+    except ConfigError as e:
+        return [InvalidPlan(str(e)).judge()] * len(user_inputs)
+    return plan.judge_many(user_inputs)
 
-    return False, f"You got {correct}/{len(expected)} correct. Keep trying!", int(correct / len(expected) * 100)
+
+def judge_fill_blank(answers: list, config: dict) -> tuple:
+    """Judge fill-in-the-blank answers"""
+    return _judge_with(compile_fill_blank, answers, config)
 
 
 def judge_multiple_choice(selected: list, config: dict) -> tuple:
     """Judge multiple choice selection"""
-    correct = config.get("correct", [])
+    return _judge_with(compile_multiple_choice, selected, config)
 
-    if not selected:
-        return False, "Please select an answer.", 0
 
-    if sorted(selected) == sorted(correct):
-        return True, "Correct answer! 🎉", 100
+def judge_reorder(user_order: list, config: dict) -> tuple:
+    """Judge drag-and-drop reordering"""
+    return _judge_with(compile_reorder, user_order, config)
 
-    return False, "That's not quite right. Try again!", 0
 
+async def _judge_lesson(lesson: dict, request: JudgeRequest, user_id: str) -> JudgeResponse:
+    return _record_result(lesson, request, user_id, await judge_registry.judge(lesson, request))
 
-def judge_reorder(user_order: list, config: dict) -> tuple:
-    """Judge drag-and-drop reordering"""
-    correct_order = config.get("correct_order", [])
 
-    if not user_order:
-        return False, "Please arrange the items.", 0
+def _record_result(lesson: dict, request: JudgeRequest, user_id: str, result: tuple) -> JudgeResponse:
+    success, _, score, *_ = result
+    progress_recorder.record(user_id, lesson["id"], success, score)
+    leaderboard.record(user_id, lesson["id"], success, score)
+    return _response(lesson, request, result)
 
-    if user_order == correct_order:
-        return True, "Perfect order! 🎉", 100
 
-    # Partial credit
-    correct_positions = sum(1 for u, c in zip(user_order, correct_order) if u == c)
-    total = len(correct_order)
-    score = int(correct_positions / total * 100)
+def _response(lesson: dict, request: JudgeRequest, result: tuple) -> JudgeResponse:
+    success, feedback, score, *graded = result
+    game_type = judge_registry.get(lesson["game_type"])
 
-    return False, f"Almost! {correct_positions}/{total} items in the right position.", score
+    if graded:
+        ai_output = graded[0]
+    else:
+        ai_output = request.user_prompt if game_type and game_type.echo_input else None
+
+    return JudgeResponse(
+        success=success,
+        feedback=feedback,
+        score=score,
+        ai_output=ai_output
+    )
 
 
 @router.post("/judge", response_model=JudgeResponse)
 async def judge_prompt(
     request: JudgeRequest,
-    user: dict = Depends(verify_token)
+    user: dict = Depends(limit_user),
+    lessons: LessonRepository = Depends(get_lesson_repository),
 ):
     """Judge a user's submission based on the lesson's game type"""
-    supabase = get_supabase_client()
-
-    # Fetch lesson from DB
-    result = supabase.table("lessons").select("*").eq("id", request.level_id).execute()
-    if not result.data:
+    lesson = await lesson_catalog.get(request.level_id, lessons)
+    if not lesson:
         raise HTTPException(status_code=404, detail="Level not found")
 
-    lesson = result.data[0]
-    game_type = lesson["game_type"]
-    config = lesson.get("config", {})
-
-    # Route to correct judge
-    if game_type == "exact_match":
-        success, feedback, score = judge_exact_match(request.user_prompt, config)
-    elif game_type == "fill_blank":
-        success, feedback, score = judge_fill_blank(request.answers or [], config)
-    elif game_type == "multiple_choice":
-        success, feedback, score = judge_multiple_choice(request.selected or [], config)
-    elif game_type == "reorder":
-        success, feedback, score = judge_reorder(request.user_order or [], config)
-    else:
-        success, feedback, score = False, f"Game type '{game_type}' not yet supported.", 0
+    return await _judge_lesson(lesson, request, user["user_id"])
 
-    return JudgeResponse(
-        success=success,
-        feedback=feedback,
-        score=score,
-        ai_output=request.user_prompt if game_type == "exact_match" else None
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.post("/judge/stream")
+async def judge_stream(
+    request: JudgeRequest,
+    user: dict = Depends(limit_user),
+    lessons: LessonRepository = Depends(get_lesson_repository),
+):
+    """
+    Judge as a server-sent event stream. LLM levels send ``token`` events
+    with the model output as it is written and stop generating as soon as
+    the answer is decided; every level ends with one ``result`` event
+    carrying a JudgeResponse (or ``error``).
+    """
+    lesson = await lesson_catalog.get(request.level_id, lessons)
+    if not lesson:
+        raise HTTPException(status_code=404, detail="Level not found")
+
+    async def events():
+        # Starlette closes this generator when the client disconnects, which aborts the provider call
+        stream = judge_registry.judge_stream(lesson, request)
+        try:
+            async for kind, payload in stream:
+                if kind == "token":
+                    yield _sse("token", json.dumps({"text": payload}))
+                else:
+                    response = _record_result(lesson, request, user["user_id"], payload)
+                    yield _sse("result", response.model_dump_json())
+        except Exception as e:
+            yield _sse("error", json.dumps({"detail": str(e)}))
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+@router.post("/judge/batch", response_model=JudgeBatchResponse)
+async def judge_batch(
+    batch: JudgeBatchRequest,
+    user: dict = Depends(limit_user),
+    lessons: LessonRepository = Depends(get_lesson_repository),
+):
+    """
+    Judge many submissions (mixed lessons allowed) in one call.
+    Results keep request order; a bad item gets an ``error`` instead of failing the batch.
+    Batch scores are not recorded to progress or the leaderboard: one rate-limited call
+    must not stand in for hundreds of attempts.
+    """
+    if len(batch.items) > settings.JUDGE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(batch.items)} items (max {settings.JUDGE_BATCH_MAX_SIZE})"
+        )
+
+    found = await lesson_catalog.get_many((item.level_id for item in batch.items), lessons)
+
+    async def judge_item(index: int, item: JudgeRequest) -> JudgeBatchItem:
+        lesson = found.get(item.level_id)
+        if lesson is None:
+            return JudgeBatchItem(index=index, level_id=item.level_id, error="Level not found")
+        try:
+            result = _response(lesson, item, await judge_registry.judge(lesson, item))
+        except Exception as e:
+            return JudgeBatchItem(index=index, level_id=item.level_id, error=str(e))
+        return JudgeBatchItem(index=index, level_id=item.level_id, **result.model_dump())
+
+    tasks = [asyncio.ensure_future(judge_item(i, item)) for i, item in enumerate(batch.items)]
+
+    if batch.stream:
+        async def ndjson():
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield (await next_done).model_dump_json() + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*tasks)
+    return JudgeBatchResponse(results=results, total=len(results))
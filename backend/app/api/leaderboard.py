@@ -0,0 +1,47 @@
+"""
+Leaderboard API endpoint — served from the in-memory leaderboard
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.core.config import settings
+from app.core.security import verify_token
+from app.services.leaderboard import leaderboard
+
+router = APIRouter()
+
+
+def require_loaded() -> None:
+    """The first build reads the whole progress table; answer 503 until it lands"""
+    if not leaderboard.loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Leaderboard is still loading",
+            headers={"Retry-After": "5"},
+        )
+
+
+@router.get("/leaderboard", dependencies=[Depends(require_loaded)])
+async def get_leaderboard(
+    limit: int = Query(settings.LEADERBOARD_PAGE_SIZE, ge=1, le=settings.LEADERBOARD_MAX_PAGE_SIZE),
+    lesson_id: Optional[int] = None,
+    user: dict = Depends(verify_token),
+):
+    """Top entries of the global board, or of one lesson's board with ``lesson_id``"""
+    return {"entries": leaderboard.top(limit, lesson_id), "total": leaderboard.size(lesson_id)}
+
+
+@router.get("/leaderboard/me", dependencies=[Depends(require_loaded)])
+async def get_my_rank(
+    around: int = Query(0, ge=0, le=settings.LEADERBOARD_MAX_AROUND),
+    lesson_id: Optional[int] = None,
+    user: dict = Depends(verify_token),
+):
+    """The caller's entry (null if they have no result yet) and up to ``around`` neighbours either side"""
+    user_id = user["user_id"]
+    return {
+        "entry": leaderboard.rank(user_id, lesson_id),
+        "neighbours": leaderboard.around(user_id, around, lesson_id) if around else [],
+        "total": leaderboard.size(lesson_id),
+    }
@@ -1,40 +1,32 @@
 """
-Levels API endpoint — reads from Supabase DB
+Levels API endpoint — served from the in-memory lesson catalog
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 
-from app.core.security import get_supabase_client
+from app.core.http_cache import level_responses
+from app.repositories.lessons import LessonRepository, get_lesson_repository
+from app.services.lesson_catalog import lesson_catalog
 
 router = APIRouter()
 
 
 @router.get("/levels")
-async def list_levels():
-    """Get all published levels, ordered by order_index"""
-    supabase = get_supabase_client()
-    result = (
-        supabase.table("lessons")
-        .select("*")
-        .eq("is_published", True)
-        .order("order_index")
-        .execute()
+async def list_levels(request: Request, lessons: LessonRepository = Depends(get_lesson_repository)):
+    """Get all published levels, ordered by order_index (ETag / If-None-Match aware)"""
+    levels = await lesson_catalog.list_published(lessons)
+    body = level_responses.get(
+        "levels", lesson_catalog.version, lambda: {"levels": levels, "total": len(levels)}
     )
-    return {"levels": result.data, "total": len(result.data)}
+    return level_responses.respond(request, body)
 
 
 @router.get("/levels/{level_id}")
-async def get_level(level_id: int):
-    """Get a specific published level by ID"""
-    supabase = get_supabase_client()
-    result = (
-        supabase.table("lessons")
-        .select("*")
-        .eq("id", level_id)
-        .eq("is_published", True)
-        .execute()
-    )
+async def get_level(request: Request, level_id: int, lessons: LessonRepository = Depends(get_lesson_repository)):
+    """Get a specific published level by ID (ETag / If-None-Match aware)"""
+    level = await lesson_catalog.get(level_id, lessons, published_only=True)
 
-    if not result.data:
+    if not level:
         raise HTTPException(status_code=404, detail="Level not found")
 
-    return result.data[0]
+    body = level_responses.get(("level", level_id), lesson_catalog.version, lambda: level)
+    return level_responses.respond(request, body)
@@ -2,7 +2,7 @@
 Configuration settings for Prmpt backend
 12-Factor App: Config loaded from environment variables
 """
-from typing import List
+from typing import Dict, List, Literal
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -13,6 +13,9 @@ class Settings(BaseSettings):
     # App
     APP_NAME: str = "Prmpt"
     DEBUG: bool = False
+    # Startup - SDK imports, JWKS and the lesson catalog load after the server starts listening
+    # (/health reports "warming" until done); false = finish them before accepting traffic
+    STARTUP_WARMUP_BACKGROUND: bool = True
     
     # CORS - comma-separated origins or JSON array
     CORS_ORIGINS: List[str] = Field(
@@ -22,12 +25,138 @@ class Settings(BaseSettings):
     # Supabase
     SUPABASE_URL: str = ""
     SUPABASE_SERVICE_KEY: str = ""
+    SUPABASE_POOL_SIZE: int = 4
+    SUPABASE_POOL_ACQUIRE_TIMEOUT: float = 5.0  # seconds to wait for a free client
+    SUPABASE_HTTP_TIMEOUT: float = 10.0
+    SUPABASE_MAX_CONNECTIONS: int = 20
+    SUPABASE_KEEPALIVE_EXPIRY: float = 30.0
+    DB_QUERY_TIMEOUT: float = 5.0  # per repository call
+    SUPABASE_MAX_ROWS: int = 1000  # PostgREST max_rows (supabase/config.toml); longer reads are paged
+    DB_DISCONNECT_POLL_INTERVAL: float = 0.25
+
+    # Lesson catalog - seconds between polls for changes made outside this process (0 = off)
+    LESSON_CATALOG_POLL_INTERVAL: float = 30.0
+    # Each poll re-reads rows this many seconds older than the newest it has seen (updated_at is set
+    # when a write starts, so one committed late can carry an older stamp)...
+    LESSON_CATALOG_POLL_OVERLAP: float = 60.0
+    # ...and reloads the whole table at most this often, to catch anything else (0 = never)
+    LESSON_CATALOG_FULL_RELOAD_INTERVAL: float = 600.0
+    # Workers - serve.py runs WEB_CONCURRENCY uvicorn processes. With more than one, serve.py loads
+    # the catalog once, polls it and shares it with the workers as a memory-mapped snapshot file.
+    WEB_CONCURRENCY: int = 1
+    LESSON_SNAPSHOT_DIR: str = ""  # defaults to /dev/shm, else the temp dir
+    LESSON_SNAPSHOT_CHECK_INTERVAL: float = 0.5  # seconds between a worker's checks for a new snapshot
+    LESSON_SNAPSHOT_PATH: str = ""  # set by serve.py for its workers; leave empty
+    # Public level responses - browsers/CDNs may reuse them this long, then revalidate by ETag
+    LEVELS_CACHE_CONTROL: str = "public, max-age=60, stale-while-revalidate=300"
+    HTTP_COMPRESS_MIN_SIZE: int = 512  # bytes; smaller cached bodies are always sent uncompressed
+
+    # Judge
+    JUDGE_BATCH_MAX_SIZE: int = 500
+    JUDGE_MAX_INPUT_LENGTH: int = 10000  # default per-lesson cap on submitted text
+    # "similarity" match type - defaults for lessons that don't set pass_score / min_score (0-100)
+    JUDGE_SIMILARITY_PASS_SCORE: int = 90
+    JUDGE_SIMILARITY_MIN_SCORE: int = 50
+    REGEX_TIMEOUT: float = 1.0  # hard limit for patterns outside the linear-time subset
+    REGEX_WORKERS: int = 2
+
+    # Admin listings - page sizes for /api/admin/users and /api/admin/lessons, and their exports
+    ADMIN_PAGE_SIZE: int = 50
+    ADMIN_MAX_PAGE_SIZE: int = 200
+    ADMIN_USERS_UPSTREAM_PAGE_SIZE: int = 200  # auth users fetched per call while filtering or exporting
+    ADMIN_USERS_MAX_SCAN_PAGES: int = 10  # auth pages one filtered request may walk before returning a cursor
+    ADMIN_EXPORT_PAGE_SIZE: int = 500  # lessons fetched per query while exporting (and diffing imports)
+    # Lesson import - bundles larger than this are rejected; the changed rows are written in one transaction
+    LESSON_IMPORT_MAX_LESSONS: int = 10000
+
+    # Credits - deductions are buffered and flushed to the ledger in batches
+    CREDITS_DEFAULT: int = 50
+    CREDITS_WRITE_BEHIND: bool = True  # False = one synchronous RPC per deduction
+    CREDITS_FLUSH_INTERVAL: float = 0.2  # max seconds a deduction waits before it is persisted
+    CREDITS_FLUSH_BATCH_SIZE: int = 200
+    CREDITS_MAX_PENDING: int = 5000
+    CREDITS_BALANCE_TTL: float = 30.0
+
+    # Progress - judge results are queued and merged into user_progress in the background
+    PROGRESS_QUEUE_SIZE: int = 10000
+    PROGRESS_FLUSH_INTERVAL: float = 1.0
+    PROGRESS_FLUSH_BATCH_SIZE: int = 500
+
+    # Leaderboard - built from user_progress at startup, then fed by judge results in this process.
+    # Periodic rebuilds pick up results judged by other workers (0 = startup only).
+    LEADERBOARD_REBUILD_INTERVAL: float = 300.0
+    LEADERBOARD_REBUILD_PAGE_SIZE: int = 1000  # capped at SUPABASE_MAX_ROWS
+    LEADERBOARD_REPLAY_WINDOW: float = 30.0  # seconds of recent results re-applied after a rebuild
+    LEADERBOARD_PAGE_SIZE: int = 50
+    LEADERBOARD_MAX_PAGE_SIZE: int = 200
+    LEADERBOARD_MAX_AROUND: int = 50
+
+    # Rate limiting - token buckets per route, keyed by IP (before auth) and by user (after auth).
+    # rate = tokens per second, burst = bucket size; omit a pair to skip that key.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_ROUTES: Dict[str, Dict[str, float]] = Field(default_factory=lambda: {
+        "/api/judge": {"user_rate": 2.0, "user_burst": 20, "ip_rate": 10.0, "ip_burst": 60},
+        "/api/judge/stream": {"user_rate": 1.0, "user_burst": 10, "ip_rate": 5.0, "ip_burst": 30},
+        "/api/judge/batch": {"user_rate": 0.2, "user_burst": 3, "ip_rate": 1.0, "ip_burst": 10},
+    })
+    RATE_LIMIT_BACKEND: Literal["memory", "postgres"] = "memory"  # postgres = shared across workers
+    RATE_LIMIT_SHARDS: int = 64
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # key IPs on X-Forwarded-For (only behind a trusted proxy)
+    # Admission control for the routes above: in-flight cap per worker, and how long a request may queue
+    ADMISSION_MAX_CONCURRENT: int = 256
+    ADMISSION_MAX_QUEUE_WAIT: float = 0.5
+
+    # Metrics - Prometheus text format on /metrics
+    METRICS_ENABLED: bool = True
+    METRICS_LOOP_LAG_INTERVAL: float = 0.5  # seconds between event loop lag samples (0 = off)
+
+    # Auth - "local" verifies JWTs in-process, "remote" asks Supabase every time
+    AUTH_VERIFY_MODE: Literal["local", "remote"] = "local"
+    SUPABASE_JWT_SECRET: str = ""  # HS256 projects; asymmetric keys come from JWKS
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+    SUPABASE_JWT_ISSUER: str = ""  # defaults to {SUPABASE_URL}/auth/v1
+    AUTH_JWKS_REFRESH_INTERVAL: float = 600.0
+    AUTH_JWKS_MIN_REFETCH: float = 30.0
+    AUTH_TOKEN_CACHE_TTL: float = 60.0
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    # Admin role checks - cache user_id -> role for AUTH_ROLE_CACHE_TTL, so a change made by any worker
+    # applies everywhere within that long
+    AUTH_ROLE_FROM_CLAIM: bool = False  # True = trust the token's role claim (stale until the token expires)
+    AUTH_ROLE_CACHE_TTL: float = 60.0
+    AUTH_ROLE_CHANGE_TTL: float = 3600.0  # role changes made here outrank token claims this long (>= JWT expiry)
     
     # AI Providers
     OPENAI_API_KEY: str = ""
     GOOGLE_AI_API_KEY: str = ""
     ANTHROPIC_API_KEY: str = ""
     XAI_API_KEY: str = ""
+    # Base URLs can point at a local fake provider for testing
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
+    GOOGLE_AI_BASE_URL: str = "https://generativelanguage.googleapis.com/v1beta"
+    ANTHROPIC_BASE_URL: str = "https://api.anthropic.com/v1"
+    XAI_BASE_URL: str = "https://api.x.ai/v1"
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    GOOGLE_AI_MODEL: str = "gemini-1.5-flash"
+    ANTHROPIC_MODEL: str = "claude-3-5-haiku-latest"
+    XAI_MODEL: str = "grok-2-latest"
+
+    # LLM judge
+    LLM_TIMEOUT: float = 30.0
+    LLM_MAX_TOKENS: int = 512
+    LLM_MAX_CONNECTIONS: int = 50
+    LLM_DEFAULT_CONCURRENCY: int = 8  # in-flight calls per provider
+    LLM_PROVIDER_CONCURRENCY: Dict[str, int] = Field(default_factory=dict)  # e.g. {"openai": 16}
+    LLM_CACHE_SIZE: int = 5000
+    LLM_CACHE_TTL: float = 3600.0
+
+    # LLM routing
+    LLM_LATENCY_WINDOW: int = 200  # recent calls kept per provider/model for p50/p95 and error rate
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # below this, hedge after LLM_HEDGE_DEFAULT_DELAY instead of p95
+    LLM_HEDGE_DEFAULT_DELAY: float = 5.0
+    LLM_MAX_ERROR_RATE: float = 0.5  # providers above this are tried last
+    LLM_BREAKER_FAILURES: int = 5  # consecutive failures that open a provider's circuit
+    LLM_BREAKER_RESET: float = 30.0  # seconds before an open circuit lets a trial call through
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,169 @@
+"""
+Supabase client pool — long-lived clients shared for the app lifetime
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Deque, Optional
+
+import httpx
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import supabase_client_create
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
+
+def import_supabase():
+    """
+    The supabase package (auth, postgrest, storage, realtime, functions) takes
+    ~200 ms to import, so it is loaded on first use or by the startup warmup
+    rather than when this module is imported.
+    """
+    import supabase
+
+    return supabase
+
+
+class SupabasePool:
+    """
+    Bounded pool of async Supabase clients backed by one keep-alive HTTP session.
+
+    Clients are created lazily up to ``size`` and handed back to the pool
+    after each use, so TLS connections and auth/postgrest sub-clients are
+    reused across requests instead of being rebuilt every call.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        acquire_timeout: float,
+        http_timeout: float,
+        max_connections: int,
+        keepalive_expiry: float,
+    ):
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.http_timeout = http_timeout
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+
+        self._http: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: Deque["AsyncClient"] = deque()
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._acquired = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self._http is not None
+
+    def open(self) -> None:
+        """Create the shared HTTP session (idempotent)"""
+        if self._http is not None:
+            return
+        self._http = httpx.AsyncClient(
+            timeout=self.http_timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+        self._slots = asyncio.Semaphore(self.size)
+
+    async def close(self) -> None:
+        """Drop all pooled clients and close the shared HTTP session"""
+        self._idle.clear()
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._slots = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _create_client(self) -> "AsyncClient":
+        supabase = import_supabase()
+        options = supabase.AsyncClientOptions(
+            auto_refresh_token=False,
+            persist_session=False,
+            httpx_client=self._http,
+        )
+        started = time.perf_counter()
+        client = await supabase.acreate_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY, options)
+        supabase_client_create.observe(time.perf_counter() - started)
+        self._created += 1
+        return client
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator["AsyncClient"]:
+        """Borrow a client, waiting up to ``acquire_timeout`` for a free slot"""
+        self.open()
+        slots = self._slots
+
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Database connection pool exhausted"
+            )
+        finally:
+            self._waiting -= 1
+
+        waited = time.perf_counter() - started
+        self._acquired += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+        try:
+            client = self._idle.pop() if self._idle else await self._create_client()
+        except Exception:
+            slots.release()
+            raise
+
+        self._in_use += 1
+        try:
+            yield client
+        finally:
+            self._in_use -= 1
+            # Only return the client if the pool was not closed meanwhile
+            if self._slots is slots:
+                self._idle.append(client)
+                slots.release()
+
+    def stats(self) -> dict:
+        """Snapshot of pool usage for monitoring"""
+        return {
+            "size": self.size,
+            "created": self._created,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "waiting": self._waiting,
+            "acquired_total": self._acquired,
+            "acquire_timeouts": self._timeouts,
+            "wait_avg_ms": round(self._wait_total / self._acquired * 1000, 3) if self._acquired else 0.0,
+            "wait_max_ms": round(self._wait_max * 1000, 3),
+        }
+
+
+supabase_pool = SupabasePool(
+    size=settings.SUPABASE_POOL_SIZE,
+    acquire_timeout=settings.SUPABASE_POOL_ACQUIRE_TIMEOUT,
+    http_timeout=settings.SUPABASE_HTTP_TIMEOUT,
+    max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+    keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY,
+)
+
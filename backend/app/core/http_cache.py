@@ -0,0 +1,165 @@
+"""
+HTTP cache - pre-serialized, pre-compressed JSON responses with strong ETags
+"""
+import gzip
+import hashlib
+import json
+from typing import Callable, Dict, Hashable, Optional
+
+import brotli
+from fastapi import Request, Response, status
+
+from app.core.config import settings
+
+# Preference order when the client accepts several
+ENCODINGS = ("br", "gzip")
+
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "br":
+        # Quality 9 of 11: most of the size win for a fraction of the CPU; paid once per catalog version
+        return brotli.compress(data, quality=9)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class CachedBody:
+    """
+    One JSON body, serialized once. Compressed variants are built on first
+    request and kept with it.
+
+    The ETag is a hash of the serialized bytes rather than the catalog
+    version, so every worker (each with its own catalog) hands out the same
+    tag for the same content. Each encoding gets its own strong tag
+    (``"<hash>-br"``) since the bytes differ, and any of them validates.
+    """
+
+    __slots__ = ("identity", "tag", "_encoded")
+
+    def __init__(self, content):
+        # Same serialization as JSONResponse, so cached and uncached bodies are byte-identical
+        self.identity = json.dumps(
+            content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+        self.tag = hashlib.blake2b(self.identity, digest_size=12).hexdigest()
+        self._encoded: Dict[str, bytes] = {}
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.tag}"' if encoding == "identity" else f'"{self.tag}-{encoding}"'
+
+    def body(self, encoding: str) -> bytes:
+        if encoding == "identity":
+            return self.identity
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = _compress(encoding, self.identity)
+        return data
+
+    @property
+    def size(self) -> int:
+        return len(self.identity) + sum(len(data) for data in self._encoded.values())
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """``Accept-Encoding`` as ``{coding: q}``"""
+    accepted = {}
+    for part in header.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def negotiate(header: Optional[str], size: int, min_size: int) -> str:
+    if not header or size < min_size:
+        return "identity"
+    accepted = _accepted(header)
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+def not_modified(if_none_match: Optional[str], tag: str) -> bool:
+    """Whether ``If-None-Match`` names any encoding of the body tagged ``tag`` (weak comparison)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"').split("-", 1)[0] == tag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    JSON response bodies keyed by ``key``, valid for one ``version`` of
+    their source data; the first lookup with a newer version drops them
+    all. A conditional request whose ETag still matches gets a 304 straight
+    from the cached tag, with no serialization and no body.
+    """
+
+    def __init__(self, cache_control: str, compress_min_size: int):
+        self.cache_control = cache_control
+        self.compress_min_size = compress_min_size
+        self._version: Optional[int] = None
+        self._bodies: Dict[Hashable, CachedBody] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: Hashable, version: int, build: Callable[[], object]) -> CachedBody:
+        """The cached body for ``key`` at ``version``, serializing ``build()`` on a miss"""
+        if version != self._version:
+            self._bodies = {}
+            self._version = version
+        body = self._bodies.get(key)
+        if body is None:
+            self.misses += 1
+            body = self._bodies[key] = CachedBody(build())
+        else:
+            self.hits += 1
+        return body
+
+    def respond(self, request: Request, body: CachedBody) -> Response:
+        encoding = negotiate(request.headers.get("accept-encoding"), len(body.identity), self.compress_min_size)
+        headers = {
+            "ETag": body.etag(encoding),
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if not_modified(request.headers.get("if-none-match"), body.tag):
+            self.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(body.body(encoding), media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "version": self._version,
+            "entries": len(self._bodies),
+            "bytes": sum(body.size for body in self._bodies.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+level_responses = ResponseCache(
+    cache_control=settings.LEVELS_CACHE_CONTROL,
+    compress_min_size=settings.HTTP_COMPRESS_MIN_SIZE,
+)
@@ -0,0 +1,343 @@
+"""
+Metrics - counters, gauges and histograms exposed in Prometheus text format
+"""
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Everything here is touched from the event loop thread only, so plain ints
+# and floats are enough: no locks, no atomics, one dict lookup per update.
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets (seconds) from sub-millisecond judge work up to slow provider calls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._children: Dict[LabelValues, _CounterChild] = {}
+
+    def labels(self, *values: str) -> _CounterChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _CounterChild()
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}"
+            for values, child in self._children.items()
+        ]
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def labels(self, *values: str) -> _GaugeChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _GaugeChild()
+        return child
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class GaugeFunc(_Metric):
+    """
+    Gauge read at scrape time from ``fn``, which returns ``{label_values: value}``.
+    Used for values services already keep (pool sizes, cache hit rates), so
+    the hot path pays nothing.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], fn: Callable[[], Dict[LabelValues, float]]):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, values)} {_number(float(value))}"
+            for values, value in self.fn().items()
+        ]
+
+
+class CounterFunc(GaugeFunc):
+    """Counter read at scrape time from totals a service already keeps"""
+    kind = "counter"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._children: Dict[LabelValues, _HistogramChild] = {}
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.bounds)
+        return child
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), child.counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_number(child.sum)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def gauge_func(self, name: str, help: str, labelnames: Sequence[str], fn) -> GaugeFunc:
+        return self.register(GaugeFunc(name, help, labelnames, fn))
+
+    def counter_func(self, name: str, help: str, labelnames: Sequence[str], fn) -> CounterFunc:
+        return self.register(CounterFunc(name, help, labelnames, fn))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            try:
+                samples = metric.render()
+            except Exception:
+                # A broken collector shouldn't take the whole scrape down
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- Hot-path instruments ---
+http_request_duration = registry.histogram(
+    "prmpt_http_request_duration_seconds", "HTTP request latency by route and status", ("method", "route", "status")
+)
+http_requests_in_flight = registry.gauge("prmpt_http_requests_in_flight", "HTTP requests being handled")
+supabase_client_create = registry.histogram(
+    "prmpt_supabase_client_create_seconds", "Time to create a pooled Supabase client"
+)
+auth_verify = registry.histogram(
+    "prmpt_auth_verify_seconds", "verify_token time by verification path and outcome", ("mode", "outcome")
+)
+lesson_fetch = registry.histogram(
+    "prmpt_lesson_fetch_seconds", "Lesson lookup time by source", ("source",)
+)
+judge_duration = registry.histogram(
+    "prmpt_judge_seconds", "Judge time per game type", ("game_type",)
+)
+regex_duration = registry.histogram(
+    "prmpt_regex_seconds", "Regex matching time by engine", ("engine",)
+)
+llm_provider_duration = registry.histogram(
+    "prmpt_llm_provider_seconds", "Upstream LLM call time by provider and outcome", ("provider", "outcome")
+)
+event_loop_lag = registry.gauge("prmpt_event_loop_lag_seconds", "Most recent event loop scheduling delay")
+event_loop_lag_hist = registry.histogram(
+    "prmpt_event_loop_lag_sample_seconds", "Event loop scheduling delay samples",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+class MetricsMiddleware:
+    """
+    Request latency histogram and in-flight gauge. Requests are labelled by
+    route template (``/api/users/{user_id}``), not raw path, so label
+    cardinality stays bounded; paths that match no route are "unmatched".
+    """
+
+    def __init__(self, app, exclude: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = http_requests_in_flight.labels()
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            http_request_duration.labels(
+                scope["method"], _route_template(scope), str(status_code)
+            ).observe(time.perf_counter() - started)
+
+
+def _route_template(scope: dict) -> str:
+    """``/api/levels/{level_id}`` for ``/api/levels/3``; "unmatched" if no route handled it"""
+    if "route" not in scope:
+        return "unmatched"
+    path = scope["path"]
+    if not scope.get("path_params"):
+        return path
+    # Segment by segment from the route's own template, so a parameter whose value equals
+    # another one or a literal segment (``/api/users/1/lessons/1``) is still labelled right
+    parts = path.split("/")
+    template = getattr(scope["route"], "path_format", path).split("/")[1:]
+    # A mounted app's routes only know the part of the path after the mount point
+    return "/".join(parts[: max(1, len(parts) - len(template))] + template)
+
+
+class LoopLagMonitor:
+    """Samples how late a sleeping task wakes up: a direct read of event loop congestion"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        gauge = event_loop_lag.labels()
+        samples = event_loop_lag_hist.labels()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            gauge.set(lag)
+            samples.observe(lag)
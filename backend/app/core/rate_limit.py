@@ -0,0 +1,273 @@
+"""
+Rate limiting and admission control for expensive routes
+"""
+import asyncio
+import math
+import time
+from typing import Callable, Dict, List, Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.security import verify_token
+from app.repositories.rate_limits import RateLimitRepository
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "full_at")
+
+    def __init__(self, tokens: float, updated: float, full_at: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.full_at = full_at
+
+
+class BucketStore:
+    """
+    In-process token buckets spread over ``shards`` dicts.
+
+    A bucket that has refilled is indistinguishable from a new one, so each
+    shard is swept every ``sweep_every`` operations and full buckets are
+    dropped; memory follows the number of recently active keys, and each
+    sweep only walks one shard.
+    """
+
+    def __init__(self, shards: int, sweep_every: int = 1024):
+        self._shards: List[Dict[str, _Bucket]] = [{} for _ in range(max(1, shards))]
+        self._ops = [0] * len(self._shards)
+        self.sweep_every = sweep_every
+        self.evicted = 0
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Seconds until ``cost`` tokens are available; 0 means they were taken"""
+        index = hash(key) % len(self._shards)
+        shard = self._shards[index]
+        now = time.monotonic()
+
+        bucket = shard.get(key)
+        if bucket is None:
+            tokens = burst
+        else:
+            tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+
+        full_at = now + (burst - tokens) / rate
+        if bucket is None:
+            shard[key] = _Bucket(tokens, now, full_at)
+        else:
+            bucket.tokens, bucket.updated, bucket.full_at = tokens, now, full_at
+
+        self._ops[index] += 1
+        if self._ops[index] >= self.sweep_every:
+            self._ops[index] = 0
+            self._sweep(shard, now)
+        return wait
+
+    def _sweep(self, shard: Dict[str, _Bucket], now: float) -> None:
+        idle = [key for key, bucket in shard.items() if bucket.full_at <= now]
+        for key in idle:
+            del shard[key]
+        self.evicted += len(idle)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+class RateLimiter:
+    """
+    Per-route token buckets keyed by client IP or user id.
+
+    ``routes`` maps a request path to ``{"user_rate", "user_burst",
+    "ip_rate", "ip_burst"}``. Buckets live in-process by default; the
+    ``postgres`` backend shares them between workers at the cost of one
+    round trip per check, and lets requests through if the database is
+    unreachable rather than failing them.
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, Dict[str, float]],
+        backend: str,
+        shards: int,
+        trust_forwarded: bool = False,
+        repository_factory: Callable[[], RateLimitRepository] = RateLimitRepository,
+    ):
+        self.routes = routes
+        self.backend = backend
+        self.trust_forwarded = trust_forwarded
+        self.repository_factory = repository_factory
+        self.store = BucketStore(shards)
+
+        self.allowed = 0
+        self.limited = 0
+        self.backend_errors = 0
+
+    def limits_for(self, path: str) -> Optional[Dict[str, float]]:
+        return self.routes.get(path)
+
+    async def take(self, path: str, kind: str, identity: str) -> float:
+        """Take one token from the ``kind`` ("ip" or "user") bucket for ``path``; returns seconds to wait"""
+        limits = self.routes.get(path) or {}
+        rate, burst = limits.get(f"{kind}_rate"), limits.get(f"{kind}_burst")
+        if not rate or not burst:
+            return 0.0
+
+        key = f"{path}|{kind}|{identity}"
+        if self.backend == "postgres":
+            try:
+                wait = await self.repository_factory().take(key, rate, burst)
+            except Exception:
+                self.backend_errors += 1
+                wait = 0.0
+        else:
+            wait = self.store.take(key, rate, burst)
+
+        if wait:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    def client_ip(self, scope: dict) -> str:
+        if self.trust_forwarded:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "buckets": len(self.store),
+            "evicted": self.store.evicted,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "backend_errors": self.backend_errors,
+        }
+
+
+class AdmissionControl:
+    """
+    Caps in-flight requests per worker. A request that can't get a slot
+    within ``max_queue_wait`` seconds is shed instead of queueing behind
+    work the server can't finish in time.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue_wait: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue_wait = max_queue_wait
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+
+    async def acquire(self) -> bool:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        if not self._slots.locked():
+            await self._slots.acquire()
+        else:
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.max_queue_wait)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            finally:
+                self.queued -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+def _retry_after(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class RateLimitMiddleware:
+    """
+    Per-IP limits and admission control, applied before any auth or
+    database work. Per-user limits need the verified token, so they are
+    applied by the ``limit_user`` dependency instead.
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None, admission: Optional[AdmissionControl] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+        self.admission = admission or admission_control
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or self.limiter.limits_for(path) is None:
+            await self.app(scope, receive, send)
+            return
+
+        wait = await self.limiter.take(path, "ip", self.limiter.client_ip(scope))
+        if wait:
+            response = JSONResponse(
+                {"detail": "Too many requests. Please slow down."},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers=_retry_after(wait),
+            )
+            await response(scope, receive, send)
+            return
+
+        if not await self.admission.acquire():
+            response = JSONResponse(
+                {"detail": "The server is busy. Please try again shortly."},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers=_retry_after(self.admission.max_queue_wait),
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release()
+
+
+async def limit_user(request: Request, user: dict = Depends(verify_token)) -> dict:
+    """``verify_token`` plus the route's per-user rate limit"""
+    if settings.RATE_LIMIT_ENABLED:
+        wait = await rate_limiter.take(request.scope["path"], "user", user["user_id"])
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please slow down.",
+                headers=_retry_after(wait),
+            )
+    return user
+
+
+rate_limiter = RateLimiter(
+    routes=settings.RATE_LIMIT_ROUTES,
+    backend=settings.RATE_LIMIT_BACKEND,
+    shards=settings.RATE_LIMIT_SHARDS,
+    trust_forwarded=settings.RATE_LIMIT_TRUST_FORWARDED,
+)
+
+admission_control = AdmissionControl(
+    max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+    max_queue_wait=settings.ADMISSION_MAX_QUEUE_WAIT,
+)
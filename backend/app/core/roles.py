@@ -0,0 +1,56 @@
+"""
+Role resolution for admin checks — a short-lived cache of looked-up roles, or the token claim
+when AUTH_ROLE_FROM_CLAIM is on
+"""
+from typing import Optional
+
+from app.core.config import settings
+from app.core.tokens import TokenCache
+from app.repositories.users import UserAdminRepository
+from app.services.single_flight import SingleFlight
+
+# user_id -> {"role": role}; role None means the auth user no longer exists
+role_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_ROLE_CACHE_TTL)
+
+# Roles changed through this process. Checked before token claims, so an
+# admin demoted here can't keep using an older token that still says admin.
+role_changes = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_ROLE_CHANGE_TTL)
+
+_lookups = SingleFlight("roles")
+
+
+async def _fetch_role(users: UserAdminRepository, user_id: str) -> dict:
+    auth_user = await users.get_by_id(user_id)
+    role = (auth_user.user_metadata or {}).get("role", "") if auth_user else None
+    entry = {"role": role}
+    role_cache.put(user_id, entry)
+    return entry
+
+
+async def resolve_role(user: dict, users: UserAdminRepository) -> Optional[str]:
+    """
+    Role of a verified user ("" if none), or None if the auth user is gone.
+
+    Only a cache miss without a role claim costs an ``auth.admin`` call;
+    concurrent misses for one user share it.
+    """
+    user_id = user["user_id"]
+    changed = role_changes.get(user_id)
+    if changed is not None:
+        return changed["role"]
+
+    if settings.AUTH_ROLE_FROM_CLAIM and user.get("role") is not None:
+        return user["role"]
+
+    cached = role_cache.get(user_id)
+    if cached is None:
+        # Not bound to this request, so its disconnect can't fail callers sharing the lookup
+        detached = UserAdminRepository(timeout=users.timeout, pool=users.pool)
+        cached = await _lookups.do(user_id, lambda: _fetch_role(detached, user_id))
+    return cached["role"]
+
+
+def record_role_change(user_id: str, role: Optional[str]) -> None:
+    """Make a role update (or deletion, ``role=None``) take effect immediately in this process"""
+    role_cache.discard(user_id)
+    role_changes.put(user_id, {"role": role})
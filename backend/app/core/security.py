@@ -1,20 +1,47 @@
 """
 Security utilities for JWT validation with Supabase
 """
+import asyncio
+import time
 from typing import Optional
 from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import JWTError, jwt
-from supabase import create_client, Client
 
 from app.core.config import settings
+from app.core.database import supabase_pool
+from app.core.metrics import auth_verify
+from app.core.tokens import LocalVerificationUnavailable, verify_jwt_locally
+from app.services.single_flight import SingleFlight
 
 security = HTTPBearer()
 
+# A page load fires several API calls with the same token at once
+_remote_checks = SingleFlight("auth")
 
-def get_supabase_client() -> Client:
-    """Create Supabase client"""
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+
+async def _verify_remote(token: str) -> dict:
+    """Ask Supabase Auth to validate the token (catches revoked sessions)"""
+    return await _remote_checks.do(token, lambda: _fetch_user(token))
+
+
+async def _fetch_user(token: str) -> dict:
+    async with supabase_pool.acquire() as supabase:
+        user_response = await asyncio.wait_for(
+            supabase.auth.get_user(token),
+            timeout=settings.DB_QUERY_TIMEOUT,
+        )
+
+    if not user_response or not user_response.user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication token"
+        )
+
+    return {
+        "user_id": user_response.user.id,
+        "email": user_response.user.email,
+        "role": (user_response.user.user_metadata or {}).get("role", ""),
+    }
 
 
 async def verify_token(
@@ -22,24 +49,45 @@ async def verify_token(
 ) -> dict:
     """
     Verify Supabase JWT token and return user data
+
+    In ``local`` mode the signature and claims are checked in-process;
+    tokens without a usable signing key fall back to Supabase Auth.
     """
     token = credentials.credentials
-    
+    started = time.perf_counter()
+    mode, outcome = settings.AUTH_VERIFY_MODE, "error"
+
     try:
-        supabase = get_supabase_client()
+        if mode == "local":
+            try:
+                user = await verify_jwt_locally(token)
+                outcome = "ok"
+                return user
+            except LocalVerificationUnavailable:
+                mode = "remote"
+
         # Verify token with Supabase
-        user_response = supabase.auth.get_user(token)
-        
-        if not user_response or not user_response.user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication token"
-            )
-        
-        return {
-            "user_id": user_response.user.id,
-            "email": user_response.user.email,
-        }
+        user = await _verify_remote(token)
+        outcome = "ok"
+        return user
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Authentication failed: {str(e)}"
+        )
+    finally:
+        auth_verify.labels(mode, outcome).observe(time.perf_counter() - started)
+
+
+async def verify_token_strict(
+    credentials: HTTPAuthorizationCredentials = Security(security)
+) -> dict:
+    """
+    Verify token against Supabase Auth regardless of AUTH_VERIFY_MODE.
+    Use on revocation-sensitive routes.
+    """
+    try:
+        return await _verify_remote(credentials.credentials)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,222 @@
+"""
+Local Supabase JWT verification — cached signing keys and verified-token cache
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+def import_jose():
+    """python-jose (and the cryptography backend it loads) on first use or from the startup warmup"""
+    import jose
+    import jose.jwk
+    import jose.jwt
+
+    return jose
+
+
+class TokenCache:
+    """LRU cache of verified token -> user claims with a short TTL"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[token]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def put(self, token: str, user: dict, token_exp: Optional[float] = None) -> None:
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            # Never cache past the token's own expiry
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+
+        self._entries[token] = (time.monotonic() + ttl, user)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class SigningKeys:
+    """
+    Signing keys for Supabase access tokens.
+
+    HS256 tokens are checked against ``SUPABASE_JWT_SECRET``; asymmetric
+    tokens against the project's JWKS, which is fetched once and then
+    refreshed in the background.
+    """
+
+    def __init__(self, jwks_url: str, refresh_interval: float):
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+        self._keys: Dict[str, tuple] = {}  # kid -> (key, alg)
+        self._fetched_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def start(self) -> None:
+        """Load the JWKS and keep it fresh until ``stop`` is called"""
+        if not self.jwks_url or self._task is not None:
+            return
+        self._lock = asyncio.Lock()
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._lock = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def refresh(self) -> None:
+        """Fetch the JWKS; keep the previous keys if the fetch fails"""
+        try:
+            async with httpx.AsyncClient(timeout=settings.SUPABASE_HTTP_TIMEOUT) as client:
+                response = await client.get(self.jwks_url)
+                response.raise_for_status()
+                jwks = response.json()
+        except (httpx.HTTPError, ValueError):
+            return
+
+        jose = import_jose()
+        keys = {}
+        for key_data in jwks.get("keys", []):
+            kid = key_data.get("kid")
+            alg = key_data.get("alg")
+            if not kid or not alg:
+                continue
+            try:
+                keys[kid] = (jose.jwk.construct(key_data, alg), alg)
+            except jose.JWTError:
+                continue
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    async def get(self, kid: Optional[str]) -> Optional[tuple]:
+        """Return ``(key, alg)`` for ``kid``, refetching once if it is unknown (key rotation)"""
+        if not kid:
+            return None
+        key = self._keys.get(kid)
+        if key is not None or not self.jwks_url:
+            return key
+
+        # Rate-limit forced refreshes so bogus kids cannot hammer the auth server
+        if time.monotonic() - self._fetched_at < settings.AUTH_JWKS_MIN_REFETCH:
+            return None
+        lock = self._lock or asyncio.Lock()
+        async with lock:
+            if kid not in self._keys:
+                await self.refresh()
+        return self._keys.get(kid)
+
+
+class LocalVerificationUnavailable(Exception):
+    """Raised when a token cannot be checked in-process (no matching key)"""
+
+
+def _issuer() -> str:
+    if settings.SUPABASE_JWT_ISSUER:
+        return settings.SUPABASE_JWT_ISSUER
+    return f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1"
+
+
+def _jwks_url() -> str:
+    if not settings.SUPABASE_URL:
+        return ""
+    return f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+
+
+signing_keys = SigningKeys(_jwks_url(), settings.AUTH_JWKS_REFRESH_INTERVAL)
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+
+async def verify_jwt_locally(token: str) -> dict:
+    """
+    Check signature, exp, aud and iss of a Supabase access token in-process.
+
+    Returns:
+        The user dict (``user_id``, ``email``, ``role``) for a valid token.
+
+    Raises:
+        JWTError: If the token is invalid or expired.
+        LocalVerificationUnavailable: If no signing key is configured for it.
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    jose = import_jose()
+    header = jose.jwt.get_unverified_header(token)
+    alg = header.get("alg")
+    if alg == "HS256":
+        if not settings.SUPABASE_JWT_SECRET:
+            raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET is not set")
+        key = settings.SUPABASE_JWT_SECRET
+    else:
+        # Only accept the algorithm published with the key, never the header's claim
+        entry = await signing_keys.get(header.get("kid"))
+        if entry is None:
+            raise LocalVerificationUnavailable(f"No signing key for kid '{header.get('kid')}'")
+        key, alg = entry
+
+    claims = jose.jwt.decode(
+        token,
+        key,
+        algorithms=[alg],
+        audience=settings.SUPABASE_JWT_AUDIENCE,
+        issuer=_issuer(),
+    )
+    if not claims.get("sub"):
+        raise jose.JWTError("Token has no subject")
+
+    user = {
+        "user_id": claims["sub"],
+        "email": claims.get("email"),
+        # Supabase copies user_metadata into the token; None if this one doesn't carry it
+        "role": (claims["user_metadata"] or {}).get("role", "") if "user_metadata" in claims else None,
+    }
+    token_cache.put(token, user, claims.get("exp"))
+    return user
@@ -0,0 +1,70 @@
+"""
+Startup warmup - slow startup work that runs after the server starts accepting connections
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+Step = Tuple[str, Callable[[], Awaitable]]
+
+
+class Warmup:
+    """
+    Runs named startup steps (SDK imports, key fetches, cache loads) one
+    after another in a background task, so the lifespan returns and the
+    server listens straight away.
+
+    ``state`` is "starting" until ``start``, "warming" while steps run and
+    "ready" once every step has finished. A failed step is recorded and
+    skipped: whatever it was preparing then happens lazily on first use,
+    as it would without the warmup.
+    """
+
+    def __init__(self):
+        self.state = "starting"
+        self.steps: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._started = 0.0
+        self.ready_ms: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def start(self, steps: Sequence[Step], background: bool = True) -> None:
+        """Run ``steps``; with ``background=False``, wait for them (the server listens only afterwards)"""
+        self._started = time.perf_counter()
+        self.state = "warming"
+        self.steps = {name: {"state": "pending"} for name, _ in steps}
+        if background:
+            self._task = asyncio.create_task(self._run(steps))
+        else:
+            await self._run(steps)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, steps: Sequence[Step]) -> None:
+        for name, step in steps:
+            started = time.perf_counter()
+            try:
+                await step()
+            except Exception as e:
+                self.steps[name] = {"state": "failed", "error": str(e)}
+            else:
+                self.steps[name] = {"state": "done"}
+            self.steps[name]["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        self.ready_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        self.state = "ready"
+
+    def stats(self) -> dict:
+        return {"state": self.state, "ready_ms": self.ready_ms, "steps": self.steps}
+
+
+warmup = Warmup()
@@ -2,7 +2,7 @@
 Pydantic models for API requests and responses
 """
 from typing import Optional, Literal
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 # Level Models
@@ -23,6 +23,36 @@ class Level(BaseModel):
     difficulty: Literal["beginner", "intermediate", "advanced"] = "beginner"
 
 
+# Lesson Models
+class LessonCreate(BaseModel):
+    title: str
+    description: Optional[str] = None
+    goal: str
+    game_type: str = "exact_match"
+    difficulty: str = "beginner"
+    order_index: int = 0
+    config: dict = {}
+    time_limit: Optional[int] = None
+    is_published: bool = False
+
+
+class LessonUpdate(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    goal: Optional[str] = None
+    game_type: Optional[str] = None
+    difficulty: Optional[str] = None
+    order_index: Optional[int] = None
+    config: Optional[dict] = None
+    time_limit: Optional[int] = None
+    is_published: Optional[bool] = None
+
+
+class LessonImport(LessonCreate):
+    """One lesson of an import bundle; rows with an id replace that lesson, rows without one are added"""
+    id: Optional[int] = Field(default=None, ge=1)
+
+
 # Judge Models
 class JudgeRequest(BaseModel):
     level_id: int
@@ -44,4 +74,4 @@ class UserCredits(BaseModel):
 
 
 class CreditDeductRequest(BaseModel):
-    amount: int = 1
+    amount: int = Field(default=1, ge=0)
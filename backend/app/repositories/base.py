@@ -0,0 +1,103 @@
+"""
+Base repository — pooled async Supabase access with timeouts and disconnect handling
+"""
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, List, Optional, TypeVar
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.database import SupabasePool, supabase_pool
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
+T = TypeVar("T")
+
+# nginx-style status for requests abandoned by the client
+HTTP_499_CLIENT_CLOSED_REQUEST = 499
+
+
+class Repository:
+    """
+    Base class for data access.
+
+    Every call borrows a pooled client only for the duration of the query,
+    is bounded by a timeout, and is cancelled early if the HTTP client that
+    triggered it has gone away.
+    """
+
+    def __init__(
+        self,
+        request: Optional[Request] = None,
+        timeout: Optional[float] = None,
+        pool: SupabasePool = supabase_pool,
+    ):
+        self.request = request
+        self.timeout = settings.DB_QUERY_TIMEOUT if timeout is None else timeout
+        self.pool = pool
+
+    async def _call(
+        self,
+        fn: Callable[["AsyncClient"], Awaitable[T]],
+        timeout: Optional[float] = None,
+    ) -> T:
+        """Run ``fn(client)`` with a pooled client under the repository guards"""
+        async def run() -> T:
+            async with self.pool.acquire() as client:
+                return await fn(client)
+
+        return await self._guard(run(), self.timeout if timeout is None else timeout)
+
+    async def _guard(self, coro: Awaitable[T], timeout: float) -> T:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        poll = settings.DB_DISCONNECT_POLL_INTERVAL
+        task = asyncio.ensure_future(coro)
+
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise HTTPException(
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                        detail="Database request timed out"
+                    )
+
+                wait = min(remaining, poll) if self.request is not None else remaining
+                done, _ = await asyncio.wait({task}, timeout=wait)
+                if done:
+                    return task.result()
+
+                if self.request is not None and await self.request.is_disconnected():
+                    raise HTTPException(
+                        status_code=HTTP_499_CLIENT_CLOSED_REQUEST,
+                        detail="Client closed request"
+                    )
+        finally:
+            if not task.done():
+                task.cancel()
+
+
+def is_rejected(error: BaseException) -> bool:
+    """
+    True if the database refused the data itself (SQLSTATE class 22, invalid
+    value, or 23, constraint violation): sending the same rows again would
+    fail the same way, unlike a timeout or a dropped connection.
+    """
+    code = getattr(error, "code", None)
+    return isinstance(code, str) and code[:2] in ("22", "23")
+
+
+async def fan_out(*awaitables: Awaitable[Any]) -> List[Any]:
+    """
+    Run independent reads concurrently and return their results in order.
+    If one fails the others are cancelled.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in awaitables]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
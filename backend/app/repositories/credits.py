@@ -0,0 +1,80 @@
+"""
+Credits repository — balances and the append-only ledger, via stored functions
+"""
+from typing import List, Optional
+
+from fastapi import Request
+
+from app.repositories.base import Repository
+
+
+class CreditsRepository(Repository):
+    """
+    Reads ``public.user_credits`` / ``public.credit_ledger``.
+
+    All writes go through the ``ensure_credits``, ``deduct_credits`` and
+    ``apply_credit_batch`` functions so balance and ledger change together.
+    """
+
+    table = "user_credits"
+    ledger_table = "credit_ledger"
+
+    async def get_balance(self, user_id: str) -> Optional[int]:
+        result = await self._call(
+            lambda db: db.table(self.table).select("balance").eq("user_id", user_id).execute()
+        )
+        return result.data[0]["balance"] if result.data else None
+
+    async def ensure(self, user_id: str, default: int) -> int:
+        """Create the balance row with ``default`` credits if missing; returns the balance"""
+        result = await self._call(
+            lambda db: db.rpc(
+                "ensure_credits", {"p_user_id": user_id, "p_default": default}
+            ).execute()
+        )
+        return result.data
+
+    async def deduct(self, user_id: str, amount: int, idempotency_key: str, default: int) -> dict:
+        """Atomically deduct up to ``amount``; returns ``balance``, ``charged``, ``replayed``"""
+        result = await self._call(
+            lambda db: db.rpc(
+                "deduct_credits",
+                {
+                    "p_user_id": user_id,
+                    "p_amount": amount,
+                    "p_idempotency_key": idempotency_key,
+                    "p_default": default,
+                },
+            ).execute()
+        )
+        return result.data[0]
+
+    async def apply_batch(self, entries: List[dict], default: int) -> List[dict]:
+        """
+        Apply many deductions in one transaction; one result row per entry, in
+        order. An entry the database rejected has ``error`` set and changed nothing.
+        """
+        if not entries:
+            return []
+        result = await self._call(
+            lambda db: db.rpc(
+                "apply_credit_batch", {"p_entries": entries, "p_default": default}
+            ).execute()
+        )
+        return result.data
+
+    async def list_ledger(self, user_id: str, limit: int = 50) -> List[dict]:
+        result = await self._call(
+            lambda db: db.table(self.ledger_table)
+            .select("*")
+            .eq("user_id", user_id)
+            .order("created_at", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return result.data
+
+
+def get_credits_repository(request: Request) -> CreditsRepository:
+    """FastAPI dependency bound to the current request"""
+    return CreditsRepository(request)
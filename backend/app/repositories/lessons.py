@@ -0,0 +1,139 @@
+"""
+Lesson repository — async access to the lessons table
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.repositories.base import Repository
+
+
+class LessonRepository(Repository):
+    """Reads and writes rows of ``public.lessons``"""
+
+    table = "lessons"
+
+    async def _select_all(self, columns: str, where: Callable = lambda builder: builder) -> List[dict]:
+        """
+        Every row matching ``where``, read in id order one page at a time:
+        PostgREST returns at most SUPABASE_MAX_ROWS rows per request. Pages
+        are keyed on the last id seen, so rows inserted or deleted while
+        reading cannot shift a later page.
+        """
+        rows: List[dict] = []
+        page_size = settings.SUPABASE_MAX_ROWS
+        while True:
+            after = rows[-1]["id"] if rows else 0
+            result = await self._call(
+                lambda db: where(db.table(self.table).select(columns))
+                .gt("id", after)
+                .order("id")
+                .limit(page_size)
+                .execute()
+            )
+            if not result.data:
+                return rows
+            rows.extend(result.data)
+
+    async def list_published(self) -> List[dict]:
+        """All published lessons ordered by order_index"""
+        result = await self._call(
+            lambda db: db.table(self.table)
+            .select("*")
+            .eq("is_published", True)
+            .order("order_index")
+            .execute()
+        )
+        return result.data
+
+    async def get_published(self, lesson_id: int) -> Optional[dict]:
+        result = await self._call(
+            lambda db: db.table(self.table)
+            .select("*")
+            .eq("id", lesson_id)
+            .eq("is_published", True)
+            .execute()
+        )
+        return result.data[0] if result.data else None
+
+    async def list_all(self) -> List[dict]:
+        """All lessons, including unpublished ones, ordered by id"""
+        return await self._select_all("*")
+
+    def _page(self, db, offset: int, limit: int, filters: Optional[dict], count: Optional[str] = None):
+        builder = db.table(self.table).select("*", count=count)
+        for column, value in (filters or {}).items():
+            builder = builder.eq(column, value)
+        return builder.order("order_index").order("id").range(offset, offset + limit - 1).execute()
+
+    async def list_page(self, offset: int, limit: int, filters: Optional[dict] = None) -> List[dict]:
+        """One page of lessons ordered by order_index then id; ``filters`` are column equalities"""
+        result = await self._call(lambda db: self._page(db, offset, limit, filters))
+        return result.data
+
+    async def list_page_with_total(
+        self, offset: int, limit: int, filters: Optional[dict] = None
+    ) -> Tuple[List[dict], int]:
+        """``list_page`` and the number of lessons matching ``filters``, counted by the same request"""
+        result = await self._call(lambda db: self._page(db, offset, limit, filters, count="exact"))
+        return result.data, result.count
+
+    async def get(self, lesson_id: int) -> Optional[dict]:
+        result = await self._call(
+            lambda db: db.table(self.table).select("*").eq("id", lesson_id).execute()
+        )
+        return result.data[0] if result.data else None
+
+    async def get_many(self, lesson_ids: List[int]) -> List[dict]:
+        """Fetch several lessons with one ``in`` query per SUPABASE_MAX_ROWS ids"""
+        rows: List[dict] = []
+        page_size = settings.SUPABASE_MAX_ROWS
+        for start in range(0, len(lesson_ids), page_size):
+            page = lesson_ids[start:start + page_size]
+            result = await self._call(
+                lambda db: db.table(self.table).select("*").in_("id", page).execute()
+            )
+            rows.extend(result.data)
+        return rows
+
+    async def list_updated_since(self, updated_at: str) -> List[dict]:
+        """Lessons with updated_at at or after ``updated_at`` (ISO timestamp)"""
+        return await self._select_all("*", lambda builder: builder.gte("updated_at", updated_at))
+
+    async def list_ids(self) -> List[int]:
+        return [row["id"] for row in await self._select_all("id")]
+
+    async def create(self, data: dict) -> Optional[dict]:
+        result = await self._call(lambda db: db.table(self.table).insert(data).execute())
+        return result.data[0] if result.data else None
+
+    async def update(self, lesson_id: int, data: dict) -> Optional[dict]:
+        result = await self._call(
+            lambda db: db.table(self.table).update(data).eq("id", lesson_id).execute()
+        )
+        return result.data[0] if result.data else None
+
+    async def import_rows(self, rows: List[dict]) -> Dict[str, List[int]]:
+        """
+        Upsert ``rows`` by id (rows without one are inserted) in one
+        transaction; returns the written ids as ``{"created": [...], "updated": [...]}``
+        """
+        if not rows:
+            return {"created": [], "updated": []}
+        result = await self._call(
+            lambda db: db.rpc("import_lessons", {"p_rows": rows}).execute()
+        )
+        return result.data
+
+    async def delete(self, lesson_id: int) -> Optional[dict]:
+        """Delete a lesson, returning the removed row (None if it did not exist)"""
+        result = await self._call(
+            lambda db: db.table(self.table).delete().eq("id", lesson_id).execute()
+        )
+        return result.data[0] if result.data else None
+
+
+def get_lesson_repository(request: Request) -> LessonRepository:
+    """FastAPI dependency bound to the current request"""
+    return LessonRepository(request)
@@ -0,0 +1,72 @@
+"""
+Progress repository — async access to the user_progress table
+"""
+from typing import List, Optional
+
+from fastapi import Request
+
+from app.repositories.base import Repository
+
+
+class ProgressRepository(Repository):
+    """Reads and writes rows of ``public.user_progress``"""
+
+    table = "user_progress"
+
+    async def get(self, user_id: str, lesson_id: int) -> Optional[dict]:
+        result = await self._call(
+            lambda db: db.table(self.table)
+            .select("*")
+            .eq("user_id", user_id)
+            .eq("lesson_id", lesson_id)
+            .execute()
+        )
+        return result.data[0] if result.data else None
+
+    async def list_for_user(self, user_id: str) -> List[dict]:
+        result = await self._call(
+            lambda db: db.table(self.table).select("*").eq("user_id", user_id).execute()
+        )
+        return result.data
+
+    async def list_after(self, after_id: int, limit: int) -> List[dict]:
+        """Up to ``limit`` rows with id > ``after_id`` in id order (keyset paging over the whole table)"""
+        result = await self._call(
+            lambda db: db.table(self.table)
+            .select("id,user_id,lesson_id,score,completed,completed_at")
+            .gt("id", after_id)
+            .order("id")
+            .limit(limit)
+            .execute()
+        )
+        return result.data
+
+    async def upsert_many(self, rows: List[dict]) -> List[dict]:
+        """Insert or update rows keyed on (user_id, lesson_id)"""
+        if not rows:
+            return []
+        result = await self._call(
+            lambda db: db.table(self.table)
+            .upsert(rows, on_conflict="user_id,lesson_id")
+            .execute()
+        )
+        return result.data
+
+    async def record_many(self, rows: List[dict]) -> int:
+        """
+        Merge aggregated judge results via ``record_progress``: attempts are
+        added, the best score kept, ``completed_at`` set on first success.
+        Rows for a user or lesson that no longer exists are skipped; returns
+        the number of rows written.
+        """
+        if not rows:
+            return 0
+        result = await self._call(
+            lambda db: db.rpc("record_progress", {"p_rows": rows}).execute()
+        )
+        return result.data
+
+
+def get_progress_repository(request: Request) -> ProgressRepository:
+    """FastAPI dependency bound to the current request"""
+    return ProgressRepository(request)
@@ -0,0 +1,18 @@
+"""
+Rate limit repository — token buckets shared across workers
+"""
+from app.repositories.base import Repository
+
+
+class RateLimitRepository(Repository):
+    """Takes tokens from ``public.rate_limit_buckets`` via ``take_rate_tokens``"""
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Seconds until ``cost`` tokens are available; 0 means they were taken"""
+        result = await self._call(
+            lambda db: db.rpc(
+                "take_rate_tokens",
+                {"p_key": key, "p_rate": rate, "p_burst": burst, "p_cost": cost},
+            ).execute()
+        )
+        return float(result.data or 0)
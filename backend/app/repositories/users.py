@@ -0,0 +1,54 @@
+"""
+User admin repository — async access to Supabase Auth users
+"""
+from typing import List, Optional
+
+import httpx
+from fastapi import Request
+
+from app.repositories.base import Repository
+
+
+class UserAdminRepository(Repository):
+    """Wraps the service-role ``auth.admin`` API"""
+
+    async def get_by_id(self, user_id: str):
+        """Return the auth user, or None if it does not exist"""
+        response = await self._call(lambda db: db.auth.admin.get_user_by_id(user_id))
+        return response.user if response else None
+
+    async def list_users(self, page: Optional[int] = None, per_page: Optional[int] = None) -> List:
+        return await self._call(
+            lambda db: db.auth.admin.list_users(page=page, per_page=per_page)
+        )
+
+    async def count(self) -> Optional[int]:
+        """
+        Number of auth users, or None if the auth server didn't say.
+
+        ``list_users`` drops the admin API's X-Total-Count header, so this
+        asks for a one-user page through the auth client directly.
+        """
+        response = await self._call(
+            lambda db: db.auth.admin._request("GET", "admin/users", query=httpx.QueryParams(page=1, per_page=1))
+        )
+        total = response.headers.get("x-total-count")
+        return int(total) if total is not None else None
+
+    async def update_role(self, user_id: str, role: str):
+        """Set ``user_metadata.role``; returns the updated user or None"""
+        response = await self._call(
+            lambda db: db.auth.admin.update_user_by_id(
+                user_id,
+                {"user_metadata": {"role": role}}
+            )
+        )
+        return response.user if response else None
+
+    async def delete(self, user_id: str) -> None:
+        await self._call(lambda db: db.auth.admin.delete_user(user_id))
+
+
+def get_user_admin_repository(request: Request) -> UserAdminRepository:
+    """FastAPI dependency bound to the current request"""
+    return UserAdminRepository(request)
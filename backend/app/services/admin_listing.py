@@ -0,0 +1,227 @@
+"""
+Admin Listing Service - paged, filtered user/lesson listings and streaming exports
+"""
+import base64
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.repositories.lessons import LessonRepository
+from app.repositories.users import UserAdminRepository
+
+USER_COLUMNS = ("id", "email", "role", "created_at", "last_sign_in_at", "email_confirmed")
+LESSON_COLUMNS = (
+    "id", "title", "description", "goal", "game_type", "difficulty", "order_index",
+    "config", "time_limit", "is_published", "created_at", "updated_at",
+)
+# Export rows are sent in chunks of about this many characters
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor this server did not issue"""
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    # Query params without an offset are taken as UTC; auth timestamps always carry one
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _role(user) -> str:
+    # Demoting a user stores role "" rather than removing the key
+    return (user.user_metadata or {}).get("role") or "user"
+
+
+def serialize_user(user) -> dict:
+    return {
+        "id": str(user.id),
+        "email": user.email,
+        "role": _role(user),
+        "created_at": _isoformat(user.created_at),
+        "last_sign_in_at": _isoformat(user.last_sign_in_at),
+        "email_confirmed": user.email_confirmed_at is not None,
+    }
+
+
+@dataclass(frozen=True)
+class UserFilter:
+    role: Optional[str] = None  # "admin" or "user"
+    email_prefix: Optional[str] = None
+    confirmed: Optional[bool] = None
+    last_sign_in_after: Optional[datetime] = None
+    last_sign_in_before: Optional[datetime] = None
+
+    @property
+    def empty(self) -> bool:
+        return self == UserFilter()
+
+    def matches(self, user) -> bool:
+        if self.role is not None and _role(user) != self.role:
+            return False
+        if self.email_prefix and not (user.email or "").lower().startswith(self.email_prefix.lower()):
+            return False
+        if self.confirmed is not None and (user.email_confirmed_at is not None) != self.confirmed:
+            return False
+        if self.last_sign_in_after is not None or self.last_sign_in_before is not None:
+            signed_in = user.last_sign_in_at
+            if signed_in is None:
+                return False
+            after, before = _aware(self.last_sign_in_after), _aware(self.last_sign_in_before)
+            if after is not None and signed_in < after:
+                return False
+            if before is not None and signed_in >= before:
+                return False
+        return True
+
+
+# --- Cursors ---
+def encode_cursor(*parts: int) -> str:
+    raw = ".".join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Tuple[int, ...]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        parts = tuple(int(part) for part in raw.split("."))
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor")
+    if len(parts) != size or any(part < 0 for part in parts):
+        raise InvalidCursor("Invalid cursor")
+    return parts
+
+
+# --- Users ---
+async def page_users(
+    users: UserAdminRepository,
+    user_filter: UserFilter,
+    limit: int,
+    cursor: Optional[str],
+    upstream_page_size: int,
+    max_scan_pages: int,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Up to ``limit`` matching users and the cursor for the next page (None at the end).
+
+    The auth API only pages, so filters are applied here while walking its
+    pages. A cursor records the auth page, its size and the position inside
+    it. A request walks at most ``max_scan_pages`` auth pages; a sparse
+    filter may return fewer than ``limit`` users with a cursor to continue.
+    """
+    if cursor:
+        page, per_page, offset = decode_cursor(cursor, 3)
+        if page < 1 or per_page < 1:
+            raise InvalidCursor("Invalid cursor")
+    else:
+        # Unfiltered pages line up one-to-one with auth pages
+        page, per_page, offset = 1, limit if user_filter.empty else upstream_page_size, 0
+
+    matched: List[dict] = []
+    for _ in range(max_scan_pages):
+        batch = await users.list_users(page=page, per_page=per_page)
+        for index in range(offset, len(batch)):
+            if not user_filter.matches(batch[index]):
+                continue
+            matched.append(serialize_user(batch[index]))
+            if len(matched) == limit:
+                if index + 1 < len(batch):
+                    return matched, encode_cursor(page, per_page, index + 1)
+                if len(batch) < per_page:
+                    return matched, None
+                return matched, encode_cursor(page + 1, per_page, 0)
+        if len(batch) < per_page:
+            return matched, None
+        page, offset = page + 1, 0
+    return matched, encode_cursor(page, per_page, 0)
+
+
+async def iter_users(users: UserAdminRepository, user_filter: UserFilter, page_size: int) -> AsyncIterator[dict]:
+    """Every matching user, one auth page in memory at a time"""
+    page = 1
+    while True:
+        batch = await users.list_users(page=page, per_page=page_size)
+        for user in batch:
+            if user_filter.matches(user):
+                yield serialize_user(user)
+        if len(batch) < page_size:
+            return
+        page += 1
+
+
+# --- Lessons ---
+async def page_lessons(
+    lessons: LessonRepository,
+    filters: dict,
+    limit: int,
+    cursor: Optional[str],
+) -> Tuple[List[dict], Optional[str], int]:
+    """
+    Up to ``limit`` lessons in order_index order, the cursor for the next
+    page, and how many lessons match ``filters`` in all
+    """
+    offset = decode_cursor(cursor, 1)[0] if cursor else 0
+    # One extra row tells whether there is a next page; the total comes with the same request
+    rows, total = await lessons.list_page_with_total(offset, limit + 1, filters)
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(offset + limit), total
+    return rows, None, total
+
+
+async def iter_lessons(lessons: LessonRepository, filters: dict, page_size: int) -> AsyncIterator[dict]:
+    # A page larger than PostgREST's max_rows would come back short and look like the last one
+    page_size = min(page_size, settings.SUPABASE_MAX_ROWS)
+    offset = 0
+    while True:
+        rows = await lessons.list_page(offset, page_size, filters)
+        for row in rows:
+            yield row
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+# --- Export formats ---
+async def ndjson_lines(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    chunk: List[str] = []
+    size = 0
+    async for row in rows:
+        line = json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    # Keep spreadsheet apps from evaluating user-controlled text (emails, titles) as formulas
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+
+async def csv_lines(rows: AsyncIterator[dict], columns: Sequence[str]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow({column: _csv_value(row.get(column)) for column in columns})
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
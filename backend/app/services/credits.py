@@ -0,0 +1,295 @@
+"""
+Credits Service - write-behind deductions over the durable credits ledger
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.repositories.credits import CreditsRepository
+
+
+class CreditsUnavailable(Exception):
+    """Raised when deductions are backed up and the database is not taking them"""
+
+
+class _Balance:
+    """Local view of a user's balance: confirmed value minus unflushed deductions"""
+
+    __slots__ = ("balance", "pending", "fetched_at")
+
+    def __init__(self, balance: int):
+        self.balance = balance
+        self.pending = 0
+        self.fetched_at = time.monotonic()
+
+
+class CreditsService:
+    """
+    Hot-path credit deductions with durable, batched persistence.
+
+    With ``write_behind`` on, a deduction is applied to the in-process view
+    and queued; the queue is flushed through ``apply_credit_batch`` at least
+    every ``flush_interval`` seconds (sooner once ``batch_size`` entries are
+    waiting). Postgres stays authoritative: it re-applies each deduction
+    under a row lock, clamps at zero, and dedupes on the idempotency key, so
+    retries and other workers/replicas cannot double-charge. An entry the
+    database rejects outright (e.g. the user no longer exists) is dropped
+    and counted rather than retried. With it off, every deduction is a
+    synchronous ``deduct_credits`` call.
+    """
+
+    def __init__(
+        self,
+        default: int,
+        write_behind: bool,
+        flush_interval: float,
+        batch_size: int,
+        max_pending: int,
+        balance_ttl: float,
+        cache_size: int = 100_000,
+        repository_factory: Callable[[], CreditsRepository] = CreditsRepository,
+    ):
+        self.default = default
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.balance_ttl = balance_ttl
+        self.cache_size = cache_size
+        self.repository_factory = repository_factory
+
+        self._balances: "OrderedDict[str, _Balance]" = OrderedDict()
+        self._replies: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._pending: List[dict] = []
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.deductions = 0
+        self.replays = 0
+        self.flushes = 0
+        self.flushed_entries = 0
+        self.flush_failures = 0
+        self.rejected_entries = 0
+        self.last_flush_ms = 0.0
+
+    # --- Lifecycle ---
+    async def start(self) -> None:
+        if not self.write_behind or self._task is not None:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the flusher and drain whatever is still buffered"""
+        if self._task is not None:
+            # Let a flush in progress finish rather than cancel it mid-batch
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopping:
+                return
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Entries were put back; the next tick retries them
+                pass
+
+    # --- Balances ---
+    async def _view(self, user_id: str) -> _Balance:
+        entry = self._balances.get(user_id)
+        if entry is not None and (entry.pending or time.monotonic() - entry.fetched_at < self.balance_ttl):
+            self._balances.move_to_end(user_id)
+            return entry
+
+        # Concurrent first requests for a user share one database round trip,
+        # detached from any one request so a disconnect can't fail the others
+        started = time.monotonic()
+        loading = self._loading.get(user_id)
+        if loading is None:
+            loading = asyncio.ensure_future(self.repository_factory().ensure(user_id, self.default))
+            self._loading[user_id] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        balance = await asyncio.shield(loading)
+
+        # Another request may have deducted, or a flush confirmed a newer balance,
+        # while we were waiting on the database
+        entry = self._balances.get(user_id)
+        if entry is not None and (entry.pending or entry.fetched_at >= started):
+            return entry
+
+        entry = _Balance(balance)
+        self._balances[user_id] = entry
+        self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        while len(self._balances) > self.cache_size:
+            user_id, entry = next(iter(self._balances.items()))
+            if entry.pending:
+                self._balances.move_to_end(user_id)
+                break
+            del self._balances[user_id]
+
+    def _remember(self, user_id: str, key: str, balance: int) -> None:
+        self._replies[(user_id, key)] = balance
+        while len(self._replies) > self.cache_size:
+            self._replies.popitem(last=False)
+
+    async def balance(self, user_id: str) -> int:
+        """Current balance, creating the account with the starting grant if needed"""
+        return (await self._view(user_id)).balance
+
+    async def deduct(
+        self,
+        user_id: str,
+        amount: int,
+        repo: CreditsRepository,
+        idempotency_key: Optional[str] = None,
+    ) -> int:
+        """
+        Deduct up to ``amount`` credits (never below zero) and return the new balance.
+
+        Repeating a request with the same ``idempotency_key`` returns the
+        original balance without charging again.
+
+        Raises:
+            CreditsUnavailable: If the write-behind buffer is full and cannot be flushed.
+        """
+        if idempotency_key:
+            replay = self._replies.get((user_id, idempotency_key))
+            if replay is not None:
+                self.replays += 1
+                return replay
+        key = idempotency_key or uuid.uuid4().hex
+
+        if not self.write_behind:
+            row = await repo.deduct(user_id, amount, key, self.default)
+            self._balances.pop(user_id, None)
+            self.deductions += 1
+            self._remember(user_id, key, row["balance"])
+            return row["balance"]
+
+        if len(self._pending) >= self.max_pending:
+            # Backpressure: don't let the buffer outgrow what the database can absorb
+            try:
+                await self.flush()
+            except Exception as e:
+                raise CreditsUnavailable("Credits are temporarily unavailable") from e
+
+        entry = await self._view(user_id)
+        if idempotency_key:
+            replay = self._replies.get((user_id, idempotency_key))
+            if replay is not None:
+                self.replays += 1
+                return replay
+
+        entry.balance -= min(entry.balance, amount)
+        entry.pending += 1
+        self._pending.append({"user_id": user_id, "amount": amount, "idempotency_key": key})
+        self.deductions += 1
+        self._remember(user_id, key, entry.balance)
+
+        if len(self._pending) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return entry.balance
+
+    async def initialize(self, user_id: str) -> int:
+        return await self.balance(user_id)
+
+    # --- Persistence ---
+    async def flush(self) -> None:
+        """Write all buffered deductions to the ledger in batches"""
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:len(batch)]
+
+                started = time.perf_counter()
+                try:
+                    rows = await self.repository_factory().apply_batch(batch, self.default)
+                except BaseException as e:
+                    # Idempotency keys make the retry safe even if this batch landed
+                    self._pending[:0] = batch
+                    if isinstance(e, Exception):
+                        self.flush_failures += 1
+                    raise
+
+                self.flushes += 1
+                self.flushed_entries += len(batch)
+                self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+                self._confirm(batch, rows)
+
+    def _confirm(self, batch: List[dict], rows: List[dict]) -> None:
+        """
+        Adopt the database's balance once a user has nothing left in flight.
+        ``rows`` are in ``batch`` order, one per entry.
+        """
+        latest: Dict[str, Optional[int]] = {}
+        for sent, row in zip(batch, rows):
+            user_id = sent["user_id"]
+            entry = self._balances.get(user_id)
+            if entry is not None:
+                entry.pending -= 1
+            if row.get("error"):
+                # Never charged; the local view must not keep the deduction either
+                self.rejected_entries += 1
+                self._replies.pop((user_id, sent["idempotency_key"]), None)
+                latest[user_id] = None
+            elif latest.get(user_id, 0) is not None:
+                latest[user_id] = row["balance"]
+
+        for user_id, balance in latest.items():
+            entry = self._balances.get(user_id)
+            if entry is None or entry.pending > 0:
+                continue
+            if balance is None:
+                # Re-read on the next request rather than guess what was applied
+                del self._balances[user_id]
+                continue
+            entry.pending = 0
+            entry.balance = balance
+            entry.fetched_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "write_behind": self.write_behind,
+            "pending": len(self._pending),
+            "cached_balances": len(self._balances),
+            "deductions": self.deductions,
+            "replays": self.replays,
+            "flushes": self.flushes,
+            "flushed_entries": self.flushed_entries,
+            "flush_failures": self.flush_failures,
+            "rejected_entries": self.rejected_entries,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+credits_service = CreditsService(
+    default=settings.CREDITS_DEFAULT,
+    write_behind=settings.CREDITS_WRITE_BEHIND,
+    flush_interval=settings.CREDITS_FLUSH_INTERVAL,
+    # One result row per entry, so a batch must fit in one PostgREST response
+    batch_size=min(settings.CREDITS_FLUSH_BATCH_SIZE, settings.SUPABASE_MAX_ROWS),
+    max_pending=settings.CREDITS_MAX_PENDING,
+    balance_ttl=settings.CREDITS_BALANCE_TTL,
+)
@@ -0,0 +1,248 @@
+"""
+Judge Registry - one place to declare a game type's config schema, compiler and judge
+"""
+import inspect
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import judge_duration
+from app.services.validators import (
+    ConfigError,
+    InvalidPlan,
+    compile_exact_match,
+    compile_fill_blank,
+    compile_llm,
+    compile_multiple_choice,
+    compile_reorder,
+)
+
+
+@dataclass(frozen=True)
+class GameType:
+    """
+    A judgeable game type.
+
+    ``compile`` turns a lesson config into a plan with a ``judge(submission)``
+    method (sync or async); ``submission`` picks the relevant field off a
+    judge request; ``echo_input`` returns the user's prompt as ``ai_output``.
+    A plan may return the text it graded (e.g. model output) as a fourth
+    element of its result, which is then used as ``ai_output``. Plans that
+    produce output over time may also provide ``stream(submission)``, an
+    async generator of ``("token", text)`` events ending in ``("result", result)``.
+    """
+    id: str
+    name: str
+    description: str
+    config_schema: dict
+    compile: Callable[[dict], Any]
+    submission: Callable[[Any], Any]
+    echo_input: bool = False
+
+
+class LatencyStats:
+    """Count / total / max judge time for one game type, mirrored into a histogram"""
+
+    __slots__ = ("count", "total", "max", "histogram")
+
+    def __init__(self, histogram=None):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = histogram
+
+    def record(self, seconds: float) -> None:
+        if self.histogram is not None:
+            self.histogram.observe(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 4) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 4),
+        }
+
+
+class JudgeRegistry:
+    """Game types keyed by id, plus a plan cache keyed by lesson id + updated_at"""
+
+    def __init__(self):
+        self._types: Dict[str, GameType] = {}
+        self._latency: Dict[str, LatencyStats] = {}
+        self._plans: Dict[int, Tuple[Optional[str], Any]] = {}
+
+    def register(self, game_type: GameType) -> GameType:
+        self._types[game_type.id] = game_type
+        self._latency[game_type.id] = LatencyStats(judge_duration.labels(game_type.id))
+        return game_type
+
+    def get(self, game_type_id: str) -> Optional[GameType]:
+        return self._types.get(game_type_id)
+
+    def compile(self, game_type_id: str, config: dict):
+        """
+        Compile a lesson config into a judge plan.
+
+        Raises:
+            ConfigError: If the game type is unknown or the config is invalid.
+        """
+        game_type = self._types.get(game_type_id)
+        if game_type is None:
+            raise ConfigError(f"Game type '{game_type_id}' not yet supported.")
+        return game_type.compile(config or {})
+
+    def plan_for(self, lesson: dict):
+        """Compiled plan for a lesson, cached by lesson id + updated_at"""
+        lesson_id = lesson["id"]
+        updated_at = lesson.get("updated_at")
+
+        cached = self._plans.get(lesson_id)
+        if cached is not None and cached[0] == updated_at:
+            return cached[1]
+
+        try:
+            plan = self.compile(lesson["game_type"], lesson.get("config") or {})
+        except ConfigError as e:
+            plan = InvalidPlan(str(e))
+
+        self._plans[lesson_id] = (updated_at, plan)
+        return plan
+
+    async def judge(self, lesson: dict, request: Any) -> tuple:
+        """Judge a request against a lesson, recording per-type latency"""
+        game_type = self._types.get(lesson["game_type"])
+        if game_type is None:
+            return False, f"Game type '{lesson['game_type']}' not yet supported.", 0
+
+        plan = self.plan_for(lesson)
+        started = time.perf_counter()
+        result = plan.judge(game_type.submission(request))
+        if inspect.isawaitable(result):
+            result = await result
+        self._latency[game_type.id].record(time.perf_counter() - started)
+        return result
+
+    async def judge_stream(self, lesson: dict, request: Any) -> AsyncIterator[tuple]:
+        """
+        Like ``judge``, but as events: ``("token", text)`` while the plan
+        produces output, then ``("result", result)``. Plans without
+        ``stream`` yield just the result.
+        """
+        game_type = self._types.get(lesson["game_type"])
+        plan = self.plan_for(lesson) if game_type is not None else None
+        if getattr(plan, "stream", None) is None:
+            yield "result", await self.judge(lesson, request)
+            return
+
+        started = time.perf_counter()
+        events = plan.stream(game_type.submission(request))
+        try:
+            async for kind, payload in events:
+                if kind == "result":
+                    self._latency[game_type.id].record(time.perf_counter() - started)
+                yield kind, payload
+        finally:
+            await events.aclose()
+
+    def describe(self) -> List[dict]:
+        """Game types and their config schemas, for the admin UI"""
+        return [
+            {
+                "id": game_type.id,
+                "name": game_type.name,
+                "description": game_type.description,
+                "config_schema": game_type.config_schema,
+            }
+            for game_type in self._types.values()
+        ]
+
+    def stats(self) -> dict:
+        return {type_id: stats.snapshot() for type_id, stats in self._latency.items()}
+
+
+judge_registry = JudgeRegistry()
+
+# Extra exact_match / llm options for match_type "similarity" (partial credit by closeness)
+SIMILARITY_SCHEMA = {
+    "similarity_metric": {"type": "select", "options": ["edit", "tokens"], "default": "edit", "label": "Similarity (edit distance or shared words)"},
+    "pass_score": {"type": "number", "default": settings.JUDGE_SIMILARITY_PASS_SCORE, "label": "Similarity Needed to Pass (%)"},
+    "min_score": {"type": "number", "default": settings.JUDGE_SIMILARITY_MIN_SCORE, "label": "Minimum Similarity for Partial Credit (%)"},
+}
+
+judge_registry.register(GameType(
+    id="exact_match",
+    name="Exact Match",
+    description="User types the exact expected output",
+    config_schema={
+        "expected": {"type": "string", "required": True, "label": "Expected Answer"},
+        "case_sensitive": {"type": "boolean", "default": True, "label": "Case Sensitive"},
+        "match_type": {"type": "select", "options": ["exact", "contains", "regex", "similarity"], "default": "exact", "label": "Match Type"},
+        **SIMILARITY_SCHEMA,
+        "max_input_length": {"type": "number", "default": settings.JUDGE_MAX_INPUT_LENGTH, "label": "Max Answer Length"},
+    },
+    compile=compile_exact_match,
+    submission=lambda request: request.user_prompt,
+    echo_input=True,
+))
+
+judge_registry.register(GameType(
+    id="fill_blank",
+    name="Fill in the Blank",
+    description="User fills in missing words in a template",
+    config_schema={
+        "template": {"type": "string", "required": True, "label": "Template (use {{blank}} for blanks)"},
+        "answers": {"type": "string_array", "required": True, "label": "Answers (in order)"},
+        "case_sensitive": {"type": "boolean", "default": False, "label": "Case Sensitive"},
+    },
+    compile=compile_fill_blank,
+    submission=lambda request: request.answers or [],
+))
+
+judge_registry.register(GameType(
+    id="multiple_choice",
+    name="Multiple Choice",
+    description="User selects the correct option(s)",
+    config_schema={
+        "question": {"type": "string", "required": True, "label": "Question"},
+        "options": {"type": "string_array", "required": True, "label": "Options"},
+        "correct": {"type": "number_array", "required": True, "label": "Correct Option Indices (0-based)"},
+        "multi": {"type": "boolean", "default": False, "label": "Allow Multiple Selections"},
+    },
+    compile=compile_multiple_choice,
+    submission=lambda request: request.selected or [],
+))
+
+judge_registry.register(GameType(
+    id="reorder",
+    name="Reorder / Drag & Drop",
+    description="User arranges items in the correct order by dragging",
+    config_schema={
+        "items": {"type": "string_array", "required": True, "label": "Items (in correct order)"},
+        "correct_order": {"type": "number_array", "required": True, "label": "Correct Order Indices"},
+    },
+    compile=compile_reorder,
+    submission=lambda request: request.user_order or [],
+))
+
+judge_registry.register(GameType(
+    id="llm",
+    name="LLM Output",
+    description="User's prompt is run through an AI model and the output is checked",
+    config_schema={
+        "system_prompt": {"type": "string", "required": False, "label": "System Prompt"},
+        "expected": {"type": "string", "required": True, "label": "Expected in Output"},
+        "match_type": {"type": "select", "options": ["exact", "contains", "regex", "similarity"], "default": "contains", "label": "Match Type"},
+        **SIMILARITY_SCHEMA,
+        "case_sensitive": {"type": "boolean", "default": False, "label": "Case Sensitive"},
+        "provider": {"type": "select", "options": ["openai", "gemini", "claude", "grok", "any"], "default": "openai", "label": "Default Provider (any = fastest available)"},
+        "model": {"type": "string", "required": False, "label": "Model (blank = provider default)"},
+        "max_input_length": {"type": "number", "default": settings.JUDGE_MAX_INPUT_LENGTH, "label": "Max Prompt Length"},
+    },
+    compile=compile_llm,
+    submission=lambda request: (request.user_prompt, request.ai_provider),
+))
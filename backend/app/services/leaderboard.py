@@ -0,0 +1,344 @@
+"""
+Leaderboard Service - in-memory global and per-lesson rankings, fed by judge results
+"""
+import asyncio
+import time
+from array import array
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.repositories.progress import ProgressRepository
+from app.services.single_flight import SingleFlight
+from app.services.sorted_index import SortedIntList
+
+# A board orders users by one int key, smallest first:
+#   (COMPLETED_MAX - completed, SCORE_MAX - score, completed_at or TIME_NONE, seq)
+# packed into fixed-width bit fields, so more completions win, then a higher
+# score, then whoever got there first; ``seq`` makes every key unique.
+_SEQ_BITS = 32
+_TIME_BITS = 34  # seconds since the epoch, good until 2514
+_SCORE_BITS = 32
+_COMPLETED_BITS = 16
+_SEQ_MAX = (1 << _SEQ_BITS) - 1
+_TIME_NONE = (1 << _TIME_BITS) - 1  # never completed: sorts after any completion time
+_SCORE_MAX = (1 << _SCORE_BITS) - 1
+_COMPLETED_MAX = (1 << _COMPLETED_BITS) - 1
+_TIME_SHIFT = _SEQ_BITS
+_SCORE_SHIFT = _TIME_SHIFT + _TIME_BITS
+_COMPLETED_SHIFT = _SCORE_SHIFT + _SCORE_BITS
+
+
+class Standing(NamedTuple):
+    completed: int
+    score: int
+    completed_at: Optional[int]  # epoch seconds
+    seq: int
+
+
+def _encode(completed: int, score: int, completed_at: Optional[int], seq: int) -> int:
+    completed = min(max(completed, 0), _COMPLETED_MAX)
+    score = min(max(score, 0), _SCORE_MAX)
+    at = _TIME_NONE if completed_at is None else min(max(completed_at, 0), _TIME_NONE - 1)
+    return (
+        (_COMPLETED_MAX - completed) << _COMPLETED_SHIFT
+        | (_SCORE_MAX - score) << _SCORE_SHIFT
+        | at << _TIME_SHIFT
+        | seq
+    )
+
+
+def _decode(key: int) -> Standing:
+    at = (key >> _TIME_SHIFT) & _TIME_NONE
+    return Standing(
+        completed=_COMPLETED_MAX - (key >> _COMPLETED_SHIFT),
+        score=_SCORE_MAX - ((key >> _SCORE_SHIFT) & _SCORE_MAX),
+        completed_at=None if at == _TIME_NONE else at,
+        seq=key & _SEQ_MAX,
+    )
+
+
+def _epoch(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+class Board:
+    """One ranking: user seq -> key, plus the keys in rank order"""
+
+    def __init__(self, keys: Optional[Dict[int, int]] = None):
+        self._keys: Dict[int, int] = keys or {}
+        self._order = SortedIntList(self._keys.values())
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, seq: int) -> Optional[Standing]:
+        key = self._keys.get(seq)
+        return _decode(key) if key is not None else None
+
+    def set(self, seq: int, completed: int, score: int, completed_at: Optional[int]) -> None:
+        key = _encode(completed, score, completed_at, seq)
+        old = self._keys.get(seq)
+        if old == key:
+            return
+        if old is not None:
+            self._order.remove(old)
+        self._keys[seq] = key
+        self._order.add(key)
+
+    def rank(self, seq: int) -> Optional[int]:
+        """0-based position of ``seq``, or None if it is not on this board"""
+        key = self._keys.get(seq)
+        return self._order.index(key) if key is not None else None
+
+    def slice(self, start: int, stop: int) -> List[Tuple[int, Standing]]:
+        start = max(start, 0)
+        return [(start + i, _decode(key)) for i, key in enumerate(self._order.islice(start, stop))]
+
+
+def _build_boards(completed: array, scores: array, reached: array, lessons: Dict[int, Dict[int, int]]) -> tuple:
+    global_keys = {
+        seq: _encode(completed[seq], scores[seq], reached[seq] if reached[seq] >= 0 else None, seq)
+        for seq in range(len(completed))
+    }
+    return Board(global_keys), {lesson_id: Board(keys) for lesson_id, keys in lessons.items()}
+
+
+class Leaderboard:
+    """
+    Global and per-lesson rankings kept entirely in memory.
+
+    The global board ranks users by completed lessons, then summed best
+    scores, then the earliest time they reached that many completions.
+    Each lesson board ranks one lesson by completion, best score and first
+    completion time, and doubles as the per-(user, lesson) state that turns
+    a judge result into a delta for the global board, so ``record`` is
+    O(log n) and idempotent in the same way ``record_progress`` is: the best
+    score is kept and the first success sets ``completed_at``.
+
+    ``rebuild`` reads ``user_progress`` once in id order, builds fresh
+    boards off to the side and swaps them in, then replays results recorded
+    since shortly before it started (rows the progress write-behind had not
+    yet flushed). It runs at startup and every ``rebuild_interval`` seconds
+    to pick up results judged by other workers.
+    """
+
+    def __init__(self, rebuild_interval: float, page_size: int, replay_window: float):
+        self.rebuild_interval = rebuild_interval
+        self.page_size = page_size
+        self.replay_window = replay_window
+
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._global = Board()
+        self._lessons: Dict[int, Board] = {}
+        self._recent: deque = deque(maxlen=settings.PROGRESS_QUEUE_SIZE)
+        self._loaded = False
+        self._flight = SingleFlight("leaderboard")
+        self._task: Optional[asyncio.Task] = None
+
+        self.recorded = 0
+        self.rebuilds = 0
+        self.rebuild_failures = 0
+        self.last_rebuild_ms = 0.0
+        self.last_rebuild_rows = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    # --- Updates ---
+    def _seq(self, user_id: str) -> int:
+        seq = self._ids.get(user_id)
+        if seq is None:
+            seq = self._ids[user_id] = len(self._names)
+            self._names.append(user_id)
+        return seq
+
+    def record(self, user_id: str, lesson_id: int, success: bool, score: int, judged_at: Optional[float] = None) -> None:
+        """Apply one judge result to the lesson and global boards"""
+        judged_at = time.time() if judged_at is None else judged_at
+        self._recent.append((user_id, lesson_id, success, score, judged_at))
+        self.recorded += 1
+        self._apply(user_id, lesson_id, success, score, int(judged_at))
+
+    def _apply(self, user_id: str, lesson_id: int, success: bool, score: int, judged_at: int) -> None:
+        seq = self._seq(user_id)
+        board = self._lessons.get(lesson_id)
+        if board is None:
+            board = self._lessons[lesson_id] = Board()
+
+        current = board.get(seq)
+        old = current or Standing(0, 0, None, seq)
+        completed = 1 if success or old.completed else 0
+        best = max(old.score, score)
+        completed_at = old.completed_at if old.completed else (judged_at if success else None)
+        if current is not None and (completed, best, completed_at) == current[:3]:
+            return
+        board.set(seq, completed, best, completed_at)
+
+        total = self._global.get(seq) or Standing(0, 0, None, seq)
+        reached = total.completed_at
+        if completed and not old.completed:
+            reached = max(reached or 0, judged_at)
+        self._global.set(seq, total.completed + completed - old.completed, total.score + best - old.score, reached)
+
+    # --- Queries ---
+    def _board(self, lesson_id: Optional[int]) -> Optional[Board]:
+        return self._global if lesson_id is None else self._lessons.get(lesson_id)
+
+    def _entry(self, position: int, standing: Standing) -> dict:
+        return {
+            "rank": position + 1,
+            "user_id": self._names[standing.seq],
+            "completed": standing.completed,
+            "score": standing.score,
+            "completed_at": (
+                datetime.fromtimestamp(standing.completed_at, timezone.utc).isoformat()
+                if standing.completed_at is not None else None
+            ),
+        }
+
+    def size(self, lesson_id: Optional[int] = None) -> int:
+        board = self._board(lesson_id)
+        return len(board) if board is not None else 0
+
+    def top(self, limit: int, lesson_id: Optional[int] = None) -> List[dict]:
+        board = self._board(lesson_id)
+        if board is None:
+            return []
+        return [self._entry(position, standing) for position, standing in board.slice(0, limit)]
+
+    def rank(self, user_id: str, lesson_id: Optional[int] = None) -> Optional[dict]:
+        """The user's entry, or None if they have no result on that board"""
+        board, seq = self._board(lesson_id), self._ids.get(user_id)
+        if board is None or seq is None:
+            return None
+        position = board.rank(seq)
+        return self._entry(position, board.get(seq)) if position is not None else None
+
+    def around(self, user_id: str, count: int, lesson_id: Optional[int] = None) -> List[dict]:
+        """Up to ``count`` entries either side of the user, the user included"""
+        board, seq = self._board(lesson_id), self._ids.get(user_id)
+        position = board.rank(seq) if board is not None and seq is not None else None
+        if position is None:
+            return []
+        return [self._entry(p, standing) for p, standing in board.slice(position - count, position + count + 1)]
+
+    # --- Loading ---
+    async def rebuild(self, progress: Optional[ProgressRepository] = None) -> None:
+        """Replace every board with a fresh build from ``user_progress`` (concurrent calls share one pass)"""
+        progress = progress or ProgressRepository()
+        await self._flight.do("rebuild", lambda: self._rebuild(progress))
+
+    async def _rebuild(self, progress: ProgressRepository) -> None:
+        started = time.time()
+        clock = time.perf_counter()
+        ids: Dict[str, int] = {}
+        names: List[str] = []
+        lessons: Dict[int, Dict[int, int]] = {}
+        # Global totals by seq; arrays keep this at a few bytes per user
+        completed, scores, reached = array("l"), array("q"), array("q")
+        rows_read = 0
+
+        try:
+            after = 0
+            while True:
+                rows = await progress.list_after(after, self.page_size)
+                for row in rows:
+                    user_id = str(row["user_id"])
+                    seq = ids.get(user_id)
+                    if seq is None:
+                        seq = ids[user_id] = len(names)
+                        names.append(user_id)
+                        completed.append(0)
+                        scores.append(0)
+                        reached.append(-1)
+
+                    done = bool(row.get("completed"))
+                    score = row.get("score") or 0
+                    at = _epoch(row.get("completed_at")) if done else None
+                    lessons.setdefault(row["lesson_id"], {})[seq] = _encode(int(done), score, at, seq)
+                    completed[seq] += done
+                    scores[seq] += score
+                    if at is not None and at > reached[seq]:
+                        reached[seq] = at
+                # PostgREST may return fewer rows than asked for (max_rows); only an empty page ends the table
+                if not rows:
+                    break
+                rows_read += len(rows)
+                after = rows[-1]["id"]
+        except Exception:
+            self.rebuild_failures += 1
+            raise
+
+        # Sorting a million keys takes a while; keep the event loop serving meanwhile
+        self._global, self._lessons = await asyncio.to_thread(
+            _build_boards, completed, scores, reached, lessons
+        )
+        self._ids, self._names = ids, names
+        self._loaded = True
+
+        # Results judged since just before the read began may not have reached the table yet
+        since = started - self.replay_window
+        for user_id, lesson_id, success, score, judged_at in list(self._recent):
+            if judged_at >= since:
+                self._apply(user_id, lesson_id, success, score, int(judged_at))
+
+        self.rebuilds += 1
+        self.last_rebuild_rows = rows_read
+        self.last_rebuild_ms = round((time.perf_counter() - clock) * 1000, 3)
+
+    async def start(self) -> None:
+        """Initial build in the background (it reads the whole table) plus the periodic rebuild"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._rebuild_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _rebuild_loop(self) -> None:
+        while True:
+            try:
+                await self.rebuild()
+            except Exception:
+                # Supabase may not be reachable yet; retry soon until the first build lands
+                if not self._loaded:
+                    await asyncio.sleep(min(self.rebuild_interval or 5.0, 5.0))
+                    continue
+            if self.rebuild_interval <= 0:
+                return
+            await asyncio.sleep(self.rebuild_interval)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "users": len(self._global),
+            "lessons": len(self._lessons),
+            "entries": sum(len(board) for board in self._lessons.values()),
+            "recorded": self.recorded,
+            "rebuilds": self.rebuilds,
+            "rebuild_failures": self.rebuild_failures,
+            "last_rebuild_rows": self.last_rebuild_rows,
+            "last_rebuild_ms": self.last_rebuild_ms,
+        }
+
+
+leaderboard = Leaderboard(
+    rebuild_interval=settings.LEADERBOARD_REBUILD_INTERVAL,
+    page_size=min(settings.LEADERBOARD_REBUILD_PAGE_SIZE, settings.SUPABASE_MAX_ROWS),
+    replay_window=settings.LEADERBOARD_REPLAY_WINDOW,
+)
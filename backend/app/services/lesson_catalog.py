@@ -0,0 +1,499 @@
+"""
+Lesson Catalog Service - in-memory index of lessons, kept in sync with admin writes
+"""
+import asyncio
+import os
+import time
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from app.core.config import settings
+from app.core.metrics import lesson_fetch
+from app.repositories.base import fan_out
+from app.repositories.lessons import LessonRepository
+from app.services.lesson_snapshot import LessonSnapshot, write_snapshot
+from app.services.single_flight import SingleFlight
+
+
+def _detached(lessons: Optional[LessonRepository]) -> LessonRepository:
+    """
+    Repository for a coalesced fetch: same pool and timeout, but not tied to
+    one request, so that request disconnecting can't fail the others.
+    """
+    if lessons is None:
+        return LessonRepository()
+    return LessonRepository(timeout=lessons.timeout, pool=lessons.pool)
+
+
+# Ids remembered as absent per catalog version; past this the set is emptied and refilled
+MAX_ABSENT_IDS = 10_000
+
+
+def _sort_key(lesson: dict) -> tuple:
+    return (lesson.get("order_index", 0), lesson["id"])
+
+
+def _before(updated_at: str, seconds: float) -> str:
+    """The ISO timestamp ``seconds`` before ``updated_at`` (unchanged if it can't be parsed)"""
+    if seconds <= 0:
+        return updated_at
+    try:
+        return (datetime.fromisoformat(updated_at) - timedelta(seconds=seconds)).isoformat()
+    except ValueError:
+        return updated_at
+
+
+class LessonCatalog:
+    """
+    Holds every lesson in memory: an id -> lesson index plus the published
+    lessons pre-sorted by order_index.
+
+    ``version`` increases on every change so callers can key derived data
+    (compiled validators, HTTP caches) on it. Ids the database did not
+    have are remembered until the next version, so repeated lookups of a
+    missing lesson do not each cost a query.
+    """
+
+    def __init__(self, poll_interval: float, poll_overlap: float = 0.0, full_reload_interval: float = 0.0):
+        self.poll_interval = poll_interval
+        self.poll_overlap = poll_overlap
+        self.full_reload_interval = full_reload_interval
+        self.full_reloads = 0
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.absent_hits = 0
+        self._by_id: Dict[int, dict] = {}
+        self._absent: Set[int] = set()
+        self._absent_version = 0
+        self._published: List[dict] = []
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._latest_update: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flight = SingleFlight("lessons")
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    # --- Loading ---
+    async def load(self, lessons: Optional[LessonRepository] = None) -> None:
+        """Replace the catalog with a fresh copy of the lessons table"""
+        rows = await (lessons or LessonRepository()).list_all()
+        by_id = {row["id"]: row for row in rows}
+        # A reload that finds nothing new keeps the version, and with it every cache keyed on it
+        if not self._loaded or by_id != self._by_id:
+            self._by_id = by_id
+            self._rebuild()
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+
+    async def start(self) -> None:
+        """Initial load plus the background poll for out-of-process changes"""
+        try:
+            await self.load()
+        except Exception:
+            # Supabase may not be reachable yet; the first request loads lazily
+            pass
+        if self.poll_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+            except Exception:
+                continue
+
+    async def poll(self) -> None:
+        """
+        Pick up rows changed since ``poll_overlap`` seconds before the newest
+        known updated_at, and deletions. Every ``full_reload_interval``
+        seconds the whole table is reloaded instead, for changes the
+        incremental read cannot see.
+        """
+        if not self._loaded or self._latest_update is None:
+            await self.load()
+            return
+        if self.full_reload_interval > 0 and time.monotonic() - self._loaded_at >= self.full_reload_interval:
+            await self.load()
+            self.full_reloads += 1
+            return
+
+        lessons = LessonRepository()
+        changed, ids = await fan_out(
+            lessons.list_updated_since(_before(self._latest_update, self.poll_overlap)),
+            lessons.list_ids(),
+        )
+        for row in changed:
+            self.upsert(row)
+        for lesson_id in set(self._by_id) - set(ids):
+            self.remove(lesson_id)
+
+    async def _ensure_loaded(self, lessons: Optional[LessonRepository]) -> None:
+        if not self._loaded:
+            await self._flight.do("load", lambda: self.load(_detached(lessons)))
+
+    # --- Incremental updates ---
+    def upsert(self, lesson: dict) -> None:
+        """Insert or replace one lesson (no-op if nothing changed)"""
+        if self._by_id.get(lesson["id"]) == lesson:
+            return
+        self._by_id[lesson["id"]] = lesson
+        self._rebuild()
+
+    def upsert_many(self, lessons: Iterable[dict]) -> None:
+        """``upsert`` for a batch (a bulk import), re-sorting once at the end"""
+        changed = False
+        for lesson in lessons:
+            if self._by_id.get(lesson["id"]) != lesson:
+                self._by_id[lesson["id"]] = lesson
+                changed = True
+        if changed:
+            self._rebuild()
+
+    def remove(self, lesson_id: int) -> None:
+        if self._by_id.pop(lesson_id, None) is not None:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._published = sorted(
+            (lesson for lesson in self._by_id.values() if lesson.get("is_published")),
+            key=_sort_key,
+        )
+        updates = [lesson["updated_at"] for lesson in self._by_id.values() if lesson.get("updated_at")]
+        self._latest_update = max(updates) if updates else None
+        self.version += 1
+
+    def publish(self, path: str, notify_port: int = 0) -> None:
+        """Write the catalog as a snapshot file for ``SnapshotCatalog`` readers"""
+        write_snapshot(path, self.version, self._by_id.values(), self._published, notify_port)
+
+    # --- Reads ---
+    def _known_absent(self, lesson_id: int) -> bool:
+        if self._absent_version != self.version:
+            self._absent.clear()
+            self._absent_version = self.version
+        return lesson_id in self._absent
+
+    def _mark_absent(self, lesson_ids: Iterable[int], version: int) -> None:
+        """Remember ids the database did not have, unless the catalog changed during the query"""
+        if version != self.version or self._absent_version != version:
+            return
+        if len(self._absent) >= MAX_ABSENT_IDS:
+            self._absent.clear()
+        self._absent.update(lesson_ids)
+
+    async def list_published(self, lessons: Optional[LessonRepository] = None) -> List[dict]:
+        await self._ensure_loaded(lessons)
+        self.hits += 1
+        return self._published
+
+    async def get(
+        self,
+        lesson_id: int,
+        lessons: Optional[LessonRepository] = None,
+        published_only: bool = False,
+    ) -> Optional[dict]:
+        """
+        Look up a lesson by id. Unknown ids fall back to the database once
+        per catalog version, so rows created by another process are picked
+        up before the next poll.
+        """
+        started = time.perf_counter()
+        await self._ensure_loaded(lessons)
+
+        lesson = self._by_id.get(lesson_id)
+        if lesson is not None:
+            self.hits += 1
+            lesson_fetch.labels("catalog").observe(time.perf_counter() - started)
+        elif self._known_absent(lesson_id):
+            self.absent_hits += 1
+            lesson_fetch.labels("catalog").observe(time.perf_counter() - started)
+        else:
+            self.misses += 1
+            version = self.version
+            lesson = await self._flight.do(
+                ("get", lesson_id), lambda: _detached(lessons).get(lesson_id)
+            )
+            if lesson is not None:
+                self.upsert(lesson)
+            else:
+                self._mark_absent((lesson_id,), version)
+            lesson_fetch.labels("database").observe(time.perf_counter() - started)
+
+        if lesson is not None and published_only and not lesson.get("is_published"):
+            return None
+        return lesson
+
+    async def get_many(
+        self,
+        lesson_ids: Iterable[int],
+        lessons: Optional[LessonRepository] = None,
+    ) -> Dict[int, dict]:
+        """Look up several lessons; ids missing from the catalog are fetched in one query"""
+        started = time.perf_counter()
+        await self._ensure_loaded(lessons)
+
+        found: Dict[int, dict] = {}
+        missing = []
+        for lesson_id in set(lesson_ids):
+            lesson = self._by_id.get(lesson_id)
+            if lesson is not None:
+                self.hits += 1
+                found[lesson_id] = lesson
+            elif self._known_absent(lesson_id):
+                self.absent_hits += 1
+            else:
+                self.misses += 1
+                missing.append(lesson_id)
+
+        if missing:
+            missing.sort()
+            version = self.version
+            rows = await self._flight.do(
+                ("get_many", tuple(missing)), lambda: _detached(lessons).get_many(missing)
+            )
+            self._mark_absent(set(missing) - {lesson["id"] for lesson in rows}, version)
+            self.upsert_many(rows)
+            for lesson in rows:
+                found[lesson["id"]] = lesson
+        lesson_fetch.labels("database" if missing else "catalog").observe(time.perf_counter() - started)
+        return found
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "loaded": self._loaded,
+            "lessons": len(self._by_id),
+            "published": len(self._published),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "absent_hits": self.absent_hits,
+            "absent_ids": len(self._absent),
+            "coalesced": self._flight.coalesced,
+            "full_reloads": self.full_reloads,
+        }
+
+
+class _Overlaid(Mapping):
+    """A snapshot with local changes on top (``None`` = deleted here)"""
+
+    def __init__(self, snapshot: LessonSnapshot, overlay: Dict[int, Optional[dict]]):
+        self._snapshot = snapshot
+        self._overlay = overlay
+
+    def __getitem__(self, lesson_id: int) -> dict:
+        if lesson_id in self._overlay:
+            lesson = self._overlay[lesson_id]
+        else:
+            lesson = self._snapshot.get(lesson_id)
+        if lesson is None:
+            raise KeyError(lesson_id)
+        return lesson
+
+    def __iter__(self) -> Iterator[int]:
+        for lesson_id in self._snapshot:
+            if self._overlay.get(lesson_id, True) is not None:
+                yield lesson_id
+        for lesson_id, lesson in self._overlay.items():
+            if lesson is not None and self._snapshot.get(lesson_id) is None:
+                yield lesson_id
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class SnapshotCatalog(LessonCatalog):
+    """
+    The catalog in a ``serve.py`` worker: lessons are read from the
+    snapshot file the supervisor publishes (see ``SnapshotPublisher``),
+    mapped read-only and shared by every worker, instead of each worker
+    loading and polling the lessons table itself.
+
+    A replaced file is noticed within ``check_interval`` and swapped in
+    between two requests. Changes made in this worker (admin writes, rows
+    found on a miss) go into an overlay, so they are visible here at once,
+    and the supervisor is asked to republish; an overlay entry is
+    dropped once a snapshot reflects it. Until the first snapshot exists
+    this falls back to loading from the database like ``LessonCatalog``.
+    """
+
+    def __init__(self, path: str, check_interval: float):
+        super().__init__(poll_interval=0)
+        self.path = path
+        self.check_interval = check_interval
+        self.swaps = 0
+        self._snapshot: Optional[LessonSnapshot] = None
+        self._overlay: Dict[int, Optional[dict]] = {}
+
+    async def start(self) -> None:
+        try:
+            self.check()
+        except (OSError, ValueError):
+            pass
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch_loop())
+
+    async def _watch_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                self.check()
+            except (OSError, ValueError):
+                continue
+
+    def check(self) -> bool:
+        """Map the snapshot file if it was replaced since the last check"""
+        stat = os.stat(self.path)
+        if self._snapshot is not None and self._snapshot.identity == (stat.st_ino, stat.st_mtime_ns):
+            return False
+
+        snapshot = LessonSnapshot(self.path)
+        for lesson_id, lesson in list(self._overlay.items()):
+            current = snapshot.get(lesson_id)
+            if lesson is None:
+                reflected = current is None
+            else:
+                reflected = current is not None and (current.get("updated_at") or "") >= (lesson.get("updated_at") or "")
+            if reflected:
+                del self._overlay[lesson_id]
+        self._snapshot = snapshot
+        self.swaps += 1
+        self._refresh()
+        return True
+
+    def _refresh(self) -> None:
+        view = _Overlaid(self._snapshot, self._overlay)
+        if self._overlay:
+            published = sorted((lesson for lesson in view.values() if lesson.get("is_published")), key=_sort_key)
+        else:
+            published = self._snapshot.published()
+        self._by_id, self._published = view, published
+        self._loaded = True
+        self.version += 1
+
+    def upsert(self, lesson: dict) -> None:
+        if self._snapshot is None:
+            super().upsert(lesson)
+            return
+        if self._by_id.get(lesson["id"]) == lesson:
+            return
+        self._overlay[lesson["id"]] = lesson
+        self._refresh()
+        self._snapshot.notify_publisher()
+
+    def upsert_many(self, lessons: Iterable[dict]) -> None:
+        if self._snapshot is None:
+            super().upsert_many(lessons)
+            return
+        changed = False
+        for lesson in lessons:
+            if self._by_id.get(lesson["id"]) != lesson:
+                self._overlay[lesson["id"]] = lesson
+                changed = True
+        if changed:
+            self._refresh()
+            self._snapshot.notify_publisher()
+
+    def remove(self, lesson_id: int) -> None:
+        if self._snapshot is None:
+            super().remove(lesson_id)
+            return
+        if self._by_id.get(lesson_id) is None:
+            return
+        self._overlay[lesson_id] = None
+        self._refresh()
+        self._snapshot.notify_publisher()
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "snapshot": self._snapshot.stats() if self._snapshot is not None else None,
+            "overlay": len(self._overlay),
+            "swaps": self.swaps,
+        }
+
+
+class _WakeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, wake: asyncio.Event):
+        self.wake = wake
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.wake.set()
+
+
+class SnapshotPublisher:
+    """
+    Supervisor side of ``SnapshotCatalog``: keeps one ``LessonCatalog`` in
+    sync with the database and rewrites the snapshot file whenever its
+    version changes. It polls every ``poll_interval`` seconds (0 = only
+    when asked) and at once when a worker asks, with a datagram to the
+    local UDP port recorded in the snapshot.
+    """
+
+    def __init__(self, catalog: LessonCatalog, path: str, poll_interval: float):
+        self.catalog = catalog
+        self.path = path
+        self.poll_interval = poll_interval
+        self.notify_port = 0
+        self.published_version: Optional[int] = None
+        self.publishes = 0
+
+    async def run(self, on_publish: Optional[Callable[[], None]] = None) -> None:
+        wake = asyncio.Event()
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _WakeProtocol(wake), local_addr=("127.0.0.1", 0)
+        )
+        self.notify_port = transport.get_extra_info("sockname")[1]
+        try:
+            while True:
+                try:
+                    await self.catalog.poll()
+                except Exception:
+                    pass
+                if self.catalog.loaded and self.catalog.version != self.published_version:
+                    self.catalog.publish(self.path, self.notify_port)
+                    self.published_version = self.catalog.version
+                    self.publishes += 1
+                    if on_publish is not None:
+                        on_publish()
+
+                # Retry an unreachable database sooner than the regular poll
+                timeout = self.poll_interval or None
+                if not self.catalog.loaded:
+                    timeout = min(timeout or 1.0, 1.0)
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+        finally:
+            transport.close()
+
+
+def _create_catalog() -> LessonCatalog:
+    if settings.LESSON_SNAPSHOT_PATH:
+        return SnapshotCatalog(settings.LESSON_SNAPSHOT_PATH, settings.LESSON_SNAPSHOT_CHECK_INTERVAL)
+    return LessonCatalog(
+        poll_interval=settings.LESSON_CATALOG_POLL_INTERVAL,
+        poll_overlap=settings.LESSON_CATALOG_POLL_OVERLAP,
+        full_reload_interval=settings.LESSON_CATALOG_FULL_RELOAD_INTERVAL,
+    )
+
+
+lesson_catalog = _create_catalog()
@@ -0,0 +1,283 @@
+"""
+Lesson Import Service - streamed lesson bundles, validated and diffed, written in one transaction
+"""
+import codecs
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional
+
+from pydantic import ValidationError
+
+from app.models.schemas import LessonImport
+from app.repositories.lessons import LessonRepository
+from app.services.admin_listing import iter_lessons
+from app.services.judge_registry import judge_registry
+from app.services.validators import ConfigError
+
+# Columns compared by the content hash; id and timestamps are not content
+CONTENT_FIELDS = (
+    "title", "description", "goal", "game_type", "difficulty",
+    "order_index", "config", "time_limit", "is_published",
+)
+# One bundle item may not be longer than this many characters
+MAX_ITEM_SIZE = 1024 * 1024
+# Invalid items listed in an error report; the rest are only counted
+MAX_REPORTED_ERRORS = 50
+
+
+class BundleError(ValueError):
+    """Raised for a bundle that is not NDJSON or a JSON array of lesson objects"""
+
+
+class TooManyLessons(ValueError):
+    """Raised when a bundle holds more lessons than one import may write"""
+
+
+class _BundleReader:
+    """
+    Incremental parser for both bundle formats. The first non-blank
+    character picks the format: ``[`` is a JSON array, anything else is
+    one object per line (NDJSON, as the export writes it).
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.array: Optional[bool] = None
+        self.closed = False
+        self.need_comma = False
+        self.items = 0
+
+    def feed(self, text: str, final: bool = False) -> List[dict]:
+        self.buffer += text
+        if self.array is None:
+            stripped = self.buffer.lstrip()
+            if not stripped:
+                return []
+            self.array = stripped[0] == "["
+            self.buffer = stripped[1:] if self.array else stripped
+        items = self._array(final) if self.array else self._lines(final)
+        if not final and len(self.buffer) > MAX_ITEM_SIZE:
+            raise BundleError(f"Item {self.items + 1} is larger than {MAX_ITEM_SIZE} characters")
+        return items
+
+    def _item(self, value) -> dict:
+        self.items += 1
+        if not isinstance(value, dict):
+            raise BundleError(f"Item {self.items} is not a JSON object")
+        return value
+
+    def _lines(self, final: bool) -> List[dict]:
+        lines = self.buffer.split("\n")
+        self.buffer = "" if final else lines.pop()
+        items = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError as e:
+                raise BundleError(f"Item {self.items + 1}: {e}")
+            items.append(self._item(value))
+        return items
+
+    def _array(self, final: bool) -> List[dict]:
+        decoder = json.JSONDecoder()
+        items = []
+        buffer = self.buffer
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position == len(buffer):
+                break
+            if self.closed:
+                raise BundleError("Unexpected data after the closing ']'")
+            char = buffer[position]
+            if char == "]":
+                self.closed = True
+                position += 1
+            elif self.need_comma:
+                if char != ",":
+                    raise BundleError(f"Expected ',' or ']' after item {self.items}")
+                self.need_comma = False
+                position += 1
+            else:
+                try:
+                    value, position = decoder.raw_decode(buffer, position)
+                except ValueError as e:
+                    if final:
+                        raise BundleError(f"Item {self.items + 1}: {e}")
+                    # Most likely cut off mid-item; wait for the next chunk
+                    break
+                items.append(self._item(value))
+                self.need_comma = True
+        self.buffer = buffer[position:]
+        if final and not self.closed:
+            raise BundleError("JSON array is not closed")
+        return items
+
+
+async def iter_bundle(chunks: AsyncIterable[bytes]) -> AsyncIterator[dict]:
+    """Lesson objects from a UTF-8 NDJSON or JSON array bundle, decoded as the chunks arrive"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    reader = _BundleReader()
+    try:
+        async for chunk in chunks:
+            for item in reader.feed(decoder.decode(chunk)):
+                yield item
+        for item in reader.feed(decoder.decode(b"", final=True), final=True):
+            yield item
+    except UnicodeDecodeError:
+        raise BundleError("Bundle is not valid UTF-8")
+
+
+def content_hash(lesson: dict) -> str:
+    """Hash of a lesson's content columns, equal for rows that would read the same"""
+    content = {name: lesson.get(name) for name in CONTENT_FIELDS}
+    data = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def lesson_from_level(level: dict, order_index: int) -> dict:
+    """A lesson row for one entry of the legacy ``levels/definitions.py`` list, as the seed migration maps it"""
+    validation = level.get("validation") or {}
+    config = {"expected": validation.get("expected", ""), "case_sensitive": validation.get("case_sensitive", True)}
+    if validation.get("type", "exact") != "exact":
+        config["match_type"] = validation["type"]
+    return {
+        "id": level["id"],
+        "title": level["title"],
+        "description": level.get("description"),
+        "goal": level["goal"],
+        "game_type": "exact_match",
+        "difficulty": level.get("difficulty", "beginner"),
+        "order_index": order_index,
+        "config": config,
+        "is_published": True,
+    }
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+        )
+    return f"Invalid lesson config: {error}"
+
+
+@dataclass
+class ImportResult:
+    """What an import did (or, for a dry run or a bundle with errors, would have done)"""
+    dry_run: bool
+    created: List[Optional[int]] = field(default_factory=list)  # None = id assigned on write
+    updated: List[int] = field(default_factory=list)
+    unchanged: List[int] = field(default_factory=list)
+    errors: List[dict] = field(default_factory=list)
+    error_count: int = 0
+    written: List[dict] = field(default_factory=list)  # rows as stored, read back after the write
+
+    def summary(self) -> dict:
+        summary = {
+            "dry_run": self.dry_run,
+            "created": len(self.created),
+            "updated": len(self.updated),
+            "unchanged": len(self.unchanged),
+            "lesson_ids": {
+                "created": [lesson_id for lesson_id in self.created if lesson_id is not None],
+                "updated": self.updated,
+            },
+        }
+        if self.error_count:
+            summary["errors"] = self.errors
+            summary["error_count"] = self.error_count
+        return summary
+
+
+async def import_lessons(
+    items: AsyncIterable[dict],
+    lessons: LessonRepository,
+    max_lessons: int,
+    page_size: int,
+    dry_run: bool = False,
+) -> ImportResult:
+    """
+    Validate every lesson in ``items`` (fields, then by compiling its
+    config like an admin edit does), diff them against the table and
+    write only the new or changed ones with a single ``import_lessons``
+    call, so the import applies entirely or not at all.
+
+    Lessons with an id are matched by id; lessons without one count as
+    unchanged when an existing row has the same content hash, which keeps
+    re-running an id-less bundle from duplicating it. If any lesson is
+    invalid nothing is written and ``errors`` lists them.
+
+    Raises:
+        BundleError: If the bundle itself cannot be parsed.
+        TooManyLessons: If it holds more than ``max_lessons`` lessons.
+    """
+    result = ImportResult(dry_run=dry_run)
+    incoming: List[dict] = []
+    seen_ids = set()
+    position = 0
+    async for raw in items:
+        position += 1
+        if position > max_lessons:
+            raise TooManyLessons(f"A bundle may hold at most {max_lessons} lessons")
+        try:
+            lesson = LessonImport.model_validate(raw)
+            judge_registry.compile(lesson.game_type, lesson.config)
+        except (ValidationError, ConfigError) as e:
+            error = _error_message(e)
+        else:
+            error = "Duplicate id in bundle" if lesson.id is not None and lesson.id in seen_ids else None
+        if error is not None:
+            result.error_count += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append({"item": position, "id": raw.get("id"), "error": error})
+            continue
+        if lesson.id is not None:
+            seen_ids.add(lesson.id)
+        incoming.append(lesson.model_dump())
+    if result.error_count:
+        return result
+
+    existing_by_id: Dict[int, str] = {}
+    existing_by_hash: Dict[str, int] = {}
+    async for row in iter_lessons(lessons, {}, page_size):
+        digest = content_hash(row)
+        existing_by_id[row["id"]] = digest
+        existing_by_hash.setdefault(digest, row["id"])
+
+    changes = []
+    for lesson in incoming:
+        lesson_id = lesson["id"]
+        digest = content_hash(lesson)
+        if lesson_id is None:
+            if digest in existing_by_hash:
+                result.unchanged.append(existing_by_hash[digest])
+                continue
+            result.created.append(None)
+        elif lesson_id not in existing_by_id:
+            result.created.append(lesson_id)
+        elif existing_by_id[lesson_id] != digest:
+            result.updated.append(lesson_id)
+        else:
+            result.unchanged.append(lesson_id)
+            continue
+        changes.append(lesson)
+
+    if dry_run or not changes:
+        return result
+
+    written = await lessons.import_rows(changes)
+    result.created, result.updated = written["created"], written["updated"]
+    # Read back what the database stored (ids, defaults, timestamps) for the lesson catalog
+    result.written = await lessons.get_many(result.created + result.updated)
+    return result
+
+
+async def iter_levels(levels: Iterable[dict]) -> AsyncIterator[dict]:
+    """The legacy level definitions as import items"""
+    for order_index, level in enumerate(levels, 1):
+        yield lesson_from_level(level, order_index)
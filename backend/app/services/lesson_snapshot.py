@@ -0,0 +1,129 @@
+"""
+Lesson snapshot - the lesson catalog as one read-only, memory-mapped file shared by all workers
+"""
+import json
+import mmap
+import os
+import socket
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+MAGIC = b"PRMPTLC1"
+# magic, catalog version, publisher's notify port, lesson count, published count
+_HEADER = struct.Struct("<8sQqII")
+
+
+def _dumps(lesson: dict) -> bytes:
+    return json.dumps(lesson, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_snapshot(
+    path: str,
+    version: int,
+    lessons: Iterable[dict],
+    published: Sequence[dict],
+    notify_port: int = 0,
+) -> None:
+    """
+    Write ``lessons`` to ``path`` and swap it in with ``os.replace``, so
+    readers only ever open a complete file. ``notify_port`` is the local
+    UDP port readers send to when they want a fresh snapshot (0 = none).
+
+    Layout after the header: lesson ids (int64, ascending), count + 1 data
+    offsets (uint64), the published lessons in display order as indexes
+    into the ids (uint32), then one compact JSON document per lesson.
+    """
+    rows = sorted(lessons, key=lambda lesson: lesson["id"])
+    ids = array("q", (row["id"] for row in rows))
+    position = {lesson_id: i for i, lesson_id in enumerate(ids)}
+    order = array("I", (position[lesson["id"]] for lesson in published))
+    blobs = [_dumps(row) for row in rows]
+
+    start = _HEADER.size + len(ids) * 8 + (len(ids) + 1) * 8 + len(order) * 4
+    offsets = array("Q", [start])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, version, notify_port, len(ids), len(order)))
+        f.write(ids.tobytes())
+        f.write(offsets.tobytes())
+        f.write(order.tobytes())
+        for blob in blobs:
+            f.write(blob)
+    os.replace(temp, path)
+
+
+class LessonSnapshot:
+    """
+    A mapped snapshot file. Lookups bisect the id array in place and decode
+    a lesson's JSON on first access, so a worker only holds the lessons it
+    has served; everything else stays in the page cache, shared with the
+    other workers.
+
+    ``identity`` (inode, mtime) tells a reader whether the file at the
+    path has been replaced since this one was opened.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity: Tuple[int, int] = (stat.st_ino, stat.st_mtime_ns)
+
+        magic, self.version, self.notify_port, count, published = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a lesson snapshot")
+        view = memoryview(self._map)
+        start = _HEADER.size
+        self._ids = view[start:start + count * 8].cast("q")
+        start += count * 8
+        self._offsets = view[start:start + (count + 1) * 8].cast("Q")
+        start += (count + 1) * 8
+        self._published = view[start:start + published * 4].cast("I")
+        self._decoded: Dict[int, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def _lesson(self, index: int) -> dict:
+        lesson = self._decoded.get(index)
+        if lesson is None:
+            lesson = self._decoded[index] = json.loads(
+                self._map[self._offsets[index]:self._offsets[index + 1]]
+            )
+        return lesson
+
+    def get(self, lesson_id: int) -> Optional[dict]:
+        index = bisect_left(self._ids, lesson_id)
+        if index == len(self._ids) or self._ids[index] != lesson_id:
+            return None
+        return self._lesson(index)
+
+    def published(self) -> List[dict]:
+        return [self._lesson(index) for index in self._published]
+
+    def notify_publisher(self) -> bool:
+        """Ask the process that wrote this snapshot to poll and republish now"""
+        if not self.notify_port:
+            return False
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(b"1", ("127.0.0.1", self.notify_port))
+        except OSError:
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "lessons": len(self._ids),
+            "decoded": len(self._decoded),
+            "bytes": len(self._map),
+        }
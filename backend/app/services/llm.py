@@ -0,0 +1,413 @@
+"""
+LLM Service - shared provider clients, per-provider concurrency limits and an output cache
+"""
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import llm_provider_duration
+from app.services.single_flight import SingleFlight
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider is not configured or its call fails"""
+
+
+class OutputCache:
+    """LRU cache of model outputs with a fixed TTL"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def peek(self, key: Hashable) -> bool:
+        """Whether ``key`` has a live entry, without touching LRU order or hit counts"""
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def put(self, key: Hashable, output: str) -> None:
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, output)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# --- Providers ---
+class Provider:
+    """Request/response mapping for one provider's HTTP API"""
+
+    def __init__(self, id: str, base_url: str, api_key: str, model: str, concurrency: int):
+        self.id = id
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.concurrency = concurrency
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key and self.base_url)
+
+    def request(self, model: str, system_prompt: str, user_prompt: str, max_tokens: int) -> Tuple[str, dict, dict]:
+        raise NotImplementedError
+
+    def parse(self, data: dict) -> str:
+        raise NotImplementedError
+
+    def stream_request(self, model: str, system_prompt: str, user_prompt: str, max_tokens: int) -> Tuple[str, dict, dict]:
+        url, headers, body = self.request(model, system_prompt, user_prompt, max_tokens)
+        return url, headers, {**body, "stream": True}
+
+    def parse_chunk(self, data: dict) -> str:
+        """Text carried by one server-sent event of a streamed response"""
+        raise NotImplementedError
+
+
+class OpenAICompatibleProvider(Provider):
+    """OpenAI chat completions (also used by xAI)"""
+
+    def request(self, model, system_prompt, user_prompt, max_tokens):
+        messages = [{"role": "user", "content": user_prompt}]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        return (
+            f"{self.base_url}/chat/completions",
+            {"Authorization": f"Bearer {self.api_key}"},
+            {"model": model, "messages": messages, "temperature": 0, "max_tokens": max_tokens},
+        )
+
+    def parse(self, data):
+        return data["choices"][0]["message"]["content"] or ""
+
+    def parse_chunk(self, data):
+        choices = data.get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or ""
+
+
+class AnthropicProvider(Provider):
+    def request(self, model, system_prompt, user_prompt, max_tokens):
+        body = {
+            "model": model,
+            "messages": [{"role": "user", "content": user_prompt}],
+            "temperature": 0,
+            "max_tokens": max_tokens,
+        }
+        if system_prompt:
+            body["system"] = system_prompt
+        return (
+            f"{self.base_url}/messages",
+            {"x-api-key": self.api_key, "anthropic-version": "2023-06-01"},
+            body,
+        )
+
+    def parse(self, data):
+        return "".join(block.get("text", "") for block in data["content"] if block.get("type") == "text")
+
+    def parse_chunk(self, data):
+        if data.get("type") == "error":
+            raise ValueError(data.get("error", {}).get("message", "stream error"))
+        if data.get("type") != "content_block_delta":
+            return ""
+        return data["delta"].get("text", "")
+
+
+class GeminiProvider(Provider):
+    def request(self, model, system_prompt, user_prompt, max_tokens):
+        body = {
+            "contents": [{"role": "user", "parts": [{"text": user_prompt}]}],
+            "generationConfig": {"temperature": 0, "maxOutputTokens": max_tokens},
+        }
+        if system_prompt:
+            body["systemInstruction"] = {"parts": [{"text": system_prompt}]}
+        return (
+            f"{self.base_url}/models/{model}:generateContent",
+            {"x-goog-api-key": self.api_key},
+            body,
+        )
+
+    def parse(self, data):
+        parts = data["candidates"][0]["content"].get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    def stream_request(self, model, system_prompt, user_prompt, max_tokens):
+        url, headers, body = self.request(model, system_prompt, user_prompt, max_tokens)
+        return url.replace(":generateContent", ":streamGenerateContent?alt=sse"), headers, body
+
+    def parse_chunk(self, data):
+        if not data.get("candidates"):
+            return ""
+        return self.parse(data)
+
+
+class _ProviderStats:
+    __slots__ = ("calls", "errors", "in_flight", "total", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "avg_ms": round(self.total / self.calls * 1000, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+_OUTCOMES = {True: "ok", False: "error", None: "cancelled"}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so trivially different prompts share a cache entry"""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+class LLMPool:
+    """
+    Shared keep-alive HTTP session for all providers.
+
+    Each provider gets its own semaphore so a slow provider cannot take every
+    connection, and identical requests (temperature 0) are answered from the
+    output cache.
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, Provider],
+        cache: OutputCache,
+        timeout: float,
+        max_connections: int,
+        max_tokens: int,
+    ):
+        self.providers = providers
+        self.cache = cache
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_tokens = max_tokens
+
+        self._http: Optional[httpx.AsyncClient] = None
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._stats = {provider_id: _ProviderStats() for provider_id in providers}
+        self._flight = SingleFlight("llm")
+        # Called with (provider_id, model, seconds, ok) after every upstream call
+        self.on_result: Optional[Callable[[str, str, float, bool], None]] = None
+
+    def open(self) -> None:
+        """Create the shared HTTP session (idempotent)"""
+        if self._http is not None:
+            return
+        self._http = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        self._slots = {
+            provider_id: asyncio.Semaphore(provider.concurrency)
+            for provider_id, provider in self.providers.items()
+        }
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self._slots = {}
+
+    def get(self, provider_id: str) -> Provider:
+        provider = self.providers.get(provider_id)
+        if provider is None or not provider.configured:
+            raise ProviderUnavailable(f"AI provider '{provider_id}' is not configured.")
+        return provider
+
+    @staticmethod
+    def cache_key(provider_id: str, model: str, system_prompt: str, user_prompt: str) -> tuple:
+        return (provider_id, model, system_prompt, normalize_prompt(user_prompt), 0)
+
+    async def complete(
+        self,
+        provider_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+    ) -> str:
+        """
+        Run ``user_prompt`` against a provider at temperature 0.
+
+        Raises:
+            ProviderUnavailable: If the provider is not configured or the call fails.
+        """
+        provider = self.get(provider_id)
+        model = model or provider.model
+        key = self.cache_key(provider_id, model, system_prompt, user_prompt)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Students often send the same canonical prompt at once; make one call for all of them
+        return await self._flight.do(
+            key, lambda: self._call(provider, model, system_prompt, user_prompt, key)
+        )
+
+    async def _call(self, provider: Provider, model: str, system_prompt: str, user_prompt: str, key: tuple) -> str:
+        provider_id = provider.id
+        self.open()
+        url, headers, body = provider.request(model, system_prompt, user_prompt, self.max_tokens)
+        stats = self._stats[provider_id]
+
+        async with self._slots[provider_id]:
+            stats.in_flight += 1
+            started = time.perf_counter()
+            ok = None  # stays None if cancelled (e.g. a hedge that lost): that says nothing about the provider
+            try:
+                response = await self._http.post(url, headers=headers, json=body)
+                response.raise_for_status()
+                output = provider.parse(response.json())
+                ok = True
+            except (httpx.HTTPError, ValueError, KeyError, IndexError, TypeError) as e:
+                ok = False
+                stats.errors += 1
+                raise ProviderUnavailable(f"AI provider '{provider_id}' request failed: {e}")
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.in_flight -= 1
+                stats.calls += 1
+                stats.total += elapsed
+                stats.max = max(stats.max, elapsed)
+                llm_provider_duration.labels(provider_id, _OUTCOMES[ok]).observe(elapsed)
+                if ok is not None and self.on_result is not None:
+                    self.on_result(provider_id, model, elapsed, ok)
+
+        self.cache.put(key, output)
+        return output
+
+    async def stream(
+        self,
+        provider_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Like ``complete`` but yields the output in pieces as the provider sends them.
+
+        A cached output is yielded whole. Closing the generator early closes
+        the upstream response, so the provider stops generating; only a
+        stream that ran to the end is cached.
+
+        Raises:
+            ProviderUnavailable: If the provider is not configured or the call fails.
+        """
+        provider = self.get(provider_id)
+        model = model or provider.model
+        key = self.cache_key(provider_id, model, system_prompt, user_prompt)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        self.open()
+        url, headers, body = provider.stream_request(model, system_prompt, user_prompt, self.max_tokens)
+        stats = self._stats[provider_id]
+        pieces = []
+
+        async with self._slots[provider_id]:
+            stats.in_flight += 1
+            started = time.perf_counter()
+            ok = None  # streams closed early by the consumer aren't comparable and aren't reported
+            try:
+                async with self._http.stream("POST", url, headers=headers, json=body) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[5:].strip()
+                        if payload == "[DONE]":
+                            break
+                        text = provider.parse_chunk(json.loads(payload))
+                        if text:
+                            pieces.append(text)
+                            yield text
+                ok = True
+            except (httpx.HTTPError, ValueError, KeyError, IndexError, TypeError) as e:
+                ok = False
+                stats.errors += 1
+                raise ProviderUnavailable(f"AI provider '{provider_id}' request failed: {e}")
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.in_flight -= 1
+                stats.calls += 1
+                stats.total += elapsed
+                stats.max = max(stats.max, elapsed)
+                llm_provider_duration.labels(provider_id, _OUTCOMES[ok]).observe(elapsed)
+                if ok is not None and self.on_result is not None:
+                    self.on_result(provider_id, model, elapsed, ok)
+
+        self.cache.put(key, "".join(pieces))
+
+    def stats(self) -> dict:
+        return {
+            "providers": {provider_id: s.snapshot() for provider_id, s in self._stats.items()},
+            "cache": self.cache.stats(),
+            "coalesced": self._flight.coalesced,
+        }
+
+
+def _concurrency(provider_id: str) -> int:
+    return settings.LLM_PROVIDER_CONCURRENCY.get(provider_id, settings.LLM_DEFAULT_CONCURRENCY)
+
+
+llm_pool = LLMPool(
+    providers={
+        "openai": OpenAICompatibleProvider(
+            "openai", settings.OPENAI_BASE_URL, settings.OPENAI_API_KEY, settings.OPENAI_MODEL, _concurrency("openai")
+        ),
+        "gemini": GeminiProvider(
+            "gemini", settings.GOOGLE_AI_BASE_URL, settings.GOOGLE_AI_API_KEY, settings.GOOGLE_AI_MODEL, _concurrency("gemini")
+        ),
+        "claude": AnthropicProvider(
+            "claude", settings.ANTHROPIC_BASE_URL, settings.ANTHROPIC_API_KEY, settings.ANTHROPIC_MODEL, _concurrency("claude")
+        ),
+        "grok": OpenAICompatibleProvider(
+            "grok", settings.XAI_BASE_URL, settings.XAI_API_KEY, settings.XAI_MODEL, _concurrency("grok")
+        ),
+    },
+    cache=OutputCache(settings.LLM_CACHE_SIZE, settings.LLM_CACHE_TTL),
+    timeout=settings.LLM_TIMEOUT,
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    max_tokens=settings.LLM_MAX_TOKENS,
+)
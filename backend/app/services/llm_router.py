@@ -0,0 +1,315 @@
+"""
+LLM Router - latency-aware provider choice, hedged requests and circuit breakers
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.llm import LLMPool, ProviderUnavailable, llm_pool
+
+ANY_PROVIDER = "any"
+
+Target = Tuple[str, str]  # (provider_id, model)
+
+
+class CircuitBreaker:
+    """
+    Closed until ``failures`` calls in a row fail, then open (calls refused)
+    for ``reset_after`` seconds, then half-open: one trial call either
+    closes it again or re-opens it.
+    """
+
+    def __init__(self, failures: int, reset_after: float):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.trips = 0
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial = False
+
+    def allow(self) -> bool:
+        """Whether a call could go through now (no side effects)"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return time.monotonic() - self._opened_at >= self.reset_after
+        return not self._trial
+
+    def acquire(self) -> bool:
+        """Claim a call; past the reset timeout only one trial call is let through"""
+        if not self.allow():
+            return False
+        if self.state != "closed":
+            self.state = "half_open"
+            self._trial = True
+        return True
+
+    def release(self) -> None:
+        """Give back a trial call that was abandoned before it finished"""
+        self._trial = False
+
+    def record(self, ok: bool) -> None:
+        self._trial = False
+        if ok:
+            self.state = "closed"
+            self._consecutive = 0
+            return
+
+        self._consecutive += 1
+        if self.state == "half_open" or self._consecutive >= self.failures:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class ProviderHealth:
+    """Rolling latency/outcome window and circuit breaker for one provider/model"""
+
+    def __init__(self, window: int, breaker: CircuitBreaker):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.breaker = breaker
+
+    def observe(self, seconds: float, ok: bool) -> None:
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(seconds)
+        self.breaker.record(ok)
+
+    def observe_abandoned(self, seconds: float) -> None:
+        """A call cancelled after ``seconds`` (e.g. it lost a hedge): at least that slow"""
+        self.latencies.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def snapshot(self) -> dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "samples": len(self.outcomes),
+            "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 3) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "circuit": self.breaker.state,
+            "trips": self.breaker.trips,
+        }
+
+
+class LLMRouter:
+    """
+    Chooses which provider answers a prompt and keeps slow or failing ones
+    from setting the judge's tail latency.
+
+    Upstream call outcomes from the pool feed a rolling p50/p95 and error
+    rate per provider/model. A lesson pinned to a provider only ever uses
+    that provider; a lesson set to ``"any"`` tries the fastest healthy one
+    first. If it hasn't answered by its p95, a hedged request goes to the
+    next candidate and whichever answers first wins (the other is
+    cancelled); a failure falls through to the next candidate. Providers
+    that fail ``breaker_failures`` times in a row are skipped until their
+    circuit lets a trial call through.
+    """
+
+    def __init__(
+        self,
+        pool: LLMPool,
+        window: int,
+        hedge: bool,
+        hedge_min_samples: int,
+        hedge_default_delay: float,
+        max_error_rate: float,
+        breaker_failures: int,
+        breaker_reset: float,
+    ):
+        self.pool = pool
+        self.window = window
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_default_delay = hedge_default_delay
+        self.max_error_rate = max_error_rate
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+
+        self._health: Dict[Target, ProviderHealth] = {}
+        pool.on_result = self._observe
+
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.rejected = 0
+
+    def health(self, provider_id: str, model: str) -> ProviderHealth:
+        health = self._health.get((provider_id, model))
+        if health is None:
+            health = ProviderHealth(self.window, CircuitBreaker(self.breaker_failures, self.breaker_reset))
+            self._health[(provider_id, model)] = health
+        return health
+
+    def _observe(self, provider_id: str, model: str, seconds: float, ok: bool) -> None:
+        self.health(provider_id, model).observe(seconds, ok)
+
+    def candidates(self, provider_id: Optional[str], model: Optional[str] = None) -> List[Target]:
+        """Providers to try, best first"""
+        if provider_id and provider_id != ANY_PROVIDER:
+            provider = self.pool.get(provider_id)
+            return [(provider_id, model or provider.model)]
+
+        targets = [(pid, p.model) for pid, p in self.pool.providers.items() if p.configured]
+        if not targets:
+            raise ProviderUnavailable("No AI provider is configured.")
+        return sorted(targets, key=self._rank)
+
+    def _rank(self, target: Target) -> tuple:
+        health = self.health(*target)
+        p50 = health.percentile(0.5)
+        # Providers without samples sort first so they get measured
+        return (not health.breaker.allow(), health.error_rate > self.max_error_rate, p50 or 0.0)
+
+    def hedge_delay(self, target: Target) -> float:
+        health = self.health(*target)
+        if len(health.latencies) < self.hedge_min_samples:
+            return self.hedge_default_delay
+        return health.percentile(0.95)
+
+    def pick(self, provider_id: Optional[str], model: Optional[str] = None) -> Target:
+        """
+        Best provider for a single (unhedged) call such as a stream.
+
+        Raises:
+            ProviderUnavailable: If no candidate's circuit is closed.
+        """
+        for target in self.candidates(provider_id, model):
+            if self.health(*target).breaker.allow():
+                return target
+        self.rejected += 1
+        raise ProviderUnavailable("The AI provider is temporarily unavailable. Please try again shortly.")
+
+    async def complete(
+        self,
+        provider_id: Optional[str],
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+    ) -> str:
+        """
+        ``LLMPool.complete`` with provider choice, hedging and fallback.
+
+        Raises:
+            ProviderUnavailable: If every candidate failed or is switched off.
+        """
+        targets = self.candidates(provider_id, model)
+
+        # A cached answer from any candidate beats a network call
+        for pid, m in targets:
+            if self.pool.cache.peek(self.pool.cache_key(pid, m, system_prompt, user_prompt)):
+                return await self.pool.complete(pid, system_prompt, user_prompt, m)
+
+        remaining = [t for t in targets if self.health(*t).breaker.allow()]
+        if not remaining:
+            self.rejected += 1
+            raise ProviderUnavailable("The AI provider is temporarily unavailable. Please try again shortly.")
+
+        pending: Dict[asyncio.Future, Target] = {}
+
+        def launch() -> bool:
+            while remaining:
+                target = remaining.pop(0)
+                if self.health(*target).breaker.acquire():
+                    task = asyncio.ensure_future(self._attempt(target, system_prompt, user_prompt))
+                    task.add_done_callback(_consume)
+                    pending[task] = target
+                    return True
+            return False
+
+        if not launch():
+            self.rejected += 1
+            raise ProviderUnavailable("The AI provider is temporarily unavailable. Please try again shortly.")
+        hedged = set()
+        last_error: Optional[ProviderUnavailable] = None
+
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and remaining and len(pending) == 1:
+                    timeout = self.hedge_delay(pending[next(iter(pending))])
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Slower than this provider's p95: race the next candidate
+                    if launch():
+                        self.hedges += 1
+                        hedged.add(next(reversed(pending)))
+                    continue
+
+                winner = None
+                for task in done:
+                    del pending[task]
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        last_error = task.exception()
+                if winner is not None:
+                    if winner in hedged:
+                        self.hedge_wins += 1
+                    return winner.result()
+
+                if not pending and launch():
+                    self.fallbacks += 1
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error or ProviderUnavailable("The AI provider is temporarily unavailable. Please try again shortly.")
+
+    async def _attempt(self, target: Target, system_prompt: str, user_prompt: str) -> str:
+        provider_id, model = target
+        started = time.perf_counter()
+        try:
+            return await self.pool.complete(provider_id, system_prompt, user_prompt, model)
+        except asyncio.CancelledError:
+            # Keep a provider that keeps losing hedges from looking as fast as its old samples,
+            # and free a half-open trial for someone else
+            health = self.health(*target)
+            health.observe_abandoned(time.perf_counter() - started)
+            health.breaker.release()
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "targets": {f"{pid}/{model}": h.snapshot() for (pid, model), h in self._health.items()},
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "rejected": self.rejected,
+        }
+
+
+def _consume(task: asyncio.Future) -> None:
+    # Losing attempts may fail after the winner returned; don't log them as unretrieved
+    if not task.cancelled():
+        task.exception()
+
+
+llm_router = LLMRouter(
+    llm_pool,
+    window=settings.LLM_LATENCY_WINDOW,
+    hedge=settings.LLM_HEDGE_ENABLED,
+    hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+    hedge_default_delay=settings.LLM_HEDGE_DEFAULT_DELAY,
+    max_error_rate=settings.LLM_MAX_ERROR_RATE,
+    breaker_failures=settings.LLM_BREAKER_FAILURES,
+    breaker_reset=settings.LLM_BREAKER_RESET,
+)
@@ -0,0 +1,224 @@
+"""
+Progress Recorder - write-behind user_progress updates from judge results
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.repositories.base import is_rejected
+from app.repositories.progress import ProgressRepository
+
+
+class ProgressRecorder:
+    """
+    Records judge results without making the judge wait on the database.
+
+    ``record`` only puts the result on a bounded queue. A background flusher
+    merges queued results per (user_id, lesson_id) and writes them with one
+    ``record_progress`` call once ``batch_size`` pairs are buffered or
+    ``flush_interval`` has passed. While a write is slow or failing the
+    flusher stops taking from the queue, so a full queue pushes back on
+    intake: results that do not fit are dropped and counted rather than
+    delaying a response. Everything still queued is written on shutdown.
+
+    Rows the database can never take (the user or lesson was deleted) are
+    left out and counted, so they cannot hold up the rows behind them.
+    """
+
+    def __init__(
+        self,
+        queue_size: int,
+        flush_interval: float,
+        batch_size: int,
+        repository_factory: Callable[[], ProgressRepository] = ProgressRepository,
+    ):
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.repository_factory = repository_factory
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._merged: Dict[Tuple[str, int], dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._writing: Optional[asyncio.Future] = None
+        self._stopping = False
+
+        self.recorded = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.rejected_rows = 0
+        self.flush_failures = 0
+        self.last_flush_ms = 0.0
+
+    def _ensure_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._ensure_queue()
+        self._stopping = False
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything still buffered"""
+        if self._task is not None:
+            # wait_for can swallow a cancel that races a queue item; the flag covers that case
+            self._stopping = True
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writing is not None:
+            # Let an interrupted write finish so its rows aren't sent twice
+            await asyncio.wait([self._writing])
+
+        self._drain_queue()
+        while self._merged:
+            try:
+                await self._write()
+            except Exception:
+                # Database unreachable at shutdown; nothing more we can do
+                break
+
+    def record(self, user_id: str, lesson_id: int, success: bool, score: int) -> None:
+        """Queue a judge result; never blocks"""
+        try:
+            self._ensure_queue().put_nowait((user_id, lesson_id, success, score, time.time()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        self.recorded += 1
+
+    def _merge(self, item: tuple) -> None:
+        user_id, lesson_id, success, score, judged_at = item
+        row = self._merged.get((user_id, lesson_id))
+        if row is None:
+            row = {
+                "user_id": user_id,
+                "lesson_id": lesson_id,
+                "attempts": 0,
+                "score": 0,
+                "completed": False,
+                "completed_at": None,
+            }
+            self._merged[(user_id, lesson_id)] = row
+
+        row["attempts"] += 1
+        row["score"] = max(row["score"], score)
+        if success and not row["completed"]:
+            row["completed"] = True
+            row["completed_at"] = datetime.fromtimestamp(judged_at, timezone.utc).isoformat()
+
+    def _restore(self, row: dict) -> None:
+        """Put back a row whose write failed, combined with results merged since"""
+        key = (row["user_id"], row["lesson_id"])
+        current = self._merged.get(key)
+        if current is None:
+            self._merged[key] = row
+            return
+        current["attempts"] += row["attempts"]
+        current["score"] = max(current["score"], row["score"])
+        if row["completed"]:
+            current["completed"] = True
+            current["completed_at"] = row["completed_at"]
+
+    def _drain_queue(self) -> None:
+        queue = self._queue
+        while queue is not None and not queue.empty():
+            self._merge(queue.get_nowait())
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while not self._stopping:
+            deadline = loop.time() + self.flush_interval
+            while len(self._merged) < self.batch_size and not self._stopping:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._merge(item)
+                while len(self._merged) < self.batch_size and not queue.empty():
+                    self._merge(queue.get_nowait())
+
+            if not self._merged or self._stopping:
+                continue
+            self._writing = asyncio.ensure_future(self._write())
+            try:
+                await asyncio.shield(self._writing)
+            except Exception:
+                # Keep the merged rows; new results keep merging into them until the next try
+                await asyncio.sleep(self.flush_interval)
+
+    async def _write(self) -> None:
+        # Taken out while in flight: results arriving meanwhile start new rows, not change these
+        rows = [self._merged.pop(key) for key in list(self._merged)[:self.batch_size]]
+        started = time.perf_counter()
+        try:
+            await self._record(rows)
+        except Exception:
+            self.flush_failures += 1
+            raise
+
+        self.flushes += 1
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    async def _record(self, rows: List[dict]) -> None:
+        """
+        Write ``rows``. If the database rejects the batch outright, write each
+        half separately, so only the rows it cannot take are left out. Rows
+        not written because of any other error are put back for the next try.
+        """
+        try:
+            written = await self.repository_factory().record_many(rows)
+        except Exception as e:
+            if not is_rejected(e):
+                for row in rows:
+                    self._restore(row)
+                raise
+            if len(rows) == 1:
+                self.rejected_rows += 1
+                return
+            middle = len(rows) // 2
+            try:
+                await self._record(rows[:middle])
+            except Exception:
+                for row in rows[middle:]:
+                    self._restore(row)
+                raise
+            await self._record(rows[middle:])
+            return
+
+        self.flushed_rows += written
+        self.rejected_rows += len(rows) - written
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "merged": len(self._merged),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "rejected_rows": self.rejected_rows,
+            "flush_failures": self.flush_failures,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+progress_recorder = ProgressRecorder(
+    queue_size=settings.PROGRESS_QUEUE_SIZE,
+    flush_interval=settings.PROGRESS_FLUSH_INTERVAL,
+    batch_size=settings.PROGRESS_FLUSH_BATCH_SIZE,
+)
@@ -0,0 +1,563 @@
+"""
+Safe Regex Service - linear-time matching for lesson patterns
+
+Patterns in the supported subset (literals, classes, groups, alternation,
+greedy/lazy quantifiers, ^ $ \\A \\Z, inline i/s flags) are compiled to a
+Thompson NFA and searched with a lazily built DFA, so matching time is
+linear in the input no matter how the pattern is written. Anything else
+(backreferences, lookarounds, \\b, ...) runs on Python's ``re`` in a worker
+process under a hard timeout.
+"""
+import asyncio
+import multiprocessing
+import re
+import threading
+from typing import Callable, Dict, FrozenSet, List, Optional, Set
+
+from app.core.config import settings
+
+MAX_REPEAT = 1000
+MAX_NFA_STATES = 20000
+MAX_DFA_STATES = 10000
+
+# NFA state kinds
+_CHAR, _SPLIT, _BOL, _EOL, _EOS, _MATCH = range(6)
+
+
+class Unsupported(Exception):
+    """Pattern uses syntax outside the linear-time subset"""
+
+
+class RegexTimeout(Exception):
+    """Backtracking match did not finish within the time limit"""
+
+
+# --- Parsing ---
+def _word(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+_CLASS_ESCAPES: Dict[str, Callable[[str], bool]] = {
+    "d": str.isdecimal,
+    "D": lambda c: not c.isdecimal(),
+    "w": _word,
+    "W": lambda c: not _word(c),
+    "s": str.isspace,
+    "S": lambda c: not c.isspace(),
+}
+
+_CONTROL_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v", "a": "\a"}
+
+_QUANTIFIER = re.compile(r"\{(\d*)(,?)(\d*)\}")
+_INLINE_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+
+
+class _Parser:
+    """Recursive-descent parser producing a small AST of tuples"""
+
+    def __init__(self, pattern: str, ignorecase: bool):
+        self.p = pattern
+        self.i = 0
+        self.ignorecase = ignorecase
+        self.dotall = False
+
+    def parse(self):
+        self._inline_flags()
+        node = self._alt()
+        if self.i != len(self.p):
+            raise Unsupported("unbalanced parenthesis")
+        return node
+
+    def _peek(self) -> Optional[str]:
+        return self.p[self.i] if self.i < len(self.p) else None
+
+    def _inline_flags(self) -> None:
+        while True:
+            m = _INLINE_FLAGS.match(self.p, self.i)
+            if not m:
+                return
+            for flag in m.group(1):
+                if flag == "i":
+                    self.ignorecase = True
+                elif flag == "s":
+                    self.dotall = True
+                elif flag != "u":
+                    raise Unsupported(f"flag '{flag}'")
+            self.i = m.end()
+
+    def _alt(self):
+        branches = [self._cat()]
+        while self._peek() == "|":
+            self.i += 1
+            branches.append(self._cat())
+        return branches[0] if len(branches) == 1 else ("alt", branches)
+
+    def _cat(self):
+        items = []
+        while self._peek() is not None and self._peek() not in "|)":
+            items.append(self._repeat())
+        return ("cat", items)
+
+    def _repeat(self):
+        atom = self._atom()
+        c = self._peek()
+        if c == "*":
+            lo, hi = 0, None
+            self.i += 1
+        elif c == "+":
+            lo, hi = 1, None
+            self.i += 1
+        elif c == "?":
+            lo, hi = 0, 1
+            self.i += 1
+        elif c == "{" and _QUANTIFIER.match(self.p, self.i) and _QUANTIFIER.match(self.p, self.i).group(0) != "{}":
+            m = _QUANTIFIER.match(self.p, self.i)
+            lo = int(m.group(1)) if m.group(1) else 0
+            if m.group(2):
+                hi = int(m.group(3)) if m.group(3) else None
+            else:
+                hi = lo
+            self.i = m.end()
+        else:
+            return atom
+
+        if (hi if hi is not None else lo) > MAX_REPEAT:
+            raise Unsupported("repeat count too large")
+        if self._peek() == "?":
+            self.i += 1  # lazy: same answer for a yes/no search
+        elif self._peek() == "+":
+            raise Unsupported("possessive quantifier")
+        return ("rep", atom, lo, hi)
+
+    def _atom(self):
+        c = self.p[self.i]
+        if c == "(":
+            if self.p.startswith("(?:", self.i):
+                self.i += 3
+            elif self.p.startswith("(?P<", self.i):
+                end = self.p.find(">", self.i)
+                self.i = end + 1
+            elif self.p.startswith("(?", self.i):
+                raise Unsupported("group extension")
+            else:
+                self.i += 1
+            node = self._alt()
+            if self._peek() != ")":
+                raise Unsupported("unbalanced parenthesis")
+            self.i += 1
+            return node
+        if c == "[":
+            return self._class()
+        self.i += 1
+        if c == ".":
+            if self.dotall:
+                return ("char", lambda ch: True)
+            return ("char", lambda ch: ch != "\n")
+        if c == "^":
+            return ("bol",)
+        if c == "$":
+            return ("eol",)
+        if c == "\\":
+            return self._escape()
+        return ("char", self._literal(c))
+
+    def _literal(self, c: str) -> Callable[[str], bool]:
+        if self.ignorecase and c.lower() != c.upper():
+            folded = c.lower()
+            return lambda ch: ch.lower() == folded
+        return c.__eq__
+
+    def _escape_char(self) -> str:
+        """Single-character escapes shared by atoms and classes"""
+        if self.i >= len(self.p):
+            raise Unsupported("trailing backslash")
+        e = self.p[self.i]
+        self.i += 1
+        if e in _CONTROL_ESCAPES:
+            return _CONTROL_ESCAPES[e]
+        if e in "xuU":
+            width = {"x": 2, "u": 4, "U": 8}[e]
+            digits = self.p[self.i:self.i + width]
+            self.i += width
+            return chr(int(digits, 16))
+        if e.isalnum():
+            raise Unsupported(f"escape '\\{e}'")
+        return e
+
+    def _escape(self):
+        e = self._peek()
+        if e in _CLASS_ESCAPES:
+            self.i += 1
+            return ("char", _CLASS_ESCAPES[e])
+        if e == "A":
+            self.i += 1
+            return ("bol",)
+        if e == "Z":
+            self.i += 1
+            return ("eos",)
+        return ("char", self._literal(self._escape_char()))
+
+    def _class(self):
+        self.i += 1  # '['
+        negate = self._peek() == "^"
+        if negate:
+            self.i += 1
+
+        chars: Set[str] = set()
+        ranges: List[tuple] = []
+        tests: List[Callable[[str], bool]] = []
+        first = True
+        while True:
+            c = self._peek()
+            if c is None:
+                raise Unsupported("unterminated class")
+            if c == "]" and not first:
+                self.i += 1
+                break
+            first = False
+
+            if c == "\\":
+                self.i += 1
+                e = self._peek()
+                if e in _CLASS_ESCAPES:
+                    self.i += 1
+                    tests.append(_CLASS_ESCAPES[e])
+                    continue
+                if e == "b":
+                    self.i += 1
+                    lo = "\b"
+                else:
+                    lo = self._escape_char()
+            else:
+                self.i += 1
+                lo = c
+
+            if self._peek() == "-" and self.i + 1 < len(self.p) and self.p[self.i + 1] != "]":
+                self.i += 1
+                if self._peek() == "\\":
+                    self.i += 1
+                    hi = self._escape_char()
+                else:
+                    hi = self.p[self.i]
+                    self.i += 1
+                ranges.append((lo, hi))
+            else:
+                chars.add(lo)
+
+        def member(ch: str) -> bool:
+            return ch in chars or any(a <= ch <= b for a, b in ranges) or any(t(ch) for t in tests)
+
+        if self.ignorecase:
+            def pred(ch: str) -> bool:
+                return (member(ch) or member(ch.lower()) or member(ch.upper())) != negate
+        else:
+            def pred(ch: str) -> bool:
+                return member(ch) != negate
+        return ("char", pred)
+
+
+# --- NFA ---
+class _NFA:
+    """Thompson NFA stored as parallel lists"""
+
+    def __init__(self):
+        self.kind: List[int] = []
+        self.pred: List[Optional[Callable[[str], bool]]] = []
+        self.outs: List[List[int]] = []
+
+    def add(self, kind: int, outs: List[int], pred=None) -> int:
+        if len(self.kind) >= MAX_NFA_STATES:
+            raise Unsupported("pattern too large")
+        self.kind.append(kind)
+        self.pred.append(pred)
+        self.outs.append(outs)
+        return len(self.kind) - 1
+
+    def build(self, node, nxt: int) -> int:
+        """Compile ``node`` so that it continues at state ``nxt``; returns its entry state"""
+        tag = node[0]
+        if tag == "char":
+            return self.add(_CHAR, [nxt], node[1])
+        if tag == "cat":
+            for item in reversed(node[1]):
+                nxt = self.build(item, nxt)
+            return nxt
+        if tag == "alt":
+            return self.add(_SPLIT, [self.build(branch, nxt) for branch in node[1]])
+        if tag == "bol":
+            return self.add(_BOL, [nxt])
+        if tag == "eol":
+            return self.add(_EOL, [nxt])
+        if tag == "eos":
+            return self.add(_EOS, [nxt])
+
+        # rep
+        _, body, lo, hi = node
+        if hi is None:
+            loop = self.add(_SPLIT, [])
+            self.outs[loop] = [self.build(body, loop), nxt]
+            nxt = loop
+        else:
+            skip_to = nxt
+            for _ in range(hi - lo):
+                nxt = self.add(_SPLIT, [self.build(body, nxt), skip_to])
+        for _ in range(lo):
+            nxt = self.build(body, nxt)
+        return nxt
+
+
+class LinearRegex:
+    """
+    Unanchored regex search in time linear in the input.
+
+    DFA states (sets of NFA states) are built lazily and memoised per
+    input character, so steady-state matching is one dict lookup per char.
+    """
+
+    def __init__(self, pattern: str, ignorecase: bool = False):
+        self.pattern = pattern
+        ast = _Parser(pattern, ignorecase).parse()
+
+        nfa = _NFA()
+        accept = nfa.add(_MATCH, [])
+        self._start = nfa.build(ast, accept)
+        self._nfa = nfa
+        self._has_end_assertion = any(k in (_EOL, _EOS) for k in nfa.kind)
+
+        self._mid_start = self._closure({self._start})
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: Dict[FrozenSet[int], int] = {}
+        self._sets: List[FrozenSet[int]] = []
+        self._trans: List[Dict[str, int]] = []
+        self._accepting: List[bool] = []
+        self._initial = self._intern(self._closure({self._start}, bol=True))
+
+    def _closure(self, states, bol: bool = False, eol: bool = False, eos: bool = False) -> FrozenSet[int]:
+        kind, outs = self._nfa.kind, self._nfa.outs
+        seen: Set[int] = set()
+        stack = list(states)
+        while stack:
+            s = stack.pop()
+            if s in seen:
+                continue
+            seen.add(s)
+            k = kind[s]
+            if k == _SPLIT or (k == _BOL and bol) or (k == _EOL and eol) or (k == _EOS and eos):
+                stack.extend(outs[s])
+        return frozenset(seen)
+
+    def _intern(self, states: FrozenSet[int]) -> int:
+        state_id = self._ids.get(states)
+        if state_id is None:
+            state_id = len(self._sets)
+            self._ids[states] = state_id
+            self._sets.append(states)
+            self._trans.append({})
+            self._accepting.append(any(self._nfa.kind[s] == _MATCH for s in states))
+        return state_id
+
+    def _step(self, state_id: int, c: str) -> int:
+        kind, pred, outs = self._nfa.kind, self._nfa.pred, self._nfa.outs
+        moved = [outs[s][0] for s in self._sets[state_id] if kind[s] == _CHAR and pred[s](c)]
+        target = self._closure(moved) | self._mid_start
+
+        if len(self._sets) >= MAX_DFA_STATES:
+            self._reset()
+            return self._intern(target)
+
+        next_id = self._intern(target)
+        self._trans[state_id][c] = next_id
+        return next_id
+
+    def _expand(self, state_id: int, bol: bool, eos: bool) -> int:
+        """Follow ``$`` (and ``^`` / ``\\Z`` where they hold) from a DFA state at an end position"""
+        return self._intern(self._closure(self._sets[state_id], bol=bol, eol=True, eos=eos))
+
+    def search(self, text: str) -> bool:
+        n = len(text)
+        # Python's $ matches at the end and just before a trailing newline
+        before_last_newline = n - 1 if text.endswith("\n") else -1
+        check_end = self._has_end_assertion
+
+        state = self._initial
+        if check_end and (n == 0 or before_last_newline == 0):
+            state = self._expand(state, bol=True, eos=n == 0)
+        if self._accepting[state]:
+            return True
+
+        for i, c in enumerate(text):
+            if check_end and i == before_last_newline and i > 0:
+                state = self._expand(state, bol=False, eos=False)
+                if self._accepting[state]:
+                    return True
+            nxt = self._trans[state].get(c)
+            state = nxt if nxt is not None else self._step(state, c)
+            if self._accepting[state]:
+                return True
+
+        if check_end and n > 0:
+            return self._accepting[self._expand(state, bol=False, eos=True)]
+        return False
+
+    def scanner(self) -> "RegexScanner":
+        return RegexScanner(self)
+
+
+class RegexScanner:
+    """
+    Feeds text to a ``LinearRegex`` as it arrives and reports as soon as a
+    match is certain. Matches that depend on ``$`` / ``\\Z`` are only known
+    at the end of input, so callers still run ``search`` on the final text
+    when ``feed`` never returned True.
+    """
+
+    def __init__(self, regex: LinearRegex):
+        self._regex = regex
+        # Hold the NFA state set, not a DFA id: other searches may reset the DFA between chunks
+        self._states = regex._sets[regex._initial]
+        self.matched = regex._accepting[regex._initial]
+
+    def feed(self, chunk: str) -> bool:
+        if self.matched:
+            return True
+        regex = self._regex
+        state = regex._intern(self._states)
+        for c in chunk:
+            nxt = regex._trans[state].get(c)
+            state = nxt if nxt is not None else regex._step(state, c)
+            if regex._accepting[state]:
+                self.matched = True
+                break
+        self._states = regex._sets[state]
+        return self.matched
+
+
+def classify(pattern: str, ignorecase: bool = False) -> Optional[LinearRegex]:
+    """Return a linear-time matcher for ``pattern``, or None if it needs backtracking"""
+    try:
+        return LinearRegex(pattern, ignorecase)
+    except (Unsupported, ValueError, IndexError):
+        return None
+
+
+# --- Backtracking fallback ---
+def _search_in_worker(pattern: str, flags: int, text: str) -> bool:
+    return re.search(pattern, text, flags) is not None
+
+
+class RegexWorkerPool:
+    """
+    Runs backtracking regex searches in worker processes. A search that
+    exceeds its timeout gets its pool terminated and replaced; other
+    in-flight searches are resubmitted to the new pool.
+
+    ``search_blocking`` serves synchronous callers from a second pool,
+    started on first use, so its timeouts never disturb ``search``.
+    """
+
+    def __init__(self, workers: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self.timeouts = 0
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._pending: Dict[asyncio.Future, tuple] = {}
+        self._blocking_pool = None
+        self._blocking_lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Boot the workers ahead of the first search so it isn't charged the
+        spawn time. Safe to call from a thread (the startup warmup does).
+        """
+        self._ensure_pool()
+
+    def _ensure_pool(self):
+        pool = self._pool
+        if pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = multiprocessing.get_context("spawn").Pool(self.workers)
+                pool = self._pool
+        return pool
+
+    def _submit(self, future: asyncio.Future, args: tuple) -> None:
+        loop = future.get_loop()
+        pool = self._ensure_pool()
+
+        def resolve(result):
+            loop.call_soon_threadsafe(_set_result, future, pool, result)
+
+        def fail(error):
+            loop.call_soon_threadsafe(_set_exception, future, pool, error)
+
+        future.pool = pool
+        pool.apply_async(_search_in_worker, args, callback=resolve, error_callback=fail)
+
+    async def search(self, pattern: str, flags: int, text: str, timeout: Optional[float] = None) -> bool:
+        future = asyncio.get_running_loop().create_future()
+        args = (pattern, flags, text)
+        self._pending[future] = args
+        self._submit(future, args)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            await self._restart(exclude=future)
+            raise RegexTimeout(pattern)
+        finally:
+            self._pending.pop(future, None)
+
+    def search_blocking(self, pattern: str, flags: int, text: str, timeout: Optional[float] = None) -> bool:
+        """``search`` for synchronous code; waits at most the timeout, then raises RegexTimeout"""
+        with self._blocking_lock:
+            if self._blocking_pool is None:
+                self._blocking_pool = multiprocessing.get_context("spawn").Pool(self.workers)
+            pool = self._blocking_pool
+        result = pool.apply_async(_search_in_worker, (pattern, flags, text))
+        try:
+            return result.get(timeout or self.timeout)
+        except multiprocessing.TimeoutError:
+            self.timeouts += 1
+            with self._blocking_lock:
+                if self._blocking_pool is pool:
+                    self._blocking_pool = None
+            # Searches other threads had in this pool fail with it rather than wait it out
+            pool.terminate()
+            raise RegexTimeout(pattern)
+
+    async def _restart(self, exclude: asyncio.Future) -> None:
+        with self._pool_lock:
+            old, self._pool = self._pool, None
+        self._pending.pop(exclude, None)
+        for future, args in list(self._pending.items()):
+            if not future.done():
+                self._submit(future, args)
+        if old is not None:
+            await asyncio.get_running_loop().run_in_executor(None, old.terminate)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+        with self._blocking_lock:
+            pool, self._blocking_pool = self._blocking_pool, None
+        if pool is not None:
+            pool.terminate()
+
+
+def _set_result(future: asyncio.Future, pool, result) -> None:
+    # Ignore late answers from a pool that has since been replaced
+    if not future.done() and getattr(future, "pool", None) is pool:
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, pool, error) -> None:
+    if not future.done() and getattr(future, "pool", None) is pool:
+        future.set_exception(error)
+
+
+regex_pool = RegexWorkerPool(workers=settings.REGEX_WORKERS, timeout=settings.REGEX_TIMEOUT)
@@ -0,0 +1,135 @@
+"""
+Similarity - bit-parallel edit distance and token overlap for partial-credit scoring
+"""
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+_WORD = re.compile(r"\w+")
+
+
+class EditDistance:
+    """
+    Levenshtein distance from one fixed string to many others.
+
+    Uses Myers' bit-vector algorithm in Hyyrö's formulation: the DP column
+    for ``pattern`` is held as two bit vectors (+1 / -1 vertical deltas) in
+    Python ints, so each character of the other string costs a handful of
+    word operations instead of ``len(pattern)`` cell updates. The per-
+    character match masks are built once here and reused for every call.
+    """
+
+    __slots__ = ("pattern", "_peq", "_mask", "_high")
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        peq: Dict[str, int] = {}
+        for i, char in enumerate(pattern):
+            peq[char] = peq.get(char, 0) | (1 << i)
+        self._peq = peq
+        self._mask = (1 << len(pattern)) - 1
+        self._high = 1 << (len(pattern) - 1) if pattern else 0
+
+    def distance(self, text: str, max_distance: Optional[int] = None) -> int:
+        """
+        Edit distance between the pattern and ``text``.
+
+        With ``max_distance``, returns ``max_distance + 1`` as soon as the
+        distance is known to exceed it: up front when the lengths differ by
+        more, otherwise once the running score, less one per character still
+        to read, is over the limit.
+        """
+        m, n = len(self.pattern), len(text)
+        if max_distance is not None and abs(m - n) > max_distance:
+            return max_distance + 1
+        if not m:
+            return n
+        if not n:
+            return m
+
+        peq, mask, high = self._peq, self._mask, self._high
+        vp, vn, score = mask, 0, m
+        limit = n + max_distance if max_distance is not None else None
+        for j, char in enumerate(text, 1):
+            eq = peq.get(char, 0)
+            xv = eq | vn
+            xh = (((eq & vp) + vp) ^ vp) | eq
+            hp = vn | (~(xh | vp) & mask)
+            hn = vp & xh
+            if hp & high:
+                score += 1
+            elif hn & high:
+                score -= 1
+            # Top row is D[0][j] = j, so a +1 shifts in at the bottom
+            hp = ((hp << 1) | 1) & mask
+            hn = (hn << 1) & mask
+            vp = hn | (~(xv | hp) & mask)
+            vn = hp & xv
+            # Each remaining character can lower the score by at most one
+            if limit is not None and score - limit + j > 0:
+                return max_distance + 1
+        return score
+
+    def similarity(self, text: str, floor: float = 0.0) -> float:
+        """
+        1 - distance / longer length, in [0, 1]. Anything below ``floor``
+        comes back as 0.0, which lets far-off (or much longer) text exit early.
+        """
+        longest = max(len(self.pattern), len(text))
+        if not longest:
+            return 1.0
+        max_distance = None
+        if floor > 0:
+            max_distance = int(longest * (1 - floor))
+            # 30 * (1 - 0.9) is 2.999...; allow every distance the final check below would pass
+            while max_distance < longest and 1 - (max_distance + 1) / longest >= floor:
+                max_distance += 1
+        distance = self.distance(text, max_distance)
+        if max_distance is not None and distance > max_distance:
+            return 0.0
+        value = 1 - distance / longest
+        return value if value >= floor else 0.0
+
+    def similarities(self, texts: Iterable[str], floor: float = 0.0) -> List[float]:
+        """``similarity`` for many texts; repeated texts are only scored once"""
+        seen: Dict[str, float] = {}
+        results = []
+        for text in texts:
+            value = seen.get(text)
+            if value is None:
+                value = seen[text] = self.similarity(text, floor)
+            results.append(value)
+        return results
+
+
+class TokenOverlap:
+    """Dice coefficient over word multisets: 2 * |shared words| / (|a| + |b|)"""
+
+    __slots__ = ("pattern", "_counts", "_total")
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self._counts = Counter(_WORD.findall(pattern))
+        self._total = sum(self._counts.values())
+
+    def similarity(self, text: str, floor: float = 0.0) -> float:
+        counts = Counter(_WORD.findall(text))
+        total = self._total + sum(counts.values())
+        if not total:
+            return 1.0
+        shared = sum((self._counts & counts).values())
+        value = 2 * shared / total
+        return value if value >= floor else 0.0
+
+    def similarities(self, texts: Iterable[str], floor: float = 0.0) -> List[float]:
+        seen: Dict[str, float] = {}
+        results = []
+        for text in texts:
+            value = seen.get(text)
+            if value is None:
+                value = seen[text] = self.similarity(text, floor)
+            results.append(value)
+        return results
+
+
+METRICS = {"edit": EditDistance, "tokens": TokenOverlap}
@@ -0,0 +1,79 @@
+"""
+Single-flight - coalesce concurrent identical calls into one in-flight awaitable
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Concurrent ``do(key, fn)`` calls with the same key share one run of ``fn``.
+
+    Every caller gets the same result or exception. A caller that is
+    cancelled only stops waiting; the shared call keeps running for the
+    others and is cancelled once nobody is waiting for it. Nothing is cached
+    after the call completes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0  # runs of fn
+        self.coalesced = 0  # callers that joined a run already in flight
+        self._in_flight: Dict[Hashable, _Call] = {}
+        _registry.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._in_flight.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._in_flight[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # Last one out: stop the work and let the next caller start afresh
+                self._forget(key, call)
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._in_flight.get(key) is call:
+            del self._in_flight[key]
+        # Keep an unobserved failure from being logged as "never retrieved"
+        if call.task.done() and not call.task.cancelled():
+            call.task.exception()
+
+    def stats(self) -> dict:
+        total = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+
+_registry: List[SingleFlight] = []
+
+
+def stats() -> dict:
+    """Counters for every single-flight group, keyed by name"""
+    return {flight.name: flight.stats() for flight in _registry}
@@ -0,0 +1,178 @@
+"""
+Sorted Index - an order-statistics list of ints with O(log n) rank and position lookups
+"""
+from bisect import bisect_left, insort
+from typing import Iterable, Iterator, List
+
+
+class SortedIntList:
+    """
+    Sorted set of distinct ints supporting add, remove, ``index`` (rank) and
+    positional reads.
+
+    Values live in consecutive sorted blocks of ``load`` to ``2 * load``
+    items. ``_maxes`` (the last value of each block) finds a value's block by
+    bisection, and a Fenwick tree over block lengths turns a block number
+    into a position and back in O(log blocks). Inserting into a block is a
+    memmove of at most ``2 * load`` pointers; blocks are split when they
+    grow past that and merged into a neighbour when they shrink below
+    ``load / 4``, rebuilding the tree (O(blocks)) only then.
+    """
+
+    def __init__(self, values: Iterable[int] = (), load: int = 512):
+        self.load = load
+        self._blocks: List[List[int]] = []
+        self._maxes: List[int] = []
+        self._tree: List[int] = [0]
+        self._len = 0
+        self.rebuild(values)
+
+    def rebuild(self, values: Iterable[int]) -> None:
+        """Replace the contents with ``values`` in one O(n log n) pass"""
+        ordered = sorted(set(values))
+        self._blocks = [ordered[i:i + self.load] for i in range(0, len(ordered), self.load)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(ordered)
+        self._build_tree()
+
+    def _build_tree(self) -> None:
+        tree = [0] + [len(block) for block in self._blocks]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, block: int, delta: int) -> None:
+        tree = self._tree
+        i = block + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _offset(self, block: int) -> int:
+        """Number of values in blocks before ``block``"""
+        tree = self._tree
+        total = 0
+        i = block
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, index: int) -> tuple:
+        """(block, offset in block) of the value at ``index``"""
+        tree = self._tree
+        block = 0
+        step = 1 << (len(tree).bit_length() - 1)
+        while step:
+            candidate = block + step
+            if candidate < len(tree) and tree[candidate] <= index:
+                index -= tree[candidate]
+                block = candidate
+            step >>= 1
+        return block, index
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, value: int) -> bool:
+        block = bisect_left(self._maxes, value)
+        if block == len(self._maxes):
+            return False
+        values = self._blocks[block]
+        return values[bisect_left(values, value)] == value
+
+    def add(self, value: int) -> None:
+        if not self._blocks:
+            self._blocks, self._maxes, self._len = [[value]], [value], 1
+            self._build_tree()
+            return
+
+        block = bisect_left(self._maxes, value)
+        if block == len(self._maxes):
+            block -= 1
+            self._blocks[block].append(value)
+            self._maxes[block] = value
+        else:
+            insort(self._blocks[block], value)
+        self._len += 1
+
+        values = self._blocks[block]
+        if len(values) > 2 * self.load:
+            self._blocks.insert(block + 1, values[self.load:])
+            del values[self.load:]
+            self._maxes[block] = values[-1]
+            self._maxes.insert(block + 1, self._blocks[block + 1][-1])
+            self._build_tree()
+        else:
+            self._tree_add(block, 1)
+
+    def remove(self, value: int) -> None:
+        """Remove ``value``; raises ValueError if it is not present"""
+        block = bisect_left(self._maxes, value)
+        if block == len(self._maxes):
+            raise ValueError(f"{value} is not in list")
+        values = self._blocks[block]
+        i = bisect_left(values, value)
+        if values[i] != value:
+            raise ValueError(f"{value} is not in list")
+        del values[i]
+        self._len -= 1
+
+        if len(values) >= self.load // 4 or len(self._blocks) == 1:
+            if values:
+                self._maxes[block] = values[-1]
+                self._tree_add(block, -1)
+                return
+        # Fold a small block into its neighbour (re-split if that makes it too big)
+        neighbour = block - 1 if block > 0 else block + 1
+        if values and neighbour < len(self._blocks):
+            first, second = min(block, neighbour), max(block, neighbour)
+            merged = self._blocks[first] + self._blocks[second]
+            self._blocks[first:second + 1] = [merged]
+            self._maxes[first:second + 1] = [merged[-1]]
+            if len(merged) > 2 * self.load:
+                self._blocks[first:first + 1] = [merged[:len(merged) // 2], merged[len(merged) // 2:]]
+                self._maxes[first:first + 1] = [self._blocks[first][-1], self._blocks[first + 1][-1]]
+        elif not values:
+            del self._blocks[block]
+            del self._maxes[block]
+        self._build_tree()
+
+    def index(self, value: int) -> int:
+        """0-based position of ``value``; raises ValueError if it is not present"""
+        block = bisect_left(self._maxes, value)
+        if block == len(self._maxes):
+            raise ValueError(f"{value} is not in list")
+        values = self._blocks[block]
+        i = bisect_left(values, value)
+        if values[i] != value:
+            raise ValueError(f"{value} is not in list")
+        return self._offset(block) + i
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("list index out of range")
+        block, offset = self._locate(index)
+        return self._blocks[block][offset]
+
+    def islice(self, start: int, stop: int) -> Iterator[int]:
+        """Values at positions ``start`` to ``stop - 1`` (clamped to the list)"""
+        start, stop = max(0, start), min(stop, self._len)
+        if start >= stop:
+            return
+        block, offset = self._locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            values = self._blocks[block]
+            chunk = values[offset:offset + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            block, offset = block + 1, 0
+
+    def __iter__(self) -> Iterator[int]:
+        for values in self._blocks:
+            yield from values
@@ -0,0 +1,488 @@
+"""
+Compiled Validators - lesson configs compiled once into immutable judge plans
+"""
+import re
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, FrozenSet, List, Optional, Pattern, Tuple, Union
+
+from app.core.config import settings
+from app.core.metrics import regex_duration
+from app.services.llm import ProviderUnavailable, llm_pool
+from app.services.llm_router import ANY_PROVIDER, llm_router
+from app.services.safe_regex import LinearRegex, RegexTimeout, classify, regex_pool
+from app.services.similarity import METRICS, EditDistance, TokenOverlap
+
+JudgeResult = Tuple[bool, str, int]
+
+BLANK = "{{blank}}"
+SIMILARITY_KEYS = ("similarity_metric", "pass_score", "min_score")
+
+
+class ConfigError(ValueError):
+    """Raised when a lesson config cannot be compiled"""
+
+
+# --- Plans ---
+@dataclass(frozen=True)
+class ExactMatchPlan:
+    match_type: str
+    expected: str  # original text, used in feedback
+    compare_expected: str  # case-folded if case-insensitive
+    case_sensitive: bool
+    max_input_length: int
+    pattern: Optional[Pattern] = None
+    matcher: Optional[LinearRegex] = None  # None for patterns that need backtracking
+    scorer: Optional[Union[EditDistance, TokenOverlap]] = None  # "similarity" only
+    pass_score: int = 100  # "similarity": score that counts as solved
+    min_score: int = 0  # "similarity": lower scores get no partial credit
+
+    @property
+    def regex_engine(self) -> Optional[str]:
+        if self.match_type != "regex":
+            return None
+        return "linear" if self.matcher is not None else "backtracking"
+
+    def judge(self, user_input: str):
+        """
+        Judge a submission. Returns a result directly, or an awaitable for
+        regexes outside the linear-time subset (run in a worker with a timeout).
+        """
+        if len(user_input) > self.max_input_length:
+            return self._too_long()
+        if self.match_type == "regex":
+            if self.matcher is not None:
+                started = time.perf_counter()
+                matched = self.matcher.search(user_input)
+                regex_duration.labels("linear").observe(time.perf_counter() - started)
+                return self._regex_result(matched)
+            return self._judge_backtracking(user_input)
+        return self._judge_text(user_input)
+
+    def stream_grader(self) -> "StreamGrader":
+        return StreamGrader(self)
+
+    def judge_blocking(self, user_input: str) -> JudgeResult:
+        """
+        Synchronous variant for scripts and the legacy judge functions.
+        Backtracking regexes still run in the worker pool under its timeout,
+        never inline.
+        """
+        if len(user_input) > self.max_input_length:
+            return self._too_long()
+        if self.match_type == "regex":
+            if self.matcher is not None:
+                return self._regex_result(self.matcher.search(user_input))
+            started = time.perf_counter()
+            try:
+                matched = regex_pool.search_blocking(self.pattern.pattern, self.pattern.flags, user_input)
+            except RegexTimeout:
+                return self._regex_timeout()
+            finally:
+                regex_duration.labels("backtracking").observe(time.perf_counter() - started)
+            return self._regex_result(matched)
+        return self._judge_text(user_input)
+
+    def judge_many(self, user_inputs: List[str]) -> List[JudgeResult]:
+        """
+        ``judge_blocking`` for many answers, e.g. grading a whole class
+        offline. Similarity is scored in one pass over the answers with the
+        expected text's match masks built once and duplicates scored once.
+        """
+        if self.match_type != "similarity":
+            return [self.judge_blocking(user_input) for user_input in user_inputs]
+        fitting = [user_input for user_input in user_inputs if len(user_input) <= self.max_input_length]
+        scores = iter(self.scorer.similarities((self._compare(u).strip() for u in fitting), self.min_score / 100))
+        return [
+            self._similarity_result(next(scores)) if len(user_input) <= self.max_input_length else self._too_long()
+            for user_input in user_inputs
+        ]
+
+    async def _judge_backtracking(self, user_input: str) -> JudgeResult:
+        started = time.perf_counter()
+        try:
+            matched = await regex_pool.search(self.pattern.pattern, self.pattern.flags, user_input)
+        except RegexTimeout:
+            return self._regex_timeout()
+        finally:
+            regex_duration.labels("backtracking").observe(time.perf_counter() - started)
+        return self._regex_result(matched)
+
+    @staticmethod
+    def _regex_timeout() -> JudgeResult:
+        return False, "Checking your answer took too long. Try a shorter answer.", 0
+
+    def _too_long(self) -> JudgeResult:
+        return False, f"Your answer is too long (max {self.max_input_length} characters).", 0
+
+    @staticmethod
+    def _regex_result(matched: bool) -> JudgeResult:
+        if matched:
+            return True, "Excellent! Pattern matched successfully! 🚀", 100
+        return False, "The pattern doesn't match. Try a different approach.", 0
+
+    def _compare(self, user_input: str) -> str:
+        return user_input if self.case_sensitive else user_input.lower()
+
+    def _similarity_result(self, similarity: float) -> JudgeResult:
+        score = int(similarity * 100)
+        if score == 100:
+            return True, "Perfect match! 🎉", 100
+        if score >= self.pass_score:
+            return True, f"Great job! Your answer is {score}% similar to the expected one! ✨", score
+        if score > 0:
+            return False, f"Getting closer: your answer is {score}% similar. Expected: '{self.expected}'", score
+        return False, f"Not quite. Expected: '{self.expected}'", 0
+
+    def _judge_text(self, user_input: str) -> JudgeResult:
+        compare_input = self._compare(user_input)
+
+        if self.match_type == "similarity":
+            return self._similarity_result(self.scorer.similarity(compare_input.strip(), self.min_score / 100))
+
+        if self.match_type == "exact":
+            if compare_input.strip() == self.compare_expected:
+                return True, "Perfect! Exact match achieved! 🎉", 100
+            return False, f"Not quite. Expected exactly: '{self.expected}'", 0
+
+        if self.compare_expected in compare_input:
+            return True, "Great job! Your output contains the required content! ✨", 100
+        return False, f"Your output should contain: '{self.expected}'", 0
+
+
+class StreamGrader:
+    """
+    Grades text that arrives in pieces (e.g. streamed model output).
+
+    ``feed`` returns True once more text cannot change the outcome: a
+    "contains" or linear regex match was seen, an "exact" answer went off
+    track, or the text is over the length limit. ``finish`` judges the full
+    text with the plan, so the final result is always the plan's own.
+    """
+
+    def __init__(self, plan: ExactMatchPlan):
+        self.plan = plan
+        self.decided = False
+        self._pieces: List[str] = []
+        self._length = 0
+        self._tail = ""  # "contains": last len(expected) - 1 characters seen
+        self._head = ""  # "exact": output so far, left-stripped
+        self._scanner = plan.matcher.scanner() if plan.match_type == "regex" and plan.matcher else None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._pieces)
+
+    def feed(self, chunk: str) -> bool:
+        self._pieces.append(chunk)
+        self._length += len(chunk)
+        if self.decided:
+            return True
+
+        plan = self.plan
+        if self._length > plan.max_input_length:
+            self.decided = True
+        elif plan.match_type == "regex":
+            self.decided = self._scanner is not None and self._scanner.feed(chunk)
+        elif plan.match_type != "similarity":  # more text can move a similarity score either way
+            if not plan.case_sensitive:
+                chunk = chunk.lower()
+            if plan.match_type == "contains":
+                window = self._tail + chunk
+                self.decided = plan.compare_expected in window
+                keep = len(plan.compare_expected) - 1
+                self._tail = window[-keep:] if keep > 0 else ""
+            else:
+                self._head = (self._head + chunk).lstrip()
+                self.decided = not self._exact_possible(self._head, plan.compare_expected)
+        return self.decided
+
+    @staticmethod
+    def _exact_possible(head: str, expected: str) -> bool:
+        if len(head) <= len(expected):
+            return expected.startswith(head)
+        return head.startswith(expected) and head[len(expected):].isspace()
+
+    def finish(self):
+        """The plan's result for everything fed so far (may be an awaitable)"""
+        return self.plan.judge(self.text)
+
+
+@dataclass(frozen=True)
+class FillBlankPlan:
+    expected: Tuple[str, ...]  # stripped, case-folded if case-insensitive
+    case_sensitive: bool
+
+    def judge(self, answers: List[str]) -> JudgeResult:
+        total = len(self.expected)
+        if not answers or len(answers) != total:
+            return False, f"Expected {total} answers, got {len(answers or [])}", 0
+
+        if self.case_sensitive:
+            correct = sum(1 for u, e in zip(answers, self.expected) if u.strip() == e)
+        else:
+            correct = sum(1 for u, e in zip(answers, self.expected) if u.strip().lower() == e)
+
+        if correct == total:
+            return True, "All blanks filled correctly! 🎉", 100
+
+        return False, f"You got {correct}/{total} correct. Keep trying!", int(correct / total * 100)
+
+
+@dataclass(frozen=True)
+class MultipleChoicePlan:
+    correct: FrozenSet[int]
+
+    def judge(self, selected: List[int]) -> JudgeResult:
+        if not selected:
+            return False, "Please select an answer.", 0
+
+        if len(selected) == len(self.correct) and frozenset(selected) == self.correct:
+            return True, "Correct answer! 🎉", 100
+
+        return False, "That's not quite right. Try again!", 0
+
+
+@dataclass(frozen=True)
+class ReorderPlan:
+    correct_order: Tuple[int, ...]
+
+    def judge(self, user_order: List[int]) -> JudgeResult:
+        if not user_order:
+            return False, "Please arrange the items.", 0
+
+        if tuple(user_order) == self.correct_order:
+            return True, "Perfect order! 🎉", 100
+
+        # Partial credit
+        correct_positions = sum(1 for u, c in zip(user_order, self.correct_order) if u == c)
+        total = len(self.correct_order)
+        score = int(correct_positions / total * 100)
+
+        return False, f"Almost! {correct_positions}/{total} items in the right position.", score
+
+
+@dataclass(frozen=True)
+class LLMPlan:
+    """Runs the user's prompt through a model, then grades the output with ``grader``"""
+    system_prompt: str
+    provider: str
+    model: Optional[str]
+    grader: ExactMatchPlan
+    max_prompt_length: int
+
+    def _check_prompt(self, user_prompt: str) -> Optional[tuple]:
+        if not user_prompt.strip():
+            return False, "Please write a prompt.", 0, None
+        if len(user_prompt) > self.max_prompt_length:
+            return False, f"Your prompt is too long (max {self.max_prompt_length} characters).", 0, None
+        return None
+
+    async def judge(self, submission: Tuple[str, Optional[str]]) -> tuple:
+        """Returns ``(success, feedback, score, ai_output)``"""
+        user_prompt, provider = submission
+        rejected = self._check_prompt(user_prompt)
+        if rejected:
+            return rejected
+
+        try:
+            output = await llm_router.complete(provider or self.provider, self.system_prompt, user_prompt, self.model)
+        except ProviderUnavailable as e:
+            return False, str(e), 0, None
+
+        result = self.grader.judge(output)
+        if not isinstance(result, tuple):
+            result = await result
+        return (*result, output)
+
+    async def stream(self, submission: Tuple[str, Optional[str]]) -> AsyncIterator[tuple]:
+        """
+        Yields ``("token", text)`` as the model writes, then one
+        ``("result", (success, feedback, score, ai_output))``.
+
+        Generation is cut off as soon as the grader has decided, and when the
+        consumer closes this generator (client gone).
+        """
+        user_prompt, provider = submission
+        rejected = self._check_prompt(user_prompt)
+        if rejected:
+            yield "result", rejected
+            return
+
+        try:
+            provider, model = llm_router.pick(provider or self.provider, self.model)
+        except ProviderUnavailable as e:
+            yield "result", (False, str(e), 0, None)
+            return
+
+        grader = self.grader.stream_grader()
+        tokens = llm_pool.stream(provider, self.system_prompt, user_prompt, model)
+        try:
+            async for text in tokens:
+                yield "token", text
+                if grader.feed(text):
+                    break
+        except ProviderUnavailable as e:
+            yield "result", (False, str(e), 0, None)
+            return
+        finally:
+            await tokens.aclose()
+
+        result = grader.finish()
+        if not isinstance(result, tuple):
+            result = await result
+        yield "result", (*result, grader.text)
+
+
+@dataclass(frozen=True)
+class InvalidPlan:
+    """Stand-in for a stored config that no longer compiles"""
+    feedback: str
+
+    def judge(self, *_) -> JudgeResult:
+        return False, self.feedback, 0
+
+
+# --- Compilers ---
+def _list(config: dict, key: str) -> list:
+    value = config.get(key)
+    if not isinstance(value, list):
+        raise ConfigError(f"'{key}' must be a list")
+    return value
+
+
+def _int_list(config: dict, key: str) -> List[int]:
+    values = _list(config, key)
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        raise ConfigError(f"'{key}' must be a list of integers")
+    return values
+
+
+def _percent(config: dict, key: str, default: int) -> int:
+    value = config.get(key, default)
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 100:
+        raise ConfigError(f"'{key}' must be an integer from 0 to 100")
+    return value
+
+
+def _max_length(config: dict) -> int:
+    """``max_input_length``, or JUDGE_MAX_INPUT_LENGTH when it is not set (0 is invalid, not unset)"""
+    value = config.get("max_input_length")
+    if value is None:
+        return settings.JUDGE_MAX_INPUT_LENGTH
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ConfigError("'max_input_length' must be a positive integer")
+    return value
+
+
+def compile_exact_match(config: dict) -> ExactMatchPlan:
+    expected = config.get("expected", "")
+    if not isinstance(expected, str):
+        raise ConfigError("'expected' must be a string")
+    case_sensitive = bool(config.get("case_sensitive", True))
+    match_type = config.get("match_type", "exact")
+
+    max_input_length = _max_length(config)
+
+    if match_type == "regex":
+        try:
+            pattern = re.compile(expected, 0 if case_sensitive else re.IGNORECASE)
+        except re.error as e:
+            raise ConfigError(f"Invalid regex pattern: {e}")
+        matcher = classify(expected, ignorecase=not case_sensitive)
+        return ExactMatchPlan(match_type, expected, expected, case_sensitive, max_input_length, pattern, matcher)
+
+    compare_expected = expected if case_sensitive else expected.lower()
+    if match_type == "similarity":
+        metric = config.get("similarity_metric") or "edit"
+        if metric not in METRICS:
+            raise ConfigError(f"Unknown similarity metric '{metric}'")
+        pass_score = _percent(config, "pass_score", settings.JUDGE_SIMILARITY_PASS_SCORE)
+        min_score = _percent(config, "min_score", settings.JUDGE_SIMILARITY_MIN_SCORE)
+        if min_score > pass_score:
+            raise ConfigError("'min_score' must not be above 'pass_score'")
+        compare_expected = compare_expected.strip()
+        return ExactMatchPlan(
+            match_type, expected, compare_expected, case_sensitive, max_input_length,
+            scorer=METRICS[metric](compare_expected), pass_score=pass_score, min_score=min_score,
+        )
+    if match_type == "exact":
+        compare_expected = compare_expected.strip()
+    elif match_type != "contains":
+        raise ConfigError(f"Unknown match type '{match_type}'")
+
+    return ExactMatchPlan(match_type, expected, compare_expected, case_sensitive, max_input_length)
+
+
+def compile_llm(config: dict) -> LLMPlan:
+    system_prompt = config.get("system_prompt", "")
+    if not isinstance(system_prompt, str):
+        raise ConfigError("'system_prompt' must be a string")
+    provider = config.get("provider") or "openai"
+    if provider != ANY_PROVIDER and provider not in llm_pool.providers:
+        raise ConfigError(f"Unknown provider '{provider}'")
+    model = config.get("model") or None
+    if model is not None and not isinstance(model, str):
+        raise ConfigError("'model' must be a string")
+    if model is not None and provider == ANY_PROVIDER:
+        raise ConfigError("'model' needs a specific provider")
+
+    max_prompt_length = _max_length(config)
+
+    # Same options as exact_match, but case-insensitive "contains" fits free-form model output better.
+    # max_input_length limits the student's prompt, not the model's output.
+    grader = compile_exact_match({
+        "match_type": "contains",
+        "case_sensitive": False,
+        **{k: config[k] for k in SIMILARITY_KEYS + ("expected", "match_type", "case_sensitive") if k in config},
+    })
+    return LLMPlan(system_prompt, provider, model, grader, max_prompt_length)
+
+
+def compile_fill_blank(config: dict) -> FillBlankPlan:
+    answers = _list(config, "answers")
+    if not answers or not all(isinstance(a, str) for a in answers):
+        raise ConfigError("'answers' must be a non-empty list of strings")
+
+    template = config.get("template")
+    if isinstance(template, str) and template.count(BLANK) != len(answers):
+        raise ConfigError(
+            f"Template has {template.count(BLANK)} blanks but {len(answers)} answers were given"
+        )
+
+    case_sensitive = bool(config.get("case_sensitive", False))
+    expected = tuple(a.strip() if case_sensitive else a.strip().lower() for a in answers)
+    return FillBlankPlan(expected, case_sensitive)
+
+
+def compile_multiple_choice(config: dict) -> MultipleChoicePlan:
+    correct = _int_list(config, "correct")
+    if not correct:
+        raise ConfigError("'correct' must list at least one option")
+    if len(set(correct)) != len(correct):
+        raise ConfigError("'correct' contains duplicate options")
+
+    options = config.get("options")
+    if isinstance(options, list) and any(i < 0 or i >= len(options) for i in correct):
+        raise ConfigError("'correct' refers to an option that does not exist")
+    if not config.get("multi", False) and len(correct) > 1:
+        raise ConfigError("Only one correct option is allowed unless 'multi' is set")
+
+    return MultipleChoicePlan(frozenset(correct))
+
+
+def compile_reorder(config: dict) -> ReorderPlan:
+    correct_order = _int_list(config, "correct_order")
+    if not correct_order:
+        raise ConfigError("'correct_order' must not be empty")
+    if sorted(correct_order) != list(range(len(correct_order))):
+        raise ConfigError("'correct_order' must be a permutation of the item indices")
+
+    items = config.get("items")
+    if isinstance(items, list) and len(items) != len(correct_order):
+        raise ConfigError(
+            f"'items' has {len(items)} entries but 'correct_order' has {len(correct_order)}"
+        )
+
+    return ReorderPlan(tuple(correct_order))
+
@@ -0,0 +1,15 @@
+"""
+Benchmarks - micro-benchmarks for the judges and the leaderboard, and a load generator for the app
+
+Run from ``backend/``:
+
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.load --duration 30 --concurrency 32 --output load.json
+    python -m benchmarks.leaderboard --users 1000000 --output leaderboard.json
+    python -m benchmarks.startup --runs 5 --output startup.json
+    python -m benchmarks.compare baseline.json micro.json
+
+Nothing here needs a real Supabase project: ``benchmarks.fake_supabase``
+serves the PostgREST, RPC and GoTrue endpoints the app uses, seeded with
+the lessons from the migrations.
+"""
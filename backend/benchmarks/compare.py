@@ -0,0 +1,96 @@
+"""
+Compare - diff a benchmark run against a stored baseline
+
+    python -m benchmarks.compare baseline.json current.json --threshold 0.10
+
+Exits with status 1 if any tracked metric regressed by more than the
+threshold, so it can gate CI. Throughput (``ops_per_sec``, ``rps``) must
+not drop; latency percentiles must not rise.
+"""
+import argparse
+import sys
+from typing import List, Optional, Sequence
+
+from benchmarks import report
+
+HIGHER_IS_BETTER = ("ops_per_sec", "rps")
+DEFAULT_METRICS = ("ops_per_sec", "rps", "p50_us", "p99_us", "p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(baseline: dict, current: dict, threshold: float, metrics: Sequence[str] = DEFAULT_METRICS) -> List[dict]:
+    """One row per (benchmark, metric) present in both runs"""
+    if baseline.get("kind") != current.get("kind"):
+        raise ValueError(f"Cannot compare a '{baseline.get('kind')}' run with a '{current.get('kind')}' run")
+
+    rows = []
+    for name, current_result in current["results"].items():
+        baseline_result = baseline["results"].get(name)
+        if baseline_result is None:
+            continue
+        for metric in metrics:
+            before, after = baseline_result.get(metric), current_result.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append({
+                "benchmark": name,
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "change": round(change, 4),
+                "regression": worse > threshold,
+            })
+    return rows
+
+
+def render(rows: List[dict]) -> str:
+    lines = [f"{'benchmark':<36} {'metric':<12} {'baseline':>12} {'current':>12} {'change':>9}"]
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['benchmark']:<36} {row['metric']:<12} {row['baseline']:>12} {row['current']:>12} "
+            f"{row['change'] * 100:>+8.1f}%{flag}"
+        )
+    return "\n".join(lines)
+
+
+def config_changes(baseline: dict, current: dict) -> List[str]:
+    """Settings that differ between the runs; numbers from different setups aren't comparable"""
+    before, after = baseline.get("config", {}), current.get("config", {})
+    return sorted(key for key in set(before) | set(after) if key != "duration" and before.get(key) != after.get(key))
+
+
+def check(baseline_path: str, current: dict, threshold: float) -> bool:
+    """Print the comparison to stderr; True if nothing regressed"""
+    baseline = report.load(baseline_path)
+    rows = compare(baseline, current, threshold)
+    changed = config_changes(baseline, current)
+    if changed:
+        print(f"note: run settings differ from the baseline: {', '.join(changed)}", file=sys.stderr)
+    print(render(rows), file=sys.stderr)
+    return not any(row["regression"] for row in rows)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression (0.10 = 10%%)")
+    parser.add_argument("--metrics", default=",".join(DEFAULT_METRICS), help="comma-separated metric names")
+    args = parser.parse_args(argv)
+
+    baseline, current = report.load(args.baseline), report.load(args.current)
+    try:
+        rows = compare(baseline, current, args.threshold, args.metrics.split(","))
+    except ValueError as e:
+        parser.error(str(e))
+    changed = config_changes(baseline, current)
+    if changed:
+        print(f"note: run settings differ from the baseline: {', '.join(changed)}", file=sys.stderr)
+    print(render(rows))
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Fake LLM provider - OpenAI, Anthropic and Gemini shaped endpoints on one
+server, for benchmarks and tests that must not call (or pay for) a real model.
+
+    python -m benchmarks.fake_llm --port 8787 --latency 0.3 --error-rate 0.05
+
+Point the app at it with ``OPENAI_BASE_URL``, ``ANTHROPIC_BASE_URL``,
+``GOOGLE_AI_BASE_URL`` and ``XAI_BASE_URL`` set to ``http://127.0.0.1:8787/v1``
+(any non-empty API key). The model answers with the user prompt itself, so
+a lesson's expected output is whatever the student asks for.
+
+Every request sleeps ``latency`` (+ up to ``jitter``) seconds before
+answering; streamed responses spread that delay over their chunks. A
+fraction ``error_rate`` of requests fails with ``error_status`` instead.
+"""
+import argparse
+import asyncio
+import json
+import random
+from typing import Callable, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_PORT = 8787
+
+
+def echo(model: str, system_prompt: str, user_prompt: str) -> str:
+    return user_prompt
+
+
+class FakeLLM:
+    """Behaviour and counters shared by the fake endpoints"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0,
+        reply: Callable[[str, str, str], str] = echo,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply = reply
+        self._rng = random.Random(seed)
+
+        self.requests: List[dict] = []  # {"api", "model", "headers", "body"} of every request
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chunks_sent = 0
+
+    def delay(self) -> float:
+        return self.latency + (self._rng.random() * self.jitter if self.jitter else 0.0)
+
+    def fails(self) -> bool:
+        return bool(self.error_rate) and self._rng.random() < self.error_rate
+
+
+def _chunks(text: str) -> List[str]:
+    """``text`` split after each space, the way models stream roughly a word at a time"""
+    words = text.split(" ")
+    return [word + " " for word in words[:-1]] + [words[-1]] if text else []
+
+
+def _sse(events) -> str:
+    return "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+
+
+def _openai(model: str, text: str) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+    }
+
+
+def _openai_chunk(model: str, text: str) -> dict:
+    return {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "model": model,
+            "choices": [{"index": 0, "delta": {"content": text}}]}
+
+
+def _anthropic(model: str, text: str) -> dict:
+    return {
+        "id": "msg_fake",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+    }
+
+
+def _anthropic_chunk(model: str, text: str) -> dict:
+    return {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text}}
+
+
+def _gemini(model: str, text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}]}
+
+
+def create_app(state: FakeLLM) -> FastAPI:
+    app = FastAPI(title="Fake LLM")
+
+    async def answer(
+        api: str,
+        request: Request,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        stream: bool,
+        key: Optional[str],
+    ):
+        body = await request.json()
+        state.requests.append({"api": api, "model": model, "headers": dict(request.headers), "body": body})
+        if not key:
+            state.errors += 1
+            return JSONResponse({"error": {"message": "missing API key"}}, status_code=401)
+
+        text = state.reply(model, system_prompt, user_prompt)
+        build, build_chunk = {
+            "openai": (_openai, _openai_chunk),
+            "anthropic": (_anthropic, _anthropic_chunk),
+            "gemini": (_gemini, _gemini),
+        }[api]
+        delay = state.delay()
+        state.in_flight += 1
+        state.max_in_flight = max(state.max_in_flight, state.in_flight)
+
+        if not stream:
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                state.in_flight -= 1
+            if state.fails():
+                state.errors += 1
+                return JSONResponse({"error": {"message": "injected failure"}}, status_code=state.error_status)
+            return build(model, text)
+
+        if state.fails():
+            state.in_flight -= 1
+            state.errors += 1
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=state.error_status)
+
+        chunks = _chunks(text)
+
+        async def events():
+            try:
+                if api == "anthropic":
+                    yield _sse([{"type": "message_start", "message": _anthropic(model, "")}])
+                for chunk in chunks:
+                    await asyncio.sleep(delay / len(chunks))
+                    state.chunks_sent += 1
+                    yield _sse([build_chunk(model, chunk)])
+                if api == "openai":
+                    yield "data: [DONE]\n\n"
+                elif api == "anthropic":
+                    yield _sse([{"type": "message_stop"}])
+            finally:
+                state.in_flight -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        system_prompt = "".join(m["content"] for m in messages if m["role"] == "system")
+        user_prompt = "".join(m["content"] for m in messages if m["role"] == "user")
+        key = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        return await answer(
+            "openai", request, body.get("model", ""), system_prompt, user_prompt, bool(body.get("stream")), key,
+        )
+
+    @app.post("/v1/messages")
+    async def anthropic_messages(request: Request):
+        body = await request.json()
+        user_prompt = "".join(m["content"] for m in body.get("messages", []) if m["role"] == "user")
+        return await answer(
+            "anthropic", request, body.get("model", ""), body.get("system", ""), user_prompt,
+            bool(body.get("stream")), request.headers.get("x-api-key"),
+        )
+
+    @app.post("/v1/models/{target}")
+    async def gemini_generate(target: str, request: Request):
+        model, _, method = target.partition(":")
+        body = await request.json()
+        system_prompt = "".join(part["text"] for part in body.get("systemInstruction", {}).get("parts", []))
+        user_prompt = "".join(
+            part["text"] for content in body.get("contents", []) for part in content.get("parts", [])
+        )
+        return await answer(
+            "gemini", request, model, system_prompt, user_prompt,
+            method == "streamGenerateContent", request.headers.get("x-goog-api-key"),
+        )
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds, uniformly")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    state = FakeLLM(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(state), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+"""
+Fake Supabase - an in-memory stand-in for the PostgREST, RPC and GoTrue
+endpoints the app calls, for benchmarks that must not depend on a live project.
+
+    python -m benchmarks.fake_supabase --port 54321 --latency 0.005
+
+Lessons are seeded from the ``INSERT INTO public.lessons`` statement in the
+migrations, so the benchmark data is the data users actually get. Every
+request sleeps ``latency`` (+ up to ``jitter``) seconds first, to stand in
+for the network hop to a hosted project. Like PostgREST, reads and
+set-returning RPCs return at most ``max_rows`` rows (supabase/config.toml).
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+from starlette.datastructures import QueryParams
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "supabase" / "migrations"
+
+ADMIN_ID = "00000000-0000-0000-0000-00000000a000"
+DEFAULT_JWT_SECRET = "benchmark-jwt-secret"
+DEFAULT_MAX_ROWS = 1000
+
+_INSERT_LESSONS = re.compile(r"INSERT\s+INTO\s+public\.lessons\s*\(([^)]*)\)\s*VALUES", re.IGNORECASE)
+_SQL_STRING_OR_COMMENT = re.compile(r"'(?:[^']|'')*'|--[^\n]*")
+_SQL_TOKEN = re.compile(
+    r"\s+|--[^\n]*|'(?:[^']|'')*'|-?\d+(?:\.\d+)?|[A-Za-z_]+|[(),;]"
+)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _sql_value(token: str) -> Any:
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'")
+    lowered = token.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "null":
+        return None
+    if re.fullmatch(r"-?\d+", token):
+        return int(token)
+    if re.fullmatch(r"-?\d+\.\d+", token):
+        return float(token)
+    raise ValueError(f"Unsupported SQL literal: {token}")
+
+
+def parse_seed_lessons(sql: str) -> List[dict]:
+    """Rows of every ``INSERT INTO public.lessons (...) VALUES (...), ...;`` in ``sql``"""
+    rows = []
+    comments = [m.span() for m in _SQL_STRING_OR_COMMENT.finditer(sql) if m.group().startswith("--")]
+    for match in _INSERT_LESSONS.finditer(sql):
+        if any(start <= match.start() < end for start, end in comments):
+            continue
+        columns = [c.strip() for c in match.group(1).split(",")]
+        row: Optional[list] = None
+        for token in _SQL_TOKEN.findall(sql, match.end()):
+            if token.isspace() or token.startswith("--") or token == ",":
+                continue
+            if token == ";":
+                break
+            if token == "(":
+                row = []
+            elif token == ")":
+                rows.append(dict(zip(columns, row)))
+                row = None
+            elif row is not None:
+                row.append(_sql_value(token))
+    return rows
+
+
+def seed_lessons(migrations_dir: Path = MIGRATIONS_DIR) -> List[dict]:
+    """Lessons from the migrations, with the column defaults Postgres would fill in"""
+    lessons = []
+    for path in sorted(migrations_dir.glob("*.sql")):
+        lessons.extend(parse_seed_lessons(path.read_text(encoding="utf-8")))
+
+    created = _now()
+    for lesson in lessons:
+        if isinstance(lesson.get("config"), str):
+            lesson["config"] = json.loads(lesson["config"])
+        lesson.setdefault("description", None)
+        lesson.setdefault("difficulty", "beginner")
+        lesson.setdefault("order_index", 0)
+        lesson.setdefault("time_limit", None)
+        lesson.setdefault("is_published", False)
+        lesson.setdefault("created_at", created)
+        lesson.setdefault("updated_at", created)
+    return lessons
+
+
+def user_id(index: int) -> str:
+    """Deterministic id of the ``index``-th seeded (non-admin) user"""
+    return str(uuid.UUID(int=index + 1))
+
+
+def mint_token(
+    user_id: str,
+    secret: str,
+    issuer: str,
+    email: Optional[str] = None,
+    user_metadata: Optional[dict] = None,
+    ttl: int = 3600,
+) -> str:
+    """An HS256 access token shaped like the ones GoTrue issues"""
+    now = int(time.time())
+    claims = {
+        "sub": user_id,
+        "aud": "authenticated",
+        "iss": issuer,
+        "role": "authenticated",
+        "email": email or f"{user_id}@bench.local",
+        "user_metadata": user_metadata or {},
+        "app_metadata": {"provider": "email"},
+        "iat": now,
+        "exp": now + ttl,
+    }
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+class FakeSupabase:
+    """The tables, users and stored-function state behind the fake endpoints"""
+
+    def __init__(
+        self,
+        users: int = 100,
+        jwt_secret: str = DEFAULT_JWT_SECRET,
+        lessons: Optional[List[dict]] = None,
+        max_rows: int = DEFAULT_MAX_ROWS,
+    ):
+        self.jwt_secret = jwt_secret
+        self.max_rows = max_rows
+        self.tables: Dict[str, List[dict]] = {
+            "lessons": lessons if lessons is not None else seed_lessons(),
+            "user_progress": [],
+            "user_credits": [],
+            "credit_ledger": [],
+        }
+        self.users: Dict[str, dict] = {}
+        self._add_user(ADMIN_ID, "admin@bench.local", {"role": "admin"})
+        for index in range(users):
+            self._add_user(user_id(index), f"user{index}@bench.local", {})
+
+        self.credits: Dict[str, int] = {}
+        self.ledger: Dict[tuple, dict] = {}
+        self.buckets: Dict[str, tuple] = {}
+        self.requests = 0
+
+    def _add_user(self, uid: str, email: str, metadata: dict) -> None:
+        self.users[uid] = {
+            "id": uid,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": email,
+            "user_metadata": dict(metadata),
+            "app_metadata": {"provider": "email"},
+            "created_at": "2026-01-01T00:00:00Z",
+            "email_confirmed_at": "2026-01-01T00:00:00Z",
+            "last_sign_in_at": None,
+        }
+
+    # --- PostgREST ---
+
+    def capped(self, result: Any) -> Any:
+        """``result`` as a response body: row lists are cut to ``max_rows`` (0 = no cap)"""
+        if self.max_rows and isinstance(result, list):
+            return result[:self.max_rows]
+        return result
+
+    def select(self, table: str, params) -> List[dict]:
+        rows = self.tables.setdefault(table, [])
+        for column, expr in params.multi_items():
+            if column in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            op, _, value = expr.partition(".")
+            rows = [row for row in rows if _matches(row.get(column), op, value)]
+
+        for clause in reversed(params.get("order", "").split(",") if "order" in params else []):
+            column, _, direction = clause.partition(".")
+            rows = sorted(
+                rows,
+                key=lambda row: (row.get(column) is None, row.get(column)),
+                reverse=direction.startswith("desc"),
+            )
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        return rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+
+    def count(self, table: str, params) -> int:
+        """How many rows match the filters, whatever the range (``Prefer: count=exact``)"""
+        unranged = [(key, value) for key, value in params.multi_items() if key not in ("offset", "limit")]
+        return len(self.select(table, QueryParams(unranged)))
+
+    def insert(self, table: str, rows: List[dict], upsert_on: Optional[List[str]]) -> List[dict]:
+        existing = self.tables.setdefault(table, [])
+        written = []
+        for row in rows:
+            if upsert_on:
+                current = next(
+                    (r for r in existing if all(r.get(c) == row.get(c) for c in upsert_on)), None
+                )
+                if current is not None:
+                    current.update(row, updated_at=_now())
+                    written.append(current)
+                    continue
+            row = dict(row)
+            row.setdefault("id", max((r.get("id") or 0 for r in existing), default=0) + 1)
+            row.setdefault("created_at", _now())
+            row.setdefault("updated_at", row["created_at"])
+            existing.append(row)
+            written.append(row)
+        return written
+
+    # --- Stored functions (see supabase/migrations) ---
+
+    def ensure_credits(self, uid: str, default: int) -> int:
+        return self.credits.setdefault(uid, default)
+
+    def deduct_credits(self, uid: str, amount: int, key: str, default: int) -> dict:
+        balance = self.ensure_credits(uid, default)
+        entry = self.ledger.get((uid, key))
+        if entry is not None:
+            return {"balance": entry["balance"], "charged": entry["charged"], "replayed": True}
+        charged = min(balance, amount)
+        self.credits[uid] = balance - charged
+        self.ledger[(uid, key)] = {"balance": self.credits[uid], "charged": charged}
+        return {"balance": self.credits[uid], "charged": charged, "replayed": False}
+
+    def apply_credit_entry(self, entry: dict, default: int) -> dict:
+        row = {"user_id": entry["user_id"], "idempotency_key": entry["idempotency_key"]}
+        if entry["user_id"] not in self.users:
+            # What the user_credits foreign key does to a deleted account
+            return dict(row, balance=None, charged=None, replayed=None, error="violates foreign key constraint")
+        return dict(row, error=None, **self.deduct_credits(entry["user_id"], entry["amount"], entry["idempotency_key"], default))
+
+    def record_progress(self, rows: List[dict]) -> int:
+        progress = self.tables["user_progress"]
+        lesson_ids = {lesson["id"] for lesson in self.tables["lessons"]}
+        # Like the function, rows for a deleted user or lesson are skipped
+        rows = [row for row in rows if row["user_id"] in self.users and row["lesson_id"] in lesson_ids]
+        for row in rows:
+            current = next(
+                (r for r in progress if r["user_id"] == row["user_id"] and r["lesson_id"] == row["lesson_id"]),
+                None,
+            )
+            if current is None:
+                progress.append(dict(row, id=len(progress) + 1))
+                continue
+            current["attempts"] += row["attempts"]
+            current["score"] = max(current["score"], row["score"])
+            current["completed"] = current["completed"] or row["completed"]
+            current["completed_at"] = current["completed_at"] or row["completed_at"]
+        return len(rows)
+
+    def import_lessons(self, rows: List[dict]) -> dict:
+        lessons = self.tables["lessons"]
+        by_id = {lesson["id"]: lesson for lesson in lessons}
+        next_id = max([0, *by_id, *(row.get("id") or 0 for row in rows)])
+        created, updated = [], []
+        for row in rows:
+            current = by_id.get(row.get("id"))
+            if current is not None:
+                current.update(row, updated_at=_now())
+                updated.append(current["id"])
+                continue
+            if row.get("id") is None:
+                next_id += 1
+                row = dict(row, id=next_id)
+            row = dict(row, created_at=_now())
+            row["updated_at"] = row["created_at"]
+            lessons.append(row)
+            by_id[row["id"]] = row
+            created.append(row["id"])
+        return {"created": sorted(created), "updated": sorted(updated)}
+
+    def take_rate_tokens(self, key: str, rate: float, burst: float, cost: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= cost:
+            self.buckets[key] = (tokens - cost, now)
+            return 0.0
+        self.buckets[key] = (tokens, now)
+        return (cost - tokens) / rate
+
+    def rpc(self, name: str, body: dict) -> Any:
+        if name == "ensure_credits":
+            return self.ensure_credits(body["p_user_id"], body["p_default"])
+        if name == "deduct_credits":
+            return [self.deduct_credits(
+                body["p_user_id"], body["p_amount"], body["p_idempotency_key"], body["p_default"]
+            )]
+        if name == "apply_credit_batch":
+            return [self.apply_credit_entry(entry, body["p_default"]) for entry in body["p_entries"]]
+        if name == "record_progress":
+            return self.record_progress(body["p_rows"])
+        if name == "import_lessons":
+            return self.import_lessons(body["p_rows"])
+        if name == "take_rate_tokens":
+            return self.take_rate_tokens(body["p_key"], body["p_rate"], body["p_burst"], body.get("p_cost", 1))
+        raise KeyError(name)
+
+    # --- GoTrue ---
+
+    def user_for_token(self, token: str) -> Optional[dict]:
+        try:
+            claims = jwt.decode(token, self.jwt_secret, algorithms=["HS256"], options={"verify_aud": False})
+        except JWTError:
+            return None
+        return self.users.get(claims.get("sub"))
+
+
+def _coerce(value: str) -> Any:
+    if value in ("true", "false"):
+        return value == "true"
+    if value == "null":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _matches(actual: Any, op: str, raw: str) -> bool:
+    if op == "in":
+        return actual in [_coerce(v.strip('"')) for v in raw.strip("()").split(",")]
+    if op == "is":
+        return actual is _coerce(raw)
+    value = _coerce(raw)
+    if op == "eq":
+        return actual == value
+    if op == "neq":
+        return actual != value
+    if actual is None:
+        return False
+    # Timestamps compare as ISO strings, everything else natively
+    if isinstance(value, str) or isinstance(actual, str):
+        actual, value = str(actual), str(value)
+    if op == "gt":
+        return actual > value
+    if op == "gte":
+        return actual >= value
+    if op == "lt":
+        return actual < value
+    if op == "lte":
+        return actual <= value
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse({"message": message, "msg": message, "code": status_code}, status_code=status_code)
+
+
+def create_app(state: FakeSupabase, latency: float = 0.0, jitter: float = 0.0, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Fake Supabase")
+    rng = random.Random(seed)
+
+    @app.middleware("http")
+    async def injected_latency(request: Request, call_next):
+        state.requests += 1
+        delay = latency + (rng.random() * jitter if jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        return await call_next(request)
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        rows = state.capped(state.select(table, request.query_params))
+        if "count=exact" not in request.headers.get("prefer", ""):
+            return rows
+        offset = int(request.query_params.get("offset", 0))
+        total = state.count(table, request.query_params)
+        span = f"{offset}-{offset + len(rows) - 1}" if rows else "*"
+        return JSONResponse(rows, headers={"Content-Range": f"{span}/{total}"})
+
+    @app.post("/rest/v1/rpc/{name}")
+    async def rpc(name: str, request: Request):
+        try:
+            return state.capped(state.rpc(name, await request.json()))
+        except KeyError:
+            return _error(404, f"Could not find the function public.{name}")
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        upsert_on = None
+        if "merge-duplicates" in request.headers.get("prefer", ""):
+            upsert_on = request.query_params.get("on_conflict", "id").split(",")
+        return JSONResponse(state.insert(table, rows, upsert_on), status_code=201)
+
+    @app.patch("/rest/v1/{table}")
+    async def update(table: str, request: Request):
+        changes = await request.json()
+        rows = state.select(table, request.query_params)
+        for row in rows:
+            row.update(changes, updated_at=_now())
+        return rows
+
+    @app.delete("/rest/v1/{table}")
+    async def delete(table: str, request: Request):
+        rows = state.select(table, request.query_params)
+        state.tables[table] = [row for row in state.tables[table] if row not in rows]
+        return rows
+
+    @app.get("/auth/v1/user")
+    async def get_user(request: Request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        user = state.user_for_token(token)
+        if user is None:
+            return _error(401, "invalid JWT")
+        return user
+
+    @app.get("/auth/v1/.well-known/jwks.json")
+    async def jwks():
+        # HS256 only; the app verifies with SUPABASE_JWT_SECRET
+        return {"keys": []}
+
+    @app.get("/auth/v1/admin/users")
+    async def list_users(page: int = 1, per_page: int = 50):
+        users = list(state.users.values())
+        return JSONResponse(
+            {"users": users[(page - 1) * per_page:page * per_page], "aud": "authenticated"},
+            headers={"X-Total-Count": str(len(users))},
+        )
+
+    @app.get("/auth/v1/admin/users/{uid}")
+    async def get_user_by_id(uid: str):
+        if uid not in state.users:
+            return _error(404, "User not found")
+        return state.users[uid]
+
+    @app.put("/auth/v1/admin/users/{uid}")
+    async def update_user(uid: str, request: Request):
+        if uid not in state.users:
+            return _error(404, "User not found")
+        body = await request.json()
+        state.users[uid]["user_metadata"].update(body.get("user_metadata", {}))
+        return state.users[uid]
+
+    @app.delete("/auth/v1/admin/users/{uid}")
+    async def delete_user(uid: str):
+        state.users.pop(uid, None)
+        return {}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds, uniformly")
+    parser.add_argument("--users", type=int, default=100, help="seeded users besides the admin")
+    parser.add_argument("--jwt-secret", default=DEFAULT_JWT_SECRET)
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS, help="rows per response (0 = no cap)")
+    args = parser.parse_args()
+
+    state = FakeSupabase(users=args.users, jwt_secret=args.jwt_secret, max_rows=args.max_rows)
+    app = create_app(state, latency=args.latency, jitter=args.jitter)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Leaderboard benchmark - build time, memory and query latency at scale
+
+    python -m benchmarks.leaderboard --users 1000000 --output leaderboard.json
+
+Builds the leaderboard from a synthetic ``user_progress`` table (each user
+has ``--lessons-per-user`` rows spread over ``--lessons`` lessons, a third
+of them completed) through the same keyset-paged ``rebuild`` the app runs
+at startup. The build is run twice: once timed, once under tracemalloc for
+the memory it keeps (``retained_mb``) and its high-water mark (``peak_mb``).
+Then top-K, rank, around and record are timed like the micro-benchmarks.
+"""
+import argparse
+import asyncio
+import gc
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from itertools import cycle
+from typing import List, Optional, Sequence
+
+from app.services.leaderboard import Leaderboard
+from benchmarks import compare, report
+from benchmarks.micro import run_case
+
+EPOCH = int(datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp())
+
+
+class SyntheticProgress:
+    """Stands in for ProgressRepository: rows are generated per page, never all held at once"""
+
+    def __init__(self, users: int, lessons: int, per_user: int, seed: int):
+        self.users = users
+        self.lessons = lessons
+        self.per_user = min(per_user, lessons)
+        self.seed = seed
+
+    @property
+    def rows(self) -> int:
+        return self.users * self.per_user
+
+    def user_id(self, index: int) -> str:
+        return str(uuid.UUID(int=index + 1))
+
+    def row(self, row_id: int) -> dict:
+        user, slot = divmod(row_id - 1, self.per_user)
+        # Cheap deterministic scramble; seeding a Random per row would dominate the build time
+        mixed = ((row_id + self.seed) * 2654435761) & 0xFFFFFFFF
+        completed = mixed % 3 == 0
+        return {
+            "id": row_id,
+            "user_id": self.user_id(user),
+            "lesson_id": (user + slot) % self.lessons + 1,
+            "score": (mixed >> 8) % 101,
+            "completed": completed,
+            "completed_at": (
+                datetime.fromtimestamp(EPOCH + (mixed >> 4) % (86400 * 90), timezone.utc).isoformat()
+                if completed else None
+            ),
+        }
+
+    async def list_after(self, after_id: int, limit: int) -> List[dict]:
+        return [self.row(row_id) for row_id in range(after_id + 1, min(after_id + limit, self.rows) + 1)]
+
+
+def _build(progress: SyntheticProgress, page_size: int) -> Leaderboard:
+    board = Leaderboard(rebuild_interval=0, page_size=page_size, replay_window=0)
+    asyncio.run(board.rebuild(progress))
+    return board
+
+
+def measure_build(progress: SyntheticProgress, page_size: int) -> tuple:
+    started = time.perf_counter()
+    board = _build(progress, page_size)
+    seconds = time.perf_counter() - started
+    del board
+    gc.collect()
+
+    # Row generation is allocated and freed page by page, so it barely shows in either number
+    tracemalloc.start()
+    board = _build(progress, page_size)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "users": progress.users,
+        "rows": progress.rows,
+        "build_s": round(seconds, 3),
+        "rows_per_sec": round(progress.rows / seconds, 1),
+        "retained_mb": round(retained / 2 ** 20, 1),
+        "peak_mb": round(peak / 2 ** 20, 1),
+        "bytes_per_user": round(retained / progress.users, 1),
+        "bytes_per_row": round(retained / progress.rows, 1),
+        "board": board.stats(),
+    }, board
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--lessons", type=int, default=8)
+    parser.add_argument("--lessons-per-user", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=1000, help="rows per rebuild page")
+    parser.add_argument("--samples", type=int, default=100, help="timed batches per query")
+    parser.add_argument("--min-batch-time", type=float, default=0.002, help="seconds per timed batch")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this report; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    progress = SyntheticProgress(args.users, args.lessons, args.lessons_per_user, args.seed)
+    build, board = measure_build(progress, args.page_size)
+    print(
+        f"build {build['users']} users / {build['rows']} rows: {build['build_s']} s, "
+        f"{build['retained_mb']} MB retained ({build['bytes_per_user']} B/user), {build['peak_mb']} MB peak",
+        file=sys.stderr,
+    )
+
+    rng = random.Random(args.seed)
+    users = cycle([progress.user_id(rng.randrange(args.users)) for _ in range(4096)])
+    lessons = cycle([rng.randrange(args.lessons) + 1 for _ in range(4096)])
+    judged = cycle([
+        (progress.user_id(rng.randrange(args.users)), rng.randrange(args.lessons) + 1,
+         rng.random() < 0.33, rng.randrange(101), EPOCH + 86400 * 90 + i)
+        for i in range(4096)
+    ])
+    cases = {
+        "top/10": lambda: board.top(10),
+        "top/100": lambda: board.top(100),
+        "top/10/lesson": lambda: board.top(10, next(lessons)),
+        "rank": lambda: board.rank(next(users)),
+        "rank/lesson": lambda: board.rank(next(users), next(lessons)),
+        "around/5": lambda: board.around(next(users), 5),
+        "record": lambda: board.record(*next(judged)),
+    }
+    results = {"build": build}
+    for name, op in cases.items():
+        results[name] = run_case(lambda _value, _config: op(), None, {}, args.samples, args.min_batch_time)
+        print(f"{name:<36} {results[name]['p50_us']:>10.2f} us", file=sys.stderr)
+
+    result = report.build(
+        "leaderboard",
+        {
+            "users": args.users,
+            "lessons": args.lessons,
+            "lessons_per_user": args.lessons_per_user,
+            "page_size": args.page_size,
+            "samples": args.samples,
+            "min_batch_time": args.min_batch_time,
+            "seed": args.seed,
+        },
+        results,
+    )
+    report.write(result, args.output)
+    if args.baseline and not compare.check(args.baseline, result, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
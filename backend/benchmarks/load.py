@@ -0,0 +1,365 @@
+"""
+Load generator - drives the real app over HTTP with a mix of player traffic
+
+    python -m benchmarks.load --duration 30 --concurrency 32 --latency 0.005 --output load.json
+
+By default it starts ``benchmarks.fake_supabase`` and the app (``uvicorn
+main:app``) as subprocesses on free ports, wired to each other, so runs are
+reproducible on any machine. ``--url`` targets an app that is already
+running instead; tokens are then minted with ``--jwt-secret`` and
+``--supabase-url``, which must match that app's settings.
+
+Without ``--rate`` the generator is closed-loop: ``--concurrency`` virtual
+users each send their next request as soon as the last one answers. With
+``--rate`` requests arrive on a fixed schedule and latency is measured from
+the scheduled time, so a stalled server shows up in the percentiles instead
+of quietly lowering the request rate.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from benchmarks import compare, report
+from benchmarks.fake_supabase import DEFAULT_JWT_SECRET, mint_token, seed_lessons, user_id
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Relative weights of each kind of request; roughly what a lesson session looks like
+DEFAULT_MIX = {
+    "levels_list": 20,
+    "level_get": 15,
+    "judge_exact_match": 30,
+    "judge_fill_blank": 10,
+    "judge_multiple_choice": 10,
+    "judge_reorder": 8,
+    "judge_batch": 2,
+    "user_credits": 5,
+}
+
+Request = Tuple[str, str, Optional[dict]]  # (method, path, json body)
+
+
+class Traffic:
+    """Builds the next request of each scenario from the seeded lessons"""
+
+    def __init__(self, lessons: List[dict], rng: random.Random, hit_rate: float = 0.5):
+        published = [lesson for lesson in lessons if lesson.get("is_published")]
+        self.by_type: Dict[str, List[dict]] = defaultdict(list)
+        for lesson in published:
+            self.by_type[lesson["game_type"]].append(lesson)
+        self.ids = [lesson["id"] for lesson in published]
+        self.rng = rng
+        self.hit_rate = hit_rate
+
+    def scenarios(self) -> Dict[str, Callable[[], Request]]:
+        scenarios = {
+            "levels_list": lambda: ("GET", "/api/levels", None),
+            "level_get": lambda: ("GET", f"/api/levels/{self.rng.choice(self.ids)}", None),
+            "judge_batch": self.judge_batch,
+            "user_credits": lambda: ("GET", "/api/user/credits", None),
+        }
+        for game_type in ("exact_match", "fill_blank", "multiple_choice", "reorder"):
+            if self.by_type[game_type]:
+                scenarios[f"judge_{game_type}"] = lambda game_type=game_type: (
+                    "POST", "/api/judge", self.answer(self.rng.choice(self.by_type[game_type]))
+                )
+        return scenarios
+
+    def answer(self, lesson: dict) -> dict:
+        """A judge request for ``lesson``, right ``hit_rate`` of the time"""
+        config = lesson["config"]
+        hit = self.rng.random() < self.hit_rate
+        body = {"level_id": lesson["id"]}
+        game_type = lesson["game_type"]
+        if game_type == "exact_match":
+            if config.get("match_type") == "regex":
+                answer = "Please review this, thank you." if hit else "Review this."
+            elif config.get("match_type") == "contains":
+                answer = f'{{{config["expected"]}: "Ada", "age": 36}}' if hit else '{"age": 36}'
+            else:
+                answer = config["expected"] if hit else config["expected"][::-1]
+            body["user_prompt"] = answer
+        elif game_type == "fill_blank":
+            body["answers"] = list(config["answers"]) if hit else list(reversed(config["answers"]))
+        elif game_type == "multiple_choice":
+            wrong = [i for i in range(len(config["options"])) if i not in config["correct"]]
+            body["selected"] = list(config["correct"]) if hit or not wrong else wrong[:1]
+        elif game_type == "reorder":
+            order = list(config["correct_order"])
+            body["user_order"] = order if hit else order[::-1]
+        return body
+
+    def judge_batch(self) -> Request:
+        lessons = [self.rng.choice(group) for group in self.by_type.values() for _ in range(2)]
+        return "POST", "/api/judge/batch", {"items": [self.answer(lesson) for lesson in lessons]}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.recording = False
+
+    def record(self, scenario: str, seconds: float, status: str) -> None:
+        if self.recording:
+            self.latencies[scenario].append(seconds)
+            self.statuses[scenario][status] += 1
+
+    def results(self, elapsed: float) -> Dict[str, dict]:
+        results = {}
+        names = sorted(self.latencies)
+        all_latencies = [s for name in names for s in self.latencies[name]]
+        all_statuses = sum((self.statuses[name] for name in names), Counter())
+        for name, latencies, statuses in [("total", all_latencies, all_statuses)] + [
+            (name, self.latencies[name], self.statuses[name]) for name in names
+        ]:
+            errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+            results[name] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+                **report.summarize(latencies, 1e3, "ms"),
+                "statuses": dict(sorted(statuses.items())),
+            }
+        return results
+
+
+async def _send(client: httpx.AsyncClient, recorder: Recorder, scenario: str, request: Request,
+                headers: dict, started: float) -> None:
+    method, path, body = request
+    try:
+        response = await client.request(method, path, json=body, headers=headers)
+        await response.aread()
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.record(scenario, time.perf_counter() - started, status)
+
+
+async def generate(
+    base_url: str,
+    tokens: List[str],
+    mix: Dict[str, float],
+    duration: float,
+    warmup: float,
+    concurrency: int,
+    rate: Optional[float],
+    seed: int,
+    timeout: float,
+) -> Tuple[Dict[str, dict], float]:
+    rng = random.Random(seed)
+    scenarios = Traffic(seed_lessons(), rng).scenarios()
+    unknown = set(mix) - set(scenarios)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios in --mix: {', '.join(sorted(unknown))}")
+    names = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in names]
+
+    def next_request() -> Tuple[str, Request, dict]:
+        scenario = rng.choices(names, weights)[0]
+        return scenario, scenarios[scenario](), {"Authorization": f"Bearer {rng.choice(tokens)}"}
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        loop = asyncio.get_running_loop()
+        measure_from = loop.time() + warmup
+        deadline = measure_from + duration
+
+        async def start_recording():
+            await asyncio.sleep(warmup)
+            recorder.recording = True
+
+        recording = asyncio.create_task(start_recording())
+
+        if rate is None:
+            async def virtual_user():
+                while loop.time() < deadline:
+                    scenario, request, headers = next_request()
+                    await _send(client, recorder, scenario, request, headers, time.perf_counter())
+
+            await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+        else:
+            in_flight = set()
+            interval = 1.0 / rate
+            scheduled = time.perf_counter()
+            while loop.time() < deadline:
+                scenario, request, headers = next_request()
+                task = asyncio.create_task(_send(client, recorder, scenario, request, headers, scheduled))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                scheduled += interval
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            if in_flight:
+                await asyncio.wait(in_flight)
+
+        await recording
+        elapsed = min(duration, max(0.0, loop.time() - measure_from))
+    return recorder.results(elapsed), elapsed
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise SystemExit(f"Timed out waiting for {url}")
+
+
+def start_stack(args) -> Tuple[str, str, List[subprocess.Popen]]:
+    """Start the fake Supabase and the app; returns (app_url, supabase_url, processes)"""
+    supabase_port, app_port = _free_port(), _free_port()
+    supabase_url = f"http://127.0.0.1:{supabase_port}"
+    processes = []
+
+    fake = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_supabase",
+            "--port", str(supabase_port),
+            "--latency", str(args.latency),
+            "--jitter", str(args.jitter),
+            "--users", str(args.users),
+            "--jwt-secret", args.jwt_secret,
+        ],
+        cwd=BACKEND_DIR,
+    )
+    processes.append(fake)
+    _wait_ready(f"{supabase_url}/auth/v1/.well-known/jwks.json", fake)
+
+    env = dict(
+        os.environ,
+        SUPABASE_URL=supabase_url,
+        SUPABASE_SERVICE_KEY="benchmark-service-key",
+        SUPABASE_JWT_SECRET=args.jwt_secret,
+        SUPABASE_JWT_ISSUER="",
+        AUTH_VERIFY_MODE=args.auth_mode,
+        RATE_LIMIT_ENABLED="true" if args.rate_limit else "false",
+    )
+    app = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1",
+            "--port", str(app_port),
+            "--workers", str(args.workers),
+            "--log-level", "warning",
+            "--no-access-log",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    processes.append(app)
+    app_url = f"http://127.0.0.1:{app_port}"
+    _wait_ready(f"{app_url}/health", app)
+    return app_url, supabase_url, processes
+
+
+def stop_stack(processes: List[subprocess.Popen]) -> None:
+    for process in reversed(processes):
+        process.terminate()
+    for process in reversed(processes):
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in filter(None, value.split(",")):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="app to target; by default the fake Supabase and the app are started")
+    parser.add_argument("--supabase-url", default="", help="with --url: the app's SUPABASE_URL (token issuer)")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of traffic before measuring")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users / max connections")
+    parser.add_argument("--rate", type=float, help="open-loop arrival rate (requests/s)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="scenario weights, e.g. judge_exact_match=5,levels_list=1")
+    parser.add_argument("--users", type=int, default=100, help="distinct players sending requests")
+    parser.add_argument("--latency", type=float, default=0.005, help="fake Supabase latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.002, help="extra random fake Supabase latency (s)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--auth-mode", choices=("local", "remote"), default="local")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the app's rate limits on")
+    parser.add_argument("--jwt-secret", default=DEFAULT_JWT_SECRET)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this report; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    processes: List[subprocess.Popen] = []
+    if args.url:
+        app_url, supabase_url = args.url, args.supabase_url
+    else:
+        app_url, supabase_url, processes = start_stack(args)
+
+    issuer = f"{supabase_url.rstrip('/')}/auth/v1"
+    tokens = [mint_token(user_id(i), args.jwt_secret, issuer) for i in range(args.users)]
+    try:
+        results, elapsed = asyncio.run(generate(
+            app_url, tokens, args.mix, args.duration, args.warmup,
+            args.concurrency, args.rate, args.seed, args.timeout,
+        ))
+    finally:
+        stop_stack(processes)
+
+    config = {
+        "target": "external" if args.url else "local",
+        "duration": round(elapsed, 3),
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "mix": args.mix,
+        "users": args.users,
+        "supabase_latency": None if args.url else args.latency,
+        "supabase_jitter": None if args.url else args.jitter,
+        "workers": None if args.url else args.workers,
+        "auth_mode": None if args.url else args.auth_mode,
+        "rate_limit": None if args.url else args.rate_limit,
+        "seed": args.seed,
+    }
+    result = report.build("load", config, results)
+    report.write(result, args.output)
+    total = results.get("total", {})
+    print(
+        f"{total.get('requests', 0)} requests, {total.get('rps', 0)} req/s, "
+        f"p50 {total.get('p50_ms', 0)} ms, p99 {total.get('p99_ms', 0)} ms, {total.get('errors', 0)} errors",
+        file=sys.stderr,
+    )
+    if args.baseline and not compare.check(args.baseline, result, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Micro-benchmarks for the judge functions
+
+    python -m benchmarks.micro --output micro.json [--baseline baseline.json]
+
+Each case calls one judge function with a fixed config and answer. Judge
+cases call a plan compiled once, as the judge routes do through the
+registry's plan cache; the ``compile/`` cases time compiling itself. Calls
+are timed in batches sized so one batch takes at least ``--min-batch-time``
+seconds (timer overhead stays negligible even for sub-microsecond calls);
+each batch's per-call time is one sample. Configs start from the seeded
+lessons and are scaled up to the sizes lessons and AI outputs reach in
+practice.
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.services.judge_registry import judge_registry
+from app.services.static_judge import judge_static
+from benchmarks import compare, report
+from benchmarks.fake_supabase import seed_lessons
+
+Case = Tuple[Callable, object, object]
+
+# Typical AI outputs: a one-liner, a paragraph, a long answer (still under
+# JUDGE_MAX_INPUT_LENGTH, so the matchers run rather than the length check)
+TEXT_SIZES = {"64B": 64, "1KB": 1024, "8KB": 8 * 1024}
+WORDS = (
+    "the model should answer with a short list of steps and explain each one "
+    "briefly before giving the final result in plain text without markdown"
+).split()
+
+
+def _text(size: int, rng: random.Random, suffix: str = "") -> str:
+    """~``size`` characters of prose ending in ``suffix`` (the part a judge looks for)"""
+    words: List[str] = []
+    length = len(suffix)
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words) + (" " + suffix if suffix else "")
+
+
+def _typos(text: str, rate: float, rng: random.Random) -> str:
+    """``text`` with about ``rate`` of its characters replaced, dropped or doubled"""
+    out = []
+    for char in text:
+        roll = rng.random()
+        if roll < rate / 3:
+            out.append(rng.choice("abcdefghijklmnopqrstuvwxyz"))
+        elif roll < rate * 2 / 3:
+            continue
+        elif roll < rate:
+            out.append(char + char)
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def naive_similarity(user_input: str, config: dict) -> int:
+    """Baseline for the similarity cases: textbook O(m * n) DP, no early exit"""
+    expected, text = config["expected"].strip(), user_input.strip()
+    previous = list(range(len(text) + 1))
+    for i, a in enumerate(expected, 1):
+        current = [i]
+        for j, b in enumerate(text, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a != b)))
+        previous = current
+    longest = max(len(expected), len(text))
+    return int((1 - previous[-1] / longest) * 100) if longest else 100
+
+
+def judge_plan(value, plan) -> tuple:
+    """One call on a compiled plan, without the worker pool hop a backtracking regex takes"""
+    return getattr(plan, "judge_blocking", plan.judge)(value)
+
+
+def _case(game_type: str, value, config: dict) -> Case:
+    return judge_plan, value, judge_registry.compile(game_type, config)
+
+
+def build_cases(seed: int = 0) -> Dict[str, Case]:
+    rng = random.Random(seed)
+    lessons = {lesson["id"]: lesson["config"] for lesson in seed_lessons()}
+    exact, contains, regex = lessons[1], lessons[4], lessons[5]
+    fill_blank, multiple_choice, reorder = lessons[6], lessons[7], lessons[8]
+
+    cases: Dict[str, Case] = {
+        "exact_match/exact/hit": _case("exact_match", exact["expected"], exact),
+        "exact_match/exact/miss": _case("exact_match", "Hello World", exact),
+    }
+    for label, size in TEXT_SIZES.items():
+        cases[f"exact_match/exact/{label}"] = _case("exact_match", _text(size, rng), exact)
+        cases[f"exact_match/contains/{label}"] = _case(
+            "exact_match", _text(size, rng, '{"name": "Ada", "age": 36}'), contains
+        )
+        cases[f"exact_match/regex/{label}/hit"] = _case(
+            "exact_match", _text(size, rng, "Please take a look. Thank you!"), regex
+        )
+        cases[f"exact_match/regex/{label}/miss"] = _case("exact_match", _text(size, rng, "please"), regex)
+
+    for blanks in (3, 20, 100):
+        if blanks == 3:
+            config = fill_blank
+        else:
+            answers = [f"answer {i}" for i in range(blanks)]
+            config = {"template": " ".join(["{{blank}}"] * blanks), "answers": answers, "case_sensitive": False}
+        given = [answer.upper() for answer in config["answers"]]
+        cases[f"fill_blank/{blanks}"] = _case("fill_blank", given, config)
+
+    for options in (4, 50):
+        if options == 4:
+            config, selected = multiple_choice, multiple_choice["correct"]
+        else:
+            correct = sorted(rng.sample(range(options), 10))
+            config = {
+                "question": "Pick every effective prompt",
+                "options": [_text(80, rng) for _ in range(options)],
+                "correct": correct,
+                "multi": True,
+            }
+            selected = list(reversed(correct))
+        cases[f"multiple_choice/{options}"] = _case("multiple_choice", selected, config)
+
+    for items in (4, 50, 500):
+        if items == 4:
+            config = reorder
+        else:
+            config = {"items": [_text(40, rng) for _ in range(items)], "correct_order": list(range(items))}
+        order = list(config["correct_order"])
+        cases[f"reorder/{items}/hit"] = _case("reorder", order, config)
+        cases[f"reorder/{items}/miss"] = _case("reorder", order[1:] + order[:1], config)
+
+    for label, size in TEXT_SIZES.items():
+        cases[f"static/exact/{label}"] = (
+            judge_static, _text(size, rng), {"type": "exact", "expected": exact["expected"]}
+        )
+        cases[f"static/contains/{label}"] = (
+            judge_static, _text(size, rng, '"name"'), {"type": "contains", "expected": '"name"'}
+        )
+        cases[f"static/regex/{label}"] = (
+            judge_static,
+            _text(size, rng, "please and thank you"),
+            {"type": "regex", "expected": regex["expected"], "case_sensitive": False},
+        )
+
+    # Similarity: a typo'd answer of the expected length, and AI-output sized answers
+    # to a one-line expected text (far longer than it, so the length bound decides)
+    for label, size in (("64B", 64), ("1KB", 1024)):
+        expected = _text(size, rng)
+        config = {"expected": expected, "match_type": "similarity"}
+        answer = _typos(expected, 0.05, rng)
+        cases[f"similarity/edit/typos/{label}"] = _case("exact_match", answer, config)
+        cases[f"similarity/tokens/typos/{label}"] = _case(
+            "exact_match", answer, {**config, "similarity_metric": "tokens"}
+        )
+        cases[f"similarity/naive_dp/typos/{label}"] = (naive_similarity, answer, config)
+
+    sentence = {"expected": _text(64, rng), "match_type": "similarity"}
+    for label, size in TEXT_SIZES.items():
+        answer = _text(size, rng)
+        cases[f"similarity/edit/{label}"] = _case("exact_match", answer, sentence)
+        cases[f"similarity/edit/{label}/no_floor"] = _case("exact_match", answer, {**sentence, "min_score": 0})
+        cases[f"similarity/naive_dp/{label}"] = (naive_similarity, answer, sentence)
+
+    # One expected text, a class worth of answers: one call vs. one call per answer
+    answers = [_typos(sentence["expected"], rng.choice((0.0, 0.05, 0.2, 0.5)), rng) for _ in range(1000)]
+    plan = judge_registry.compile("exact_match", sentence)
+    cases["similarity/batch/1000"] = (lambda values, plan: plan.judge_many(values), answers, plan)
+    cases["similarity/loop/1000"] = (
+        lambda values, plan: [judge_plan(value, plan) for value in values], answers, plan
+    )
+
+    # What a plan cache miss costs (a lesson's first judge after it changes)
+    for name, game_type, config in (
+        ("exact_match/exact", "exact_match", exact),
+        ("exact_match/regex", "exact_match", regex),
+        ("exact_match/similarity", "exact_match", sentence),
+        ("fill_blank", "fill_blank", fill_blank),
+        ("multiple_choice", "multiple_choice", multiple_choice),
+        ("reorder", "reorder", reorder),
+    ):
+        cases[f"compile/{name}"] = (judge_registry.compile, game_type, config)
+    return cases
+
+
+def _calibrate(fn: Callable, value, config, min_batch_time: float) -> int:
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn(value, config)
+        if time.perf_counter() - started >= min_batch_time:
+            return number
+        number *= 2
+
+
+def run_case(fn: Callable, value, config, samples: int, min_batch_time: float) -> dict:
+    number = _calibrate(fn, value, config, min_batch_time)
+    timings = []
+    total = 0.0
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(samples):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn(value, config)
+            elapsed = time.perf_counter() - started
+            total += elapsed
+            timings.append(elapsed / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return {
+        "ops_per_sec": round(samples * number / total, 1),
+        **report.summarize(timings, 1e6, "us"),
+        "calls_per_sample": number,
+        "samples": samples,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=100, help="timed batches per case")
+    parser.add_argument("--min-batch-time", type=float, default=0.002, help="seconds per timed batch")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this report; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, (fn, value, config) in build_cases(args.seed).items():
+        if args.filter in name:
+            results[name] = run_case(fn, value, config, args.samples, args.min_batch_time)
+            print(f"{name:<36} {results[name]['p50_us']:>10.2f} us", file=sys.stderr)
+
+    result = report.build(
+        "micro",
+        {"samples": args.samples, "min_batch_time": args.min_batch_time, "seed": args.seed},
+        results,
+    )
+    report.write(result, args.output)
+    if args.baseline and not compare.check(args.baseline, result, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
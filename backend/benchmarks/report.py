@@ -0,0 +1,57 @@
+"""
+Report - percentiles and the JSON result format shared by the benchmarks
+"""
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples: List[float], scale: float, unit: str) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of ``samples`` (seconds) in ``unit`` (multiplied by ``scale``)"""
+    ordered = sorted(samples)
+    mean = sum(ordered) / len(ordered) if ordered else 0.0
+    return {
+        f"p50_{unit}": round(percentile(ordered, 0.50) * scale, 3),
+        f"p95_{unit}": round(percentile(ordered, 0.95) * scale, 3),
+        f"p99_{unit}": round(percentile(ordered, 0.99) * scale, 3),
+        f"mean_{unit}": round(mean * scale, 3),
+        f"max_{unit}": round((ordered[-1] if ordered else 0.0) * scale, 3),
+    }
+
+
+def build(kind: str, config: dict, results: Dict[str, dict]) -> dict:
+    return {
+        "kind": kind,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+        },
+        "config": config,
+        "results": results,
+    }
+
+
+def write(report: dict, output: Optional[str]) -> None:
+    """Print ``report`` as JSON, or save it to ``output``"""
+    text = json.dumps(report, indent=2, sort_keys=False)
+    if output:
+        Path(output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+def load(path: str) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
@@ -0,0 +1,186 @@
+"""
+Startup benchmark - import time and time-to-first-200, with a budget
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+
+Two measurements, each in fresh processes:
+
+- ``import``: ``python -X importtime -c "import main"``. Reports the total
+  and the self time summed per top-level package, and fails if a module in
+  LAZY_MODULES was imported (those must load on first use or in the
+  startup warmup, never at import).
+- ``first_200`` / ``ready`` / ``first_levels``: ``uvicorn main:app``
+  against ``benchmarks.fake_supabase``, timed from spawning the process to
+  the first 200 from ``/health``, from ``/health/ready`` and from
+  ``/api/levels``.
+
+Exits 1 when a budget below (or ``--baseline`` comparison) is exceeded, so
+CI can run it as a check.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from benchmarks import compare, report
+from benchmarks.load import BACKEND_DIR, _free_port, _wait_ready
+
+# Heavy SDKs the app must not import when main is imported
+LAZY_MODULES = ("supabase", "postgrest", "supabase_auth", "jose", "cryptography", "openai", "anthropic", "google")
+
+IMPORT_BUDGET_MS = 1000.0
+FIRST_200_BUDGET_MS = 3000.0
+
+
+def _env(supabase_url: str) -> dict:
+    return dict(
+        os.environ,
+        SUPABASE_URL=supabase_url,
+        SUPABASE_SERVICE_KEY="benchmark-service-key",
+        SUPABASE_JWT_SECRET="benchmark-jwt-secret",
+        RATE_LIMIT_ENABLED="false",
+    )
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for each ``-X importtime`` line"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_imports(runs: int) -> Tuple[List[float], Dict[str, float], List[str]]:
+    """Seconds to import main per run, mean self ms per top-level package, lazy modules seen"""
+    totals: List[float] = []
+    packages: Dict[str, float] = defaultdict(float)
+    imported_lazy = set()
+    for _ in range(runs):
+        done = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=BACKEND_DIR, env=_env("http://127.0.0.1:9"), capture_output=True, text=True, check=True,
+        )
+        rows = parse_importtime(done.stderr)
+        totals.append(next(cumulative for name, _, cumulative in rows if name == "main") / 1e6)
+        for name, self_us, _ in rows:
+            top = name.split(".")[0]
+            packages[top] += self_us / 1000 / runs
+            if top in LAZY_MODULES:
+                imported_lazy.add(top)
+    return totals, dict(packages), sorted(imported_lazy)
+
+
+def _poll(url: str, process: subprocess.Popen, deadline: float) -> float:
+    """perf_counter time of the first 200 from ``url``"""
+    with httpx.Client(timeout=1.0) as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise SystemExit(f"App exited with status {process.returncode}")
+            try:
+                if client.get(url).status_code == 200:
+                    return time.perf_counter()
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.005)
+    raise SystemExit(f"Timed out waiting for {url}")
+
+
+def time_startup(supabase_url: str, timeout: float) -> Dict[str, float]:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=_env(supabase_url),
+    )
+    try:
+        deadline = started + timeout
+        first_200 = _poll(f"{url}/health", app, deadline)
+        ready = _poll(f"{url}/health/ready", app, deadline)
+        first_levels = _poll(f"{url}/api/levels", app, deadline)
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+    return {
+        "first_200": first_200 - started,
+        "ready": ready - started,
+        "first_levels": first_levels - started,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--latency", type=float, default=0.005, help="fake Supabase latency per request (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for one startup")
+    parser.add_argument("--top", type=int, default=15, help="packages listed in the import breakdown")
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS, help="p50 limit for import main")
+    parser.add_argument("--first-200-budget-ms", type=float, default=FIRST_200_BUDGET_MS,
+                        help="p50 limit from process start to the first /health 200")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this report; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    totals, packages, imported_lazy = profile_imports(args.runs)
+    breakdown = dict(sorted(packages.items(), key=lambda item: -item[1])[:args.top])
+    results = {
+        "import": {**report.summarize(totals, 1000, "ms"), "imported_lazy_modules": imported_lazy},
+        "import_breakdown": {name: round(ms, 3) for name, ms in breakdown.items()},
+    }
+
+    supabase_port = _free_port()
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_supabase", "--port", str(supabase_port),
+         "--latency", str(args.latency)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL,
+    )
+    supabase_url = f"http://127.0.0.1:{supabase_port}"
+    try:
+        _wait_ready(f"{supabase_url}/auth/v1/.well-known/jwks.json", fake)
+        timings = [time_startup(supabase_url, args.timeout) for _ in range(args.runs)]
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+    for phase in ("first_200", "ready", "first_levels"):
+        results[phase] = report.summarize([t[phase] for t in timings], 1000, "ms")
+
+    for phase in ("import", "first_200", "ready", "first_levels"):
+        print(f"{phase:<16} {results[phase]['p50_ms']:>10.1f} ms", file=sys.stderr)
+
+    result = report.build(
+        "startup",
+        {"runs": args.runs, "latency": args.latency, "import_budget_ms": args.import_budget_ms,
+         "first_200_budget_ms": args.first_200_budget_ms},
+        results,
+    )
+    report.write(result, args.output)
+
+    failed = False
+    if imported_lazy:
+        print(f"FAIL: import main loaded {', '.join(imported_lazy)} (must be lazy)", file=sys.stderr)
+        failed = True
+    if results["import"]["p50_ms"] > args.import_budget_ms:
+        print(f"FAIL: import main took {results['import']['p50_ms']} ms "
+              f"(budget {args.import_budget_ms} ms)", file=sys.stderr)
+        failed = True
+    if results["first_200"]["p50_ms"] > args.first_200_budget_ms:
+        print(f"FAIL: first /health 200 after {results['first_200']['p50_ms']} ms "
+              f"(budget {args.first_200_budget_ms} ms)", file=sys.stderr)
+        failed = True
+    if args.baseline and not compare.check(args.baseline, result, args.threshold):
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Prmpt Backend - bulk lesson import / export against the configured Supabase project
+
+    python lessons_cli.py export --output lessons.ndjson
+    python lessons_cli.py import lessons.ndjson --dry-run
+    python lessons_cli.py import lessons.ndjson
+    python lessons_cli.py import --definitions        # the legacy levels/definitions.py list
+
+Uses SUPABASE_URL / SUPABASE_SERVICE_KEY like the server, so a fresh
+environment can be seeded before any admin account exists. Imports take
+NDJSON (the export format) or a JSON array, are validated in full, and
+write only new or changed lessons in one transaction; see
+``app.services.lesson_import``. Prints the import summary as JSON and
+exits 1 if any lesson was rejected, 2 if the bundle could not be read.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import AsyncIterator, Optional, Sequence
+
+from app.core.config import settings
+from app.core.database import supabase_pool
+from app.repositories.lessons import LessonRepository
+from app.services.admin_listing import iter_lessons, ndjson_lines
+from app.services.lesson_import import BundleError, TooManyLessons, import_lessons, iter_bundle, iter_levels
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def _read_chunks(path: str) -> AsyncIterator[bytes]:
+    f = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+
+async def _import(args: argparse.Namespace, lessons: LessonRepository) -> int:
+    if args.definitions:
+        from levels.definitions import LEVELS
+
+        items = iter_levels(LEVELS)
+    else:
+        items = iter_bundle(_read_chunks(args.path))
+    try:
+        result = await import_lessons(
+            items,
+            lessons,
+            max_lessons=settings.LESSON_IMPORT_MAX_LESSONS,
+            page_size=settings.ADMIN_EXPORT_PAGE_SIZE,
+            dry_run=args.dry_run,
+        )
+    except (BundleError, TooManyLessons) as e:
+        print(f"Invalid bundle: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(result.summary(), indent=2))
+    return 1 if result.error_count else 0
+
+
+async def _export(args: argparse.Namespace, lessons: LessonRepository) -> int:
+    filters = {"game_type": args.game_type} if args.game_type else {}
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        async for chunk in ndjson_lines(iter_lessons(lessons, filters, settings.ADMIN_EXPORT_PAGE_SIZE)):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+async def run(args: argparse.Namespace) -> int:
+    # A bulk write may take longer than one API query is allowed to
+    lessons = LessonRepository(timeout=args.timeout)
+    try:
+        return await (_import(args, lessons) if args.command == "import" else _export(args, lessons))
+    finally:
+        await supabase_pool.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per database call")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="validate a bundle and apply the changes")
+    source = import_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("path", nargs="?", help="NDJSON or JSON array file, or - for stdin")
+    source.add_argument("--definitions", action="store_true", help="import levels/definitions.py")
+    import_parser.add_argument("--dry-run", action="store_true", help="report the diff without writing")
+
+    export_parser = commands.add_parser("export", help="write every lesson as NDJSON")
+    export_parser.add_argument("--output", help="file to write (default: stdout)")
+    export_parser.add_argument("--game-type", help="only lessons of this game type")
+
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
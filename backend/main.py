@@ -1,18 +1,99 @@
 """
 Prmpt Backend - FastAPI Application
 """
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from app.api import judge, levels, user, admin
+from app.api import judge, levels, user, admin, leaderboard as leaderboard_api
 from app.core.config import settings
+from app.core.database import import_supabase, supabase_pool
+from app.core.http_cache import level_responses
+from app.core.metrics import LoopLagMonitor, MetricsMiddleware, registry
+from app.core.rate_limit import RateLimitMiddleware, admission_control, rate_limiter
+from app.core.roles import role_cache
+from app.core.tokens import import_jose, signing_keys, token_cache
+from app.core.warmup import warmup
+from app.services.credits import credits_service
+from app.services.judge_registry import judge_registry
+from app.services.leaderboard import leaderboard
+from app.services.lesson_catalog import lesson_catalog
+from app.services.llm import llm_pool
+from app.services.llm_router import llm_router
+from app.services.progress_recorder import progress_recorder
+from app.services import single_flight
+from app.services.safe_regex import regex_pool
+
+
+loop_lag = LoopLagMonitor(settings.METRICS_LOOP_LAG_INTERVAL)
+
+
+async def _open_http_clients() -> None:
+    # Building their TLS contexts (CA bundle load) costs ~150 ms; both pools also open on first use
+    supabase_pool.open()
+    llm_pool.open()
+
+
+async def _import_sdks() -> None:
+    # In a thread so requests are served meanwhile; one that needs an SDK first simply imports it
+    await asyncio.to_thread(lambda: (import_supabase(), import_jose()))
+
+
+async def _open_supabase_client() -> None:
+    async with supabase_pool.acquire():
+        pass
+
+
+async def _start_regex_pool() -> None:
+    # Spawning the worker processes blocks for a while; until they exist a search starts them itself
+    await asyncio.to_thread(regex_pool.start)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared clients on startup and release them on shutdown"""
+    await loop_lag.start()
+    await credits_service.start()
+    await progress_recorder.start()
+    await leaderboard.start()
+    await warmup.start(
+        [
+            ("http_clients", _open_http_clients),
+            ("imports", _import_sdks),
+            ("signing_keys", signing_keys.start),
+            ("supabase_client", _open_supabase_client),
+            ("lesson_catalog", lesson_catalog.start),
+            ("regex_pool", _start_regex_pool),
+        ],
+        background=settings.STARTUP_WARMUP_BACKGROUND,
+    )
+    yield
+    await warmup.stop()
+    await leaderboard.stop()
+    await progress_recorder.stop()
+    await credits_service.stop()
+    await lesson_catalog.stop()
+    regex_pool.close()
+    await signing_keys.stop()
+    await llm_pool.close()
+    await supabase_pool.close()
+    await loop_lag.stop()
+
 
 app = FastAPI(
     title="Prmpt API",
     description="Backend API for Prmpt - Gamified Prompt Engineering Academy",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Per-IP limits and load shedding on expensive routes (inside CORS so rejections carry CORS headers)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -22,11 +103,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency histogram; outermost so rejected and failed requests are counted too
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(judge.router, prefix="/api", tags=["Judge"])
 app.include_router(levels.router, prefix="/api", tags=["Levels"])
 app.include_router(user.router, prefix="/api", tags=["User"])
 app.include_router(admin.router, prefix="/api", tags=["Admin"])
+app.include_router(leaderboard_api.router, prefix="/api", tags=["Leaderboard"])
 
 
 @app.get("/")
@@ -36,4 +122,150 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    """Liveness, with ``state`` ("warming" until the startup warmup has finished, then "ready")"""
+    return {"status": "ok", "state": warmup.state}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: 503 while warming, 200 once ready, with per-step startup timings"""
+    return JSONResponse(warmup.stats(), status_code=200 if warmup.ready else 503)
+
+
+@app.get("/health/pool")
+async def pool_stats():
+    """Supabase client pool usage (in-use, idle, wait time)"""
+    return supabase_pool.stats()
+
+
+@app.get("/health/catalog")
+async def catalog_stats():
+    """Lesson catalog version and cache hit/miss counters, plus the cached /api/levels responses"""
+    return {**lesson_catalog.stats(), "http_cache": level_responses.stats()}
+
+
+@app.get("/health/judges")
+async def judge_stats():
+    """Per game type judge latency"""
+    return judge_registry.stats()
+
+
+@app.get("/health/credits")
+async def credits_stats():
+    """Credits write-behind buffer depth and flush counters"""
+    return credits_service.stats()
+
+
+@app.get("/health/progress")
+async def progress_stats():
+    """Progress write-behind queue depth and flush counters"""
+    return progress_recorder.stats()
+
+
+@app.get("/health/leaderboard")
+async def leaderboard_stats():
+    """Leaderboard size and rebuild counters"""
+    return leaderboard.stats()
+
+
+@app.get("/health/llm")
+async def llm_stats():
+    """Per-provider call counts/latency, output cache hit rate, and routing health (p50/p95, circuits, hedges)"""
+    return {**llm_pool.stats(), "routing": llm_router.stats()}
+
+
+@app.get("/health/limits")
+async def limit_stats():
+    """Rate limiter buckets/rejections and admission control (in-flight, queued, shed)"""
+    return {"rate_limits": rate_limiter.stats(), "admission": admission_control.stats()}
+
+
+@app.get("/health/coalescing")
+async def coalescing_stats():
+    """Single-flight groups: calls made vs. callers that shared an in-flight call"""
+    return single_flight.stats()
+
+
+# --- Metrics ---
+def _hit_ratio(stats: dict) -> float:
+    lookups = stats["hits"] + stats["misses"]
+    return stats["hits"] / lookups if lookups else 0.0
+
+
+registry.gauge_func(
+    "prmpt_cache_hit_ratio", "Hit ratio of in-process caches", ("cache",),
+    lambda: {
+        ("lessons",): _hit_ratio(lesson_catalog.stats()),
+        ("llm_output",): _hit_ratio(llm_pool.cache.stats()),
+        ("auth_tokens",): _hit_ratio(token_cache.stats()),
+        ("roles",): _hit_ratio(role_cache.stats()),
+        ("level_responses",): _hit_ratio(level_responses.stats()),
+    },
+)
+registry.counter_func(
+    "prmpt_http_not_modified_total", "Conditional level requests answered 304 from the response cache", (),
+    lambda: {(): level_responses.stats()["not_modified"]},
+)
+registry.gauge_func(
+    "prmpt_coalesced_ratio", "Share of callers that joined an in-flight call", ("group",),
+    lambda: {(name,): s["coalesced_rate"] for name, s in single_flight.stats().items()},
+)
+registry.gauge_func(
+    "prmpt_supabase_pool_clients", "Supabase client pool by state", ("state",),
+    lambda: {(state,): supabase_pool.stats()[state] for state in ("in_use", "idle", "waiting")},
+)
+
+
+def _write_behind_pending() -> dict:
+    progress = progress_recorder.stats()
+    return {
+        ("credits",): credits_service.stats()["pending"],
+        ("progress",): progress["queued"] + progress["merged"],
+    }
+
+
+registry.gauge_func(
+    "prmpt_write_behind_pending", "Results buffered for a background write", ("queue",), _write_behind_pending
+)
+registry.counter_func(
+    "prmpt_progress_dropped_total", "Judge results dropped because the progress queue was full", (),
+    lambda: {(): progress_recorder.stats()["dropped"]},
+)
+registry.gauge_func(
+    "prmpt_leaderboard_users", "Users on the global leaderboard", (),
+    lambda: {(): leaderboard.stats()["users"]},
+)
+registry.gauge_func(
+    "prmpt_llm_in_flight", "Upstream LLM calls in flight", ("provider",),
+    lambda: {(pid,): s["in_flight"] for pid, s in llm_pool.stats()["providers"].items()},
+)
+registry.gauge_func(
+    "prmpt_llm_circuit_open", "1 while a provider/model circuit breaker is not closed", ("target",),
+    lambda: {(target,): int(s["circuit"] != "closed") for target, s in llm_router.stats()["targets"].items()},
+)
+registry.counter_func(
+    "prmpt_rate_limited_total", "Requests rejected by a rate limit bucket", (),
+    lambda: {(): rate_limiter.stats()["limited"]},
+)
+registry.gauge_func(
+    "prmpt_admission", "Admission control slots", ("state",),
+    lambda: {(state,): admission_control.stats()[state] for state in ("in_flight", "queued")},
+)
+registry.counter_func(
+    "prmpt_admission_shed_total", "Requests shed by admission control", (),
+    lambda: {(): admission_control.stats()["shed"]},
+)
+registry.gauge_func(
+    "prmpt_ready", "1 once the startup warmup has finished", (),
+    lambda: {(): int(warmup.ready)},
+)
+registry.gauge_func(
+    "prmpt_lesson_catalog_version", "Lesson catalog snapshot version", (),
+    lambda: {(): lesson_catalog.version},
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of all metrics above plus the hot-path timers"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
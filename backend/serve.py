@@ -0,0 +1,78 @@
+"""
+Prmpt Backend - process supervisor
+
+    python serve.py --host 0.0.0.0 --port 8000
+
+Runs ``main:app`` with WEB_CONCURRENCY uvicorn workers. With one worker
+this is plain ``uvicorn main:app``. With more, this process loads the
+lesson catalog once and keeps it in sync with the database, publishing
+every new version as a snapshot file that each worker maps read-only
+(``SnapshotCatalog``). A worker that makes an admin change pings this
+process, so the new version goes out straight away rather than at the
+next LESSON_CATALOG_POLL_INTERVAL.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+
+import uvicorn
+
+from app.core.config import settings
+from app.services.lesson_catalog import LessonCatalog, SnapshotPublisher
+
+
+def _snapshot_path() -> str:
+    directory = settings.LESSON_SNAPSHOT_DIR
+    if not directory:
+        # tmpfs: the snapshot lives in memory and is never written back to disk
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"prmpt-lessons-{os.getpid()}.snapshot")
+
+
+def _start_publisher(path: str, wait: float) -> None:
+    """Run the publisher on its own event loop; wait up to ``wait`` s for the first snapshot"""
+    catalog = LessonCatalog(
+        poll_interval=0,
+        poll_overlap=settings.LESSON_CATALOG_POLL_OVERLAP,
+        full_reload_interval=settings.LESSON_CATALOG_FULL_RELOAD_INTERVAL,
+    )
+    publisher = SnapshotPublisher(catalog, path, settings.LESSON_CATALOG_POLL_INTERVAL)
+    published = threading.Event()
+    thread = threading.Thread(
+        target=lambda: asyncio.run(publisher.run(on_publish=published.set)),
+        name="lesson-snapshot",
+        daemon=True,
+    )
+    thread.start()
+    # Workers that start before it exists load from the database until it appears
+    published.wait(wait)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the Prmpt backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY)
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        uvicorn.run("main:app", host=args.host, port=args.port)
+        return
+
+    path = _snapshot_path()
+    _start_publisher(path, wait=settings.SUPABASE_HTTP_TIMEOUT)
+    # Workers are spawned fresh and read their settings from the environment
+    os.environ["LESSON_SNAPSHOT_PATH"] = path
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    main()
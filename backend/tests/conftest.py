@@ -0,0 +1,11 @@
+"""
+Test setup. Settings are read from the environment when ``app.core.config``
+is first imported, so the defaults below are set before any test module
+imports the app; nothing here talks to a real Supabase project.
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-jwt-secret")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
@@ -0,0 +1,187 @@
+"""
+In-memory stand-ins for the database. Like PostgREST, every read returns
+at most ``max_rows`` rows however many were asked for: ``FakeProgress``
+directly, ``FakePool`` through ``benchmarks.fake_supabase.FakeSupabase``.
+"""
+import asyncio
+import copy
+from contextlib import asynccontextmanager
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List, Optional
+
+MAX_ROWS = 1000
+
+
+class FakeProgress:
+    """``ProgressRepository.list_after`` over a list of user_progress rows"""
+
+    def __init__(self, rows: List[dict], max_rows: int = MAX_ROWS):
+        self.rows = sorted(rows, key=lambda row: row["id"])
+        self.max_rows = max_rows
+        self.calls = 0
+
+    async def list_after(self, after_id: int, limit: int) -> List[dict]:
+        self.calls += 1
+        rows = [row for row in self.rows if row["id"] > after_id]
+        return rows[:min(limit, self.max_rows)]
+
+
+def progress_row(row_id: int, user_id: str, lesson_id: int, score: int, completed_at: Optional[str]) -> dict:
+    return {
+        "id": row_id,
+        "user_id": user_id,
+        "lesson_id": lesson_id,
+        "score": score,
+        "completed": completed_at is not None,
+        "completed_at": completed_at,
+    }
+
+
+class _Result:
+    def __init__(self, data, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    """The slice of the supabase-py query builder the repositories use, as PostgREST query params"""
+
+    def __init__(self, state, table: str):
+        self.state = state
+        self.table = table
+        self.params: List[tuple] = []
+        self.orders: List[str] = []
+        self.counted = False
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "_Query":
+        self.params.append(("select", columns))
+        self.counted = count == "exact"
+        return self
+
+    def _filter(self, op: str, column: str, value) -> "_Query":
+        if isinstance(value, bool):
+            value = str(value).lower()
+        self.params.append((column, f"{op}.{value}"))
+        return self
+
+    def eq(self, column: str, value) -> "_Query":
+        return self._filter("eq", column, value)
+
+    def gt(self, column: str, value) -> "_Query":
+        return self._filter("gt", column, value)
+
+    def gte(self, column: str, value) -> "_Query":
+        return self._filter("gte", column, value)
+
+    def in_(self, column: str, values) -> "_Query":
+        return self._filter("in", column, "(" + ",".join(str(v) for v in values) + ")")
+
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self.orders.append(f"{column}.{'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, count: int) -> "_Query":
+        self.params.append(("limit", str(count)))
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self.params += [("offset", str(start)), ("limit", str(end - start + 1))]
+        return self
+
+    async def execute(self) -> _Result:
+        from starlette.datastructures import QueryParams
+
+        params = QueryParams(self.params + ([("order", ",".join(self.orders))] if self.orders else []))
+        count = self.state.count(self.table, params) if self.counted else None
+        return _Result(self.state.capped(self.state.select(self.table, params)), count)
+
+
+class _Rpc:
+    def __init__(self, state, name: str, body: dict):
+        self.state, self.name, self.body = state, name, body
+
+    async def execute(self) -> _Result:
+        return _Result(self.state.capped(self.state.rpc(self.name, self.body)))
+
+
+class _AuthAdmin:
+    """``client.auth.admin`` over ``FakeSupabase.users``; users come back as attribute objects"""
+
+    def __init__(self, state):
+        self.state = state
+        self.calls = 0
+
+    def _user(self, user_id: str) -> Optional[SimpleNamespace]:
+        user = copy.deepcopy(self.state.users.get(user_id))
+        if user is None:
+            return None
+        # supabase-py parses timestamps into datetimes
+        for key, value in user.items():
+            if key.endswith("_at") and isinstance(value, str):
+                user[key] = datetime.fromisoformat(value)
+        return SimpleNamespace(**user)
+
+    async def get_user_by_id(self, user_id: str):
+        self.calls += 1
+        user = self._user(user_id)
+        return SimpleNamespace(user=user) if user else None
+
+    async def list_users(self, page: Optional[int] = None, per_page: Optional[int] = None) -> list:
+        self.calls += 1
+        ids = list(self.state.users)
+        page, per_page = page or 1, per_page or 50
+        return [self._user(user_id) for user_id in ids[(page - 1) * per_page:page * per_page]]
+
+    async def update_user_by_id(self, user_id: str, attributes: dict):
+        self.calls += 1
+        if user_id not in self.state.users:
+            return None
+        self.state.users[user_id]["user_metadata"].update(attributes.get("user_metadata", {}))
+        return SimpleNamespace(user=self._user(user_id))
+
+    async def delete_user(self, user_id: str) -> None:
+        self.calls += 1
+        self.state.users.pop(user_id, None)
+
+    async def _request(self, method: str, path: str, query=None):
+        # What UserAdminRepository.count reads from GoTrue's response
+        self.calls += 1
+        return SimpleNamespace(headers={"x-total-count": str(len(self.state.users))})
+
+
+class FakeClient:
+    """Stands in for supabase's ``AsyncClient``, answering from a ``FakeSupabase``"""
+
+    def __init__(self, state):
+        self.state = state
+        self.auth = SimpleNamespace(admin=_AuthAdmin(state))
+
+    def table(self, name: str) -> _Query:
+        return _Query(self.state, name)
+
+    def rpc(self, name: str, body: dict) -> _Rpc:
+        return _Rpc(self.state, name, body)
+
+
+class FakePool:
+    """
+    ``SupabasePool`` handing out one ``FakeClient``; pass as a repository's
+    ``pool``. ``latency`` seconds pass before each call, letting concurrent
+    callers interleave; while ``down`` every call fails.
+    """
+
+    def __init__(self, state, latency: float = 0.0):
+        self.client = FakeClient(state)
+        self.latency = latency
+        self.down = False
+        self.acquired = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.acquired += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.down:
+            raise ConnectionError("database unreachable")
+        yield self.client
@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app.api import admin
+from app.repositories.lessons import LessonRepository, get_lesson_repository
+from app.repositories.users import UserAdminRepository, get_user_admin_repository
+from app.services.admin_listing import (
+    InvalidCursor, UserFilter, decode_cursor, encode_cursor, page_users, serialize_user,
+)
+from benchmarks.fake_supabase import ADMIN_ID, FakeSupabase
+from tests.fakes import FakePool
+
+NOW = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def _user(index: int, role=None) -> SimpleNamespace:
+    metadata = {} if role is None else {"role": role}
+    return SimpleNamespace(
+        id=f"user-{index}",
+        email=f"user{index}@example.com",
+        user_metadata=metadata,
+        created_at=NOW,
+        last_sign_in_at=NOW - timedelta(days=index) if index % 4 else None,
+        email_confirmed_at=NOW if index % 2 else None,
+    )
+
+
+class FakeUsers:
+    def __init__(self, users):
+        self.users = users
+        self.calls = 0
+
+    async def list_users(self, page: int, per_page: int):
+        self.calls += 1
+        return self.users[(page - 1) * per_page:page * per_page]
+
+
+@pytest.mark.parametrize("role", [None, "", "user"])
+def test_regular_users_read_as_user(role):
+    user = _user(1, role)
+    assert serialize_user(user)["role"] == "user"
+    assert UserFilter(role="user").matches(user)
+    assert not UserFilter(role="admin").matches(user)
+
+
+def test_admins_read_as_admin():
+    user = _user(1, "admin")
+    assert serialize_user(user)["role"] == "admin"
+    assert UserFilter(role="admin").matches(user)
+    assert not UserFilter(role="user").matches(user)
+
+
+def test_filtered_pages_cover_every_match_once():
+    # Demoted users carry role "" and must be listed with the other regular users
+    users = [_user(index, ["admin", "", None, "user"][index % 4]) for index in range(103)]
+    repo = FakeUsers(users)
+    user_filter = UserFilter(role="user", confirmed=True)
+    expected = [serialize_user(user) for user in users if user_filter.matches(user)]
+
+    async def collect():
+        rows, cursor = [], None
+        while True:
+            page, cursor = await page_users(repo, user_filter, 7, cursor, upstream_page_size=10, max_scan_pages=2)
+            rows += page
+            if cursor is None:
+                return rows
+
+    rows = asyncio.run(collect())
+    assert rows == expected
+    assert len(expected) == 51
+
+
+def test_cursors_round_trip_and_reject_garbage():
+    assert decode_cursor(encode_cursor(3, 50, 7), 3) == (3, 50, 7)
+    for cursor in ("not-a-cursor", encode_cursor(1, 2), encode_cursor(1, 2, 3, 4)):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(cursor, 3)
+
+
+# --- Cursor paging through the API ---
+LESSONS = [
+    {"id": index, "title": f"Lesson {index}", "game_type": "exact_match", "difficulty": "beginner",
+     "order_index": (index * 7) % 5, "is_published": index % 3 != 0, "config": {}}
+    for index in range(1, 24)
+]
+
+
+@pytest.fixture
+def state():
+    return FakeSupabase(users=11, lessons=[dict(lesson) for lesson in LESSONS])
+
+
+@pytest.fixture
+def client(state):
+    pool = FakePool(state)
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api")
+    app.dependency_overrides[admin.verify_admin] = lambda: {"user_id": ADMIN_ID}
+    app.dependency_overrides[get_lesson_repository] = lambda: LessonRepository(pool=pool)
+    app.dependency_overrides[get_user_admin_repository] = lambda: UserAdminRepository(pool=pool)
+    return TestClient(app)
+
+
+def _walk(client, path: str, key: str, **params) -> list:
+    """Every response body, following next_cursor to the end"""
+    bodies = []
+    while True:
+        response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        bodies.append(body)
+        assert body["count"] == len(body[key])
+        if body["next_cursor"] is None:
+            return bodies
+        params["cursor"] = body["next_cursor"]
+
+
+def test_lesson_pages_cover_every_match_once_with_the_total(client):
+    bodies = _walk(client, "/api/admin/lessons", "lessons", limit=4, is_published=True)
+    expected = sorted((lesson for lesson in LESSONS if lesson["is_published"]),
+                      key=lambda lesson: (lesson["order_index"], lesson["id"]))
+
+    assert [row["id"] for body in bodies for row in body["lessons"]] == [lesson["id"] for lesson in expected]
+    assert [body["count"] for body in bodies] == [4, 4, 4, 4]
+    assert {body["total"] for body in bodies} == {len(expected)}
+
+    unfiltered = client.get("/api/admin/lessons", params={"limit": 50}).json()
+    assert (unfiltered["total"], unfiltered["count"], unfiltered["next_cursor"]) == (23, 23, None)
+
+
+def test_user_pages_cover_every_user_once_with_the_total(client, state):
+    bodies = _walk(client, "/api/admin/users", "users", limit=5)
+    assert [user["id"] for body in bodies for user in body["users"]] == list(state.users)
+    assert [body["count"] for body in bodies] == [5, 5, 2]
+    assert {body["total"] for body in bodies} == {12}
+
+    # Counting filtered matches would mean reading every user
+    filtered = _walk(client, "/api/admin/users", "users", limit=5, role="admin")
+    assert [user["id"] for body in filtered for user in body["users"]] == [ADMIN_ID]
+    assert {body["total"] for body in filtered} == {None}
+
+
+@pytest.mark.parametrize("path", ["/api/admin/lessons", "/api/admin/users"])
+def test_foreign_cursors_are_rejected(client, path):
+    for cursor in ("garbage", encode_cursor(1, 2, 3, 4), encode_cursor(-1)):
+        response = client.get(path, params={"cursor": cursor})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
+    assert client.get(path, params={"limit": 0}).status_code == 422
@@ -0,0 +1,222 @@
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+from app.core.rate_limit import BucketStore
+from app.services.judge_registry import judge_registry
+from app.services.validators import InvalidPlan
+from benchmarks import compare, micro, report
+from benchmarks.fake_supabase import (
+    ADMIN_ID, FakeSupabase, create_app, mint_token, parse_seed_lessons, seed_lessons, user_id,
+)
+
+LESSONS = [
+    {"id": index, "title": f"Lesson {index}", "game_type": "exact_match" if index % 2 else "multiple_choice",
+     "order_index": 10 - index, "is_published": index != 3, "time_limit": None if index < 4 else 60, "config": {}}
+    for index in range(1, 8)
+]
+
+
+# --- Seed parsing ---
+def test_parse_seed_lessons_reads_every_insert():
+    sql = """
+    CREATE TABLE public.lessons (id INT);
+    -- INSERT INTO public.lessons (id) VALUES (99);  is only a comment
+    INSERT INTO public.lessons (id, title, config, is_published, time_limit, score)
+    VALUES
+        (1, 'It''s (a) test', '{"expected": "Hi, there"}', true, NULL, -1.5), -- trailing comment
+        (2, 'Two', '{}', FALSE, 30, 2);
+    insert into public.lessons (id, title) values (3, 'Three');
+    """
+    assert parse_seed_lessons(sql) == [
+        {"id": 1, "title": "It's (a) test", "config": '{"expected": "Hi, there"}', "is_published": True,
+         "time_limit": None, "score": -1.5},
+        {"id": 2, "title": "Two", "config": "{}", "is_published": False, "time_limit": 30, "score": 2},
+        {"id": 3, "title": "Three"},
+    ]
+
+
+def test_seeded_lessons_are_ones_the_app_can_judge():
+    lessons = seed_lessons()
+    assert lessons
+    assert len({lesson["id"] for lesson in lessons}) == len(lessons)
+    for lesson in lessons:
+        assert isinstance(lesson["config"], dict)
+        assert {"difficulty", "order_index", "is_published", "created_at", "updated_at"} <= set(lesson)
+        judge_registry.compile(lesson["game_type"], lesson["config"])
+
+
+# --- PostgREST / GoTrue endpoints ---
+@pytest.fixture
+def state():
+    return FakeSupabase(users=3, lessons=[dict(lesson) for lesson in LESSONS], max_rows=5)
+
+
+@pytest.fixture
+def client(state):
+    return TestClient(create_app(state))
+
+
+def _ids(response) -> list:
+    assert response.status_code == 200, response.text
+    return [row["id"] for row in response.json()]
+
+
+def test_select_filters_order_and_range(client):
+    get = lambda **params: client.get("/rest/v1/lessons", params=params)  # noqa: E731
+    assert _ids(get(id="gt.2", order="id.asc", limit="2")) == [3, 4]
+    assert _ids(get(game_type="eq.multiple_choice", order="order_index.asc")) == [6, 4, 2]
+    assert _ids(get(id="in.(2,5,9)", order="id.desc")) == [5, 2]
+    assert _ids(get(time_limit="is.null", is_published="eq.true", order="id")) == [1, 2]
+    assert _ids(get(id="lte.4", order="is_published.desc,id.desc", offset="1")) == [2, 1, 3]
+    # Multi-column order: the first column wins, the second breaks ties
+    assert _ids(get(order="game_type.asc,id.desc", limit="3")) == [7, 5, 3]
+
+
+def test_select_is_capped_at_max_rows(client, state):
+    assert _ids(client.get("/rest/v1/lessons", params={"order": "id"})) == [1, 2, 3, 4, 5]
+    assert _ids(client.get("/rest/v1/lessons", params={"order": "id", "limit": "50"})) == [1, 2, 3, 4, 5]
+    state.max_rows = 0
+    assert len(_ids(client.get("/rest/v1/lessons"))) == len(LESSONS)
+
+
+def test_insert_upsert_update_delete(client, state):
+    created = client.post("/rest/v1/lessons", json={"title": "New"})
+    assert created.status_code == 201
+    assert created.json()[0]["id"] == 8
+
+    upserted = client.post(
+        "/rest/v1/lessons",
+        params={"on_conflict": "id"},
+        headers={"Prefer": "resolution=merge-duplicates"},
+        json=[{"id": 8, "title": "Renamed"}, {"id": 20, "title": "Twenty"}],
+    )
+    assert [row["title"] for row in upserted.json()] == ["Renamed", "Twenty"]
+    assert len(state.tables["lessons"]) == 9
+
+    patched = client.patch("/rest/v1/lessons", params={"id": "gte.8"}, json={"is_published": False})
+    assert _ids(patched) == [8, 20]
+    assert _ids(client.delete("/rest/v1/lessons", params={"is_published": "eq.false"})) == [3, 8, 20]
+    assert sorted(row["id"] for row in state.tables["lessons"]) == [1, 2, 4, 5, 6, 7]
+
+
+def test_rpc_dispatch(client, state):
+    uid = user_id(0)
+    body = {"p_user_id": uid, "p_amount": 30, "p_idempotency_key": "k1", "p_default": 100}
+    first = client.post("/rest/v1/rpc/deduct_credits", json=body).json()
+    again = client.post("/rest/v1/rpc/deduct_credits", json=body).json()
+    # RETURNS TABLE: a one-row set
+    assert first == [{"balance": 70, "charged": 30, "replayed": False}]
+    assert again == [{"balance": 70, "charged": 30, "replayed": True}]
+    assert client.post("/rest/v1/rpc/ensure_credits", json={"p_user_id": uid, "p_default": 5}).json() == 70
+
+    # take_rate_tokens refills like the in-process buckets it stands in for
+    store = BucketStore(shards=1)
+    for _ in range(6):
+        body = {"p_key": "k", "p_rate": 0.001, "p_burst": 3, "p_cost": 1}
+        assert client.post("/rest/v1/rpc/take_rate_tokens", json=body).json() == pytest.approx(
+            store.take("k", 0.001, 3), rel=0.01,
+        )
+
+    missing = client.post("/rest/v1/rpc/no_such_function", json={})
+    assert missing.status_code == 404
+    assert "no_such_function" in missing.json()["message"]
+
+
+def test_auth_endpoints(client, state):
+    token = mint_token(user_id(1), state.jwt_secret, "http://fake/auth/v1")
+    me = client.get("/auth/v1/user", headers={"Authorization": f"Bearer {token}"})
+    assert me.json()["id"] == user_id(1)
+    forged = mint_token(user_id(1), "not-the-secret", "http://fake/auth/v1")
+    assert client.get("/auth/v1/user", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+
+    pages = [client.get("/auth/v1/admin/users", params={"page": page, "per_page": 3}).json()["users"]
+             for page in (1, 2)]
+    assert [user["id"] for user in pages[0] + pages[1]] == [ADMIN_ID] + [user_id(index) for index in range(3)]
+
+    updated = client.put(f"/auth/v1/admin/users/{user_id(2)}", json={"user_metadata": {"role": "admin"}})
+    assert updated.json()["user_metadata"] == {"role": "admin"}
+    assert client.delete(f"/auth/v1/admin/users/{user_id(2)}").status_code == 200
+    assert client.get(f"/auth/v1/admin/users/{user_id(2)}").status_code == 404
+
+
+# --- Micro-benchmarks ---
+def test_micro_cases_time_compiled_plans():
+    cases = micro.build_cases()
+    planned = {name: case for name, case in cases.items() if case[0] is micro.judge_plan}
+    assert len(planned) > 20
+    for name, (fn, value, plan) in planned.items():
+        assert not isinstance(plan, InvalidPlan), name
+        success, _, score = fn(value, plan)[:3]
+        if name.endswith("/hit"):
+            assert success and score == 100, name
+        elif name.endswith("/miss"):
+            assert not success, name
+
+    batch, loop = cases["similarity/batch/1000"], cases["similarity/loop/1000"]
+    assert batch[0](batch[1], batch[2]) == loop[0](loop[1], loop[2])
+    for name in (name for name in cases if name.startswith("compile/")):
+        fn, game_type, config = cases[name]
+        assert not isinstance(fn(game_type, config), InvalidPlan), name
+
+
+def test_run_case_reports_timings():
+    fn, value, plan = micro.build_cases()["exact_match/exact/hit"]
+    result = micro.run_case(fn, value, plan, samples=3, min_batch_time=0.001)
+    assert result["ops_per_sec"] > 0 and result["samples"] == 3
+
+
+# --- Reports and comparison ---
+def test_percentile_and_summary():
+    ordered = [float(value) for value in range(1, 101)]
+    assert report.percentile(ordered, 0.5) == 51.0
+    assert report.percentile(ordered, 0.99) == 100.0
+    assert report.percentile([], 0.5) == 0.0
+    assert report.summarize([0.003, 0.001, 0.002], 1000, "ms") == {
+        "p50_ms": 2.0, "p95_ms": 3.0, "p99_ms": 3.0, "mean_ms": 2.0, "max_ms": 3.0,
+    }
+    assert report.summarize([], 1000, "ms")["max_ms"] == 0.0
+
+
+def _run(kind: str = "micro", config: dict = None, **results) -> dict:
+    return report.build(kind, config or {"duration": 1}, results)
+
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = _run(fast={"ops_per_sec": 1000, "p99_us": 100}, gone={"ops_per_sec": 1})
+    current = _run(fast={"ops_per_sec": 850, "p99_us": 95}, new={"ops_per_sec": 1})
+    rows = compare.compare(baseline, current, threshold=0.10)
+
+    assert [(row["benchmark"], row["metric"], row["change"], row["regression"]) for row in rows] == [
+        ("fast", "ops_per_sec", -0.15, True),  # throughput dropped
+        ("fast", "p99_us", -0.05, False),  # latency improved
+    ]
+    assert not any(row["regression"] for row in compare.compare(baseline, current, threshold=0.2))
+    assert "REGRESSION" in compare.render(rows)
+
+    with pytest.raises(ValueError, match="'micro'.*'load'"):
+        compare.compare(baseline, _run("load"), threshold=0.1)
+
+
+def test_config_changes_ignore_duration():
+    baseline = _run(config={"duration": 30, "latency": 0.002, "workers": 1})
+    current = _run(config={"duration": 5, "latency": 0.005, "rate": 100})
+    assert compare.config_changes(baseline, current) == ["latency", "rate", "workers"]
+
+
+def test_compare_cli_exit_status(tmp_path, capsys):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    report.write(_run(judge={"p50_us": 10.0, "p99_us": 20.0}), str(baseline))
+    report.write(_run(judge={"p50_us": 10.5, "p99_us": 30.0}), str(current))
+    assert report.load(str(baseline))["results"] == {"judge": {"p50_us": 10.0, "p99_us": 20.0}}
+
+    assert compare.main([str(baseline), str(current)]) == 1
+    assert compare.main([str(baseline), str(current), "--metrics", "p50_us"]) == 0
+    assert compare.main([str(baseline), str(current), "--threshold", "0.6"]) == 0
+    assert compare.check(str(baseline), report.load(str(current)), 0.6)
+    out = capsys.readouterr().out
+    assert "judge" in out and "+50.0%" in out
+
+    report.write(_run(judge={}), None)
+    assert json.loads(capsys.readouterr().out)["kind"] == "micro"
@@ -0,0 +1,118 @@
+import asyncio
+import random
+
+import pytest
+
+from app.repositories.credits import CreditsRepository
+from app.services.credits import CreditsService, CreditsUnavailable
+from benchmarks.fake_supabase import FakeSupabase, user_id
+from tests.fakes import FakePool
+
+DEFAULT = 1000
+
+
+def _service(pool: FakePool, write_behind: bool = True, batch_size: int = 16, max_pending: int = 64) -> CreditsService:
+    return CreditsService(
+        default=DEFAULT,
+        write_behind=write_behind,
+        flush_interval=0.005,
+        batch_size=batch_size,
+        max_pending=max_pending,
+        balance_ttl=30.0,
+        repository_factory=lambda: CreditsRepository(timeout=5, pool=pool),
+    )
+
+
+@pytest.mark.parametrize("write_behind", [True, False])
+def test_concurrent_deductions_add_up(write_behind):
+    state = FakeSupabase(users=5)
+    pool = FakePool(state, latency=0.001)
+    service = _service(pool, write_behind=write_behind)
+    users = [user_id(index) for index in range(5)]
+    rng = random.Random(7)
+    # Enough to run two of the users dry, which must clamp at zero rather than go negative
+    plan = [(users[rng.randrange(5)], rng.randrange(1, 12)) for _ in range(800)]
+    expected = {uid: DEFAULT for uid in users}
+    for uid, amount in plan:
+        expected[uid] -= min(expected[uid], amount)
+
+    async def main():
+        await service.start()
+        replies = await asyncio.gather(
+            *(service.deduct(uid, amount, CreditsRepository(timeout=5, pool=pool)) for uid, amount in plan)
+        )
+        await service.stop()
+        return replies, {uid: await service.balance(uid) for uid in users}
+
+    replies, balances = asyncio.run(main())
+    assert all(reply >= 0 for reply in replies)
+    assert {uid: state.credits[uid] for uid in users} == expected
+    assert balances == expected
+    assert len(state.ledger) == len(plan)
+    assert service.stats()["pending"] == 0
+
+
+def test_concurrent_retries_charge_once():
+    state = FakeSupabase(users=1)
+    pool = FakePool(state, latency=0.001)
+    service = _service(pool)
+    uid = user_id(0)
+
+    async def main():
+        await service.start()
+        repo = CreditsRepository(timeout=5, pool=pool)
+        replies = await asyncio.gather(*(service.deduct(uid, 5, repo, idempotency_key=f"k{i % 10}") for i in range(100)))
+        await service.stop()
+        return replies
+
+    replies = asyncio.run(main())
+    assert state.credits[uid] == DEFAULT - 50
+    assert len(set(replies)) == 10
+    assert service.stats()["replays"] == 90
+
+
+def test_rejected_entry_does_not_block_the_queue():
+    state = FakeSupabase(users=2)
+    pool = FakePool(state)
+    service = _service(pool, batch_size=8, max_pending=8)
+    gone = "00000000-0000-0000-0000-00000000dead"
+
+    async def main():
+        repo = CreditsRepository(timeout=5, pool=pool)
+        await service.deduct(user_id(0), 1, repo)
+        # The account is removed after its balance was loaded; its deduction can never apply
+        await service.deduct(gone, 1, repo)
+        del state.users[gone]
+        for _ in range(40):
+            # Passes max_pending several times; each backpressure flush must succeed
+            await service.deduct(user_id(1), 1, repo)
+        await service.flush()
+
+    state.users[gone] = {"id": gone}
+    asyncio.run(main())
+    assert state.credits[user_id(0)] == DEFAULT - 1
+    assert state.credits[user_id(1)] == DEFAULT - 40
+    assert service.stats()["rejected_entries"] == 1
+    assert service.stats()["pending"] == 0
+    assert gone not in service._balances
+
+
+def test_full_buffer_with_the_database_down_is_unavailable():
+    state = FakeSupabase(users=1)
+    pool = FakePool(state)
+    service = _service(pool, batch_size=4, max_pending=4)
+
+    async def main():
+        repo = CreditsRepository(timeout=5, pool=pool)
+        await service.balance(user_id(0))
+        pool.down = True
+        for _ in range(4):
+            await service.deduct(user_id(0), 1, repo)
+        with pytest.raises(CreditsUnavailable):
+            await service.deduct(user_id(0), 1, repo)
+        # Nothing was lost: once the database is back the queue drains
+        pool.down = False
+        await service.flush()
+
+    asyncio.run(main())
+    assert state.credits[user_id(0)] == DEFAULT - 4
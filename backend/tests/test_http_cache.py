@@ -0,0 +1,154 @@
+import gzip
+import json
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.testclient import TestClient
+
+from app.api import levels
+from app.core.http_cache import CachedBody, ResponseCache, negotiate, not_modified
+from app.repositories.lessons import LessonRepository, get_lesson_repository
+from app.services.lesson_catalog import LessonCatalog
+from benchmarks.fake_supabase import FakeSupabase
+from tests.fakes import FakePool
+
+CACHE_CONTROL = "public, max-age=60"
+
+
+def _lesson(lesson_id: int, published: bool = True) -> dict:
+    return {
+        "id": lesson_id,
+        "title": f"Lesson {lesson_id} — «hello»",
+        "goal": "Say hello " * 20,
+        "game_type": "exact_match",
+        "order_index": lesson_id,
+        "config": {"expected": "hello"},
+        "is_published": published,
+    }
+
+
+# --- Negotiation and validation ---
+@pytest.mark.parametrize("header, size, encoding", [
+    (None, 4096, "identity"),
+    ("gzip, deflate, br", 4096, "br"),
+    ("gzip", 4096, "gzip"),
+    ("br;q=0, gzip;q=0.5", 4096, "gzip"),
+    ("*", 4096, "br"),
+    ("*;q=0, identity", 4096, "identity"),
+    ("gzip, br", 100, "identity"),
+])
+def test_negotiate(header, size, encoding):
+    assert negotiate(header, size, min_size=512) == encoding
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"abc"', True),
+    ('"abc-gzip"', True),
+    ('W/"abc-br"', True),
+    ('"old", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ('"old-gzip"', False),
+])
+def test_not_modified(header, matches):
+    assert not_modified(header, "abc") is matches
+
+
+def test_cached_body_matches_json_response_and_decompresses_back():
+    content = {"levels": [_lesson(1)], "total": 1}
+    body = CachedBody(content)
+    assert body.identity == JSONResponse(content).body
+    assert gzip.decompress(body.body("gzip")) == body.identity
+    assert brotli.decompress(body.body("br")) == body.identity
+    assert body.body("gzip") is body.body("gzip")
+    assert body.etag("identity") == f'"{body.tag}"' and body.etag("br") == f'"{body.tag}-br"'
+    # Same content, same tag: workers with separate caches agree
+    assert CachedBody(json.loads(body.identity)).tag == body.tag
+
+
+def test_bodies_are_kept_until_the_version_changes():
+    cache = ResponseCache(CACHE_CONTROL, compress_min_size=512)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"n": len(builds)}
+
+    first = cache.get("levels", 1, build)
+    assert cache.get("levels", 1, build) is first
+    assert cache.get("levels", 2, build) is not first
+    assert len(builds) == 2
+    assert cache.stats()["version"] == 2 and cache.stats()["entries"] == 1
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+
+
+# --- Through the levels routes ---
+@pytest.fixture
+def setup(monkeypatch):
+    state = FakeSupabase(users=0, lessons=[_lesson(1), _lesson(2), _lesson(3, published=False)])
+    pool = FakePool(state)
+    catalog = LessonCatalog(poll_interval=0)
+    cache = ResponseCache(CACHE_CONTROL, compress_min_size=512)
+    monkeypatch.setattr(levels, "lesson_catalog", catalog)
+    monkeypatch.setattr(levels, "level_responses", cache)
+    app = FastAPI()
+    app.include_router(levels.router, prefix="/api")
+    app.dependency_overrides[get_lesson_repository] = lambda: LessonRepository(pool=pool)
+    return TestClient(app), pool, catalog, cache
+
+
+def test_levels_carry_etag_and_cache_control(setup):
+    client, _, _, _ = setup
+    response = client.get("/api/levels", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert [level["id"] for level in response.json()["levels"]] == [1, 2]
+    assert response.headers["cache-control"] == CACHE_CONTROL
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].startswith('"') and "content-encoding" not in response.headers
+
+
+@pytest.mark.parametrize("path", ["/api/levels", "/api/levels/1"])
+def test_matching_etag_gets_a_304_without_a_query_or_serialization(setup, path):
+    client, pool, _, cache = setup
+    etag = client.get(path).headers["etag"]
+    queries, misses = pool.acquired, cache.misses
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == etag
+    assert (pool.acquired, cache.misses, cache.not_modified) == (queries, misses, 1)
+
+
+def test_compressed_variants_share_one_tag(setup):
+    client, _, _, _ = setup
+    plain = client.get("/api/levels", headers={"Accept-Encoding": "identity"})
+    for encoding in ("gzip", "br"):
+        response = client.get("/api/levels", headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert response.content == plain.content  # decoded by the client
+        assert response.headers["etag"] == plain.headers["etag"][:-1] + f'-{encoding}"'
+        # Revalidating with the compressed tag works whatever the client now accepts
+        revalidated = client.get(
+            "/api/levels", headers={"If-None-Match": response.headers["etag"], "Accept-Encoding": "identity"}
+        )
+        assert revalidated.status_code == 304
+
+
+def test_admin_write_changes_the_etag(setup):
+    client, _, catalog, _ = setup
+    before = client.get("/api/levels/1")
+    catalog.upsert({**_lesson(1), "title": "Renamed"})
+    after = client.get("/api/levels/1", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.json()["title"] == "Renamed"
+    assert after.headers["etag"] != before.headers["etag"]
+
+
+def test_unpublished_and_missing_levels_are_not_found(setup):
+    client, _, _, cache = setup
+    assert client.get("/api/levels/3").status_code == 404
+    assert client.get("/api/levels/99").status_code == 404
+    assert cache.stats()["entries"] == 0
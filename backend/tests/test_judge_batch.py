@@ -0,0 +1,105 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app.api import judge as judge_api
+from app.core.rate_limit import limit_user
+from app.repositories.lessons import LessonRepository, get_lesson_repository
+from app.services.lesson_catalog import LessonCatalog
+from benchmarks.fake_supabase import FakeSupabase, user_id
+from tests.fakes import FakePool
+
+LESSONS = [
+    {"id": 1, "title": "Echo", "game_type": "exact_match", "is_published": True,
+     "config": {"match_type": "exact", "expected": "hello", "case_sensitive": False}},
+    {"id": 2, "title": "Pick", "game_type": "multiple_choice", "is_published": True,
+     "config": {"options": ["a", "b", "c"], "correct": [1]}},
+    {"id": 3, "title": "Broken", "game_type": "exact_match", "is_published": True,
+     "config": {"match_type": "regex", "expected": "("}},
+    {"id": 4, "title": "Order", "game_type": "reorder", "is_published": True,
+     "config": {"items": ["x", "y", "z"], "correct_order": [2, 0, 1]}},
+]
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Progress and leaderboard writes made by the judge routes"""
+    writes = []
+    monkeypatch.setattr(judge_api.progress_recorder, "record", lambda *args: writes.append(("progress", *args)))
+    monkeypatch.setattr(judge_api.leaderboard, "record", lambda *args: writes.append(("leaderboard", *args)))
+    return writes
+
+
+@pytest.fixture
+def client(monkeypatch, recorded):
+    state = FakeSupabase(users=1, lessons=[dict(lesson) for lesson in LESSONS])
+    pool = FakePool(state)
+    monkeypatch.setattr(judge_api, "lesson_catalog", LessonCatalog(poll_interval=0))
+    app = FastAPI()
+    app.include_router(judge_api.router, prefix="/api")
+    app.dependency_overrides[limit_user] = lambda: {"user_id": user_id(0)}
+    app.dependency_overrides[get_lesson_repository] = lambda: LessonRepository(pool=pool)
+    return TestClient(app)
+
+
+ITEMS = [
+    {"level_id": 1, "user_prompt": "  HELLO "},
+    {"level_id": 2, "selected": [0]},
+    {"level_id": 99, "user_prompt": "x"},
+    {"level_id": 3, "user_prompt": "x"},
+    {"level_id": 4, "user_order": [2, 0, 1]},
+    {"level_id": 1, "user_prompt": "bye"},
+]
+
+
+def test_batch_scores_each_item_in_order(client):
+    response = client.post("/api/judge/batch", json={"items": ITEMS})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == len(ITEMS)
+    results = body["results"]
+
+    assert [item["index"] for item in results] == list(range(len(ITEMS)))
+    assert [item["level_id"] for item in results] == [item["level_id"] for item in ITEMS]
+    assert [item["success"] for item in results] == [True, False, False, False, True, False]
+    assert results[0]["score"] == 100 and results[0]["ai_output"] == "  HELLO "
+    assert results[2]["error"] == "Level not found"
+    # A lesson whose config no longer compiles is a failed answer, not a failed batch
+    assert results[3]["error"] is None and results[3]["score"] == 0
+    assert results[3]["feedback"].startswith("Invalid regex pattern")
+
+
+def test_batch_items_match_single_judge_results(client):
+    singles = [client.post("/api/judge", json=item) for item in ITEMS if item["level_id"] != 99]
+    batch = [item for item in client.post("/api/judge/batch", json={"items": ITEMS}).json()["results"]
+             if item["error"] is None]
+    assert [single.json() for single in singles] == [
+        {key: item[key] for key in ("success", "feedback", "score", "ai_output")} for item in batch
+    ]
+
+
+def test_batch_does_not_record_progress_or_leaderboard(client, recorded):
+    client.post("/api/judge/batch", json={"items": ITEMS})
+    client.post("/api/judge/batch", json={"items": ITEMS, "stream": True})
+    assert recorded == []
+
+    # The single-item route still records every attempt
+    client.post("/api/judge", json=ITEMS[0])
+    assert recorded == [("progress", user_id(0), 1, True, 100), ("leaderboard", user_id(0), 1, True, 100)]
+
+
+def test_streamed_batch_sends_one_line_per_item(client):
+    response = client.post("/api/judge/batch", json={"items": ITEMS, "stream": True})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    plain = client.post("/api/judge/batch", json={"items": ITEMS}).json()["results"]
+    assert sorted(lines, key=lambda item: item["index"]) == plain
+
+
+def test_oversized_batch_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(judge_api.settings, "JUDGE_BATCH_MAX_SIZE", 3)
+    response = client.post("/api/judge/batch", json={"items": ITEMS})
+    assert response.status_code == 413
+    assert "max 3" in response.json()["detail"]
@@ -0,0 +1,158 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app.api import admin
+from app.core.config import settings
+from app.services.judge_registry import GameType, JudgeRegistry, judge_registry
+from app.services.static_judge import judge_static
+from app.services.validators import ConfigError, InvalidPlan, compile_exact_match
+
+
+@pytest.fixture
+def compiles():
+    """Configs compiled by a fresh registry's exact_match type"""
+    seen = []
+
+    def compile(config: dict):
+        seen.append(config)
+        return compile_exact_match(config)
+
+    registry = JudgeRegistry()
+    registry.register(GameType(
+        id="exact_match", name="Exact Match", description="", config_schema={},
+        compile=compile, submission=lambda request: request.user_prompt,
+    ))
+    return registry, seen
+
+
+def _lesson(updated_at="2026-01-01T00:00:00+00:00", **config) -> dict:
+    return {"id": 1, "game_type": "exact_match", "updated_at": updated_at,
+            "config": {"match_type": "exact", "expected": "hello", **config}}
+
+
+def test_plan_is_cached_by_lesson_id_and_updated_at(compiles):
+    registry, seen = compiles
+    plan = registry.plan_for(_lesson())
+    assert registry.plan_for(_lesson()) is plan
+    assert registry.plan_for(_lesson(expected="edited, same timestamp")) is plan
+    assert len(seen) == 1
+
+    # An edit bumps updated_at, which is what invalidates the plan
+    edited = registry.plan_for(_lesson("2026-01-02T00:00:00+00:00", expected="bye"))
+    assert edited is not plan and len(seen) == 2
+    assert edited.judge("bye")[0] is True
+    # Other lessons have their own entries
+    assert registry.plan_for({**_lesson(), "id": 2}) is not edited
+
+
+def test_invalid_config_is_cached_until_the_lesson_changes(compiles):
+    registry, seen = compiles
+    broken = _lesson(match_type="regex", expected="(")
+    plan = registry.plan_for(broken)
+    assert isinstance(plan, InvalidPlan)
+    assert registry.plan_for(broken) is plan and len(seen) == 1
+    success, feedback, score = plan.judge("x")
+    assert (success, score) == (False, 0) and feedback.startswith("Invalid regex pattern")
+
+    fixed = registry.plan_for(_lesson("2026-01-02T00:00:00+00:00", match_type="regex", expected="h.llo"))
+    assert fixed.judge("hello")[0] is True
+
+
+def test_judge_uses_the_cached_plan_and_records_latency(compiles):
+    registry, seen = compiles
+    request = SimpleNamespace(user_prompt="HELLO")
+    results = [asyncio.run(registry.judge(_lesson(case_sensitive=False), request)) for _ in range(3)]
+    assert [result[0] for result in results] == [True] * 3
+    assert len(seen) == 1
+    assert registry.stats()["exact_match"]["count"] == 3
+
+
+def test_unknown_game_type():
+    lesson = {"id": 1, "game_type": "crossword", "config": {}}
+    assert asyncio.run(judge_registry.judge(lesson, SimpleNamespace())) == (
+        False, "Game type 'crossword' not yet supported.", 0
+    )
+    with pytest.raises(ConfigError, match="crossword"):
+        judge_registry.compile("crossword", {})
+
+
+@pytest.mark.parametrize("game_type", ["exact_match", "llm"])
+@pytest.mark.parametrize("limit", [0, -1, True, "50", 2.5])
+def test_bad_max_input_length_is_rejected_at_compile_time(game_type, limit):
+    with pytest.raises(ConfigError, match="'max_input_length' must be a positive integer"):
+        judge_registry.compile(game_type, {"expected": "hello", "max_input_length": limit})
+
+
+@pytest.mark.parametrize("game_type, length", [("exact_match", "max_input_length"), ("llm", "max_prompt_length")])
+def test_max_input_length_defaults_only_when_unset(game_type, length):
+    for config in ({}, {"max_input_length": None}):
+        plan = judge_registry.compile(game_type, {"expected": "hello", **config})
+        assert getattr(plan, length) == settings.JUDGE_MAX_INPUT_LENGTH
+    assert getattr(judge_registry.compile(game_type, {"expected": "hello", "max_input_length": 3}), length) == 3
+
+
+def test_stream_of_a_plan_without_stream_is_just_the_result(compiles):
+    registry, _ = compiles
+
+    async def events():
+        return [event async for event in registry.judge_stream(_lesson(), SimpleNamespace(user_prompt="hello"))]
+
+    assert asyncio.run(events()) == [("result", (True, "Perfect! Exact match achieved! 🎉", 100))]
+
+
+
+# --- One registry behind every judge path ---
+def test_a_new_game_type_only_needs_registering():
+    registry = JudgeRegistry()
+    registry.register(GameType(
+        id="length", name="Length", description="Answer has at least N characters",
+        config_schema={"min": {"type": "number", "required": True}},
+        compile=lambda config: SimpleNamespace(
+            judge=lambda text: (len(text) >= config["min"], "", 100 if len(text) >= config["min"] else 0)
+        ),
+        submission=lambda request: request.user_prompt,
+    ))
+    lesson = {"id": 7, "game_type": "length", "config": {"min": 3}}
+    assert asyncio.run(registry.judge(lesson, SimpleNamespace(user_prompt="abcd")))[0] is True
+    assert registry.describe() == [{
+        "id": "length", "name": "Length", "description": "Answer has at least N characters",
+        "config_schema": {"min": {"type": "number", "required": True}},
+    }]
+    assert registry.stats()["length"]["count"] == 1
+    assert registry._latency["length"].histogram.count == 1
+
+
+def test_admin_game_types_come_from_the_registry():
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api")
+    app.dependency_overrides[admin.verify_admin] = lambda: {"user_id": "admin"}
+    game_types = TestClient(app).get("/api/admin/game-types").json()["game_types"]
+    assert game_types == judge_registry.describe()
+    assert [game_type["id"] for game_type in game_types] == [
+        "exact_match", "fill_blank", "multiple_choice", "reorder", "llm",
+    ]
+
+
+@pytest.mark.parametrize("validation, answer", [
+    ({"type": "exact", "expected": "Hello", "case_sensitive": False}, "hello"),
+    ({"type": "exact", "expected": "Hello"}, "hello"),
+    ({"type": "contains", "expected": "ada"}, "my name is ada"),
+    ({"type": "regex", "expected": r"^\d{3}$"}, "123"),
+    ({"type": "regex", "expected": r"^\d{3}$"}, "12a"),
+    ({"type": "similarity", "expected": "hello world", "pass_score": 80}, "helo world"),
+])
+def test_static_judge_agrees_with_the_exact_match_plan(validation, answer):
+    config = {key: value for key, value in validation.items() if key != "type"}
+    plan = judge_registry.compile("exact_match", {**config, "match_type": validation["type"]})
+    assert judge_static(answer, validation) == plan.judge_blocking(answer)
+
+
+def test_static_judge_reports_bad_rules():
+    assert judge_static("x", {"type": "regex", "expected": "("}) == (
+        False, "Internal error: Invalid validation pattern.", 0
+    )
+    assert judge_static("x", {"type": "soundex", "expected": "x"}) == (False, "Unknown validation type.", 0)
@@ -0,0 +1,85 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.services.leaderboard import Leaderboard
+from tests.fakes import MAX_ROWS, FakeProgress, progress_row
+
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _rows(count: int, users: int, lessons: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    rows, seen = [], set()
+    while len(rows) < count:
+        user, lesson = rng.randrange(users), rng.randrange(1, lessons + 1)
+        if (user, lesson) in seen:
+            continue
+        seen.add((user, lesson))
+        at = (EPOCH + timedelta(seconds=rng.randrange(86400 * 30))).isoformat() if rng.random() < 0.7 else None
+        rows.append(progress_row(len(rows) + 1, f"user-{user}", lesson, rng.randrange(0, 200), at))
+    return rows
+
+
+def _expected_order(rows: list, all_rows: list = None) -> list:
+    """User ids best first, computed directly: completions, then score, then earliest to get there"""
+    totals = {}
+    for row in rows:
+        completed, score, reached = totals.get(row["user_id"], (0, 0, None))
+        at = int(datetime.fromisoformat(row["completed_at"]).timestamp()) if row["completed"] else None
+        if at is not None:
+            reached = at if reached is None else max(reached, at)
+        totals[row["user_id"]] = (completed + row["completed"], score + row["score"], reached)
+    # Ties beyond that fall back to first appearance in the table, which is how seqs are assigned
+    first = {}
+    for row in all_rows or rows:
+        first.setdefault(row["user_id"], len(first))
+    return sorted(
+        totals,
+        key=lambda user: (
+            -totals[user][0],
+            -totals[user][1],
+            totals[user][2] if totals[user][2] is not None else float("inf"),
+            first[user],
+        ),
+    )
+
+
+def test_rebuild_pages_past_the_row_cap():
+    rows = _rows(3500, users=1200, lessons=5)
+    progress = FakeProgress(rows)
+    # Asking for more than the cap gets short pages; the rebuild must not stop at the first one
+    board = Leaderboard(rebuild_interval=0, page_size=5000, replay_window=0)
+    asyncio.run(board.rebuild(progress))
+
+    assert board.last_rebuild_rows == len(rows)
+    assert progress.calls == -(-len(rows) // MAX_ROWS) + 1
+    expected = _expected_order(rows)
+    assert board.size() == len(expected)
+    assert [entry["user_id"] for entry in board.top(len(expected))] == expected
+    for position in (0, 1, len(expected) // 2, len(expected) - 1):
+        assert board.rank(expected[position])["rank"] == position + 1
+
+
+def test_rebuild_per_lesson_boards():
+    rows = _rows(2500, users=900, lessons=3, seed=1)
+    board = Leaderboard(rebuild_interval=0, page_size=MAX_ROWS, replay_window=0)
+    asyncio.run(board.rebuild(FakeProgress(rows)))
+
+    for lesson_id in (1, 2, 3):
+        lesson_rows = [row for row in rows if row["lesson_id"] == lesson_id]
+        assert board.size(lesson_id) == len(lesson_rows)
+        expected = _expected_order(lesson_rows, rows)
+        assert [entry["user_id"] for entry in board.top(len(expected), lesson_id)] == expected
+
+
+def test_record_after_rebuild_moves_the_user():
+    rows = [progress_row(1, "a", 1, 50, EPOCH.isoformat()), progress_row(2, "b", 1, 80, EPOCH.isoformat())]
+    board = Leaderboard(rebuild_interval=0, page_size=MAX_ROWS, replay_window=0)
+    asyncio.run(board.rebuild(FakeProgress(rows)))
+    assert board.rank("a")["rank"] == 2
+
+    board.record("a", 2, success=True, score=10, judged_at=EPOCH.timestamp() + 60)
+    assert board.rank("a")["rank"] == 1
+    assert board.rank("a", lesson_id=2)["rank"] == 1
+    assert board.around("b", 1)[0]["user_id"] == "a"
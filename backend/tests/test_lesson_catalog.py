@@ -0,0 +1,151 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.repositories.lessons import LessonRepository
+from app.services.lesson_catalog import LessonCatalog
+from benchmarks.fake_supabase import FakeSupabase
+from tests.fakes import MAX_ROWS, FakePool
+
+
+def _lesson(lesson_id: int, published: bool = True) -> dict:
+    return {
+        "id": lesson_id,
+        "title": f"Lesson {lesson_id}",
+        "goal": "Say hello",
+        "game_type": "exact_match",
+        "difficulty": "beginner",
+        "order_index": lesson_id,
+        "config": {"expected": "hello"},
+        "is_published": published,
+        "updated_at": "2026-01-01T00:00:00+00:00",
+    }
+
+
+def _setup(count: int):
+    state = FakeSupabase(users=0, lessons=[_lesson(i, published=i % 3 != 0) for i in range(1, count + 1)])
+    pool = FakePool(state)
+    return state, pool, LessonRepository(timeout=5, pool=pool)
+
+
+def test_repository_reads_past_the_row_cap():
+    state, _, lessons = _setup(2 * MAX_ROWS + 500)
+
+    async def main():
+        return await lessons.list_all(), await lessons.list_ids(), await lessons.list_updated_since("2025-01-01")
+
+    rows, ids, changed = asyncio.run(main())
+    assert [row["id"] for row in rows] == list(range(1, len(state.tables["lessons"]) + 1))
+    assert ids == [row["id"] for row in rows]
+    assert len(changed) == len(rows)
+
+
+def test_poll_keeps_lessons_past_the_row_cap(monkeypatch):
+    state, _, lessons = _setup(MAX_ROWS + 200)
+    catalog = LessonCatalog(poll_interval=0)
+
+    async def main():
+        await catalog.load(lessons)
+        assert catalog.stats()["lessons"] == MAX_ROWS + 200
+        # A poll with nothing changed must not mistake rows beyond the first page for deletions
+        await catalog.poll()
+        assert catalog.stats()["lessons"] == MAX_ROWS + 200
+        state.tables["lessons"] = [row for row in state.tables["lessons"] if row["id"] != MAX_ROWS + 100]
+        await catalog.poll()
+        assert catalog.stats()["lessons"] == MAX_ROWS + 199
+        assert await catalog.get(MAX_ROWS + 150, lessons) is not None
+
+    # poll() builds its own repository
+    monkeypatch.setattr("app.services.lesson_catalog.LessonRepository", lambda *args, **kwargs: lessons)
+    asyncio.run(main())
+
+
+def test_missing_lessons_are_cached_until_the_catalog_changes():
+    state, pool, lessons = _setup(10)
+    catalog = LessonCatalog(poll_interval=0)
+
+    async def main():
+        await catalog.load(lessons)
+        before = pool.acquired
+        for _ in range(5):
+            assert await catalog.get(404, lessons) is None
+        assert await catalog.get_many([404, 1, 405], lessons) == {1: catalog._by_id[1]}
+        assert await catalog.get_many([405], lessons) == {}
+        # One query for 404, one for 405; the repeats were answered from the catalog
+        assert pool.acquired - before == 2
+        assert catalog.stats()["absent_hits"] == 6
+
+        # Another process creates the lesson; a new catalog version forgets what was missing
+        state.tables["lessons"].append(_lesson(404))
+        catalog.upsert(_lesson(11))
+        assert (await catalog.get(404, lessons))["id"] == 404
+        assert pool.acquired - before == 3
+
+    asyncio.run(main())
+
+
+def test_published_only_hides_drafts():
+    _, _, lessons = _setup(6)
+    catalog = LessonCatalog(poll_interval=0)
+
+    async def main():
+        await catalog.load(lessons)
+        assert await catalog.get(3, lessons, published_only=True) is None
+        assert (await catalog.get(3, lessons))["id"] == 3
+        assert [lesson["id"] for lesson in await catalog.list_published(lessons)] == [1, 2, 4, 5]
+
+    asyncio.run(main())
+
+
+def _poll_setup(monkeypatch, **kwargs):
+    state, _, lessons = _setup(5)
+    monkeypatch.setattr("app.services.lesson_catalog.LessonRepository", lambda *args, **kw: lessons)
+    return state, lessons, LessonCatalog(poll_interval=0, **kwargs)
+
+
+def _late_commit(state, lesson_id: int, updated_at: str) -> None:
+    """A row written by a transaction that started before the newest known change but committed after"""
+    state.tables["lessons"].append({**_lesson(lesson_id), "updated_at": updated_at})
+
+
+def test_poll_overlap_picks_up_late_commits(monkeypatch):
+    state, lessons, catalog = _poll_setup(monkeypatch, poll_overlap=60)
+
+    async def main():
+        await catalog.load(lessons)
+        _late_commit(state, 6, "2025-12-31T23:59:30+00:00")
+        await catalog.poll()
+        assert 6 in catalog._by_id
+        # Re-reading rows already known is not a change
+        version = catalog.version
+        await catalog.poll()
+        assert catalog.version == version
+
+    asyncio.run(main())
+
+
+def test_full_reload_catches_what_the_overlap_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(
+        "app.services.lesson_catalog.time", SimpleNamespace(**dict(vars(time), monotonic=lambda: now[0]))
+    )
+    state, lessons, catalog = _poll_setup(monkeypatch, poll_overlap=60, full_reload_interval=600)
+
+    async def main():
+        await catalog.load(lessons)
+        _late_commit(state, 6, "2025-12-31T00:00:00+00:00")
+        now[0] += 599
+        await catalog.poll()
+        assert 6 not in catalog._by_id and catalog.full_reloads == 0
+
+        now[0] += 1
+        await catalog.poll()
+        assert 6 in catalog._by_id and catalog.full_reloads == 1
+
+        # A reload that finds nothing new leaves the version (and the caches keyed on it) alone
+        version = catalog.version
+        now[0] += 600
+        await catalog.poll()
+        assert catalog.full_reloads == 2 and catalog.version == version
+
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import pytest
+
+from app.repositories.lessons import LessonRepository
+from app.services.lesson_import import BundleError, TooManyLessons, import_lessons, iter_bundle
+from benchmarks.fake_supabase import FakeSupabase
+from tests.fakes import MAX_ROWS, FakePool
+
+
+def _item(index: int, lesson_id=None) -> dict:
+    item = {
+        "title": f"Imported {index}",
+        "goal": "Say hello",
+        "game_type": "exact_match",
+        "order_index": 1000 + index,
+        "config": {"expected": f"hello {index}"},
+        "is_published": True,
+    }
+    if lesson_id is not None:
+        item["id"] = lesson_id
+    return item
+
+
+async def _items(items):
+    for item in items:
+        yield item
+
+
+def _run(items, state: FakeSupabase, dry_run: bool = False, max_lessons: int = 10_000):
+    lessons = LessonRepository(timeout=5, pool=FakePool(state))
+    return asyncio.run(import_lessons(_items(items), lessons, max_lessons=max_lessons, page_size=500, dry_run=dry_run))
+
+
+def test_import_reports_every_lesson_past_the_row_cap():
+    state = FakeSupabase(users=0)
+    seeded = len(state.tables["lessons"])
+    count = MAX_ROWS * 2 + 300
+    result = _run([_item(i) for i in range(count)], state)
+
+    assert len(result.created) == count
+    assert result.updated == []
+    assert len(result.written) == count
+    assert {row["id"] for row in result.written} == set(result.created)
+    assert len(state.tables["lessons"]) == seeded + count
+
+    # The same bundle again changes nothing; edited lessons are updated by id
+    assert _run([_item(i) for i in range(count)], state).summary()["unchanged"] == count
+    edited = [dict(row, title=row["title"] + "!") for row in result.written[:MAX_ROWS + 10]]
+    again = _run(edited, state)
+    assert again.updated == sorted(row["id"] for row in edited)
+    assert again.created == []
+    assert all(row["title"].endswith("!") for row in again.written)
+
+
+def test_dry_run_and_invalid_bundles_write_nothing():
+    state = FakeSupabase(users=0)
+    before = len(state.tables["lessons"])
+    result = _run([_item(1), _item(2, lesson_id=900)], state, dry_run=True)
+    assert result.summary()["created"] == 2
+    assert result.written == []
+
+    result = _run([_item(1), {"title": "no goal", "game_type": "exact_match"}, _item(3, 7), _item(4, 7)], state)
+    assert result.error_count == 2
+    assert [error["item"] for error in result.errors] == [2, 4]
+    assert len(state.tables["lessons"]) == before
+
+    with pytest.raises(TooManyLessons):
+        _run([_item(i) for i in range(3)], state, max_lessons=2)
+
+
+def _parse(*chunks: bytes) -> list:
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [item async for item in iter_bundle(source())]
+
+    return asyncio.run(collect())
+
+
+def test_bundle_formats_split_anywhere():
+    items = [_item(i) for i in range(5)] + [{"title": "café ☕"}]
+    for text in (
+        "".join(json.dumps(item) + "\n" for item in items),
+        json.dumps(items, indent=2),
+    ):
+        data = text.encode("utf-8")
+        for size in (1, 3, 7, len(data)):
+            assert _parse(*(data[i:i + size] for i in range(0, len(data), size))) == items
+
+
+@pytest.mark.parametrize("data", [b'{"a": 1}\n[1]\n', b'[{"a": 1} {"b": 2}]', b'[{"a": 1}', b'[{"a": 1}] x', b"\xff\n"])
+def test_bad_bundles(data):
+    with pytest.raises(BundleError):
+        _parse(data)
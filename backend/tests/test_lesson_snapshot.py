@@ -0,0 +1,185 @@
+import asyncio
+import os
+import socket
+
+import pytest
+
+from app.repositories.lessons import LessonRepository
+from app.services import lesson_catalog as catalog_module
+from app.services.lesson_catalog import LessonCatalog, SnapshotCatalog, SnapshotPublisher
+from app.services.lesson_snapshot import LessonSnapshot, write_snapshot
+from benchmarks.fake_supabase import FakeSupabase
+from tests.fakes import FakePool
+
+
+def _lesson(lesson_id: int, published: bool = True, order: int = None, updated_at: str = "2026-01-01") -> dict:
+    return {
+        "id": lesson_id,
+        "title": f"Lesson {lesson_id} — ünïcode",
+        "game_type": "exact_match",
+        "order_index": lesson_id if order is None else order,
+        "config": {"expected": "hello"},
+        "is_published": published,
+        "updated_at": updated_at,
+    }
+
+
+def _catalog(lessons) -> LessonCatalog:
+    catalog = LessonCatalog(poll_interval=0)
+    catalog.upsert_many(lessons)
+    return catalog
+
+
+# --- The file format ---
+def test_snapshot_round_trips_the_catalog(tmp_path):
+    path = str(tmp_path / "lessons.snapshot")
+    lessons = [_lesson(5, order=1), _lesson(2, order=3), _lesson(9, published=False), _lesson(7, order=2)]
+    catalog = _catalog(lessons)
+    catalog.publish(path, notify_port=4321)
+
+    snapshot = LessonSnapshot(path)
+    assert (snapshot.version, snapshot.notify_port, len(snapshot)) == (catalog.version, 4321, 4)
+    assert list(snapshot) == [2, 5, 7, 9]
+    assert snapshot.get(9) == lessons[2]
+    assert snapshot.get(1) is None and snapshot.get(10) is None
+    assert [lesson["id"] for lesson in snapshot.published()] == [5, 7, 2]
+    # Only what was read has been decoded
+    assert snapshot.stats()["decoded"] == 4
+    assert LessonSnapshot(path).stats()["decoded"] == 0
+
+
+def test_empty_snapshot_and_bad_files(tmp_path):
+    path = str(tmp_path / "lessons.snapshot")
+    write_snapshot(path, 1, [], [])
+    assert len(LessonSnapshot(path)) == 0 and LessonSnapshot(path).published() == []
+
+    other = tmp_path / "other"
+    other.write_bytes(b"not a snapshot".ljust(64, b"\0"))
+    with pytest.raises(ValueError, match="not a lesson snapshot"):
+        LessonSnapshot(str(other))
+
+
+def test_rewriting_replaces_the_file_atomically(tmp_path):
+    path = str(tmp_path / "lessons.snapshot")
+    write_snapshot(path, 1, [_lesson(1)], [_lesson(1)])
+    old = LessonSnapshot(path)
+    write_snapshot(path, 2, [_lesson(1), _lesson(2)], [_lesson(1), _lesson(2)])
+    # Readers of the old file keep a consistent view; the new one is a different file
+    assert len(old) == 1 and old.get(1)["id"] == 1
+    assert LessonSnapshot(path).identity != old.identity
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+# --- Worker side ---
+@pytest.fixture
+def published(tmp_path):
+    """A snapshot file and a publisher-side catalog to change and republish"""
+    path = str(tmp_path / "lessons.snapshot")
+    catalog = _catalog([_lesson(1), _lesson(2), _lesson(3, published=False)])
+    catalog.publish(path)
+    return path, catalog
+
+
+def test_worker_reads_lessons_from_the_snapshot(published):
+    path, _ = published
+    worker = SnapshotCatalog(path, check_interval=60)
+    assert worker.check() is True
+    assert worker.check() is False
+    assert asyncio.run(worker.get(3))["id"] == 3
+    assert asyncio.run(worker.get(3, published_only=True)) is None
+    assert [lesson["id"] for lesson in asyncio.run(worker.list_published())] == [1, 2]
+    assert worker.stats()["swaps"] == 1 and worker.stats()["snapshot"]["lessons"] == 3
+
+
+def test_worker_swaps_to_a_republished_snapshot(published):
+    path, catalog = published
+    worker = SnapshotCatalog(path, check_interval=60)
+    worker.check()
+    version = worker.version
+
+    catalog.upsert(_lesson(4, order=0))
+    catalog.remove(1)
+    catalog.publish(path)
+    assert worker.check() is True
+    assert worker.version > version
+    assert [lesson["id"] for lesson in asyncio.run(worker.list_published())] == [4, 2]
+    assert 1 not in worker._by_id
+
+
+def test_local_changes_overlay_the_snapshot_until_it_catches_up(published):
+    path, catalog = published
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as publisher:
+        publisher.bind(("127.0.0.1", 0))
+        publisher.settimeout(1)
+        catalog.publish(path, notify_port=publisher.getsockname()[1])
+        worker = SnapshotCatalog(path, check_interval=60)
+        worker.check()
+
+        edited = _lesson(2, order=0, updated_at="2026-02-01")
+        worker.upsert(edited)
+        worker.remove(1)
+        # Visible in this worker at once, and the publisher is asked to republish
+        assert [lesson["id"] for lesson in asyncio.run(worker.list_published())] == [2]
+        assert 1 not in worker._by_id
+        assert publisher.recv(16) == b"1"
+        assert worker.stats()["overlay"] == 2
+
+    # A snapshot that doesn't have the changes yet keeps the overlay
+    catalog.upsert(_lesson(5))
+    catalog.publish(path)
+    worker.check()
+    assert worker.stats()["overlay"] == 2
+    assert worker._by_id[2] == edited and 1 not in worker._by_id and 5 in worker._by_id
+
+    # One that does drops it
+    catalog.upsert(edited)
+    catalog.remove(1)
+    catalog.publish(path)
+    worker.check()
+    assert worker.stats()["overlay"] == 0
+    assert [lesson["id"] for lesson in asyncio.run(worker.list_published())] == [2, 5]
+
+
+def test_worker_without_a_snapshot_loads_from_the_database(tmp_path):
+    state = FakeSupabase(users=0, lessons=[_lesson(1)])
+    worker = SnapshotCatalog(str(tmp_path / "missing.snapshot"), check_interval=60)
+    with pytest.raises(OSError):
+        worker.check()
+    lessons = LessonRepository(pool=FakePool(state))
+    assert asyncio.run(worker.get(1, lessons))["id"] == 1
+    worker.upsert(_lesson(2))
+    assert [lesson["id"] for lesson in asyncio.run(worker.list_published())] == [1, 2]
+
+
+# --- Supervisor side ---
+def test_publisher_republishes_when_a_worker_asks(tmp_path, monkeypatch):
+    state = FakeSupabase(users=0, lessons=[_lesson(1)])
+    pool = FakePool(state)
+    monkeypatch.setattr(catalog_module, "LessonRepository", lambda *args, **kwargs: LessonRepository(pool=pool))
+    path = str(tmp_path / "lessons.snapshot")
+    publisher = SnapshotPublisher(LessonCatalog(poll_interval=0), path, poll_interval=0)
+
+    async def main():
+        published = asyncio.Event()
+        task = asyncio.create_task(publisher.run(on_publish=published.set))
+        try:
+            await asyncio.wait_for(published.wait(), 2)
+            published.clear()
+            worker = SnapshotCatalog(path, check_interval=60)
+            worker.check()
+            assert worker._snapshot.notify_port == publisher.notify_port
+
+            # Written by a worker; it pings the publisher, which polls and republishes
+            state.tables["lessons"].append(_lesson(2, updated_at="2026-02-01"))
+            worker.upsert(_lesson(2, updated_at="2026-02-01"))
+            await asyncio.wait_for(published.wait(), 2)
+            worker.check()
+            return worker
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    worker = asyncio.run(main())
+    assert publisher.publishes == 2
+    assert LessonSnapshot(path).get(2)["id"] == 2
+    assert worker.stats()["overlay"] == 0
@@ -0,0 +1,326 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import uvicorn
+
+from app.services import llm as llm_module
+from app.services import validators
+from app.services.judge_registry import ConfigError
+from app.services.llm import (
+    AnthropicProvider, GeminiProvider, LLMPool, OpenAICompatibleProvider, OutputCache, ProviderUnavailable,
+)
+from app.services.llm_router import LLMRouter
+from app.services.validators import compile_llm
+from benchmarks.fake_llm import FakeLLM, create_app
+from benchmarks.load import _free_port
+
+
+@pytest.fixture
+def fake():
+    """A fake provider server on a free port, running in a background thread"""
+    state = FakeLLM()
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(state), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "fake LLM server did not start"
+        time.sleep(0.01)
+    state.url = f"http://127.0.0.1:{port}/v1"
+    yield state
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls ``time.monotonic`` as the llm module sees it"""
+    now = [1000.0]
+    monkeypatch.setattr(llm_module, "time", SimpleNamespace(**dict(vars(time), monotonic=lambda: now[0])))
+    return now
+
+
+def _pool(url: str, concurrency: int = 8, cache: OutputCache = None) -> LLMPool:
+    return LLMPool(
+        providers={
+            "openai": OpenAICompatibleProvider("openai", url, "sk-test", "gpt-test", concurrency),
+            "claude": AnthropicProvider("claude", url, "ak-test", "claude-test", concurrency),
+            "gemini": GeminiProvider("gemini", url, "gk-test", "gemini-test", concurrency),
+            "grok": OpenAICompatibleProvider("grok", url, "", "grok-test", concurrency),  # no key: not configured
+        },
+        cache=cache or OutputCache(100, 60.0),
+        timeout=5.0,
+        max_connections=20,
+        max_tokens=64,
+    )
+
+
+def _run(pool: LLMPool, coroutine_function):
+    async def main():
+        try:
+            return await coroutine_function()
+        finally:
+            await pool.close()
+
+    return asyncio.run(main())
+
+
+# --- Request building and response parsing ---
+@pytest.mark.parametrize("provider_id, api, model, auth", [
+    ("openai", "openai", "gpt-test", ("authorization", "Bearer sk-test")),
+    ("claude", "anthropic", "claude-test", ("x-api-key", "ak-test")),
+    ("gemini", "gemini", "gemini-test", ("x-goog-api-key", "gk-test")),
+])
+def test_complete_round_trips_each_provider(fake, provider_id, api, model, auth):
+    pool = _pool(fake.url)
+    output = _run(pool, lambda: pool.complete(provider_id, "Be brief.", "Say hi"))
+
+    assert output == "Say hi"
+    [request] = fake.requests
+    assert request["api"] == api
+    assert request["model"] == model
+    assert request["headers"][auth[0]] == auth[1]
+    body = request["body"]
+    if api == "openai":
+        assert body["messages"] == [{"role": "system", "content": "Be brief."}, {"role": "user", "content": "Say hi"}]
+        assert (body["temperature"], body["max_tokens"]) == (0, 64)
+    elif api == "anthropic":
+        assert body["system"] == "Be brief."
+        assert body["messages"] == [{"role": "user", "content": "Say hi"}]
+        assert (body["temperature"], body["max_tokens"]) == (0, 64)
+    else:
+        assert body["systemInstruction"] == {"parts": [{"text": "Be brief."}]}
+        assert body["generationConfig"] == {"temperature": 0, "maxOutputTokens": 64}
+    assert pool.stats()["providers"][provider_id]["calls"] == 1
+
+
+@pytest.mark.parametrize("provider_id", ["openai", "claude", "gemini"])
+def test_stream_yields_the_pieces_then_serves_from_cache(fake, provider_id):
+    pool = _pool(fake.url)
+
+    async def main():
+        first = [text async for text in pool.stream(provider_id, "", "one two three")]
+        again = [text async for text in pool.stream(provider_id, "", "one  two three ")]
+        return first, again
+
+    first, again = _run(pool, main)
+    assert first == ["one ", "two ", "three"]
+    assert again == ["one two three"]
+    assert len(fake.requests) == 1
+    # No system prompt: the provider's field is left out rather than sent empty
+    body = fake.requests[0]["body"]
+    assert "system" not in body and "systemInstruction" not in body
+    assert all(message["role"] != "system" for message in body.get("messages", []))
+
+
+def test_unconfigured_provider_is_never_called(fake):
+    pool = _pool(fake.url)
+    with pytest.raises(ProviderUnavailable, match="not configured"):
+        _run(pool, lambda: pool.complete("grok", "", "hi"))
+    with pytest.raises(ProviderUnavailable, match="not configured"):
+        _run(pool, lambda: pool.complete("mistral", "", "hi"))
+    assert fake.requests == []
+
+
+def test_failed_calls_raise_are_reported_and_not_cached(fake):
+    pool = _pool(fake.url)
+    results = []
+    pool.on_result = lambda provider_id, model, seconds, ok: results.append((provider_id, model, ok))
+    fake.error_rate = 1.0
+
+    with pytest.raises(ProviderUnavailable, match="'openai' request failed"):
+        _run(pool, lambda: pool.complete("openai", "", "hi"))
+    fake.error_rate = 0.0
+    assert _run(pool, lambda: pool.complete("openai", "", "hi")) == "hi"
+
+    assert results == [("openai", "gpt-test", False), ("openai", "gpt-test", True)]
+    assert len(fake.requests) == 2
+    assert pool.stats()["providers"]["openai"]["errors"] == 1
+
+
+def test_streamed_failure_raises(fake):
+    pool = _pool(fake.url)
+    fake.error_rate = 1.0
+
+    async def main():
+        return [text async for text in pool.stream("claude", "", "hi")]
+
+    with pytest.raises(ProviderUnavailable, match="'claude' request failed"):
+        _run(pool, main)
+    assert pool.cache.stats()["size"] == 0
+
+
+# --- Concurrency ---
+def test_each_provider_has_its_own_concurrency_limit(fake):
+    fake.latency = 0.1
+    pool = _pool(fake.url, concurrency=2)
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(pool.complete("openai", "", f"prompt {index}") for index in range(6)))
+        openai_only = time.perf_counter() - started
+        peak = fake.max_in_flight
+        fake.max_in_flight = 0
+        await asyncio.gather(*(
+            pool.complete(provider_id, "", f"other {index}")
+            for provider_id in ("openai", "claude") for index in range(4)
+        ))
+        return openai_only, peak
+
+    openai_only, peak = _run(pool, main)
+    # Six calls two at a time take three rounds
+    assert peak == 2
+    assert openai_only >= 0.3
+    # A busy provider doesn't hold up another one's slots
+    assert fake.max_in_flight == 4
+
+
+def test_identical_concurrent_prompts_share_one_call(fake):
+    fake.latency = 0.05
+    pool = _pool(fake.url)
+
+    async def main():
+        return await asyncio.gather(*(pool.complete("openai", "", "same") for _ in range(5)))
+
+    assert _run(pool, main) == ["same"] * 5
+    assert len(fake.requests) == 1
+    assert pool.stats()["coalesced"] == 4
+
+
+# --- Output cache ---
+def test_cache_key_normalises_whitespace_only(fake):
+    pool = _pool(fake.url)
+
+    async def main():
+        outputs = [await pool.complete("openai", "sys", "Say   hi\n")]
+        outputs.append(await pool.complete("openai", "sys", " Say hi"))  # same entry
+        outputs.append(await pool.complete("openai", "other", "Say hi"))  # system prompt differs
+        outputs.append(await pool.complete("openai", "sys", "say hi"))  # case differs
+        outputs.append(await pool.complete("openai", "sys", "Say hi", model="gpt-big"))
+        outputs.append(await pool.complete("claude", "sys", "Say hi"))
+        return outputs
+
+    assert _run(pool, main) == ["Say   hi\n", "Say   hi\n", "Say hi", "say hi", "Say hi", "Say hi"]
+    assert len(fake.requests) == 5
+    assert [request["model"] for request in fake.requests][-2:] == ["gpt-big", "claude-test"]
+    assert pool.cache_key("openai", "m", "sys", "a \t b\n") == pool.cache_key("openai", "m", "sys", "a b")
+
+
+def test_cache_evicts_least_recently_used():
+    cache = OutputCache(max_size=2, ttl=60.0)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # now the most recent
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+
+    # peek doesn't refresh an entry
+    assert cache.peek("a")
+    cache.put("d", "D")
+    assert not cache.peek("a")
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1}
+
+
+def test_cache_entries_expire_after_the_ttl(clock):
+    cache = OutputCache(max_size=10, ttl=60.0)
+    cache.put("a", "A")
+    clock[0] += 59.9
+    assert cache.get("a") == "A"
+    clock[0] += 0.1
+    assert not cache.peek("a")
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+    for disabled in (OutputCache(0, 60.0), OutputCache(10, 0)):
+        disabled.put("a", "A")
+        assert disabled.get("a") is None
+
+
+def test_expired_output_is_fetched_again(fake, clock):
+    pool = _pool(fake.url, cache=OutputCache(100, 30.0))
+
+    async def main():
+        await pool.complete("gemini", "", "hi")
+        await pool.complete("gemini", "", "hi")
+        clock[0] += 30.0
+        await pool.complete("gemini", "", "hi")
+
+    _run(pool, main)
+    assert len(fake.requests) == 2
+
+
+# --- The llm game type ---
+@pytest.mark.parametrize("config, message", [
+    ({"provider": "mistral"}, "Unknown provider"),
+    ({"system_prompt": 3}, "'system_prompt' must be a string"),
+    ({"model": 3, "provider": "openai"}, "'model' must be a string"),
+    ({"model": "gpt-test", "provider": "any"}, "needs a specific provider"),
+    ({"max_input_length": -5}, "'max_input_length'"),
+    ({"match_type": "nope"}, "Unknown match type"),
+])
+def test_compile_llm_rejects_bad_configs(config, message):
+    with pytest.raises(ConfigError, match=message):
+        compile_llm(config)
+
+
+@pytest.fixture
+def llm(fake, monkeypatch):
+    """The llm game type wired to a pool and router against the fake server"""
+    pool = _pool(fake.url)
+    router = LLMRouter(
+        pool, window=50, hedge=False, hedge_min_samples=5, hedge_default_delay=1.0,
+        max_error_rate=0.5, breaker_failures=3, breaker_reset=30.0,
+    )
+    monkeypatch.setattr(validators, "llm_pool", pool)
+    monkeypatch.setattr(validators, "llm_router", router)
+    return pool
+
+
+def test_llm_plan_judges_the_models_output(fake, llm):
+    plan = compile_llm({"provider": "claude", "system_prompt": "Answer briefly.", "expected": "PARIS"})
+
+    async def main():
+        passed = await plan.judge(("The capital is Paris", None))
+        failed = await plan.judge(("The capital is Rome", "gemini"))
+        return passed, failed
+
+    passed, failed = _run(llm, main)
+    assert passed[0] is True and passed[3] == "The capital is Paris"
+    assert failed[0] is False and failed[3] == "The capital is Rome"
+    assert [(request["api"], request["body"].get("system")) for request in fake.requests] == [
+        ("anthropic", "Answer briefly."), ("gemini", None),
+    ]
+
+
+def test_llm_plan_reports_provider_failures(fake, llm):
+    fake.error_rate = 1.0
+    plan = compile_llm({"provider": "openai", "expected": "x"})
+    success, feedback, score, output = _run(llm, lambda: plan.judge(("hi", None)))
+    assert (success, score, output) == (False, 0, None)
+    assert "'openai' request failed" in feedback
+
+
+def test_llm_plan_stream_stops_the_provider_once_decided(fake, llm):
+    fake.latency = 1.0
+    fake.reply = lambda model, system_prompt, user_prompt: "The answer is 42 " + "and more " * 40
+    plan = compile_llm({"provider": "openai", "expected": "42"})
+
+    async def main():
+        events = [event async for event in plan.stream(("What is it?", None))]
+        # Give the server a moment to notice the closed connection
+        for _ in range(100):
+            if fake.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        return events
+
+    events = _run(llm, main)
+    assert [text for kind, text in events[:-1]] == ["The ", "answer ", "is ", "42 "]
+    assert events[-1] == ("result", (True, events[-1][1][1], events[-1][1][2], "The answer is 42 "))
+    assert fake.in_flight == 0
+    assert fake.chunks_sent < 20
@@ -0,0 +1,252 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_router as router_module
+from app.services.llm import LLMPool, OutputCache, ProviderUnavailable
+from app.services.llm_router import CircuitBreaker, LLMRouter
+
+
+class FakeLLMPool:
+    """Scripted providers: each answers after ``delays[id]`` seconds, or fails if in ``failing``"""
+
+    def __init__(self, *provider_ids: str):
+        self.providers = {pid: SimpleNamespace(id=pid, model=f"{pid}-model", configured=True) for pid in provider_ids}
+        self.cache = OutputCache(100, 60.0)
+        self.cache_key = LLMPool.cache_key
+        self.on_result = None
+        self.delays = {pid: 0.0 for pid in provider_ids}
+        self.failing = set()
+        self.calls = []
+        self.cancelled = []
+
+    def get(self, provider_id):
+        provider = self.providers.get(provider_id)
+        if provider is None or not provider.configured:
+            raise ProviderUnavailable(f"AI provider '{provider_id}' is not configured.")
+        return provider
+
+    async def complete(self, provider_id, system_prompt, user_prompt, model=None):
+        model = model or self.get(provider_id).model
+        key = self.cache_key(provider_id, model, system_prompt, user_prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        self.calls.append(provider_id)
+        started = time.perf_counter()
+        try:
+            await asyncio.sleep(self.delays[provider_id])
+        except asyncio.CancelledError:
+            self.cancelled.append(provider_id)
+            raise
+        ok = provider_id not in self.failing
+        self.on_result(provider_id, model, time.perf_counter() - started, ok)
+        if not ok:
+            raise ProviderUnavailable(f"AI provider '{provider_id}' request failed")
+        return f"answer from {provider_id}"
+
+
+def _router(pool: FakeLLMPool, hedge: bool = True, delay: float = 0.02, failures: int = 3) -> LLMRouter:
+    return LLMRouter(
+        pool,
+        window=50,
+        hedge=hedge,
+        hedge_min_samples=5,
+        hedge_default_delay=delay,
+        max_error_rate=0.5,
+        breaker_failures=failures,
+        breaker_reset=30.0,
+    )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls ``time.monotonic`` as the router module sees it"""
+    now = [1000.0]
+    monkeypatch.setattr(
+        router_module, "time", SimpleNamespace(monotonic=lambda: now[0], perf_counter=time.perf_counter)
+    )
+    return now
+
+
+# --- Circuit breaker ---
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failures=3, reset_after=30.0)
+    for ok in (False, False, True, False, False):
+        assert breaker.acquire()
+        breaker.record(ok)
+    # The success in between reset the streak
+    assert breaker.state == "closed"
+
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+    assert not breaker.allow()
+    assert not breaker.acquire()
+
+
+def test_breaker_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failures=1, reset_after=30.0)
+    breaker.record(False)
+    clock[0] += 29.9
+    assert not breaker.allow()
+
+    clock[0] += 0.1
+    assert breaker.allow()
+    assert breaker.acquire()
+    assert breaker.state == "half_open"
+    # A second caller waits for the trial's outcome
+    assert not breaker.allow()
+    assert not breaker.acquire()
+
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.acquire() and breaker.acquire()
+
+
+def test_breaker_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failures=5, reset_after=30.0)
+    for _ in range(5):
+        breaker.record(False)
+    clock[0] += 30.0
+    assert breaker.acquire()
+
+    # One failed trial is enough, however high the failure threshold
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert breaker.trips == 2
+    assert not breaker.allow()
+    clock[0] += 30.0
+    assert breaker.allow()
+
+
+def test_breaker_released_trial_can_be_claimed_again(clock):
+    breaker = CircuitBreaker(failures=1, reset_after=30.0)
+    breaker.record(False)
+    clock[0] += 30.0
+    assert breaker.acquire()
+    assert not breaker.acquire()
+    breaker.release()
+    assert breaker.acquire()
+
+
+# --- Provider choice ---
+def test_candidates_rank_by_health():
+    pool = FakeLLMPool("slow", "fast", "new", "flaky", "down")
+    router = _router(pool)
+    for _ in range(10):
+        router._observe("slow", "slow-model", 0.5, True)
+        router._observe("fast", "fast-model", 0.1, True)
+        router._observe("flaky", "flaky-model", 0.01, False)
+    router._observe("flaky", "flaky-model", 0.01, True)
+    router.health("down", "down-model").breaker.record(False)
+    router.health("down", "down-model").breaker.record(False)
+    router.health("down", "down-model").breaker.record(False)
+
+    # Unmeasured first, then by p50; a high error rate or an open circuit sorts last
+    assert [pid for pid, _ in router.candidates("any")] == ["new", "fast", "slow", "flaky", "down"]
+    assert router.pick("any") == ("new", "new-model")
+
+
+def test_pinned_provider_is_the_only_candidate():
+    router = _router(FakeLLMPool("openai", "anthropic"))
+    assert router.candidates("anthropic") == [("anthropic", "anthropic-model")]
+    assert router.candidates("anthropic", "claude-x") == [("anthropic", "claude-x")]
+
+    pool = FakeLLMPool("openai")
+    pool.providers["openai"].configured = False
+    with pytest.raises(ProviderUnavailable):
+        _router(pool).candidates("any")
+
+
+# --- Hedging and fallback ---
+def test_failure_falls_through_to_the_next_candidate():
+    pool = FakeLLMPool("a", "b", "c")
+    pool.failing = {"a", "b"}
+    router = _router(pool, hedge=False)
+
+    assert asyncio.run(router.complete("any", "sys", "prompt")) == "answer from c"
+    assert pool.calls == ["a", "b", "c"]
+    assert router.fallbacks == 2
+    assert router.hedges == 0
+
+
+def test_every_candidate_failing_raises():
+    pool = FakeLLMPool("a", "b")
+    pool.failing = {"a", "b"}
+    router = _router(pool, hedge=False)
+
+    with pytest.raises(ProviderUnavailable, match="'b'"):
+        asyncio.run(router.complete("any", "sys", "prompt"))
+    assert pool.calls == ["a", "b"]
+
+
+def test_slow_provider_is_hedged_and_the_loser_cancelled():
+    pool = FakeLLMPool("a", "b")
+    pool.delays["a"] = 1.0
+    router = _router(pool, delay=0.02)
+
+    started = time.perf_counter()
+    assert asyncio.run(router.complete("any", "sys", "prompt")) == "answer from b"
+    assert time.perf_counter() - started < 0.5
+    assert pool.calls == ["a", "b"]
+    assert pool.cancelled == ["a"]
+    assert (router.hedges, router.hedge_wins, router.fallbacks) == (1, 1, 0)
+    # The cancelled attempt still counts as a slow sample for "a"
+    assert router.health("a", "a-model").percentile(0.5) >= 0.02
+
+
+def test_hedge_waits_for_the_providers_p95():
+    pool = FakeLLMPool("a", "b")
+    pool.delays["a"] = 0.05
+    router = _router(pool, delay=0.01)
+    for _ in range(5):
+        router._observe("a", "a-model", 0.2, True)
+        router._observe("b", "b-model", 0.3, True)
+
+    # Once measured, "a" is hedged after its own p95 rather than the default delay
+    assert router.hedge_delay(("a", "a-model")) == 0.2
+    assert asyncio.run(router.complete("any", "sys", "prompt")) == "answer from a"
+    assert pool.calls == ["a"]
+    assert router.hedges == 0
+
+
+def test_hedging_disabled_waits_for_the_first_candidate():
+    pool = FakeLLMPool("a", "b")
+    pool.delays["a"] = 0.05
+    router = _router(pool, hedge=False, delay=0.001)
+
+    assert asyncio.run(router.complete("any", "sys", "prompt")) == "answer from a"
+    assert pool.calls == ["a"]
+    assert router.hedges == 0
+
+
+def test_open_circuits_are_skipped_and_all_open_rejects():
+    pool = FakeLLMPool("a", "b")
+    pool.failing = {"a"}
+    router = _router(pool, hedge=False, failures=1)
+
+    assert asyncio.run(router.complete("any", "sys", "one")) == "answer from b"
+    assert router.health("a", "a-model").breaker.state == "open"
+    assert asyncio.run(router.complete("any", "sys", "two")) == "answer from b"
+    assert pool.calls == ["a", "b", "b"]
+
+    router.health("b", "b-model").breaker.record(False)
+    with pytest.raises(ProviderUnavailable, match="temporarily unavailable"):
+        asyncio.run(router.complete("any", "sys", "three"))
+    with pytest.raises(ProviderUnavailable):
+        router.pick("any")
+    assert router.rejected == 2
+    assert pool.calls == ["a", "b", "b"]
+
+
+def test_cached_answer_from_any_candidate_skips_the_network():
+    pool = FakeLLMPool("a", "b")
+    pool.cache.put(pool.cache_key("b", "b-model", "sys", "prompt"), "cached from b")
+    router = _router(pool)
+
+    assert asyncio.run(router.complete("any", "sys", "prompt")) == "cached from b"
+    assert pool.calls == []
@@ -0,0 +1,167 @@
+import asyncio
+import math
+import random
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from starlette.testclient import TestClient
+
+from app.core.metrics import LoopLagMonitor, MetricsMiddleware, Registry, event_loop_lag_hist, http_request_duration
+
+
+def _samples(text: str) -> dict:
+    """``{"name{labels}": value}`` for every sample line of an exposition"""
+    out = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            out[key] = float(value)
+    return out
+
+
+def test_counter_and_gauge_exposition():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ("route", "status"))
+    in_flight = registry.gauge("in_flight", "In flight")
+    requests.labels("/a", "200").inc()
+    requests.labels("/a", "200").inc(2)
+    requests.labels("/b", "500").inc(0.5)
+    in_flight.labels().inc(3)
+    in_flight.dec()
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a",status="200"} 3',
+        'requests_total{route="/b",status="500"} 0.5',
+        "# HELP in_flight In flight",
+        "# TYPE in_flight gauge",
+        "in_flight 2",
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("c", "C", ("path",)).labels('a"b\\c\nd').inc()
+    assert 'c{path="a\\"b\\\\c\\nd"} 1' in registry.render().splitlines()
+
+
+def test_histogram_buckets_are_cumulative_and_upper_inclusive():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.5, 0.1, 1.0))
+    for value in (0.05, 0.1, 0.2, 1.0, 7.0):
+        histogram.labels("/x").observe(value)
+
+    samples = _samples(registry.render())
+    assert samples == {
+        'latency_seconds_bucket{route="/x",le="0.1"}': 2,
+        'latency_seconds_bucket{route="/x",le="0.5"}': 3,
+        'latency_seconds_bucket{route="/x",le="1"}': 4,
+        'latency_seconds_bucket{route="/x",le="+Inf"}': 5,
+        'latency_seconds_sum{route="/x"}': pytest.approx(8.35),
+        'latency_seconds_count{route="/x"}': 5,
+    }
+
+
+def test_histogram_matches_a_direct_count():
+    registry = Registry()
+    bounds = (0.001, 0.01, 0.1, 1.0)
+    histogram = registry.histogram("h", "H", buckets=bounds)
+    rng = random.Random(3)
+    values = [rng.choice([rng.uniform(0, 2), rng.choice(bounds)]) for _ in range(2000)]
+    for value in values:
+        histogram.observe(value)
+
+    samples = _samples(registry.render())
+    for bound, label in zip(bounds + (math.inf,), ("0.001", "0.01", "0.1", "1", "+Inf")):
+        assert samples[f'h_bucket{{le="{label}"}}'] == sum(value <= bound for value in values)
+    assert samples["h_count"] == len(values)
+    assert samples["h_sum"] == pytest.approx(sum(values))
+
+
+def test_func_metrics_are_read_at_scrape_time_and_failures_are_skipped():
+    registry = Registry()
+    sizes = {("a",): 1}
+    registry.gauge_func("pool_size", "Pool size", ("pool",), lambda: sizes)
+    registry.counter_func("broken_total", "Broken", (), lambda: 1 / 0)
+    registry.counter("after_total", "After").inc()
+
+    sizes[("a",)] = 4
+    text = registry.render()
+    assert 'pool_size{pool="a"} 4' in text
+    assert "# TYPE pool_size gauge" in text
+    # The broken collector is left out, headers and all, and the rest still render
+    assert "broken_total" not in text
+    assert "after_total 1" in text
+    assert text.endswith("\n")
+
+
+def test_middleware_labels_requests_by_route_template():
+    router = APIRouter(prefix="/api/things")
+
+    @router.get("/{thing_id}/parts/{part}")
+    async def part(thing_id: int, part: str):
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(router)
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    @app.get("/metrics")
+    async def metrics():
+        return {}
+
+    mounted = FastAPI()
+
+    @mounted.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {}
+
+    app.mount("/v2", mounted)
+
+    client = TestClient(MetricsMiddleware(app), raise_server_exceptions=False)
+    before = {
+        key: http_request_duration.labels(*key).count
+        for key in [
+            ("GET", "/api/things/{thing_id}/parts/{part}", "200"),
+            ("GET", "unmatched", "404"),
+            ("GET", "/boom", "500"),
+            ("GET", "/metrics", "200"),
+            ("GET", "/v2/items/{item_id}", "200"),
+        ]
+    }
+
+    client.get("/api/things/7/parts/wheel")
+    # Values equal to each other or to a literal segment
+    client.get("/api/things/8/parts/8")
+    client.get("/api/things/9/parts/things")
+    client.get("/nowhere")
+    client.get("/boom")
+    client.get("/metrics")
+    client.get("/v2/items/2")
+
+    after = {key: http_request_duration.labels(*key).count for key in before}
+    assert {key: after[key] - before[key] for key in before} == {
+        ("GET", "/api/things/{thing_id}/parts/{part}", "200"): 3,
+        ("GET", "unmatched", "404"): 1,
+        ("GET", "/boom", "500"): 1,
+        ("GET", "/metrics", "200"): 0,  # excluded
+        ("GET", "/v2/items/{item_id}", "200"): 1,
+    }
+
+
+def test_loop_lag_monitor_records_samples():
+    samples = event_loop_lag_hist.labels()
+
+    async def main():
+        before = samples.count
+        monitor = LoopLagMonitor(interval=0.005)
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return samples.count - before
+
+    assert asyncio.run(main()) >= 3
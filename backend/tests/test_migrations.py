@@ -0,0 +1,95 @@
+"""
+Applies supabase/migrations to a real Postgres. Set TEST_DATABASE_URL to a superuser
+connection on a throwaway server; each run creates its own database and drops it after.
+"""
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+MIGRATIONS = Path(__file__).resolve().parents[2] / "supabase" / "migrations"
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+# The parts of a Supabase project the migrations refer to
+SUPABASE_STUB = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        CREATE ROLE anon NOLOGIN;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        CREATE ROLE authenticated NOLOGIN;
+    END IF;
+END
+$$;
+CREATE SCHEMA auth;
+CREATE TABLE auth.users (id UUID PRIMARY KEY, raw_user_meta_data JSONB DEFAULT '{}');
+CREATE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql STABLE AS $$ SELECT NULL::UUID $$;
+"""
+
+
+@pytest.fixture(scope="module")
+def db():
+    name = f"prmpt_migrations_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(DATABASE_URL, autocommit=True) as admin:
+        admin.execute(f'CREATE DATABASE "{name}"')
+    try:
+        with psycopg.connect(DATABASE_URL, dbname=name, autocommit=True) as conn:
+            conn.execute(SUPABASE_STUB)
+            for path in sorted(MIGRATIONS.glob("*.sql")):
+                conn.execute(path.read_text())
+            yield conn
+    finally:
+        with psycopg.connect(DATABASE_URL, autocommit=True) as admin:
+            admin.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+
+
+def _user(db) -> str:
+    uid = str(uuid.uuid4())
+    db.execute("INSERT INTO auth.users (id) VALUES (%s)", (uid,))
+    db.execute("SELECT * FROM public.deduct_credits(%s, 30, 'k1', 100)", (uid,))
+    return uid
+
+
+def _count(db, table: str, uid: str) -> int:
+    return db.execute(f"SELECT count(*) FROM {table} WHERE user_id = %s", (uid,)).fetchone()[0]
+
+
+def test_deleting_a_user_cascades_through_the_ledger(db):
+    uid = _user(db)
+    lesson_id = db.execute("SELECT min(id) FROM public.lessons").fetchone()[0]
+    db.execute(
+        "SELECT public.record_progress(%s::jsonb)",
+        (f'[{{"user_id": "{uid}", "lesson_id": {lesson_id}, "attempts": 1, "score": 80, "completed": true}}]',),
+    )
+    assert _count(db, "public.credit_ledger", uid) == 2  # the grant and the deduction
+
+    db.execute("DELETE FROM auth.users WHERE id = %s", (uid,))
+    assert _count(db, "public.credit_ledger", uid) == 0
+    assert _count(db, "public.user_credits", uid) == 0
+    assert _count(db, "public.user_progress", uid) == 0
+
+
+def test_ledger_of_a_live_user_stays_append_only(db):
+    uid = _user(db)
+    with pytest.raises(psycopg.errors.RaiseException, match="append-only"):
+        db.execute("UPDATE public.credit_ledger SET delta = 0 WHERE user_id = %s", (uid,))
+    with pytest.raises(psycopg.errors.RaiseException, match="append-only"):
+        db.execute("DELETE FROM public.credit_ledger WHERE user_id = %s", (uid,))
+    assert _count(db, "public.credit_ledger", uid) == 2
+
+
+def test_credit_batch_reports_a_deleted_user_without_failing(db):
+    uid, gone = _user(db), str(uuid.uuid4())
+    rows = db.execute(
+        "SELECT user_id::text, balance, charged, error FROM public.apply_credit_batch(%s::jsonb, 100)",
+        (f'[{{"user_id": "{gone}", "amount": 5, "idempotency_key": "a"}},'
+         f' {{"user_id": "{uid}", "amount": 5, "idempotency_key": "b"}}]',),
+    ).fetchall()
+    assert rows[0][0] == gone and rows[0][3]
+    assert rows[1] == (uid, 65, 5, None)
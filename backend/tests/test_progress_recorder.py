@@ -0,0 +1,105 @@
+import asyncio
+
+from app.repositories.progress import ProgressRepository
+from app.services.progress_recorder import ProgressRecorder
+from benchmarks.fake_supabase import FakeSupabase, user_id
+from tests.fakes import FakePool
+
+
+class Rejected(Exception):
+    """What postgrest raises for a constraint violation"""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+
+class FlakyProgress(ProgressRepository):
+    """Fails the way a lesson deleted mid-write, or a lost connection, would"""
+
+    def __init__(self, state: FakeSupabase, pool: FakePool, poison: set, down: list):
+        super().__init__(timeout=5, pool=pool)
+        self.state, self.poison, self.down = state, poison, down
+
+    async def record_many(self, rows):
+        if self.down and self.down.pop():
+            raise ConnectionError("database unreachable")
+        if any(row["lesson_id"] in self.poison for row in rows):
+            raise Rejected("23503")
+        return await super().record_many(rows)
+
+
+def _progress(state: FakeSupabase) -> dict:
+    return {(row["user_id"], row["lesson_id"]): row for row in state.tables["user_progress"]}
+
+
+def _recorder(factory, batch_size: int = 16) -> ProgressRecorder:
+    return ProgressRecorder(queue_size=1000, flush_interval=0.005, batch_size=batch_size, repository_factory=factory)
+
+
+def test_missing_users_and_lessons_do_not_block_the_queue():
+    state = FakeSupabase(users=4)
+    pool = FakePool(state)
+    lesson_ids = [lesson["id"] for lesson in state.tables["lessons"]][:3]
+    poison = {lesson_ids[2]}
+    down = [False, True, False, True]  # popped from the end: two outages among the first writes
+    recorder = _recorder(lambda: FlakyProgress(state, pool, poison, down), batch_size=5)
+
+    async def main():
+        await recorder.start()
+        for round_ in range(3):
+            for index in range(4):
+                for lesson_id in lesson_ids:
+                    recorder.record(user_id(index), lesson_id, success=round_ == 2, score=10 * round_ + index)
+            # A user deleted since their result was judged
+            recorder.record("00000000-0000-0000-0000-00000000dead", lesson_ids[0], True, 5)
+            await asyncio.sleep(0.05)
+        await recorder.stop()
+
+    asyncio.run(main())
+    progress = _progress(state)
+    assert len(progress) == 4 * 2
+    for index in range(4):
+        for lesson_id in lesson_ids[:2]:
+            row = progress[(user_id(index), lesson_id)]
+            assert row["attempts"] == 3
+            assert row["score"] == 20 + index
+            assert row["completed"] and row["completed_at"]
+    stats = recorder.stats()
+    assert stats["merged"] == 0
+    assert stats["flush_failures"] == 2
+    # Rejected lesson rows are isolated by splitting; the deleted user is skipped by the function
+    assert stats["rejected_rows"] >= 4 + 1
+    assert stats["flushed_rows"] + stats["rejected_rows"] >= 4 * 3 + 1
+
+
+def test_results_during_a_failed_write_are_not_lost():
+    state = FakeSupabase(users=1)
+    pool = FakePool(state, latency=0.01)
+    lesson_id = state.tables["lessons"][0]["id"]
+    down = [True]
+    recorder = _recorder(lambda: FlakyProgress(state, pool, set(), down), batch_size=1)
+
+    async def main():
+        await recorder.start()
+        recorder.record(user_id(0), lesson_id, False, 3)
+        await asyncio.sleep(0.005)
+        # Merged while the first write is in flight and then fails
+        recorder.record(user_id(0), lesson_id, True, 7)
+        await asyncio.sleep(0.1)
+        await recorder.stop()
+
+    asyncio.run(main())
+    row = _progress(state)[(user_id(0), lesson_id)]
+    assert row["attempts"] == 2
+    assert row["score"] == 7
+    assert row["completed"]
+    assert recorder.stats()["flush_failures"] == 1
+
+
+def test_full_queue_drops_and_counts():
+    recorder = ProgressRecorder(queue_size=3, flush_interval=1, batch_size=10, repository_factory=lambda: None)
+    for index in range(5):
+        recorder.record("u", index, False, 0)
+    assert recorder.stats()["recorded"] == 3
+    assert recorder.stats()["dropped"] == 2
@@ -0,0 +1,224 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.rate_limit import AdmissionControl, BucketStore, RateLimiter, RateLimitMiddleware
+from app.repositories.rate_limits import RateLimitRepository
+
+ROUTES = {
+    "/api/judge": {"user_rate": 1.0, "user_burst": 3, "ip_rate": 2.0, "ip_burst": 4},
+    "/api/levels": {"ip_rate": 10.0, "ip_burst": 10},
+}
+
+
+class BucketPool:
+    """
+    ``SupabasePool`` stand-in whose ``take_rate_tokens`` RPC is served by a
+    ``BucketStore``, like the stored function; while ``down`` every call fails.
+    """
+
+    def __init__(self):
+        self.store = BucketStore(shards=1)
+        self.calls = []
+        self.down = False
+
+    @asynccontextmanager
+    async def acquire(self):
+        if self.down:
+            raise ConnectionError("database unreachable")
+        yield self
+
+    def rpc(self, name: str, body: dict):
+        self.calls.append((name, body))
+        wait = self.store.take(body["p_key"], body["p_rate"], body["p_burst"], body["p_cost"])
+        result = SimpleNamespace(data=wait)
+
+        async def execute():
+            return result
+        return SimpleNamespace(execute=execute)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls ``time.monotonic`` as the limiter sees it"""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(**dict(vars(time), monotonic=lambda: now[0])))
+    return now
+
+
+# --- Token buckets ---
+def test_bucket_allows_the_burst_then_reports_the_wait(clock):
+    store = BucketStore(shards=4)
+    assert [store.take("k", rate=2.0, burst=3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take("k", rate=2.0, burst=3) == pytest.approx(0.5)
+    # Other keys have their own bucket
+    assert store.take("other", rate=2.0, burst=3) == 0.0
+
+    clock[0] += 0.25
+    assert store.take("k", rate=2.0, burst=3) == pytest.approx(0.25)
+    clock[0] += 0.25
+    assert store.take("k", rate=2.0, burst=3) == 0.0
+    assert store.take("k", rate=2.0, burst=3, cost=2) == pytest.approx(1.0)
+
+
+def test_bucket_refills_no_higher_than_the_burst(clock):
+    store = BucketStore(shards=1)
+    for _ in range(3):
+        store.take("k", rate=1.0, burst=3)
+    clock[0] += 3600
+    assert [store.take("k", rate=1.0, burst=3) for _ in range(4)] == [0.0, 0.0, 0.0, pytest.approx(1.0)]
+
+
+def test_sweep_drops_only_refilled_buckets(clock):
+    store = BucketStore(shards=1, sweep_every=10)
+    for index in range(5):
+        store.take(f"idle-{index}", rate=1.0, burst=5)
+    store.take("busy", rate=0.001, burst=5)
+    assert len(store) == 6
+
+    clock[0] += 10
+    for _ in range(4):
+        store.take("busy", rate=0.001, burst=5)
+    assert len(store) == 1
+    assert store.evicted == 5
+    # A swept key starts again from a full bucket
+    assert store.take("idle-0", rate=1.0, burst=5) == 0.0
+
+
+# --- Limiter ---
+def test_limiter_keys_by_route_kind_and_identity(clock):
+    limiter = RateLimiter(ROUTES, backend="memory", shards=4)
+
+    async def main():
+        judge = [await limiter.take("/api/judge", "user", "u1") for _ in range(4)]
+        # Same user on a route with no user limit, and another user, are unaffected
+        other = [
+            await limiter.take("/api/levels", "user", "u1"),
+            await limiter.take("/api/judge", "user", "u2"),
+            await limiter.take("/api/unlisted", "ip", "1.2.3.4"),
+        ]
+        return judge, other
+
+    judge, other = asyncio.run(main())
+    assert judge == [0.0, 0.0, 0.0, pytest.approx(1.0)]
+    assert other == [0.0, 0.0, 0.0]
+    assert limiter.limits_for("/api/unlisted") is None
+    assert (limiter.allowed, limiter.limited) == (4, 1)
+
+
+def test_postgres_backend_matches_the_memory_one(clock):
+    pool = BucketPool()
+    shared = RateLimiter(
+        ROUTES, backend="postgres", shards=4,
+        repository_factory=lambda: RateLimitRepository(timeout=5, pool=pool),
+    )
+    local = RateLimiter(ROUTES, backend="memory", shards=4)
+
+    async def waits(limiter):
+        out = []
+        for step in range(12):
+            out.append(await limiter.take("/api/judge", "ip", "10.0.0.1"))
+            if step % 3 == 2:
+                clock[0] += 0.4
+        return out
+
+    start = clock[0]
+    expected = asyncio.run(waits(local))
+    clock[0] = start
+    assert asyncio.run(waits(shared)) == pytest.approx(expected)
+    assert any(expected)
+    assert (shared.allowed, shared.limited) == (local.allowed, local.limited)
+    assert pool.calls[0] == (
+        "take_rate_tokens", {"p_key": "/api/judge|ip|10.0.0.1", "p_rate": 2.0, "p_burst": 4, "p_cost": 1.0},
+    )
+
+
+def test_postgres_backend_fails_open(clock):
+    pool = BucketPool()
+    pool.down = True
+    limiter = RateLimiter(
+        ROUTES, backend="postgres", shards=4,
+        repository_factory=lambda: RateLimitRepository(timeout=5, pool=pool),
+    )
+
+    async def main():
+        return [await limiter.take("/api/judge", "ip", "10.0.0.1") for _ in range(10)]
+
+    assert asyncio.run(main()) == [0.0] * 10
+    assert limiter.backend_errors == 10
+
+
+def test_forwarded_for_is_only_used_when_trusted():
+    scope = {"client": ("10.0.0.9", 5000), "headers": [(b"x-forwarded-for", b"203.0.113.7, 10.0.0.1")]}
+    assert RateLimiter(ROUTES, "memory", 1).client_ip(scope) == "10.0.0.9"
+    assert RateLimiter(ROUTES, "memory", 1, trust_forwarded=True).client_ip(scope) == "203.0.113.7"
+    assert RateLimiter(ROUTES, "memory", 1, trust_forwarded=True).client_ip({"headers": []}) == "unknown"
+
+
+# --- Admission control ---
+def test_admission_queues_then_admits_on_release():
+    admission = AdmissionControl(max_concurrent=2, max_queue_wait=1.0)
+
+    async def main():
+        assert await admission.acquire()
+        assert await admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0.01)
+        assert (admission.in_flight, admission.queued) == (2, 1)
+        admission.release()
+        assert await waiter
+        assert (admission.in_flight, admission.queued) == (2, 0)
+
+    asyncio.run(main())
+    assert (admission.admitted, admission.shed) == (3, 0)
+
+
+def test_admission_sheds_after_the_queue_wait():
+    admission = AdmissionControl(max_concurrent=1, max_queue_wait=0.02)
+
+    async def main():
+        assert await admission.acquire()
+        results = await asyncio.gather(admission.acquire(), admission.acquire())
+        admission.release()
+        # The slot that was held is free again, with nothing leaked by the shed requests
+        assert await admission.acquire()
+        return results
+
+    assert asyncio.run(main()) == [False, False]
+    assert admission.stats() == {"max_concurrent": 1, "in_flight": 1, "queued": 0, "admitted": 2, "shed": 2}
+
+
+# --- Middleware ---
+async def _ok(scope, receive, send):
+    await PlainTextResponse("ok")(scope, receive, send)
+
+
+def test_middleware_returns_429_with_retry_after():
+    limiter = RateLimiter(ROUTES, backend="memory", shards=4)
+    client = TestClient(RateLimitMiddleware(_ok, limiter, AdmissionControl(4, 0.5)))
+
+    codes = [client.get("/api/judge").status_code for _ in range(5)]
+    assert codes == [200, 200, 200, 200, 429]
+    response = client.get("/api/judge")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    # Unlisted routes and preflight requests are never limited
+    assert client.get("/health").status_code == 200
+    assert client.options("/api/judge").status_code == 200
+
+
+def test_middleware_returns_503_when_saturated():
+    limiter = RateLimiter(ROUTES, backend="memory", shards=4)
+    admission = AdmissionControl(max_concurrent=0, max_queue_wait=0.01)
+    client = TestClient(RateLimitMiddleware(_ok, limiter, admission))
+
+    response = client.get("/api/levels")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert admission.shed == 1
@@ -0,0 +1,192 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.database import SupabasePool
+from app.repositories import base
+from app.repositories.base import HTTP_499_CLIENT_CLOSED_REQUEST, Repository, fan_out, is_rejected
+
+
+# --- Client pool ---
+def _pool(size: int = 2, acquire_timeout: float = 0.05) -> SupabasePool:
+    pool = SupabasePool(size, acquire_timeout, http_timeout=1, max_connections=4, keepalive_expiry=1)
+
+    async def create_client():
+        pool._created += 1
+        return SimpleNamespace(number=pool._created)
+
+    pool._create_client = create_client
+    return pool
+
+
+def test_clients_are_created_lazily_and_reused():
+    pool = _pool()
+
+    async def main():
+        seen = []
+        for _ in range(3):
+            async with pool.acquire() as client:
+                seen.append(client.number)
+        return seen
+
+    assert asyncio.run(main()) == [1, 1, 1]
+    assert pool.stats()["created"] == 1 and pool.stats()["acquired_total"] == 3
+
+
+def test_pool_caps_concurrent_clients_and_times_out_waiters():
+    pool = _pool(size=2)
+
+    async def main():
+        release = asyncio.Event()
+        holding = []
+
+        async def hold():
+            async with pool.acquire() as client:
+                holding.append(client.number)
+                await release.wait()
+
+        holders = [asyncio.create_task(hold()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exhausted:
+            async with pool.acquire():
+                pass
+        release.set()
+        await asyncio.gather(*holders)
+        return holding, exhausted.value
+
+    holding, exhausted = asyncio.run(main())
+    assert sorted(holding) == [1, 2]
+    assert exhausted.status_code == 503
+    stats = pool.stats()
+    assert (stats["created"], stats["in_use"], stats["idle"], stats["acquire_timeouts"]) == (2, 0, 2, 1)
+
+
+def test_failed_client_creation_gives_the_slot_back():
+    pool = _pool(size=1)
+    failures = [ConnectionError("auth server down")]
+    create_client = pool._create_client
+
+    async def flaky():
+        if failures:
+            raise failures.pop()
+        return await create_client()
+
+    pool._create_client = flaky
+
+    async def main():
+        with pytest.raises(ConnectionError):
+            async with pool.acquire():
+                pass
+        async with pool.acquire() as client:
+            return client.number
+
+    assert asyncio.run(main()) == 1
+
+
+def test_clients_in_use_when_the_pool_closes_are_dropped():
+    pool = _pool()
+
+    async def main():
+        async with pool.acquire():
+            await pool.close()
+        assert not pool.is_open and pool.stats()["idle"] == 0
+        async with pool.acquire() as client:
+            return client.number
+
+    assert asyncio.run(main()) == 1
+    assert pool.stats()["idle"] == 1
+
+
+# --- Repository guards ---
+class FakeRequest:
+    def __init__(self, disconnect_after: int = 0):
+        self.polls = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self) -> bool:
+        self.polls += 1
+        return bool(self.disconnect_after) and self.polls >= self.disconnect_after
+
+
+class Slow:
+    """A query that takes ``seconds`` and notes whether it was cancelled"""
+
+    def __init__(self, seconds: float, result="rows"):
+        self.seconds = seconds
+        self.result = result
+        self.cancelled = False
+
+    async def __call__(self, client):
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(base.settings, "DB_DISCONNECT_POLL_INTERVAL", 0.01)
+
+
+def _call(repo: Repository, query, timeout=None):
+    return asyncio.run(repo._call(query, timeout))
+
+
+def test_query_result_is_returned_and_the_client_handed_back():
+    pool = _pool()
+    assert _call(Repository(request=FakeRequest(), pool=pool), Slow(0.02)) == "rows"
+    assert pool.stats()["in_use"] == 0 and pool.stats()["idle"] == 1
+
+
+def test_slow_query_times_out_and_is_cancelled():
+    pool, query = _pool(), Slow(1)
+    with pytest.raises(HTTPException) as timed_out:
+        _call(Repository(timeout=0.05, pool=pool), query)
+    assert timed_out.value.status_code == 504
+    assert query.cancelled
+    assert pool.stats()["in_use"] == 0
+
+    # A per-call timeout overrides the repository's
+    assert _call(Repository(timeout=0.01, pool=pool), Slow(0.03), timeout=1) == "rows"
+
+
+def test_disconnected_client_cancels_the_query():
+    request, query = FakeRequest(disconnect_after=3), Slow(1)
+    with pytest.raises(HTTPException) as closed:
+        _call(Repository(request=request, timeout=5, pool=_pool()), query)
+    assert closed.value.status_code == HTTP_499_CLIENT_CLOSED_REQUEST
+    assert request.polls == 3 and query.cancelled
+
+
+def test_query_errors_propagate():
+    async def failing(client):
+        raise ValueError("bad row")
+
+    with pytest.raises(ValueError, match="bad row"):
+        _call(Repository(request=FakeRequest(), pool=_pool()), failing)
+
+
+def test_fan_out_keeps_order_and_cancels_the_rest_on_failure():
+    async def value(result, delay):
+        await asyncio.sleep(delay)
+        return result
+
+    assert asyncio.run(fan_out(value("a", 0.02), value("b", 0))) == ["a", "b"]
+
+    slow = Slow(1)
+
+    async def failing():
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(fan_out(slow(None), failing()))
+    assert slow.cancelled
+
+
+@pytest.mark.parametrize("code, rejected", [("23505", True), ("22P02", True), ("57014", False), (None, False)])
+def test_is_rejected(code, rejected):
+    assert is_rejected(SimpleNamespace(code=code)) is rejected
@@ -0,0 +1,146 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app.api import admin
+from app.core import roles, tokens
+from app.core.config import settings
+from app.core.roles import record_role_change, resolve_role, role_cache, role_changes
+from app.core.security import verify_token_strict
+from app.repositories.users import UserAdminRepository, get_user_admin_repository
+from benchmarks.fake_supabase import ADMIN_ID, FakeSupabase, mint_token, user_id
+from tests.fakes import FakePool
+
+ISSUER = f"{settings.SUPABASE_URL}/auth/v1"
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    role_cache.clear()
+    role_changes.clear()
+    yield
+    role_cache.clear()
+    role_changes.clear()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls ``time.monotonic`` as the role caches see it"""
+    now = [1000.0]
+    monkeypatch.setattr(tokens, "time", SimpleNamespace(**dict(vars(time), monotonic=lambda: now[0])))
+    return now
+
+
+@pytest.fixture
+def state():
+    return FakeSupabase(users=2, lessons=[])
+
+
+@pytest.fixture
+def pool(state):
+    return FakePool(state)
+
+
+def _resolve(pool: FakePool, uid: str, claim=None):
+    return asyncio.run(resolve_role({"user_id": uid, "role": claim}, UserAdminRepository(pool=pool)))
+
+
+def _lookups(pool: FakePool) -> int:
+    return pool.client.auth.admin.calls
+
+
+def test_role_is_looked_up_not_taken_from_the_token_by_default(pool):
+    assert settings.AUTH_ROLE_FROM_CLAIM is False
+    # A token minted while the user was admin doesn't make them one now
+    assert _resolve(pool, user_id(0), claim="admin") == ""
+    assert _resolve(pool, ADMIN_ID, claim="") == "admin"
+    assert _resolve(pool, "00000000-0000-0000-0000-00000000dead", claim="admin") is None
+
+
+def test_looked_up_roles_are_cached_for_the_ttl(pool, state, clock):
+    assert _resolve(pool, ADMIN_ID, claim="admin") == "admin"
+    # Demoted through another worker: this one notices once its cached entry expires, whatever
+    # the token says
+    state.users[ADMIN_ID]["user_metadata"]["role"] = ""
+    clock[0] += settings.AUTH_ROLE_CACHE_TTL - 1
+    assert _resolve(pool, ADMIN_ID, claim="admin") == "admin"
+    assert _lookups(pool) == 1
+
+    clock[0] += 1
+    assert _resolve(pool, ADMIN_ID, claim="admin") == ""
+    assert _lookups(pool) == 2
+
+
+def test_concurrent_misses_share_one_lookup(pool):
+    async def main():
+        repo = UserAdminRepository(pool=pool)
+        return await asyncio.gather(*(resolve_role({"user_id": ADMIN_ID, "role": None}, repo) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["admin"] * 5
+    assert _lookups(pool) == 1
+
+
+def test_changes_made_here_apply_at_once(pool, monkeypatch):
+    assert _resolve(pool, ADMIN_ID) == "admin"
+    record_role_change(ADMIN_ID, "")
+    assert _resolve(pool, ADMIN_ID) == ""
+    record_role_change(user_id(1), None)
+    assert _resolve(pool, user_id(1)) is None
+
+    # They also outrank a stale claim when claims are trusted
+    monkeypatch.setattr(roles.settings, "AUTH_ROLE_FROM_CLAIM", True)
+    assert _resolve(pool, ADMIN_ID, claim="admin") == ""
+    assert _lookups(pool) == 1
+
+
+def test_claim_is_used_without_a_lookup_when_enabled(pool, monkeypatch):
+    monkeypatch.setattr(roles.settings, "AUTH_ROLE_FROM_CLAIM", True)
+    assert _resolve(pool, user_id(0), claim="admin") == "admin"
+    # Tokens without the claim still look the role up
+    assert _resolve(pool, ADMIN_ID, claim=None) == "admin"
+    assert _lookups(pool) == 1
+
+
+# --- Through the admin API ---
+@pytest.fixture
+def client(pool):
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api")
+    app.dependency_overrides[verify_token_strict] = lambda: {}
+    app.dependency_overrides[get_user_admin_repository] = lambda: UserAdminRepository(pool=pool)
+    return TestClient(app)
+
+
+def _headers(uid: str, role: str) -> dict:
+    token = mint_token(uid, settings.SUPABASE_JWT_SECRET, ISSUER, user_metadata={"role": role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_demoted_admin_is_refused_despite_an_admin_token(client, state):
+    first_admin = _headers(ADMIN_ID, "admin")
+    promoted = client.put(f"/api/admin/users/{user_id(0)}/role", json={"role": "admin"}, headers=first_admin)
+    assert promoted.status_code == 200
+    second_admin = _headers(user_id(0), "admin")
+    assert client.put(f"/api/admin/users/{user_id(1)}/role", json={"role": ""}, headers=second_admin).status_code == 200
+
+    demoted = client.put(f"/api/admin/users/{user_id(0)}/role", json={"role": ""}, headers=first_admin)
+    assert demoted.status_code == 200
+    # The token from before the demotion still says admin
+    refused = client.put(f"/api/admin/users/{ADMIN_ID}/role", json={"role": ""}, headers=second_admin)
+    assert refused.status_code == 403
+    assert refused.json()["detail"] == "Admin access required"
+    assert state.users[ADMIN_ID]["user_metadata"]["role"] == "admin"
+
+
+def test_deleted_admin_is_refused(client, state):
+    state.users[user_id(0)]["user_metadata"]["role"] = "admin"
+    assert client.delete(f"/api/admin/users/{user_id(0)}", headers=_headers(ADMIN_ID, "admin")).status_code == 200
+    stale = _headers(user_id(0), "admin")
+    refused = client.put(f"/api/admin/users/{user_id(1)}/role", json={"role": "admin"}, headers=stale)
+    assert refused.status_code == 403
+    assert refused.json()["detail"] == "Access denied"
+    assert client.delete(f"/api/admin/users/{ADMIN_ID}", headers=_headers(ADMIN_ID, "admin")).status_code == 400
@@ -0,0 +1,124 @@
+import asyncio
+import random
+import re
+
+import pytest
+
+from app.services import validators
+from app.services.safe_regex import LinearRegex, RegexWorkerPool, classify
+from app.services.validators import compile_exact_match
+
+ALPHABET = "abcAB1 _\n-"
+
+
+def _atom(rng: random.Random, depth: int) -> str:
+    roll = rng.random()
+    if depth < 3 and roll < 0.2:
+        inner = _alternation(rng, depth + 1)
+        return rng.choice(["(", "(?:"]) + inner + ")"
+    if roll < 0.35:
+        return rng.choice([".", r"\d", r"\w", r"\s", r"\D", r"\W", r"\S"])
+    if roll < 0.5:
+        return rng.choice(["[ab]", "[^a]", "[a-c]", "[A-Z1]", r"[\d_]", "[-a]", r"[^\s]"])
+    if roll < 0.55:
+        return rng.choice(["^", "$", r"\A", r"\Z"])
+    return re.escape(rng.choice(ALPHABET.replace("\n", "")))
+
+
+def _quantified(rng: random.Random, depth: int) -> str:
+    atom = _atom(rng, depth)
+    if atom in ("^", "$", r"\A", r"\Z") or rng.random() < 0.6:
+        return atom
+    quantifier = rng.choice(["*", "+", "?", "{2}", "{1,3}", "{0,2}", "{2,}"])
+    return atom + quantifier + ("?" if rng.random() < 0.3 else "")
+
+
+def _alternation(rng: random.Random, depth: int = 0) -> str:
+    branches = []
+    for _ in range(1 if rng.random() < 0.7 else rng.randint(2, 3)):
+        branches.append("".join(_quantified(rng, depth) for _ in range(rng.randint(1, 4))))
+    return "|".join(branches)
+
+
+def _text(rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 12)))
+
+
+def test_linear_regex_agrees_with_re():
+    rng = random.Random(1234)
+    checked = 0
+    for _ in range(3000):
+        pattern = _alternation(rng)
+        ignorecase = rng.random() < 0.3
+        try:
+            expected_regex = re.compile(pattern, re.IGNORECASE if ignorecase else 0)
+        except re.error:
+            continue
+        matcher = classify(pattern, ignorecase)
+        if matcher is None:
+            continue
+        for _ in range(15):
+            text = _text(rng)
+            assert matcher.search(text) == (expected_regex.search(text) is not None), (pattern, ignorecase, text)
+            checked += 1
+    # The generator stays inside the supported subset almost always
+    assert checked > 30000
+
+
+@pytest.mark.parametrize("pattern", [r"(a)\1", r"a(?=b)", r"(?<!a)b", r"\bword\b", r"(?P<x>a)(?P=x)"])
+def test_patterns_outside_the_subset_need_backtracking(pattern):
+    assert classify(pattern) is None
+
+
+def test_dfa_cache_reset_keeps_answers_right():
+    matcher = LinearRegex(r"(a|b)*a(a|b){6}")
+    rng = random.Random(5)
+    expected = re.compile(matcher.pattern)
+    for _ in range(300):
+        text = "".join(rng.choice("ab") for _ in range(rng.randint(0, 40)))
+        assert matcher.search(text) == (expected.search(text) is not None)
+
+
+def test_scanner_reports_a_match_once_certain():
+    scanner = LinearRegex(r"hello\s+world").scanner()
+    assert not scanner.feed("say hello ")
+    assert scanner.feed("  world and more")
+    assert scanner.feed("anything")
+
+
+def test_blocking_judge_runs_backtracking_patterns_under_the_timeout(monkeypatch):
+    pool = RegexWorkerPool(workers=1, timeout=1.0)
+    monkeypatch.setattr(validators, "regex_pool", pool)
+    try:
+        plan = compile_exact_match({"match_type": "regex", "expected": r"^(a|aa)+\1$"})
+        assert plan.regex_engine == "backtracking"
+        assert plan.judge_blocking("aaaa")[0]
+        # Catastrophic on re; must come back as a timeout rather than hang the caller
+        success, feedback, score = plan.judge_blocking("a" * 40 + "b")
+        assert (success, score) == (False, 0)
+        assert "too long" in feedback
+        assert pool.timeouts == 1
+        # The pool was replaced and still answers
+        assert not plan.judge_blocking("b")[0]
+    finally:
+        pool.close()
+
+
+def test_pool_started_from_a_thread_is_shared_with_searches():
+    pool = RegexWorkerPool(workers=1, timeout=5.0)
+    assert pool._pool is None  # nothing is spawned until started or used
+
+    async def main():
+        starting = asyncio.create_task(asyncio.to_thread(pool.start))
+        found = await pool.search(r"^(a|aa)+$", 0, "aaaa")
+        await starting
+        return found
+
+    try:
+        assert asyncio.run(main()) is True
+        started = pool._pool
+        pool.start()
+        assert pool._pool is started
+    finally:
+        pool.close()
+    assert pool._pool is None
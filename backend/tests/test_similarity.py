@@ -0,0 +1,122 @@
+import random
+from collections import Counter
+
+import pytest
+
+from app.services.similarity import EditDistance, TokenOverlap
+from app.services.validators import compile_exact_match
+
+
+def _levenshtein(a: str, b: str) -> int:
+    """Textbook Wagner-Fischer DP"""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def _dice(a: str, b: str) -> float:
+    words_a, words_b = Counter(a.split()), Counter(b.split())
+    total = sum(words_a.values()) + sum(words_b.values())
+    return 2 * sum((words_a & words_b).values()) / total if total else 1.0
+
+
+def _random_text(rng: random.Random, alphabet: str, max_length: int) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randrange(max_length + 1)))
+
+
+def _mutate(rng: random.Random, text: str, alphabet: str) -> str:
+    chars = list(text)
+    for _ in range(rng.randrange(6)):
+        op = rng.randrange(3)
+        position = rng.randrange(len(chars) + 1)
+        if op == 0:
+            chars.insert(position, rng.choice(alphabet))
+        elif chars and position < len(chars):
+            if op == 1:
+                del chars[position]
+            else:
+                chars[position] = rng.choice(alphabet)
+    return "".join(chars)
+
+
+@pytest.mark.parametrize("pattern, text, expected", [
+    ("kitten", "sitting", 3),
+    ("flaw", "lawn", 2),
+    ("", "abc", 3),
+    ("abc", "", 3),
+    ("", "", 0),
+    ("same", "same", 0),
+    ("héllo wörld 🎉", "hello world", 4),
+])
+def test_known_distances(pattern, text, expected):
+    assert EditDistance(pattern).distance(text) == expected
+
+
+@pytest.mark.parametrize("alphabet, max_length", [
+    ("ab", 12),
+    ("abcd ", 40),
+    ("abcdefghij", 70),  # patterns longer than a 64-bit word
+    ("aé漢🎉 ", 20),
+])
+def test_distance_matches_the_reference(alphabet, max_length):
+    rng = random.Random(len(alphabet) * 1000 + max_length)
+    for _ in range(400):
+        pattern = _random_text(rng, alphabet, max_length)
+        scorer = EditDistance(pattern)
+        # Near misses exercise the same code paths graders see, random texts the far ones
+        for text in (_mutate(rng, pattern, alphabet), _random_text(rng, alphabet, max_length)):
+            expected = _levenshtein(pattern, text)
+            assert scorer.distance(text) == expected, (pattern, text)
+            for max_distance in (0, 1, 3, expected, expected - 1, max_length):
+                if max_distance < 0:
+                    continue
+                cut = scorer.distance(text, max_distance)
+                assert cut == min(expected, max_distance + 1), (pattern, text, max_distance)
+
+
+def test_similarity_floor_matches_the_reference():
+    rng = random.Random(22)
+    alphabet = "abcde "
+    for _ in range(300):
+        pattern = _random_text(rng, alphabet, 30)
+        scorer = EditDistance(pattern)
+        texts = [_mutate(rng, pattern, alphabet) for _ in range(3)] + [_random_text(rng, alphabet, 30)]
+        for min_score in (0, 10, 29, 50, 57, 70, 71, 90, 100):
+            floor = min_score / 100
+            expected = []
+            for text in texts:
+                longest = max(len(pattern), len(text))
+                value = 1 - _levenshtein(pattern, text) / longest if longest else 1.0
+                expected.append(value if value >= floor else 0.0)
+            assert [scorer.similarity(text, floor) for text in texts] == pytest.approx(expected), (pattern, texts)
+            assert scorer.similarities(texts + texts[:2], floor) == pytest.approx(expected + expected[:2])
+
+
+def test_token_overlap_matches_the_reference():
+    rng = random.Random(5)
+    words = ["the", "cat", "sat", "on", "a", "mat", "dog"]
+    for _ in range(300):
+        pattern = " ".join(rng.choice(words) for _ in range(rng.randrange(8)))
+        text = " ".join(rng.choice(words) for _ in range(rng.randrange(8)))
+        scorer = TokenOverlap(pattern)
+        assert scorer.similarity(text) == pytest.approx(_dice(pattern, text)), (pattern, text)
+        assert scorer.similarities([text, text], 0.5) == [scorer.similarity(text, 0.5)] * 2
+    # Punctuation separates words
+    assert TokenOverlap("Hello, world!").similarity("hello world") == pytest.approx(0.5)
+
+
+def test_judge_many_scores_like_judge_one_at_a_time():
+    plan = compile_exact_match({
+        "match_type": "similarity", "expected": "The quick brown fox", "case_sensitive": False,
+        "pass_score": 80, "min_score": 40, "max_input_length": 40,
+    })
+    answers = [
+        "the quick brown fox", "  The Quick Brown Fox  ", "the quick brown box", "a quick red fox",
+        "nothing alike at all", "", "x" * 41, "the quick brown fox",
+    ]
+    assert plan.judge_many(answers) == [plan.judge_blocking(answer) for answer in answers]
+    assert [score for _, _, score in plan.judge_many(answers)] == [100, 100, 94, 63, 0, 0, 0, 100]
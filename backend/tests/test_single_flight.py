@@ -0,0 +1,167 @@
+import asyncio
+
+from app.core import security
+from app.repositories.lessons import LessonRepository
+from app.services import single_flight
+from app.services.lesson_catalog import LessonCatalog
+from app.services.single_flight import SingleFlight
+from benchmarks.fake_supabase import FakeSupabase
+from tests.fakes import FakePool
+
+
+class Work:
+    """A call that counts its runs and finishes when ``done`` is set"""
+
+    def __init__(self, result="value", error: Exception = None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.cancelled = False
+        self.done = asyncio.Event()
+
+    async def __call__(self):
+        self.runs += 1
+        try:
+            await self.done.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def _settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight("test")
+
+    async def main():
+        work = Work()
+        callers = [asyncio.create_task(flight.do("k", work)) for _ in range(5)]
+        other = asyncio.create_task(flight.do("other", Work("other")))
+        await _settle()
+        assert flight.stats()["in_flight"] == 2
+        work.done.set()
+        results = await asyncio.gather(*callers)
+        other.cancel()
+        return work.runs, results
+
+    runs, results = asyncio.run(main())
+    assert (runs, results) == (1, ["value"] * 5)
+    assert flight.stats() == {"calls": 2, "coalesced": 4, "in_flight": 0, "coalesced_rate": 0.6667}
+
+
+def test_nothing_is_cached_after_the_call():
+    flight = SingleFlight("test")
+
+    async def main():
+        work = Work()
+        work.done.set()
+        await flight.do("k", work)
+        await flight.do("k", work)
+        return work.runs
+
+    assert asyncio.run(main()) == 2
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight("test")
+
+    async def main():
+        work = Work(error=ConnectionError("down"))
+        callers = [asyncio.create_task(flight.do("k", work)) for _ in range(3)]
+        await _settle()
+        work.done.set()
+        return work.runs, await asyncio.gather(*callers, return_exceptions=True)
+
+    runs, results = asyncio.run(main())
+    assert runs == 1
+    assert [type(result) for result in results] == [ConnectionError] * 3
+
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight("test")
+
+    async def main():
+        work = Work()
+        first, second = (asyncio.create_task(flight.do("k", work)) for _ in range(2))
+        await _settle()
+        first.cancel()
+        await _settle()
+        assert not work.cancelled
+        work.done.set()
+        return first.cancelled(), await second
+
+    assert asyncio.run(main()) == (True, "value")
+
+
+def test_the_last_caller_cancelling_stops_the_work():
+    flight = SingleFlight("test")
+
+    async def main():
+        work = Work()
+        callers = [asyncio.create_task(flight.do("k", work)) for _ in range(2)]
+        await _settle()
+        for caller in callers:
+            caller.cancel()
+        await _settle()
+        assert work.cancelled and flight.stats()["in_flight"] == 0
+
+        # The next caller starts afresh
+        retry = Work("retried")
+        retry.done.set()
+        return await flight.do("k", retry)
+
+    assert asyncio.run(main()) == "retried"
+
+
+def test_groups_report_under_their_names():
+    flight = SingleFlight("named-for-test")
+    assert single_flight.stats()["named-for-test"] == flight.stats()
+
+
+# --- Where it is applied ---
+LESSONS = [{"id": 1, "title": "Echo", "game_type": "exact_match", "is_published": True, "config": {}}]
+
+
+def test_concurrent_lesson_lookups_share_one_query():
+    state = FakeSupabase(users=0, lessons=[dict(lesson) for lesson in LESSONS])
+    pool = FakePool(state, latency=0.01)
+    catalog = LessonCatalog(poll_interval=0)
+    lessons = LessonRepository(pool=pool)
+
+    async def main():
+        # The first lookups share the initial load
+        first = await asyncio.gather(*(catalog.get(1, lessons) for _ in range(5)))
+        assert [lesson["id"] for lesson in first] == [1] * 5
+        loads = pool.acquired
+        # A row added by another process: one fetch for all the requests that want it
+        state.tables["lessons"].append({**LESSONS[0], "id": 2})
+        found = await asyncio.gather(*(catalog.get(2, lessons) for _ in range(5)))
+        return loads, pool.acquired - loads, found
+
+    loads, fetches, found = asyncio.run(main())
+    assert fetches == 1 and loads <= 2  # the load may page through list_all
+    assert [lesson["id"] for lesson in found] == [2] * 5
+    assert catalog.stats()["coalesced"] == 8
+
+
+def test_concurrent_remote_token_checks_share_one_call(monkeypatch):
+    calls = []
+
+    async def fetch_user(token: str) -> dict:
+        calls.append(token)
+        await asyncio.sleep(0.01)
+        return {"user_id": token, "email": None, "role": ""}
+
+    monkeypatch.setattr(security, "_fetch_user", fetch_user)
+
+    async def main():
+        return await asyncio.gather(*(security._verify_remote(token) for token in ("a", "a", "a", "b")))
+
+    assert [user["user_id"] for user in asyncio.run(main())] == ["a", "a", "a", "b"]
+    assert calls == ["a", "b"]
@@ -0,0 +1,36 @@
+"""
+The startup budget from ``benchmarks.startup``, checked on every test run:
+``import main`` in fresh interpreters stays under IMPORT_BUDGET_MS without
+pulling in any LAZY_MODULES, and a fresh server answers /health within
+FIRST_200_BUDGET_MS.
+"""
+import statistics
+import subprocess
+import sys
+
+from benchmarks.load import BACKEND_DIR, _free_port, _wait_ready
+from benchmarks.startup import FIRST_200_BUDGET_MS, IMPORT_BUDGET_MS, profile_imports, time_startup
+
+RUNS = 3
+
+
+def test_import_main_within_budget_and_lazy():
+    totals, _, imported_lazy = profile_imports(RUNS)
+    assert imported_lazy == []
+    assert statistics.median(totals) * 1000 <= IMPORT_BUDGET_MS
+
+
+def test_first_200_within_budget():
+    port = _free_port()
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_supabase", "--port", str(port)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(f"{url}/auth/v1/.well-known/jwks.json", fake)
+        timings = [time_startup(url, timeout=30.0) for _ in range(RUNS)]
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+    assert statistics.median(t["first_200"] for t in timings) * 1000 <= FIRST_200_BUDGET_MS
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from app.services import validators
+from app.services.llm import AnthropicProvider, GeminiProvider, OpenAICompatibleProvider
+from app.services.validators import LLMPlan, compile_exact_match
+
+
+def _feed(config: dict, chunks: list) -> list:
+    """Whether the grader had decided after each chunk"""
+    grader = compile_exact_match(config).stream_grader()
+    return [grader.feed(chunk) for chunk in chunks]
+
+
+def test_contains_decides_when_expected_spans_chunks():
+    assert _feed({"match_type": "contains", "expected": "hello world"}, ["say hel", "lo wo", "rld!", "more"]) == [
+        False, False, True, True,
+    ]
+    assert _feed({"match_type": "contains", "expected": "HELLO", "case_sensitive": False}, ["x he", "LLo"]) == [
+        False, True,
+    ]
+
+
+def test_exact_decides_once_off_track():
+    config = {"match_type": "exact", "expected": "Paris"}
+    # Leading whitespace and a correct prefix keep it open
+    assert _feed(config, ["  Pa", "ris", "  "]) == [False, False, False]
+    assert _feed(config, ["Pa", "ris", "!"]) == [False, False, True]
+    assert _feed(config, ["Lon"]) == [True]
+
+
+def test_linear_regex_decides_on_first_match():
+    assert _feed({"match_type": "regex", "expected": r"\d{3}-\d{4}"}, ["call 55", "5-12", "34 now"]) == [
+        False, False, True,
+    ]
+
+
+@pytest.mark.parametrize("config", [
+    {"match_type": "regex", "expected": r"^done$"},  # needs the end of input
+    {"match_type": "regex", "expected": r"(a)\1"},  # backtracking: judged only at the end
+    {"match_type": "similarity", "expected": "kitten"},  # more text can move the score either way
+])
+def test_undecidable_until_the_end(config):
+    assert _feed(config, ["done", "aa", "kitten"]) == [False, False, False]
+
+
+def test_over_the_length_limit_decides():
+    assert _feed({"match_type": "contains", "expected": "zzz", "max_input_length": 10}, ["abcdef", "ghijkl"]) == [
+        False, True,
+    ]
+
+
+def test_finish_is_the_plans_own_result():
+    plan = compile_exact_match({"match_type": "exact", "expected": "Paris"})
+    grader = plan.stream_grader()
+    for chunk in ("  Par", "is\n"):
+        grader.feed(chunk)
+    assert grader.finish() == plan.judge("  Paris\n")
+
+
+def test_provider_stream_chunks():
+    # Chunk parsing needs no client or key
+    openai = OpenAICompatibleProvider.__new__(OpenAICompatibleProvider)
+    assert openai.parse_chunk({"choices": [{"delta": {"content": "Hi"}}]}) == "Hi"
+    assert openai.parse_chunk({"choices": []}) == ""
+    anthropic = AnthropicProvider.__new__(AnthropicProvider)
+    assert anthropic.parse_chunk({"type": "content_block_delta", "delta": {"text": "Hi"}}) == "Hi"
+    assert anthropic.parse_chunk({"type": "message_start"}) == ""
+    with pytest.raises(ValueError):
+        anthropic.parse_chunk({"type": "error", "error": {"message": "overloaded"}})
+    gemini = GeminiProvider.__new__(GeminiProvider)
+    assert gemini.parse_chunk({"candidates": [{"content": {"parts": [{"text": "Hi"}]}}]}) == "Hi"
+    assert gemini.parse_chunk({"usageMetadata": {}}) == ""
+
+
+def test_llm_stream_stops_generating_once_decided(monkeypatch):
+    pulled, closed = [], []
+
+    async def fake_stream(provider, system_prompt, user_prompt, model):
+        try:
+            for token in ["The answer", " is 42", " and more", " and more"]:
+                pulled.append(token)
+                yield token
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(validators.llm_router, "pick", lambda provider, model: (provider, model))
+    monkeypatch.setattr(validators.llm_pool, "stream", fake_stream)
+    plan = LLMPlan(
+        system_prompt="",
+        provider="openai",
+        model=None,
+        grader=compile_exact_match({"match_type": "contains", "expected": "42"}),
+        max_prompt_length=100,
+    )
+
+    async def collect():
+        return [event async for event in plan.stream(("What is it?", None))]
+
+    events = asyncio.run(collect())
+    assert events[:-1] == [("token", "The answer"), ("token", " is 42")]
+    assert events[-1][0] == "result"
+    assert events[-1][1][0] is True and events[-1][1][3] == "The answer is 42"
+    assert pulled == ["The answer", " is 42"]
+    assert closed == [True]
+
+
+def test_llm_stream_rejects_empty_prompts_without_a_call(monkeypatch):
+    monkeypatch.setattr(validators.llm_pool, "stream", None)
+    plan = LLMPlan("", "openai", None, compile_exact_match({"expected": "x"}), 100)
+
+    async def collect():
+        return [event async for event in plan.stream(("   ", None))]
+
+    assert asyncio.run(collect()) == [("result", (False, "Please write a prompt.", 0, None))]
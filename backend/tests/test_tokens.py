@@ -0,0 +1,224 @@
+import asyncio
+import time
+from functools import partial
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import JWTError, jwk, jwt
+
+from app.core import security, tokens
+from app.core.config import settings
+from app.core.tokens import LocalVerificationUnavailable, SigningKeys, TokenCache, verify_jwt_locally
+from benchmarks.fake_supabase import mint_token, user_id
+
+ISSUER = f"{settings.SUPABASE_URL}/auth/v1"
+JWKS_URL = f"{ISSUER}/.well-known/jwks.json"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls ``time.monotonic`` as the token caches see it"""
+    now = [1000.0]
+    monkeypatch.setattr(tokens, "time", SimpleNamespace(**dict(vars(time), monotonic=lambda: now[0])))
+    return now
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(tokens, "token_cache", TokenCache(max_size=100, ttl=60))
+
+
+def _verify(token: str) -> dict:
+    return asyncio.run(verify_jwt_locally(token))
+
+
+# --- HS256 ---
+def test_valid_token_is_verified_and_cached():
+    token = mint_token(user_id(0), settings.SUPABASE_JWT_SECRET, ISSUER, user_metadata={"role": "admin"})
+    assert _verify(token) == {"user_id": user_id(0), "email": f"{user_id(0)}@bench.local", "role": "admin"}
+    assert _verify(token)["user_id"] == user_id(0)
+    assert tokens.token_cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+
+def test_role_is_none_when_the_token_has_no_metadata():
+    claims = jwt.get_unverified_claims(mint_token(user_id(0), settings.SUPABASE_JWT_SECRET, ISSUER))
+    del claims["user_metadata"]
+    assert _verify(jwt.encode(claims, settings.SUPABASE_JWT_SECRET, algorithm="HS256"))["role"] is None
+
+
+@pytest.mark.parametrize("token", [
+    mint_token(user_id(0), "some-other-secret", ISSUER),
+    mint_token(user_id(0), settings.SUPABASE_JWT_SECRET, "https://elsewhere.example/auth/v1"),
+    mint_token(user_id(0), settings.SUPABASE_JWT_SECRET, ISSUER, ttl=-10),
+    jwt.encode({"aud": "authenticated", "iss": ISSUER, "exp": int(time.time()) + 60},
+               settings.SUPABASE_JWT_SECRET, algorithm="HS256"),
+    jwt.encode({"sub": user_id(0), "aud": "anon", "iss": ISSUER, "exp": int(time.time()) + 60},
+               settings.SUPABASE_JWT_SECRET, algorithm="HS256"),
+], ids=["signature", "issuer", "expired", "no-subject", "audience"])
+def test_invalid_tokens_are_rejected_and_not_cached(token):
+    with pytest.raises(JWTError):
+        _verify(token)
+    assert tokens.token_cache.stats()["size"] == 0
+
+
+def test_no_secret_means_local_verification_is_unavailable(monkeypatch):
+    monkeypatch.setattr(tokens.settings, "SUPABASE_JWT_SECRET", "")
+    with pytest.raises(LocalVerificationUnavailable):
+        _verify(mint_token(user_id(0), "benchmark-jwt-secret", ISSUER))
+
+
+# --- Verified-token cache ---
+def test_cache_entries_expire_after_the_ttl(clock):
+    cache = TokenCache(max_size=10, ttl=60)
+    cache.put("a", {"user_id": "a"})
+    clock[0] += 59
+    assert cache.get("a") == {"user_id": "a"}
+    clock[0] += 1
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 1}
+
+
+def test_cache_never_outlives_the_token(clock):
+    cache = TokenCache(max_size=10, ttl=60)
+    cache.put("soon", {}, token_exp=time.time() + 5)
+    cache.put("expired", {}, token_exp=time.time() - 1)
+    assert cache.get("expired") is None
+    clock[0] += 5
+    assert cache.get("soon") is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TokenCache(max_size=2, ttl=60)
+    cache.put("a", {})
+    cache.put("b", {})
+    cache.get("a")
+    cache.put("c", {})
+    assert cache.get("b") is None
+    assert cache.get("a") == {} and cache.get("c") == {}
+
+    disabled = TokenCache(max_size=0, ttl=60)
+    disabled.put("a", {})
+    assert disabled.stats()["size"] == 0
+
+
+# --- Asymmetric keys from the JWKS ---
+def _rsa_key(kid: str):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public = jwk.construct(pem, "RS256").public_key().to_dict()
+    return pem, {**public, "kid": kid, "alg": "RS256", "use": "sig"}
+
+
+def _rs256(pem: bytes, kid: str, sub: str = user_id(0)) -> str:
+    claims = jwt.get_unverified_claims(mint_token(sub, "unused", ISSUER))
+    return jwt.encode(claims, pem, algorithm="RS256", headers={"kid": kid})
+
+
+class FakeJWKS:
+    """The auth server's JWKS endpoint, counting fetches"""
+
+    def __init__(self, *keys):
+        self.keys = list(keys)
+        self.fetches = 0
+        self.down = False
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.fetches += 1
+        if self.down:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"keys": self.keys})
+
+
+@pytest.fixture
+def jwks(monkeypatch, clock):
+    server = FakeJWKS()
+    monkeypatch.setattr(
+        tokens.httpx, "AsyncClient", partial(httpx.AsyncClient, transport=httpx.MockTransport(server.handle))
+    )
+    monkeypatch.setattr(tokens, "signing_keys", SigningKeys(JWKS_URL, refresh_interval=600))
+    return server
+
+
+def test_jwks_keys_verify_asymmetric_tokens(jwks):
+    pem, public = _rsa_key("k1")
+    jwks.keys = [public]
+
+    async def main():
+        await tokens.signing_keys.start()
+        try:
+            return await verify_jwt_locally(_rs256(pem, "k1"))
+        finally:
+            await tokens.signing_keys.stop()
+
+    assert asyncio.run(main())["user_id"] == user_id(0)
+    assert jwks.fetches == 1
+
+
+def test_unknown_kid_refetches_once_per_min_refetch_interval(jwks, clock):
+    old_pem, old = _rsa_key("old")
+    new_pem, new = _rsa_key("new")
+    jwks.keys = [old]
+    asyncio.run(tokens.signing_keys.refresh())
+
+    # Rotated: the first token signed with the new key triggers a refetch
+    jwks.keys = [old, new]
+    clock[0] += settings.AUTH_JWKS_MIN_REFETCH
+    assert _verify(_rs256(new_pem, "new", sub=user_id(1)))["user_id"] == user_id(1)
+    assert jwks.fetches == 2
+
+    # A bogus kid right after does not hit the auth server again
+    with pytest.raises(LocalVerificationUnavailable, match="bogus"):
+        _verify(_rs256(old_pem, "bogus"))
+    assert jwks.fetches == 2
+
+
+def test_failed_refresh_keeps_the_previous_keys(jwks):
+    pem, public = _rsa_key("k1")
+    jwks.keys = [public]
+    asyncio.run(tokens.signing_keys.refresh())
+    jwks.down = True
+    asyncio.run(tokens.signing_keys.refresh())
+    assert jwks.fetches == 2
+    assert _verify(_rs256(pem, "k1"))["user_id"] == user_id(0)
+
+
+def test_key_algorithm_wins_over_the_token_header(jwks):
+    pem, public = _rsa_key("k1")
+    jwks.keys = [{**public, "alg": "RS512"}]
+    asyncio.run(tokens.signing_keys.refresh())
+    with pytest.raises(JWTError):
+        _verify(_rs256(pem, "k1"))
+
+
+# --- verify_token ---
+def _credentials(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_verify_token_falls_back_to_supabase_without_a_key(monkeypatch):
+    remote = []
+
+    async def verify_remote(token: str) -> dict:
+        remote.append(token)
+        return {"user_id": "remote", "email": None, "role": ""}
+
+    monkeypatch.setattr(security, "_verify_remote", verify_remote)
+    local = mint_token(user_id(0), settings.SUPABASE_JWT_SECRET, ISSUER)
+    assert asyncio.run(security.verify_token(_credentials(local)))["user_id"] == user_id(0)
+    assert remote == []
+
+    unknown_kid = jwt.encode({"sub": "x"}, "secret", algorithm="HS384", headers={"kid": "nope"})
+    monkeypatch.setattr(tokens, "signing_keys", SigningKeys("", refresh_interval=600))
+    assert asyncio.run(security.verify_token(_credentials(unknown_kid)))["user_id"] == "remote"
+    assert remote == [unknown_kid]
+
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(security.verify_token(_credentials(mint_token(user_id(0), "wrong", ISSUER))))
+    assert refused.value.status_code == 401 and remote == [unknown_kid]
@@ -0,0 +1,157 @@
+-- ============================================
+-- Prmpt - Credits Balance & Ledger
+-- ============================================
+
+-- Current balance per user (one row, updated in place)
+CREATE TABLE IF NOT EXISTS public.user_credits (
+    user_id UUID PRIMARY KEY REFERENCES auth.users (id) ON DELETE CASCADE,
+    balance INTEGER NOT NULL CHECK (balance >= 0),
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- Append-only history of every balance change
+CREATE TABLE IF NOT EXISTS public.credit_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES auth.users (id) ON DELETE CASCADE,
+    delta INTEGER NOT NULL,
+    balance_after INTEGER NOT NULL,
+    reason TEXT NOT NULL DEFAULT 'deduct',
+    idempotency_key TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    UNIQUE (user_id, idempotency_key)
+);
+
+-- Enable RLS
+ALTER TABLE public.user_credits ENABLE ROW LEVEL SECURITY;
+
+ALTER TABLE public.credit_ledger ENABLE ROW LEVEL SECURITY;
+
+-- Users can read their own balance and history; writes go through the functions below
+CREATE POLICY "Users can view own credits" ON public.user_credits FOR
+SELECT USING (auth.uid () = user_id);
+
+CREATE POLICY "Users can view own ledger" ON public.credit_ledger FOR
+SELECT USING (auth.uid () = user_id);
+
+-- Indexes
+CREATE INDEX IF NOT EXISTS idx_ledger_user ON public.credit_ledger (user_id, created_at);
+
+-- Updated_at trigger
+CREATE TRIGGER user_credits_updated_at
+    BEFORE UPDATE ON public.user_credits
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at();
+
+-- Ledger rows are never rewritten
+CREATE OR REPLACE FUNCTION reject_ledger_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    RAISE EXCEPTION 'credit_ledger is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER credit_ledger_append_only
+    BEFORE UPDATE OR DELETE ON public.credit_ledger
+    FOR EACH ROW
+    EXECUTE FUNCTION reject_ledger_change();
+
+-- ============================================
+-- Functions (called via PostgREST RPC)
+-- ============================================
+
+-- Create the balance row with the starting grant if missing; returns the balance
+CREATE OR REPLACE FUNCTION public.ensure_credits(p_user_id UUID, p_default INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_balance INTEGER;
+BEGIN
+    INSERT INTO public.user_credits (user_id, balance)
+    VALUES (p_user_id, p_default)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    IF FOUND THEN
+        INSERT INTO public.credit_ledger (user_id, delta, balance_after, reason, idempotency_key)
+        VALUES (p_user_id, p_default, p_default, 'grant', 'initial-grant');
+    END IF;
+
+    SELECT balance INTO v_balance FROM public.user_credits WHERE user_id = p_user_id;
+    RETURN v_balance;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Atomically take up to p_amount credits (never below zero).
+-- Replaying an idempotency key returns the original outcome without charging again.
+CREATE OR REPLACE FUNCTION public.deduct_credits(
+    p_user_id UUID,
+    p_amount INTEGER,
+    p_idempotency_key TEXT,
+    p_default INTEGER
+)
+RETURNS TABLE (balance INTEGER, charged INTEGER, replayed BOOLEAN) AS $$
+DECLARE
+    v_balance INTEGER;
+    v_charged INTEGER;
+BEGIN
+    IF p_amount < 0 THEN
+        RAISE EXCEPTION 'amount must not be negative';
+    END IF;
+
+    PERFORM public.ensure_credits(p_user_id, p_default);
+
+    -- Row lock serialises concurrent deductions for the same user
+    SELECT c.balance INTO v_balance
+    FROM public.user_credits c
+    WHERE c.user_id = p_user_id
+    FOR UPDATE;
+
+    SELECT l.balance_after, -l.delta INTO balance, charged
+    FROM public.credit_ledger l
+    WHERE l.user_id = p_user_id AND l.idempotency_key = p_idempotency_key;
+    IF FOUND THEN
+        replayed := true;
+        RETURN NEXT;
+        RETURN;
+    END IF;
+
+    v_charged := LEAST(v_balance, p_amount);
+    UPDATE public.user_credits c
+    SET balance = c.balance - v_charged
+    WHERE c.user_id = p_user_id
+    RETURNING c.balance INTO v_balance;
+
+    INSERT INTO public.credit_ledger (user_id, delta, balance_after, reason, idempotency_key)
+    VALUES (p_user_id, -v_charged, v_balance, 'deduct', p_idempotency_key);
+
+    balance := v_balance;
+    charged := v_charged;
+    replayed := false;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Apply a batch of deductions in one transaction.
+-- p_entries: [{"user_id": ..., "amount": ..., "idempotency_key": ...}, ...]
+CREATE OR REPLACE FUNCTION public.apply_credit_batch(p_entries JSONB, p_default INTEGER)
+RETURNS TABLE (user_id UUID, idempotency_key TEXT, balance INTEGER, charged INTEGER, replayed BOOLEAN) AS $$
+DECLARE
+    v_entry JSONB;
+BEGIN
+    FOR v_entry IN SELECT * FROM jsonb_array_elements(p_entries)
+    LOOP
+        user_id := (v_entry ->> 'user_id')::UUID;
+        idempotency_key := v_entry ->> 'idempotency_key';
+        SELECT d.balance, d.charged, d.replayed INTO balance, charged, replayed
+        FROM public.deduct_credits(
+            user_id,
+            (v_entry ->> 'amount')::INTEGER,
+            idempotency_key,
+            p_default
+        ) d;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION public.ensure_credits(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.deduct_credits(UUID, INTEGER, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.apply_credit_batch(JSONB, INTEGER) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,34 @@
+-- ============================================
+-- Prmpt - Batched progress recording
+-- ============================================
+
+-- Merge a batch of pre-aggregated judge results into user_progress in one statement.
+-- p_rows: [{"user_id": ..., "lesson_id": ..., "attempts": ..., "score": ...,
+--           "completed": ..., "completed_at": ...}, ...]
+-- Attempts are added, the best score is kept and completed_at is set on the first success only.
+CREATE OR REPLACE FUNCTION public.record_progress(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    INSERT INTO public.user_progress AS p (user_id, lesson_id, attempts, score, completed, completed_at)
+    SELECT
+        (r ->> 'user_id')::UUID,
+        (r ->> 'lesson_id')::INTEGER,
+        (r ->> 'attempts')::INTEGER,
+        (r ->> 'score')::INTEGER,
+        (r ->> 'completed')::BOOLEAN,
+        (r ->> 'completed_at')::TIMESTAMPTZ
+    FROM jsonb_array_elements(p_rows) AS r
+    ON CONFLICT (user_id, lesson_id) DO UPDATE SET
+        attempts = p.attempts + EXCLUDED.attempts,
+        score = GREATEST(p.score, EXCLUDED.score),
+        completed = p.completed OR EXCLUDED.completed,
+        completed_at = COALESCE(p.completed_at, EXCLUDED.completed_at);
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION public.record_progress(JSONB) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,49 @@
+-- ============================================
+-- Prmpt - Shared rate-limit buckets
+-- ============================================
+
+-- Token buckets shared by all API workers (RATE_LIMIT_BACKEND=postgres).
+-- Unlogged: losing buckets in a crash only means everyone starts with a full bucket.
+CREATE UNLOGGED TABLE IF NOT EXISTS public.rate_limit_buckets (
+    key TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+-- No policies: only the service role (API) touches buckets
+ALTER TABLE public.rate_limit_buckets ENABLE ROW LEVEL SECURITY;
+
+-- Refill p_key's bucket at p_rate tokens/second up to p_burst, then take p_cost tokens.
+-- Returns 0 when the tokens were taken, otherwise the seconds until they will be available.
+-- Now and then buckets idle for an hour are pruned; an idle bucket is full, same as a missing one.
+CREATE OR REPLACE FUNCTION public.take_rate_tokens(
+    p_key TEXT,
+    p_rate DOUBLE PRECISION,
+    p_burst DOUBLE PRECISION,
+    p_cost DOUBLE PRECISION DEFAULT 1
+)
+RETURNS DOUBLE PRECISION AS $$
+DECLARE
+    v_now TIMESTAMPTZ := clock_timestamp();
+    v_tokens DOUBLE PRECISION;
+BEGIN
+    INSERT INTO public.rate_limit_buckets AS b (key, tokens, updated_at)
+    VALUES (p_key, p_burst, v_now)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = LEAST(p_burst, b.tokens + EXTRACT(EPOCH FROM v_now - b.updated_at) * p_rate),
+        updated_at = v_now
+    RETURNING tokens INTO v_tokens;
+
+    IF random() < 0.001 THEN
+        DELETE FROM public.rate_limit_buckets WHERE updated_at < v_now - INTERVAL '1 hour';
+    END IF;
+
+    IF v_tokens >= p_cost THEN
+        UPDATE public.rate_limit_buckets SET tokens = v_tokens - p_cost WHERE key = p_key;
+        RETURN 0;
+    END IF;
+    RETURN (p_cost - v_tokens) / p_rate;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION public.take_rate_tokens(TEXT, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,85 @@
+-- ============================================
+-- Prmpt - Bulk lesson import
+-- ============================================
+
+-- Upsert a bundle of lessons in one transaction.
+-- p_rows: [{"id": ..., "title": ..., "description": ..., "goal": ..., "game_type": ...,
+--           "difficulty": ..., "order_index": ..., "config": {...}, "time_limit": ...,
+--           "is_published": ...}, ...]
+-- Rows with an id replace that lesson (or create it with that id); rows without one get the next id.
+-- Returns {"created": [id, ...], "updated": [id, ...]} as one value: a row set would be cut
+-- to PostgREST's max_rows.
+DROP FUNCTION IF EXISTS public.import_lessons(JSONB);
+
+CREATE FUNCTION public.import_lessons(p_rows JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    v_max_id BIGINT;
+    v_result JSONB;
+BEGIN
+    -- Explicit ids bypass the sequence. Hold off other inserts while it is moved past them,
+    -- so generated ids cannot collide and the sequence is never moved backwards.
+    LOCK TABLE public.lessons IN SHARE ROW EXCLUSIVE MODE;
+    v_max_id := GREATEST(
+        (SELECT MAX(id) FROM public.lessons),
+        (SELECT MAX((r ->> 'id')::INTEGER) FROM jsonb_array_elements(p_rows) AS r)
+    );
+    IF v_max_id > (
+        SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM public.lessons_id_seq
+    ) THEN
+        PERFORM setval('lessons_id_seq', v_max_id);
+    END IF;
+
+    WITH written AS (
+        INSERT INTO public.lessons AS l (
+            id, title, description, goal, game_type, difficulty,
+            order_index, config, time_limit, is_published
+        )
+        SELECT
+            COALESCE(r.id, nextval('lessons_id_seq')),
+            r.title,
+            r.description,
+            r.goal,
+            r.game_type,
+            r.difficulty,
+            r.order_index,
+            COALESCE(r.config, '{}'),
+            r.time_limit,
+            COALESCE(r.is_published, false)
+        FROM jsonb_to_recordset(p_rows) AS r (
+            id INTEGER,
+            title TEXT,
+            description TEXT,
+            goal TEXT,
+            game_type TEXT,
+            difficulty TEXT,
+            order_index INTEGER,
+            config JSONB,
+            time_limit INTEGER,
+            is_published BOOLEAN
+        )
+        ON CONFLICT (id) DO UPDATE SET
+            title = EXCLUDED.title,
+            description = EXCLUDED.description,
+            goal = EXCLUDED.goal,
+            game_type = EXCLUDED.game_type,
+            difficulty = EXCLUDED.difficulty,
+            order_index = EXCLUDED.order_index,
+            config = EXCLUDED.config,
+            time_limit = EXCLUDED.time_limit,
+            is_published = EXCLUDED.is_published
+        -- xmax is 0 only for a freshly inserted row version
+        RETURNING l.id, (l.xmax = 0) AS inserted
+    )
+    SELECT jsonb_build_object(
+        'created', COALESCE(jsonb_agg(id ORDER BY id) FILTER (WHERE inserted), '[]'::JSONB),
+        'updated', COALESCE(jsonb_agg(id ORDER BY id) FILTER (WHERE NOT inserted), '[]'::JSONB)
+    )
+    INTO v_result
+    FROM written;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION public.import_lessons(JSONB) FROM PUBLIC, anon, authenticated;
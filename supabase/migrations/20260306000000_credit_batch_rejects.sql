@@ -0,0 +1,49 @@
+-- ============================================
+-- Prmpt - Per-entry outcomes for credit batches
+-- ============================================
+
+-- Apply a batch of deductions in one transaction, each entry in its own savepoint.
+-- p_entries: [{"user_id": ..., "amount": ..., "idempotency_key": ...}, ...]
+-- An entry that can never apply (unknown user, bad amount) is rolled back on its own and
+-- reported in "error" instead of failing the batch, so it cannot hold up the entries after it.
+-- Transient errors (lock timeouts, cancellation) still fail the whole call, which is retried.
+DROP FUNCTION IF EXISTS public.apply_credit_batch(JSONB, INTEGER);
+
+CREATE FUNCTION public.apply_credit_batch(p_entries JSONB, p_default INTEGER)
+RETURNS TABLE (
+    user_id UUID,
+    idempotency_key TEXT,
+    balance INTEGER,
+    charged INTEGER,
+    replayed BOOLEAN,
+    error TEXT
+) AS $$
+DECLARE
+    v_entry JSONB;
+BEGIN
+    FOR v_entry IN SELECT * FROM jsonb_array_elements(p_entries)
+    LOOP
+        user_id := NULL;
+        idempotency_key := v_entry ->> 'idempotency_key';
+        balance := NULL;
+        charged := NULL;
+        replayed := NULL;
+        error := NULL;
+        BEGIN
+            user_id := (v_entry ->> 'user_id')::UUID;
+            SELECT d.balance, d.charged, d.replayed INTO balance, charged, replayed
+            FROM public.deduct_credits(
+                user_id,
+                (v_entry ->> 'amount')::INTEGER,
+                idempotency_key,
+                p_default
+            ) d;
+        EXCEPTION WHEN integrity_constraint_violation OR data_exception OR raise_exception THEN
+            error := SQLERRM;
+        END;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION public.apply_credit_batch(JSONB, INTEGER) FROM PUBLIC, anon, authenticated;
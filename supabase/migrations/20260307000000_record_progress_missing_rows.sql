@@ -0,0 +1,35 @@
+-- ============================================
+-- Prmpt - Skip progress for deleted users and lessons
+-- ============================================
+
+-- As before, but rows whose user or lesson no longer exists are left out instead of failing
+-- the batch on the foreign keys. Returns the number of rows written; the caller counts the rest.
+CREATE OR REPLACE FUNCTION public.record_progress(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    INSERT INTO public.user_progress AS p (user_id, lesson_id, attempts, score, completed, completed_at)
+    SELECT r.user_id, r.lesson_id, r.attempts, r.score, r.completed, r.completed_at
+    FROM jsonb_to_recordset(p_rows) AS r (
+        user_id UUID,
+        lesson_id INTEGER,
+        attempts INTEGER,
+        score INTEGER,
+        completed BOOLEAN,
+        completed_at TIMESTAMPTZ
+    )
+    WHERE EXISTS (SELECT 1 FROM auth.users u WHERE u.id = r.user_id)
+        AND EXISTS (SELECT 1 FROM public.lessons l WHERE l.id = r.lesson_id)
+    ON CONFLICT (user_id, lesson_id) DO UPDATE SET
+        attempts = p.attempts + EXCLUDED.attempts,
+        score = GREATEST(p.score, EXCLUDED.score),
+        completed = p.completed OR EXCLUDED.completed,
+        completed_at = COALESCE(p.completed_at, EXCLUDED.completed_at);
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION public.record_progress(JSONB) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,17 @@
+-- ============================================
+-- Prmpt - Let deleted users take their ledger with them
+-- ============================================
+
+-- credit_ledger.user_id cascades from auth.users, but the append-only trigger rejected
+-- every DELETE, so deleting a user with any credit history failed. Ledger rows may now be
+-- deleted only once their user is gone, which is what the cascade does; updates, and deletes
+-- of a live user's history, are still rejected.
+CREATE OR REPLACE FUNCTION reject_ledger_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' AND NOT EXISTS (SELECT 1 FROM auth.users u WHERE u.id = OLD.user_id) THEN
+        RETURN OLD;
+    END IF;
+    RAISE EXCEPTION 'credit_ledger is append-only';
+END;
+$$ LANGUAGE plpgsql;